@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Load test for the analytics entry points
+Replays a mix of daily, weekly, historical and dashboard requests against the Python services
+the way the backend runs them - one process per request - with bounded concurrency and Poisson
+arrivals. Reports latency percentiles (from arrival, so queueing counts), throughput, error and
+timeout rates and the peak RSS of the worker processes.
+
+Run it against a local mongod seeded with the synthetic data
+(backend: npm run bulk-register && npm run generate-feedback):
+
+    python load_test.py --mongodb-uri mongodb://localhost:27017/hostel-food-analysis \\
+        --concurrency 8 --rate 4 --requests 200 --mix daily=5,weekly=3,historical=1,bundle=1
+
+Repeated periods are answered from the result cache, as they are in production. Linux/macOS
+only (worker RSS comes from os.wait4).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+SERVICES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "services")
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+RSS_BYTES = 1 if sys.platform == "darwin" else 1024
+HISTORICAL_TYPES = ("comparison", "trend", "pattern")
+DEFAULT_MIX = "daily=5,weekly=3,historical=1,bundle=1"
+
+def parse_mix(mix):
+    """'daily=5,weekly=3' -> {'daily': 5.0, 'weekly': 3.0}"""
+    weights = {}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in REQUEST_KINDS:
+            raise ValueError(f"Unknown request kind '{kind}' (use {', '.join(REQUEST_KINDS)})")
+        weights[kind] = float(weight or 1)
+    return weights
+
+def random_day(rng, first_day, last_day):
+    return first_day + timedelta(days=rng.randrange((last_day - first_day).days + 1))
+
+def daily_request(rng, first_day, last_day):
+    return "daily_analysis.py", [random_day(rng, first_day, last_day).strftime('%Y-%m-%d')]
+
+def weekly_request(rng, first_day, last_day):
+    return "weekly_analysis.py", [random_day(rng, first_day, last_day).strftime('%Y-%m-%d')]
+
+def bundle_request(rng, first_day, last_day):
+    return "dashboard_bundle.py", [random_day(rng, first_day, last_day).strftime('%Y-%m-%d')]
+
+def historical_request(rng, first_day, last_day):
+    start = random_day(rng, first_day, last_day)
+    end = random_day(rng, start, last_day)
+    return "historical_analysis.py", [start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'),
+                                      rng.choice(HISTORICAL_TYPES)]
+
+REQUEST_KINDS = {
+    "daily": daily_request,
+    "weekly": weekly_request,
+    "historical": historical_request,
+    "bundle": bundle_request
+}
+
+def run_worker(python, script, args, env, timeout):
+    """
+    Run one service process; returns (status, service seconds, peak RSS bytes)
+    status: ok, error (non-zero exit, unreadable output or an error payload) or timeout
+    """
+    started = time.monotonic()
+    process = subprocess.Popen([python, os.path.join(SERVICES_DIR, script), *args],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env)
+    output = []
+    reader = threading.Thread(target=lambda: output.append(process.stdout.read()), daemon=True)
+    reader.start()
+
+    timed_out = threading.Event()
+    def kill():
+        timed_out.set()
+        process.kill()
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+
+    # wait4 reaps the worker and reports its resource usage, which Popen.wait does not
+    _, wait_status, usage = os.wait4(process.pid, 0)
+    timer.cancel()
+    process.returncode = os.waitstatus_to_exitcode(wait_status)
+    reader.join()
+    process.stdout.close()
+    elapsed = time.monotonic() - started
+    peak_rss = usage.ru_maxrss * RSS_BYTES
+
+    if timed_out.is_set():
+        return "timeout", elapsed, peak_rss
+    if process.returncode != 0:
+        return "error", elapsed, peak_rss
+    try:
+        result = json.loads(output[0])
+    except (ValueError, IndexError):
+        return "error", elapsed, peak_rss
+    return ("error" if isinstance(result, dict) and result.get("error") else "ok"), elapsed, peak_rss
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3), "max": round(max(values), 3)}
+
+def summarize(samples, wall_seconds):
+    """Latency, throughput, error/timeout rates and worker RSS of a list of samples"""
+    total = len(samples)
+    statuses = [sample["status"] for sample in samples]
+    rss_mb = [sample["peakRss"] / 1024 / 1024 for sample in samples]
+    return {
+        "requests": total,
+        "throughput": round(total / wall_seconds, 3) if wall_seconds > 0 else None,
+        "errorRate": round(statuses.count("error") / total * 100, 2) if total else 0,
+        "timeoutRate": round(statuses.count("timeout") / total * 100, 2) if total else 0,
+        "latency": percentiles([sample["latency"] for sample in samples]),
+        "serviceTime": percentiles([sample["serviceTime"] for sample in samples]),
+        "queueWait": percentiles([sample["latency"] - sample["serviceTime"] for sample in samples]),
+        "peakRssMb": {
+            "p50": round(float(np.percentile(rss_mb, 50)), 1) if rss_mb else None,
+            "max": round(max(rss_mb), 1) if rss_mb else None
+        }
+    }
+
+def run_load_test(options):
+    """Dispatch the requests and collect one sample per request"""
+    rng = random.Random(options.seed)
+    weights = parse_mix(options.mix)
+    kinds = list(weights)
+    last_day = datetime.strptime(options.end, '%Y-%m-%d')
+    first_day = datetime.strptime(options.start, '%Y-%m-%d')
+
+    env = dict(os.environ)
+    if options.mongodb_uri:
+        env["MONGODB_URI"] = options.mongodb_uri
+
+    samples = []
+    lock = threading.Lock()
+
+    def execute(kind, script, args, arrived):
+        status, service_time, peak_rss = run_worker(options.python, script, args, env, options.timeout)
+        sample = {
+            "kind": kind,
+            "args": args,
+            "status": status,
+            "latency": time.monotonic() - arrived,
+            "serviceTime": service_time,
+            "peakRss": peak_rss
+        }
+        with lock:
+            samples.append(sample)
+            if options.verbose:
+                print(f"{kind:<10} {status:<7} {sample['latency']:7.2f}s "
+                      f"{peak_rss / 1024 / 1024:7.1f}MB {' '.join(args)}", file=sys.stderr)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=options.concurrency) as pool:
+        for _ in range(options.requests):
+            if options.rate > 0:
+                time.sleep(rng.expovariate(options.rate))
+            kind = rng.choices(kinds, weights=[weights[k] for k in kinds])[0]
+            script, args = REQUEST_KINDS[kind](rng, first_day, last_day)
+            pool.submit(execute, kind, script, args, time.monotonic())
+    wall_seconds = time.monotonic() - started
+
+    return samples, wall_seconds
+
+def print_report(report):
+    overall = report["overall"]
+    arrivals = f"{report['rate']}/s" if report['rate'] else "closed loop"
+    print(f"\n📊 LOAD TEST: {overall['requests']} requests, concurrency {report['concurrency']}, "
+          f"arrivals {arrivals}, {report['wallSeconds']}s")
+    print("=" * 78)
+    print(f"{'kind':<11}{'n':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'err%':>7}{'tmo%':>7}{'rss p50':>10}{'rss max':>10}")
+    for kind, summary in [*report["byKind"].items(), ("overall", overall)]:
+        latency = summary["latency"]
+        fmt = lambda value: f"{value:.2f}s" if value is not None else "-"
+        print(f"{kind:<11}{summary['requests']:>5}{fmt(latency['p50']):>9}{fmt(latency['p95']):>9}"
+              f"{fmt(latency['p99']):>9}{summary['errorRate']:>7}{summary['timeoutRate']:>7}"
+              f"{summary['peakRssMb']['p50'] or 0:>8}MB{summary['peakRssMb']['max'] or 0:>8}MB")
+    print(f"\nThroughput: {overall['throughput']} requests/s, "
+          f"queue wait p95: {overall['queueWait']['p95']}s")
+
+def main():
+    """Main entry point for the load test"""
+    today = datetime.now()
+    parser = argparse.ArgumentParser(description="Load test the analytics entry points")
+    parser.add_argument("--mongodb-uri", help="MongoDB for the workers (default: MONGODB_URI / .env)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Worker processes in flight at most")
+    parser.add_argument("--rate", type=float, default=2.0,
+                        help="Mean arrivals per second (Poisson); 0 sends the next request as soon as it is queued")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Request weights (default {DEFAULT_MIX})")
+    parser.add_argument("--start", default=(today - timedelta(days=30)).strftime('%Y-%m-%d'),
+                        help="First day requests may target (default: 30 days ago)")
+    parser.add_argument("--end", default=(today - timedelta(days=1)).strftime('%Y-%m-%d'),
+                        help="Last day requests may target (default: yesterday)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a worker is killed (backend default 60)")
+    parser.add_argument("--python", default=sys.executable, help="Interpreter for the workers")
+    parser.add_argument("--seed", type=int, help="Random seed, for a repeatable request sequence")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Log every request to stderr")
+    options = parser.parse_args()
+
+    try:
+        parse_mix(options.mix)
+        if datetime.strptime(options.start, '%Y-%m-%d') > datetime.strptime(options.end, '%Y-%m-%d'):
+            raise ValueError("--start must not be after --end")
+    except ValueError as e:
+        parser.error(str(e))
+
+    samples, wall_seconds = run_load_test(options)
+
+    report = {
+        "concurrency": options.concurrency,
+        "rate": options.rate,
+        "wallSeconds": round(wall_seconds, 2),
+        "overall": summarize(samples, wall_seconds),
+        "byKind": {
+            kind: summarize([sample for sample in samples if sample["kind"] == kind], wall_seconds)
+            for kind in REQUEST_KINDS if any(sample["kind"] == kind for sample in samples)
+        }
+    }
+
+    if options.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Alerts Service for Hostel Food Analysis
+Evaluates the configured alert rules (config/alert_rules.json) over any date range
+"""
+
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import DatabaseConnection, AnalysisError, safe_json_output, handle_error
+from utils.metrics import enable_run_metrics
+from utils.records import load_feedback_records
+from utils.kernel import aggregate_feedback
+from utils.alert_rules import evaluate_alert_rules, load_alert_rules
+from utils.result_cache import cached_analysis, result_key
+from datetime import datetime, timedelta
+
+def build_alerts_analysis(db_conn, start_date_str, end_date_str):
+    """Alerts of the range start..end (inclusive)"""
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    except ValueError:
+        raise AnalysisError("Invalid date format. Use YYYY-MM-DD", "DATE_ERROR")
+
+    if start_date > end_date:
+        raise AnalysisError("Start date must not be after end date", "DATE_ERROR")
+
+    feedback_data = load_feedback_records(db_conn.get_feedback_collection(), {
+        "date": {
+            "$gte": start_date,
+            "$lt": end_date + timedelta(days=1)
+        }
+    })
+    total_students = db_conn.get_users_collection().count_documents({"isAdmin": False})
+
+    alerts = evaluate_alert_rules(aggregate_feedback(feedback_data), total_students)
+
+    return {
+        "error": False,
+        "startDate": start_date_str,
+        "endDate": end_date_str,
+        "rulesEvaluated": len(load_alert_rules()),
+        "data": alerts,
+        "timestamp": datetime.now().isoformat()
+    }
+
+def cached_alerts_analysis(db_conn, start_date_str, end_date_str):
+    """Alerts read through the result cache; returns (result, cached)"""
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    except ValueError:
+        return build_alerts_analysis(db_conn, start_date_str, end_date_str), False
+
+    key = result_key("alerts", start_date, end_date)
+    return cached_analysis(db_conn, key, start_date, end_date + timedelta(days=1),
+                           lambda: build_alerts_analysis(db_conn, start_date_str, end_date_str))
+
+def analyze_alerts(start_date_str, end_date_str):
+    """
+    Evaluate the alert rules over a date range and print the alerts
+    """
+    db_conn = DatabaseConnection()
+
+    if not db_conn.connect():
+        handle_error("Failed to connect to database", "DATABASE_ERROR")
+        return
+
+    try:
+        result, _ = cached_alerts_analysis(db_conn, start_date_str, end_date_str)
+        safe_json_output(result)
+
+    except AnalysisError as e:
+        handle_error(e.message, e.error_type)
+    except Exception as e:
+        handle_error(f"Alerts analysis failed: {str(e)}", "ANALYSIS_ERROR")
+    finally:
+        db_conn.close()
+
+def main():
+    """Main entry point for the alerts script"""
+    parser = argparse.ArgumentParser(description="Evaluate alert rules over a date range")
+    parser.add_argument("start_date")
+    parser.add_argument("end_date")
+
+    try:
+        args = parser.parse_args()
+    except SystemExit:
+        handle_error("Usage: python alerts_analysis.py <start_date> <end_date>", "INVALID_ARGS")
+        return
+
+    analyze_alerts(args.start_date, args.end_date)
+
+if __name__ == "__main__":
+    enable_run_metrics()
+    main()
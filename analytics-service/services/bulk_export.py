@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Bulk Export Service for Hostel Food Analysis
+Writes per-day, per-meal, per-weekday and per-student rating aggregates of a date range to CSV
+or Parquet files for BI tools. The range is aggregated with the analysis kernel one chunk of days
+at a time straight off the feedback cursor (utils.records iter_feedback_partitions), so memory
+stays constant whatever the length of the range:
+
+- day rows are written as soon as their chunk is aggregated (one Parquet row group per chunk)
+- meal and weekday totals are fixed-size histograms summed across chunks
+- student totals grow with the number of students, never with the number of days
+
+Files are written next to their final name and moved into place once complete, so a reader
+never sees a half-written export.
+"""
+
+import sys
+import os
+import csv
+import time
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import DatabaseConnection, AnalysisError, safe_json_output, handle_error
+from utils.metrics import enable_run_metrics
+from utils.records import iter_feedback_partitions
+from utils.kernel import MEAL_TYPES, WEEKDAY_NAMES, RATING_VALUES
+from utils.memory import MemoryMonitor, MAX_PARTITION_DAYS
+from datetime import datetime, timedelta
+import numpy as np
+
+EXPORTS_DIR = os.getenv(
+    'ANALYTICS_EXPORTS_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'exports')
+)
+EXPORT_FORMATS = ['csv', 'parquet']
+# Student rows are written in batches of this many rows (one Parquet row group each)
+STUDENT_BATCH_ROWS = 50000
+# Exports run below the dashboards' CPU priority
+EXPORT_NICENESS = 10
+
+HISTOGRAM_COLUMNS = [("ratings", "int"), ("average_rating", "float")] + \
+                    [(f"rating_{stars}", "int") for stars in RATING_VALUES] + [("comments", "int")]
+TABLE_COLUMNS = {
+    "day": [("date", "string"), ("weekday", "string"), ("meal", "string")] + HISTOGRAM_COLUMNS +
+           [("documents", "int"), ("participants", "int")],
+    "meal": [("meal", "string")] + HISTOGRAM_COLUMNS + [("days", "int")],
+    "weekday": [("weekday", "string"), ("meal", "string")] + HISTOGRAM_COLUMNS + [("days", "int")],
+    "student": [("student", "string"), ("meal", "string")] + HISTOGRAM_COLUMNS +
+               [("first_date", "string"), ("last_date", "string")]
+}
+EXPORT_TABLES = list(TABLE_COLUMNS)
+
+def load_pyarrow():
+    """pyarrow and pyarrow.parquet; Parquet is the only export that needs them"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise AnalysisError("Parquet export needs pyarrow (pip install pyarrow)", "MISSING_DEPENDENCY")
+    return pyarrow, pyarrow.parquet
+
+class CsvTableWriter:
+    """One CSV table, written a batch of columns at a time"""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = [name for name, _ in columns]
+        self.rows = 0
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.columns)
+
+    def write(self, batch):
+        """batch: {column: list of values}, all the same length"""
+        rows = list(zip(*(batch[name] for name in self.columns)))
+        self._writer.writerows(rows)
+        self.rows += len(rows)
+
+    def close(self):
+        self._file.close()
+
+class ParquetTableWriter:
+    """One Parquet table, one row group per written batch"""
+
+    def __init__(self, path, columns):
+        pyarrow, parquet = load_pyarrow()
+        types = {"string": pyarrow.string(), "int": pyarrow.int64(), "float": pyarrow.float64()}
+        self.path = path
+        self.rows = 0
+        self._pyarrow = pyarrow
+        self._schema = pyarrow.schema([(name, types[kind]) for name, kind in columns])
+        self._writer = parquet.ParquetWriter(path, self._schema, compression='snappy')
+
+    def write(self, batch):
+        table = self._pyarrow.Table.from_pydict({name: batch[name] for name in self._schema.names}, schema=self._schema)
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self):
+        self._writer.close()
+
+TABLE_WRITERS = {"csv": CsvTableWriter, "parquet": ParquetTableWriter}
+
+def histogram_columns(counts, comments):
+    """HISTOGRAM_COLUMNS of N rating histograms (N, 5) and their comment counts (N,)"""
+    counts = np.asarray(counts, dtype=np.int64).reshape(-1, 5)
+    ratings = counts.sum(axis=1)
+    totals = counts @ RATING_VALUES
+    columns = {
+        "ratings": ratings.tolist(),
+        "average_rating": [round(int(total) / int(count), 2) if count else None for total, count in zip(totals, ratings)],
+        "comments": np.asarray(comments, dtype=np.int64).reshape(-1).tolist()
+    }
+    for stars in RATING_VALUES:
+        columns[f"rating_{stars}"] = counts[:, stars - 1].tolist()
+    return columns
+
+class StudentTotals:
+    """Per student x meal histograms, comments and first / last rated day, summed across chunks"""
+
+    def __init__(self, n_meals):
+        self.n_meals = n_meals
+        self.keys = []
+        self._index = {}
+        self.counts = np.zeros((0, n_meals, 5), dtype=np.int64)
+        self.comments = np.zeros((0, n_meals), dtype=np.int64)
+        self.first_day = np.zeros((0, n_meals), dtype=np.int64)
+        self.last_day = np.zeros((0, n_meals), dtype=np.int64)
+
+    def _positions(self, user_keys):
+        """Rows of the chunk's students, adding new students (capacity doubles as it grows)"""
+        positions = np.empty(len(user_keys), dtype=np.int64)
+        for user, user_key in enumerate(user_keys):
+            position = self._index.get(user_key)
+            if position is None:
+                position = self._index[user_key] = len(self.keys)
+                self.keys.append(user_key)
+            positions[user] = position
+
+        if len(self.keys) > len(self.counts):
+            capacity = max(len(self.keys), 2 * len(self.counts), 256)
+            grow = capacity - len(self.counts)
+            self.counts = np.concatenate([self.counts, np.zeros((grow, self.n_meals, 5), dtype=np.int64)])
+            self.comments = np.concatenate([self.comments, np.zeros((grow, self.n_meals), dtype=np.int64)])
+            self.first_day = np.concatenate([self.first_day, np.full((grow, self.n_meals), np.iinfo(np.int64).max)])
+            self.last_day = np.concatenate([self.last_day, np.zeros((grow, self.n_meals), dtype=np.int64)])
+        return positions
+
+    def add(self, aggregates):
+        """Add one chunk's aggregates (built with keep_ratings)"""
+        positions = self._positions(aggregates.user_keys)
+        if not len(aggregates.rating_stars):
+            return
+        users = positions[aggregates.rating_users]
+        meals = aggregates.rating_meals.astype(np.int64)
+        ordinals = np.array([date.toordinal() for date in aggregates.day_dates], dtype=np.int64)[aggregates.rating_days]
+
+        self.counts[positions] += aggregates.user_counts
+        np.add.at(self.comments, (users, meals), aggregates.rating_commented.astype(np.int64))
+        np.minimum.at(self.first_day, (users, meals), ordinals)
+        np.maximum.at(self.last_day, (users, meals), ordinals)
+
+    def batches(self, meal_types, batch_rows=STUDENT_BATCH_ROWS):
+        """Student rows (students with at least one rating in a meal), batch_rows at a time"""
+        n_students = len(self.keys)
+        students_per_batch = max(batch_rows // self.n_meals, 1)
+        for start in range(0, n_students, students_per_batch):
+            end = min(start + students_per_batch, n_students)
+            counts = self.counts[start:end]
+            rated = counts.sum(axis=2) > 0
+            students, meals = np.nonzero(rated)
+            if not len(students):
+                continue
+            batch = {
+                "student": [self.keys[start + student] for student in students],
+                "meal": [meal_types[meal] for meal in meals],
+                "first_date": [datetime.fromordinal(int(day)).strftime('%Y-%m-%d')
+                               for day in self.first_day[start:end][rated]],
+                "last_date": [datetime.fromordinal(int(day)).strftime('%Y-%m-%d')
+                              for day in self.last_day[start:end][rated]]
+            }
+            batch.update(histogram_columns(counts[rated], self.comments[start:end][rated]))
+            yield batch
+
+def day_batch(aggregates, meal_types):
+    """Day x meal rows of one chunk's aggregates, in date order"""
+    order = sorted(range(len(aggregates.day_keys)), key=lambda day: aggregates.day_keys[day])
+    n_meals = len(meal_types)
+    batch = {
+        "date": [aggregates.day_keys[day] for day in order for _ in meal_types],
+        "weekday": [WEEKDAY_NAMES[aggregates.day_dates[day].weekday()] for day in order for _ in meal_types],
+        "meal": meal_types * len(order),
+        "documents": np.repeat(aggregates.day_documents[order], n_meals).tolist(),
+        "participants": [len(aggregates.day_users[day]) for day in order for _ in meal_types]
+    }
+    batch.update(histogram_columns(aggregates.counts[order], aggregates.day_comments[order]))
+    return batch
+
+def export_path(output_dir, start_date_str, end_date_str, table, export_format):
+    """<output_dir>/<start>_<end>/<table>.<format>"""
+    return os.path.join(output_dir, f"{start_date_str}_{end_date_str}", f"{table}.{export_format}")
+
+def export_aggregates(db_conn, start_date_str, end_date_str, export_format="csv", tables=None,
+                      output_dir=EXPORTS_DIR, chunk_days=MAX_PARTITION_DAYS, memory=None):
+    """
+    Export the aggregates of [start_date, end_date] (inclusive) as one file per table
+    tables: subset of EXPORT_TABLES (default: all)
+    chunk_days: days aggregated per pass over the cursor
+    memory: MemoryMonitor of the run (checked after every chunk)
+    """
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    except ValueError:
+        raise AnalysisError("Invalid date format. Use YYYY-MM-DD", "DATE_ERROR")
+
+    if start_date > end_date:
+        raise AnalysisError("Start date must be before end date", "DATE_ERROR")
+
+    tables = tables or EXPORT_TABLES
+    unknown_tables = [table for table in tables if table not in TABLE_COLUMNS]
+    if unknown_tables:
+        raise AnalysisError(f"Unknown export table(s): {', '.join(unknown_tables)}", "INVALID_ARGS")
+    if export_format not in TABLE_WRITERS:
+        raise AnalysisError(f"Unsupported export format: {export_format}", "INVALID_ARGS")
+    if chunk_days < 1:
+        raise AnalysisError("chunkDays must be at least 1", "INVALID_ARGS")
+    if export_format == "parquet":
+        load_pyarrow()  # fail before reading any feedback
+
+    memory = memory or MemoryMonitor("export")
+    started = time.perf_counter()
+    meal_types = list(MEAL_TYPES)
+    n_meals = len(meal_types)
+
+    meal_counts = np.zeros((n_meals, 5), dtype=np.int64)
+    meal_comments = np.zeros(n_meals, dtype=np.int64)
+    meal_days = np.zeros(n_meals, dtype=np.int64)
+    weekday_counts = np.zeros((7, n_meals, 5), dtype=np.int64)
+    weekday_comments = np.zeros((7, n_meals), dtype=np.int64)
+    weekday_days = np.zeros(7, dtype=np.int64)
+    students = StudentTotals(n_meals)
+    documents = days = 0
+
+    paths = {table: export_path(output_dir, start_date_str, end_date_str, table, export_format) for table in tables}
+    os.makedirs(os.path.dirname(paths[tables[0]]), exist_ok=True)
+    writers = {}
+    try:
+        for table in tables:
+            writers[table] = TABLE_WRITERS[export_format](paths[table] + ".partial", TABLE_COLUMNS[table])
+
+        for chunk_start, _, aggregates in iter_feedback_partitions(
+            db_conn.get_feedback_collection(), start_date, end_date + timedelta(days=1), chunk_days,
+            meal_types, keep_ratings=True
+        ):
+            if aggregates.day_keys:
+                if "day" in writers:
+                    writers["day"].write(day_batch(aggregates, meal_types))
+
+                meal_counts += aggregates.counts.sum(axis=0)
+                meal_comments += aggregates.day_comments.sum(axis=0)
+                meal_days += (aggregates.counts.sum(axis=2) > 0).sum(axis=0)
+                weekdays = np.array([date.weekday() for date in aggregates.day_dates], dtype=np.int64)
+                np.add.at(weekday_counts, weekdays, aggregates.counts)
+                np.add.at(weekday_comments, weekdays, aggregates.day_comments)
+                np.add.at(weekday_days, weekdays, 1)
+                if "student" in writers:
+                    students.add(aggregates)
+                documents += aggregates.total_documents
+                days += len(aggregates.day_keys)
+            memory.checkpoint(chunk_start.strftime('%Y-%m-%d'))
+
+        if "meal" in writers:
+            batch = {"meal": meal_types, "days": meal_days.tolist()}
+            batch.update(histogram_columns(meal_counts, meal_comments))
+            writers["meal"].write(batch)
+
+        if "weekday" in writers:
+            batch = {
+                "weekday": [name for name in WEEKDAY_NAMES for _ in meal_types],
+                "meal": meal_types * 7,
+                "days": np.repeat(weekday_days, n_meals).tolist()
+            }
+            batch.update(histogram_columns(weekday_counts, weekday_comments))
+            writers["weekday"].write(batch)
+
+        if "student" in writers:
+            for batch in students.batches(meal_types):
+                writers["student"].write(batch)
+
+        for table, writer in writers.items():
+            writer.close()
+            os.replace(writer.path, paths[table])
+    except BaseException:
+        for writer in writers.values():
+            try:
+                writer.close()
+            except Exception:
+                pass
+            if os.path.exists(writer.path):
+                os.remove(writer.path)
+        raise
+    finally:
+        memory.report()
+
+    print(f"Debug: Exported {documents} feedback documents over {days} days in "
+          f"{time.perf_counter() - started:.2f}s", file=sys.stderr)
+    return {
+        "error": False,
+        "startDate": start_date_str,
+        "endDate": end_date_str,
+        "format": export_format,
+        "chunkDays": chunk_days,
+        "documents": documents,
+        "days": days,
+        "students": len(students.keys) if "student" in writers else None,
+        "files": [
+            {
+                "table": table,
+                "path": paths[table],
+                "rows": writer.rows,
+                "bytes": os.path.getsize(paths[table])
+            }
+            for table, writer in writers.items()
+        ],
+        "seconds": round(time.perf_counter() - started, 2),
+        "timestamp": datetime.now().isoformat()
+    }
+
+def run_export(start_date_str, end_date_str, export_format, tables, output_dir, chunk_days):
+    """Connect, export and print the summary of the written files"""
+    db_conn = DatabaseConnection()
+
+    if not db_conn.connect():
+        handle_error("Failed to connect to database", "DATABASE_ERROR")
+        return
+
+    try:
+        safe_json_output(export_aggregates(db_conn, start_date_str, end_date_str, export_format, tables,
+                                           output_dir, chunk_days))
+    except AnalysisError as e:
+        handle_error(e.message, e.error_type)
+    except Exception as e:
+        handle_error(f"Bulk export failed: {str(e)}", "EXPORT_ERROR")
+    finally:
+        db_conn.close()
+
+def main():
+    """Main entry point for the bulk export script"""
+    parser = argparse.ArgumentParser(description="Export aggregated analytics to CSV or Parquet")
+    parser.add_argument("start_date")
+    parser.add_argument("end_date")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--tables", default=",".join(EXPORT_TABLES), help=f"Comma-separated: {', '.join(EXPORT_TABLES)}")
+    parser.add_argument("--output-dir", default=EXPORTS_DIR)
+    parser.add_argument("--chunk-days", type=int, default=MAX_PARTITION_DAYS)
+
+    try:
+        args = parser.parse_args()
+    except SystemExit:
+        handle_error("Usage: python bulk_export.py <start_date> <end_date> [--format csv|parquet] "
+                     "[--tables day,meal,weekday,student] [--output-dir DIR] [--chunk-days N]", "INVALID_ARGS")
+        return
+
+    if hasattr(os, 'nice'):
+        os.nice(EXPORT_NICENESS)
+
+    tables = [table.strip() for table in args.tables.split(',') if table.strip()]
+    run_export(args.start_date, args.end_date, args.format, tables, args.output_dir, args.chunk_days)
+
+if __name__ == "__main__":
+    enable_run_metrics()
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Comment Search Service for Hostel Food Analysis
+Searches feedback comments through the persistent inverted index
+"""
+
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import DatabaseConnection, safe_json_output, handle_error
+from utils.metrics import enable_run_metrics
+from utils.comment_index import update_comment_index, search_comments, MEAL_TYPES
+from datetime import datetime
+
+def run_comment_search(query, start_date_str=None, end_date_str=None, meals=None,
+                       min_rating=None, max_rating=None, limit=50):
+    """
+    Bring the index up to date with new feedback, then search it
+    """
+    db_conn = DatabaseConnection()
+
+    if not db_conn.connect():
+        handle_error("Failed to connect to database", "DATABASE_ERROR")
+        return
+
+    try:
+        try:
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d') if start_date_str else None
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d') if end_date_str else None
+        except ValueError:
+            handle_error("Invalid date format. Use YYYY-MM-DD", "DATE_ERROR")
+            return
+
+        invalid_meals = [meal for meal in (meals or []) if meal not in MEAL_TYPES]
+        if invalid_meals:
+            handle_error(f"Unknown meal type(s): {', '.join(invalid_meals)}", "INVALID_ARGS")
+            return
+
+        indexed = update_comment_index(db_conn)
+        search_result = search_comments(
+            db_conn, query,
+            start_date=start_date,
+            end_date=end_date,
+            meals=meals,
+            min_rating=min_rating,
+            max_rating=max_rating,
+            limit=limit
+        )
+
+        safe_json_output({
+            "error": False,
+            "query": query,
+            "filters": {
+                "startDate": start_date_str,
+                "endDate": end_date_str,
+                "meals": meals or MEAL_TYPES,
+                "minRating": min_rating,
+                "maxRating": max_rating
+            },
+            "newlyIndexed": indexed,
+            "total": search_result["total"],
+            "results": search_result["results"],
+            "timestamp": datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        handle_error(f"Comment search failed: {str(e)}", "SEARCH_ERROR")
+    finally:
+        db_conn.close()
+
+def main():
+    """Main entry point for the comment search script"""
+    parser = argparse.ArgumentParser(description="Search feedback comments")
+    parser.add_argument("query", help='Terms and/or quoted phrases, e.g. insects "ice cold"')
+    parser.add_argument("--start", dest="start_date")
+    parser.add_argument("--end", dest="end_date")
+    parser.add_argument("--meals", help="Comma-separated meal types")
+    parser.add_argument("--min-rating", type=int)
+    parser.add_argument("--max-rating", type=int)
+    parser.add_argument("--limit", type=int, default=50)
+
+    try:
+        args = parser.parse_args()
+    except SystemExit:
+        handle_error("Usage: python comment_search.py <query> [--start YYYY-MM-DD] [--end YYYY-MM-DD] "
+                     "[--meals morning,night] [--min-rating N] [--max-rating N] [--limit N]", "INVALID_ARGS")
+        return
+
+    run_comment_search(
+        args.query,
+        start_date_str=args.start_date,
+        end_date_str=args.end_date,
+        meals=args.meals.split(',') if args.meals else None,
+        min_rating=args.min_rating,
+        max_rating=args.max_rating,
+        limit=args.limit
+    )
+
+if __name__ == "__main__":
+    enable_run_metrics()
+    main()
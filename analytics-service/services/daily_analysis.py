@@ -8,14 +8,35 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.database import DatabaseConnection, get_date_range, safe_json_output, handle_error
+from utils.database import DatabaseConnection, AnalysisError, get_date_range, safe_json_output, handle_error
+from utils.metrics import enable_run_metrics
+from utils.sentiment import analyze_text_sentiment
+from utils.topics import analyze_comment_topics
+from utils.sketches import analyze_top_phrases
+from utils.dedup import detect_near_duplicates
+from utils.records import load_feedback_records
+from utils.kernel import aggregate_feedback, histogram_mean
+from utils.confidence import mean_intervals
+from utils.alert_rules import evaluate_alert_rules, load_alert_rules
+from utils.result_cache import cached_analysis, result_key
+from utils.deltas import watermarked_analysis
+from utils.segments import attach_segment_breakdown
 from datetime import datetime, timedelta
-from collections import Counter
+import argparse
 
-def generate_overall_summary(all_ratings, all_comments, meal_ratings, meal_comments):
-    """Generate AI-powered overall summary with strong insights and actionable recommendations"""
+# Sentiment bucket of each star rating (index 0 unused): 0 negative, 1 neutral, 2 positive
+RATING_SENTIMENT = (None, 0, 0, 1, 2, 2)
+
+def generate_overall_summary(meal_counts, all_comments, rule_insights=()):
+    """
+    Generate AI-powered overall summary with strong insights and actionable recommendations
+    meal_counts: {meal_type: [count of 1..5 star ratings]}
+    rule_insights: messages of the day's alerts whose rules are marked as insights (meal gap, complaint rate)
+    """
+    rating_counts = [sum(counts[star] for counts in meal_counts.values()) for star in range(5)]
+    total_feedback = sum(rating_counts)
     
-    if not all_ratings:
+    if not total_feedback:
         return {
             "key_insights": [],
             "critical_actions": [],
@@ -23,13 +44,11 @@ def generate_overall_summary(all_ratings, all_comments, meal_ratings, meal_comme
         }
     
     # Calculate comprehensive metrics
-    avg_rating = sum(all_ratings) / len(all_ratings)
-    total_feedback = len(all_ratings)
+    avg_rating = histogram_mean(rating_counts)
     
     # Rating distribution analysis
-    rating_counts = Counter(all_ratings)
-    poor_ratings = rating_counts[1] + rating_counts[2]  # 1-2 stars
-    excellent_ratings = rating_counts[4] + rating_counts[5]  # 4-5 stars
+    poor_ratings = rating_counts[0] + rating_counts[1]  # 1-2 stars
+    excellent_ratings = rating_counts[3] + rating_counts[4]  # 4-5 stars
     
     poor_percentage = (poor_ratings / total_feedback) * 100
     excellent_percentage = (excellent_ratings / total_feedback) * 100
@@ -63,32 +82,20 @@ def generate_overall_summary(all_ratings, all_comments, meal_ratings, meal_comme
         }
     }
     
-    # Analyze all comments for patterns
-    all_text = " ".join(all_comments).lower()
+    # Analyze all comments for patterns: an issue's mentions are the comments naming any of its
+    # keywords, so near-duplicates collapsed by the caller are not counted again
+    lowered_comments = [comment.lower() for comment in all_comments]
     detected_issues = []
     critical_actions = []
     
     for issue_type, config in issue_patterns.items():
-        issue_count = sum(1 for keyword in config["keywords"] if keyword in all_text)
+        issue_count = sum(1 for comment in lowered_comments if any(keyword in comment for keyword in config["keywords"]))
         if issue_count > 0:
             severity_indicator = "🔴" if config["severity"] == "CRITICAL" else "🟠" if config["severity"] == "HIGH" else "🟡"
             detected_issues.append(f"{severity_indicator} {issue_type.replace('_', ' ').title()}: {issue_count} mentions")
             if config["severity"] in ["CRITICAL", "HIGH"]:
                 critical_actions.append(config["action"])
     
-    # Meal performance analysis
-    meal_names = {'morning': 'Breakfast', 'afternoon': 'Lunch', 'evening': 'Dinner', 'night': 'Night Snacks'}
-    meal_performance = {}
-    
-    for meal_type, ratings in meal_ratings.items():
-        if ratings:
-            meal_avg = sum(ratings) / len(ratings)
-            meal_performance[meal_names[meal_type]] = {
-                "rating": meal_avg,
-                "count": len(ratings),
-                "poor_count": len([r for r in ratings if r <= 2])
-            }
-    
     # Generate key insights (3-4 strong points)
     key_insights = []
     
@@ -100,19 +107,8 @@ def generate_overall_summary(all_ratings, all_comments, meal_ratings, meal_comme
     else:
         key_insights.append(f"🔴 CRITICAL: Low {avg_rating:.1f}/5 average with {poor_percentage:.0f}% poor ratings - immediate action needed")
     
-    # Insight 2: Best/worst meal identification
-    if meal_performance:
-        best_meal = max(meal_performance.items(), key=lambda x: x[1]["rating"])
-        worst_meal = min(meal_performance.items(), key=lambda x: x[1]["rating"])
-        
-        if best_meal[1]["rating"] - worst_meal[1]["rating"] > 0.8:
-            key_insights.append(f"📊 MEAL GAP: {best_meal[0]} excels ({best_meal[1]['rating']:.1f}) while {worst_meal[0]} struggles ({worst_meal[1]['rating']:.1f}) - focus on consistency")
-        
-        # Identify meals with high complaint rates
-        for meal_name, data in meal_performance.items():
-            poor_rate = (data["poor_count"] / data["count"]) * 100 if data["count"] > 0 else 0
-            if poor_rate > 30:
-                key_insights.append(f"⚠️ {meal_name.upper()} ALERT: {poor_rate:.0f}% negative feedback ({data['poor_count']}/{data['count']}) - requires immediate review")
+    # Insight 2: meal gap / complaint rate alerts from the alert rules
+    key_insights.extend(rule_insights)
     
     # Insight 3: Participation and engagement
     if total_feedback < 50:
@@ -148,289 +144,333 @@ def generate_overall_summary(all_ratings, all_comments, meal_ratings, meal_comme
         "performance_summary": performance_summary
     }
 
-def analyze_daily_feedback(date_str):
+def build_daily_analysis(db_conn, date_str, feedback_data=None, total_students=None):
     """
-    Perform comprehensive daily analysis with enhanced features
+    Build the comprehensive daily analysis result for a date
+    feedback_data / total_students: the day's feedback records and student count when the
+    caller already fetched them (e.g. the dashboard bundle reads the whole week once)
     """
-    db_conn = DatabaseConnection()
+    # Parse the requested date
+    try:
+        requested_date = datetime.strptime(date_str, '%Y-%m-%d')
+    except ValueError:
+        raise AnalysisError("Invalid date format. Use YYYY-MM-DD", "INVALID_DATE")
     
-    if not db_conn.connect():
-        handle_error("Failed to connect to database", "DATABASE_ERROR")
-        return
+    # Get current date (today)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     
-    try:
-        # Parse the requested date
-        try:
-            requested_date = datetime.strptime(date_str, '%Y-%m-%d')
-        except ValueError:
-            handle_error("Invalid date format. Use YYYY-MM-DD", "INVALID_DATE")
-            return
-        
-        # Get current date (today)
-        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        print(f"Debug: Requested date: {requested_date}, Today: {today}", file=sys.stderr)
-        
-        # Check if requested date is future (allow today and past)
-        if requested_date > today:
-            safe_json_output({
-                "status": "no_data",
-                "message": f"Feedback will be available after {requested_date.strftime('%Y-%m-%d')}",
-                "date": date_str,
-                "type": "future_date"
-            })
-            return
-        
-        # Get date range for the requested day
-        start_date, end_date = get_date_range(date_str, "day")
-        
-        # Get collections
-        feedback_collection = db_conn.get_feedback_collection()
-        users_collection = db_conn.get_users_collection()
-        
-        # Get total registered students
+    print(f"Debug: Requested date: {requested_date}, Today: {today}", file=sys.stderr)
+    
+    # Check if requested date is future (allow today and past)
+    if requested_date > today:
+        return {
+            "status": "no_data",
+            "message": f"Feedback will be available after {requested_date.strftime('%Y-%m-%d')}",
+            "date": date_str,
+            "type": "future_date"
+        }
+    
+    # Get date range for the requested day
+    start_date, end_date = get_date_range(date_str, "day")
+    
+    # Get collections
+    feedback_collection = db_conn.get_feedback_collection()
+    users_collection = db_conn.get_users_collection()
+    
+    # Get total registered students
+    if total_students is None:
         total_students = users_collection.count_documents({"isAdmin": False})
-        
-        print(f"Debug: Querying collection: {feedback_collection.name}", file=sys.stderr)
-        print(f"Debug: Date range: {start_date} to {end_date}", file=sys.stderr)
-        
-        # Fetch feedback data for the day
-        feedback_cursor = feedback_collection.find({
+    
+    print(f"Debug: Querying collection: {feedback_collection.name}", file=sys.stderr)
+    print(f"Debug: Date range: {start_date} to {end_date}", file=sys.stderr)
+    
+    # Fetch feedback data for the day
+    if feedback_data is None:
+        feedback_data = load_feedback_records(feedback_collection, {
             "date": {
                 "$gte": start_date,
                 "$lt": end_date
             }
         })
-        
-        feedback_data = list(feedback_cursor)
-        print(f"Debug: Found {len(feedback_data)} feedback documents for {date_str}", file=sys.stderr)
-        
-        # Additional debug: Show sample dates if no data found
-        if len(feedback_data) == 0:
-            sample_dates = list(feedback_collection.find({}, {"date": 1}).sort("date", -1).limit(5))
-            print(f"Debug: No data found. Sample dates in database:", file=sys.stderr)
-            for doc in sample_dates:
-                print(f"  - {doc.get('date')}", file=sys.stderr)
-            print(f"Debug: Total feedback documents in collection: {feedback_collection.count_documents({})}", file=sys.stderr)
-        
-        if not feedback_data:
-            safe_json_output({
-                "status": "no_data",
-                "message": "No feedback found for this date",
-                "date": date_str,
-                "type": "no_feedback",
-                "data": {
-                    "overview": {
-                        "totalStudents": total_students,
-                        "participatingStudents": 0,
-                        "participationRate": 0,
-                        "overallRating": 0
-                    }
+    print(f"Debug: Found {len(feedback_data)} feedback documents for {date_str}", file=sys.stderr)
+    
+    # Additional debug: Show sample dates if no data found
+    if len(feedback_data) == 0:
+        sample_dates = list(feedback_collection.find({}, {"date": 1}).sort("date", -1).limit(5))
+        print(f"Debug: No data found. Sample dates in database:", file=sys.stderr)
+        for doc in sample_dates:
+            print(f"  - {doc.get('date')}", file=sys.stderr)
+        print(f"Debug: Total feedback documents in collection: {feedback_collection.count_documents({})}", file=sys.stderr)
+    
+    if not feedback_data:
+        return {
+            "status": "no_data",
+            "message": "No feedback found for this date",
+            "date": date_str,
+            "type": "no_feedback",
+            "data": {
+                "overview": {
+                    "totalStudents": total_students,
+                    "participatingStudents": 0,
+                    "participationRate": 0,
+                    "overallRating": 0
                 }
-            })
-            return
-        
-        # Initialize analysis data structures
-        meal_types = ['morning', 'afternoon', 'evening', 'night']
-        meal_names = {
-            'morning': 'Breakfast',
-            'afternoon': 'Lunch', 
-            'evening': 'Dinner',
-            'night': 'Night Snacks'
+            }
         }
+    
+    # Initialize analysis data structures
+    meal_types = ['morning', 'afternoon', 'evening', 'night']
+    meal_names = {
+        'morning': 'Breakfast',
+        'afternoon': 'Lunch', 
+        'evening': 'Dinner',
+        'night': 'Night Snacks'
+    }
+    
+    # One pass over the day's documents: rating histograms per meal and the comment records
+    aggregates = aggregate_feedback(feedback_data, meal_types)
+    meal_counts = dict(zip(meal_types, aggregates.meal_counts().tolist()))
+    participating_students = int(aggregates.day_rated_documents.sum())
+    
+    # Calculate overall metrics
+    overall_rating = histogram_mean(aggregates.counts)
+    participation_rate = (participating_students / total_students * 100) if total_students > 0 else 0
+    
+    # Calculate average ratings per meal for pie chart
+    average_ratings_per_meal = {}
+    for meal_type in meal_types:
+        if sum(meal_counts[meal_type]):
+            average_ratings_per_meal[meal_names[meal_type]] = round(histogram_mean(meal_counts[meal_type]), 2)
+        else:
+            average_ratings_per_meal[meal_names[meal_type]] = 0
+    
+    # 95% bootstrap intervals for each meal average and the overall average (last entry)
+    rating_intervals = mean_intervals(
+        [meal_counts[meal_type] for meal_type in meal_types] + [aggregates.meal_counts().sum(axis=0)]
+    )
+    average_rating_intervals_per_meal = {
+        meal_names[meal_type]: interval for meal_type, interval in zip(meal_types, rating_intervals)
+    }
+    
+    # Calculate student rating distribution per meal
+    student_rating_per_meal = {}
+    for meal_type in meal_types:
+        student_rating_per_meal[meal_names[meal_type]] = sum(meal_counts[meal_type])
+    
+    # Prepare feedback distribution data for bar charts
+    feedback_distribution_per_meal = {}
+    for meal_type in meal_types:
+        feedback_distribution_per_meal[meal_names[meal_type]] = {
+            f"{star}_star": meal_counts[meal_type][star - 1] for star in range(1, 6)
+        }
+    
+    # Flag near-duplicate (copy-pasted / bot-like) comments once; they are collapsed
+    # before keyword counting and comment sampling (records grouped by meal, document order within)
+    comment_records = sorted(aggregates.comment_records, key=lambda record: meal_types.index(record[1]))
+    duplicate_result = detect_near_duplicates([record[3] for record in comment_records])
+    unique_records = [record for i, record in enumerate(comment_records) if i not in duplicate_result["duplicate_indices"]]
+    unique_comments = [record[3] for record in unique_records]
+    
+    # Bucket the unique comments once by meal index: (rating, comment) pairs and
+    # [negative, neutral, positive] sample lists (1-2, 3 and 4-5 stars)
+    meal_index = {meal_type: meal for meal, meal_type in enumerate(meal_types)}
+    rated_comments = [[] for _ in meal_types]
+    sentiment_comments = [([], [], []) for _ in meal_types]
+    for _, meal_type, rating, comment in unique_records:
+        meal = meal_index[meal_type]
+        rated_comments[meal].append((rating, comment))
+        sentiment_comments[meal][RATING_SENTIMENT[rating]].append(comment)
+    
+    # Score comment text in one batch (cached by comment hash) to compare with star ratings
+    text_sentiment_per_meal = analyze_text_sentiment(db_conn, {
+        meal_names[meal_type]: rated_comments[meal] for meal, meal_type in enumerate(meal_types)
+    })
+    
+    # Generate enhanced sentiment analysis for each meal
+    sentiment_analysis_per_meal = {}
+    for meal, meal_type in enumerate(meal_types):
+        counts = meal_counts[meal_type]
+        meal_name = meal_names[meal_type]
         
-        # Initialize data structures for analysis
-        meal_ratings = {meal: [] for meal in meal_types}
-        meal_comments = {meal: [] for meal in meal_types}
-        meal_participants = {meal: 0 for meal in meal_types}
-        rating_distribution = {meal: {1: 0, 2: 0, 3: 0, 4: 0, 5: 0} for meal in meal_types}
-        
-        all_ratings = []
-        all_comments = []
-        participating_students = 0
-        
-        # Process each feedback document
-        for feedback in feedback_data:
-            user_has_feedback = False
+        if sum(counts):
+            # Calculate sentiment metrics
+            avg_rating = histogram_mean(counts)
+            total_ratings = sum(counts)
             
-            for meal_type in meal_types:
-                meal_data = feedback.get('meals', {}).get(meal_type, {})
-                rating = meal_data.get('rating')
-                comment = meal_data.get('comment', '')
-                
-                if rating is not None:
-                    meal_ratings[meal_type].append(rating)
-                    all_ratings.append(rating)
-                    meal_participants[meal_type] += 1
-                    rating_distribution[meal_type][rating] += 1
-                    user_has_feedback = True
-                    
-                    # Always append a comment entry (possibly empty) to keep alignment with ratings
-                    meal_comments[meal_type].append(comment.strip() if comment and comment.strip() else '')
-                    if comment and comment.strip():
-                        all_comments.append(comment.strip())
+            # Categorize feedback by sentiment
+            positive_count = counts[3] + counts[4]  # 4-5 stars
+            neutral_count = counts[2]               # 3 stars
+            negative_count = counts[0] + counts[1]  # 1-2 stars
             
-            if user_has_feedback:
-                participating_students += 1
-        
-        # Calculate overall metrics
-        overall_rating = sum(all_ratings) / len(all_ratings) if all_ratings else 0
-        participation_rate = (participating_students / total_students * 100) if total_students > 0 else 0
-        
-        # Calculate average ratings per meal for pie chart
-        average_ratings_per_meal = {}
-        for meal_type in meal_types:
-            if meal_ratings[meal_type]:
-                avg_rating = sum(meal_ratings[meal_type]) / len(meal_ratings[meal_type])
-                average_ratings_per_meal[meal_names[meal_type]] = round(avg_rating, 2)
+            # Calculate percentages
+            positive_percentage = (positive_count / total_ratings) * 100 if total_ratings > 0 else 0
+            negative_percentage = (negative_count / total_ratings) * 100 if total_ratings > 0 else 0
+            neutral_percentage = (neutral_count / total_ratings) * 100 if total_ratings > 0 else 0
+            
+            # Sample comments for each sentiment
+            negative_comments, neutral_comments, positive_comments = sentiment_comments[meal]
+            
+            # Generate sentiment insights
+            sentiment_insights = []
+            if positive_percentage >= 60:
+                sentiment_insights.append(f"Strong positive sentiment ({positive_percentage:.0f}% satisfied)")
+            elif negative_percentage >= 30:
+                sentiment_insights.append(f"Concerning negative feedback ({negative_percentage:.0f}% dissatisfied)")
             else:
-                average_ratings_per_meal[meal_names[meal_type]] = 0
-        
-        # Calculate student rating distribution per meal
-        student_rating_per_meal = {}
-        for meal_type in meal_types:
-            student_rating_per_meal[meal_names[meal_type]] = meal_participants[meal_type]
-        
-        # Prepare feedback distribution data for bar charts
-        feedback_distribution_per_meal = {}
-        for meal_type in meal_types:
-            feedback_distribution_per_meal[meal_names[meal_type]] = {
-                "1_star": rating_distribution[meal_type][1],
-                "2_star": rating_distribution[meal_type][2], 
-                "3_star": rating_distribution[meal_type][3],
-                "4_star": rating_distribution[meal_type][4],
-                "5_star": rating_distribution[meal_type][5]
-            }
-        
-        # Generate enhanced sentiment analysis for each meal
-        sentiment_analysis_per_meal = {}
-        for meal_type in meal_types:
-            comments = meal_comments[meal_type]
-            ratings = meal_ratings[meal_type]
-            meal_name = meal_names[meal_type]
+                sentiment_insights.append(f"Mixed feedback - needs attention")
             
-            if comments and ratings:
-                # Calculate sentiment metrics
-                avg_rating = sum(ratings) / len(ratings)
-                total_ratings = len(ratings)
-                
-                # Categorize feedback by sentiment
-                positive_ratings = [r for r in ratings if r >= 4]  # 4-5 stars
-                neutral_ratings = [r for r in ratings if r == 3]   # 3 stars
-                negative_ratings = [r for r in ratings if r <= 2]  # 1-2 stars
-                
-                positive_count = len(positive_ratings)
-                neutral_count = len(neutral_ratings)
-                negative_count = len(negative_ratings)
-                
-                # Calculate percentages
-                positive_percentage = (positive_count / total_ratings) * 100 if total_ratings > 0 else 0
-                negative_percentage = (negative_count / total_ratings) * 100 if total_ratings > 0 else 0
-                neutral_percentage = (neutral_count / total_ratings) * 100 if total_ratings > 0 else 0
-                
-                # Get sample comments for each sentiment
-                positive_comments = []
-                negative_comments = []
-                neutral_comments = []
-                
-                for i, comment in enumerate(comments):
-                    if i < len(ratings) and comment.strip():
-                        rating = ratings[i]
-                        if rating >= 4:
-                            positive_comments.append(comment)
-                        elif rating <= 2:
-                            negative_comments.append(comment)
-                        else:
-                            neutral_comments.append(comment)
-                
-                # Generate sentiment insights
-                sentiment_insights = []
-                if positive_percentage >= 60:
-                    sentiment_insights.append(f"Strong positive sentiment ({positive_percentage:.0f}% satisfied)")
-                elif negative_percentage >= 30:
-                    sentiment_insights.append(f"Concerning negative feedback ({negative_percentage:.0f}% dissatisfied)")
-                else:
-                    sentiment_insights.append(f"Mixed feedback - needs attention")
-                
-                # Identify dominant sentiment
-                if positive_count > negative_count and positive_count > neutral_count:
-                    dominant_sentiment = "positive"
-                    sentiment_color = "green"
-                elif negative_count > positive_count and negative_count > neutral_count:
-                    dominant_sentiment = "negative" 
-                    sentiment_color = "red"
-                else:
-                    dominant_sentiment = "neutral"
-                    sentiment_color = "yellow"
-                
-                sentiment_analysis_per_meal[meal_name] = {
-                    "average_rating": round(avg_rating, 2),
-                    "total_responses": total_ratings,
-                    "sentiment_distribution": {
-                        "positive": {
-                            "count": positive_count,
-                            "percentage": round(positive_percentage, 1),
-                            "sample_comments": positive_comments[:2]
-                        },
-                        "negative": {
-                            "count": negative_count,
-                            "percentage": round(negative_percentage, 1),
-                            "sample_comments": negative_comments[:2]
-                        },
-                        "neutral": {
-                            "count": neutral_count,
-                            "percentage": round(neutral_percentage, 1),
-                            "sample_comments": neutral_comments[:1]
-                        }
-                    },
-                    "dominant_sentiment": dominant_sentiment,
-                    "sentiment_color": sentiment_color,
-                    "sentiment_score": round(avg_rating * 20, 1),  # Convert to percentage
-                    "key_insights": sentiment_insights,
-                    "improvement_areas": negative_comments[:2] if negative_comments else [],
-                    "positive_highlights": positive_comments[:2] if positive_comments else []
-                }
+            # Identify dominant sentiment
+            if positive_count > negative_count and positive_count > neutral_count:
+                dominant_sentiment = "positive"
+                sentiment_color = "green"
+            elif negative_count > positive_count and negative_count > neutral_count:
+                dominant_sentiment = "negative" 
+                sentiment_color = "red"
             else:
-                sentiment_analysis_per_meal[meal_name] = {
-                    "average_rating": 0,
-                    "total_responses": 0,
-                    "sentiment_distribution": {
-                        "positive": {"count": 0, "percentage": 0, "sample_comments": []},
-                        "negative": {"count": 0, "percentage": 0, "sample_comments": []},
-                        "neutral": {"count": 0, "percentage": 0, "sample_comments": []}
+                dominant_sentiment = "neutral"
+                sentiment_color = "yellow"
+            
+            sentiment_analysis_per_meal[meal_name] = {
+                "average_rating": round(avg_rating, 2),
+                "average_rating_interval": average_rating_intervals_per_meal[meal_name],
+                "total_responses": total_ratings,
+                "sentiment_distribution": {
+                    "positive": {
+                        "count": positive_count,
+                        "percentage": round(positive_percentage, 1),
+                        "sample_comments": positive_comments[:2]
                     },
-                    "dominant_sentiment": "none",
-                    "sentiment_color": "gray",
-                    "sentiment_score": 0,
-                    "key_insights": ["No feedback available"],
-                    "improvement_areas": [],
-                    "positive_highlights": []
-                }
-        
-        # Generate overall feedback summary and common issues
-        overall_summary = generate_overall_summary(all_ratings, all_comments, meal_ratings, meal_comments)
-        
-        # Prepare final result
-        result = {
-            "status": "success",
-            "date": date_str,
-            "data": {
-                "overview": {
-                    "totalStudents": total_students,
-                    "participatingStudents": participating_students,
-                    "participationRate": round(participation_rate, 1),
-                    "overallRating": round(overall_rating, 2)
+                    "negative": {
+                        "count": negative_count,
+                        "percentage": round(negative_percentage, 1),
+                        "sample_comments": negative_comments[:2]
+                    },
+                    "neutral": {
+                        "count": neutral_count,
+                        "percentage": round(neutral_percentage, 1),
+                        "sample_comments": neutral_comments[:1]
+                    }
+                },
+                "dominant_sentiment": dominant_sentiment,
+                "sentiment_color": sentiment_color,
+                "sentiment_score": round(avg_rating * 20, 1),  # Convert to percentage
+                "key_insights": sentiment_insights,
+                "improvement_areas": negative_comments[:2] if negative_comments else [],
+                "positive_highlights": positive_comments[:2] if positive_comments else [],
+                "text_sentiment": text_sentiment_per_meal[meal_name]
+            }
+        else:
+            sentiment_analysis_per_meal[meal_name] = {
+                "average_rating": 0,
+                "average_rating_interval": None,
+                "total_responses": 0,
+                "sentiment_distribution": {
+                    "positive": {"count": 0, "percentage": 0, "sample_comments": []},
+                    "negative": {"count": 0, "percentage": 0, "sample_comments": []},
+                    "neutral": {"count": 0, "percentage": 0, "sample_comments": []}
                 },
-                "averageRatingPerMeal": average_ratings_per_meal,
-                "studentRatingPerMeal": student_rating_per_meal,
-                "feedbackDistributionPerMeal": feedback_distribution_per_meal,
-                "sentimentAnalysisPerMeal": sentiment_analysis_per_meal,
-                "overallSummary": overall_summary
+                "dominant_sentiment": "none",
+                "sentiment_color": "gray",
+                "sentiment_score": 0,
+                "key_insights": ["No feedback available"],
+                "improvement_areas": [],
+                "positive_highlights": [],
+                "text_sentiment": text_sentiment_per_meal[meal_name]
             }
+    
+    # Alert rules over the day's histograms; rules marked as insights also feed the summary
+    alerts = evaluate_alert_rules(aggregates, total_students)
+    insight_rules = {rule["id"] for rule in load_alert_rules() if rule.get("insight")}
+    rule_insights = [alert["message"] for alert in alerts if alert["rule"] in insight_rules]
+    
+    # Generate overall feedback summary and common issues
+    overall_summary = generate_overall_summary(meal_counts, unique_comments, rule_insights)
+    
+    # Cluster the day's comments into topics (the persisted model absorbs closed days incrementally);
+    # the per-day stores take the raw records and collapse duplicates themselves
+    comment_topics = analyze_comment_topics(db_conn, unique_records, comment_records)
+    
+    # Frequent phrases from the day's phrase sketches (stored in the rollup store once the day closes)
+    top_phrases = analyze_top_phrases(db_conn, [date_str], meal_types, comment_records)
+    
+    # Prepare final result
+    result = {
+        "status": "success",
+        "date": date_str,
+        "data": {
+            "overview": {
+                "totalStudents": total_students,
+                "participatingStudents": participating_students,
+                "participationRate": round(participation_rate, 1),
+                "overallRating": round(overall_rating, 2),
+                "overallRatingInterval": rating_intervals[-1]
+            },
+            "averageRatingPerMeal": average_ratings_per_meal,
+            "averageRatingIntervalPerMeal": average_rating_intervals_per_meal,
+            "studentRatingPerMeal": student_rating_per_meal,
+            "feedbackDistributionPerMeal": feedback_distribution_per_meal,
+            "sentimentAnalysisPerMeal": sentiment_analysis_per_meal,
+            "topicsPerMeal": {
+                meal_names[meal_type]: topics for meal_type, topics in comment_topics["topicsPerMeal"].items()
+            },
+            "topPhrasesPerMeal": {
+                meal_names[meal_type]: phrases for meal_type, phrases in top_phrases["perMeal"].items()
+            },
+            "duplicateComments": duplicate_result["stats"],
+            "alerts": alerts,
+            "overallSummary": overall_summary
         }
-        
+    }
+    
+    return result
+
+def cached_daily_analysis(db_conn, date_str, refresh=False, store=None, load_feedback=None):
+    """
+    Daily analysis read through the result cache; returns (result, cached)
+    load_feedback: optional callable returning (feedback records, total students), only called on a miss
+    """
+    try:
+        datetime.strptime(date_str, '%Y-%m-%d')
+    except ValueError:
+        return build_daily_analysis(db_conn, date_str), False
+    
+    start_date, end_date = get_date_range(date_str, "day")
+    build = lambda: build_daily_analysis(db_conn, date_str, *(load_feedback() if load_feedback else ()))
+    return cached_analysis(db_conn, result_key("daily", start_date), start_date, end_date, build, refresh, store)
+
+def polled_daily_analysis(db_conn, date_str, since=None):
+    """
+    Daily analysis for polling clients: the full result with a watermark, or "not_modified" /
+    a delta of the changed sections when since is a watermark the client already holds
+    """
+    try:
+        datetime.strptime(date_str, '%Y-%m-%d')
+    except ValueError:
+        return build_daily_analysis(db_conn, date_str), False
+    
+    start_date, end_date = get_date_range(date_str, "day")
+    return watermarked_analysis(db_conn, result_key("daily", start_date), start_date, end_date,
+                                lambda: build_daily_analysis(db_conn, date_str), since)
+
+def analyze_daily_feedback(date_str, since=None, segments=False):
+    """
+    Perform comprehensive daily analysis with enhanced features
+    segments: attach the day's breakdown by student segment (data.segmentBreakdown)
+    """
+    db_conn = DatabaseConnection()
+    
+    if not db_conn.connect():
+        handle_error("Failed to connect to database", "DATABASE_ERROR")
+        return
+    
+    try:
+        result, _ = polled_daily_analysis(db_conn, date_str, since)
+        if segments:
+            attach_segment_breakdown(db_conn, result, [date_str])
         safe_json_output(result)
         
+    except AnalysisError as e:
+        handle_error(e.message, e.error_type)
     except Exception as e:
         handle_error(f"Daily analysis failed: {str(e)}", "ANALYSIS_ERROR")
     finally:
@@ -438,12 +478,19 @@ def analyze_daily_feedback(date_str):
 
 def main():
     """Main entry point for the daily analysis script"""
-    if len(sys.argv) != 2:
-        handle_error("Usage: python daily_analysis.py <date_string>", "INVALID_ARGS")
+    parser = argparse.ArgumentParser(description="Daily feedback analysis")
+    parser.add_argument("date")
+    parser.add_argument("--since", help="Watermark of the result the client holds")
+    parser.add_argument("--segments", action="store_true", help="Attach the breakdown by student segment")
+    
+    try:
+        args = parser.parse_args()
+    except SystemExit:
+        handle_error("Usage: python daily_analysis.py <date_string> [--since WATERMARK] [--segments]", "INVALID_ARGS")
         return
     
-    date_str = sys.argv[1]
-    analyze_daily_feedback(date_str)
+    analyze_daily_feedback(args.date, args.since, args.segments)
 
 if __name__ == "__main__":
+    enable_run_metrics()
     main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Dashboard Bundle Service for Hostel Food Analysis
+Builds everything the admin dashboard shows when it opens - the selected day, its week, the
+quick stats and the current alerts - in one process. The week's feedback is read at most once
+(and not at all when both analyses are served from the result cache); the day is cut from it.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import DatabaseConnection, AnalysisError, get_date_range, safe_json_output, handle_error
+from utils.metrics import enable_run_metrics
+from utils.records import load_feedback_records
+from utils.result_cache import ist_today
+from daily_analysis import cached_daily_analysis
+from weekly_analysis import cached_weekly_analysis
+from datetime import datetime, timedelta
+
+def week_feedback_loaders(db_conn, date_str):
+    """
+    Feedback loaders for the week containing date_str and for the day itself, sharing one
+    feedback query and one student count (run on first use)
+    """
+    week_start, week_end = get_date_range(date_str, "week")
+    day_start, day_end = get_date_range(date_str, "day")
+    loaded = {}
+
+    def load_week():
+        if not loaded:
+            loaded["records"] = load_feedback_records(db_conn.get_feedback_collection(), {
+                "date": {
+                    "$gte": week_start,
+                    "$lt": week_end
+                }
+            })
+            loaded["students"] = db_conn.get_users_collection().count_documents({"isAdmin": False})
+            print(f"Debug: Loaded {len(loaded['records'])} feedback documents for the week", file=sys.stderr)
+        return loaded["records"], loaded["students"]
+
+    def load_day():
+        records, total_students = load_week()
+        return [record for record in records if day_start <= record.date < day_end], total_students
+
+    return load_week, load_day
+
+def rating_indicator(meal_ratings):
+    """Dashboard indicator from the average of the rated meals' averages"""
+    ratings = [rating for rating in meal_ratings if rating > 0]
+    if not ratings:
+        return "no_data"
+
+    avg_rating = sum(ratings) / len(ratings)
+    if avg_rating >= 4.0:
+        return "excellent"
+    if avg_rating >= 3.5:
+        return "good"
+    if avg_rating >= 3.0:
+        return "average"
+    return "poor"
+
+def build_alerts(daily_result, weekly_result):
+    """Current alerts: the alert rules evaluated over the day and over its week"""
+    alerts = [{**alert, "source": "daily"} for alert in (daily_result.get("data") or {}).get("alerts", [])]
+    alerts.extend({**alert, "source": "weekly"} for alert in (weekly_result.get("data") or {}).get("weeklyAlerts", []))
+    return alerts
+
+def build_quick_stats(date_str, daily_result, alerts):
+    """Headline numbers of the day for the dashboard cards"""
+    data = daily_result.get("data") or {}
+    overview = data.get("overview") or {}
+    meal_ratings = data.get("averageRatingPerMeal") or {}
+    rated_meals = [(meal, rating) for meal, rating in meal_ratings.items() if rating > 0]
+
+    best_meal = max(rated_meals, key=lambda item: item[1]) if rated_meals else None
+    worst_meal = min(rated_meals, key=lambda item: item[1]) if rated_meals else None
+
+    return {
+        "date": date_str,
+        "overallRating": overview.get("overallRating", 0),
+        "participationRate": overview.get("participationRate", 0),
+        "totalFeedbacks": overview.get("participatingStudents", 0),
+        "alertsCount": len(alerts),
+        "bestMeal": {"meal": best_meal[0], "rating": best_meal[1]} if best_meal else None,
+        "worstMeal": {"meal": worst_meal[0], "rating": worst_meal[1]} if worst_meal else None,
+        "trend": rating_indicator(meal_ratings.values())
+    }
+
+def build_dashboard_bundle(db_conn, date_str):
+    """Build the dashboard sections for date_str from one read of its week"""
+    try:
+        datetime.strptime(date_str, '%Y-%m-%d')
+    except ValueError:
+        raise AnalysisError("Invalid date format. Use YYYY-MM-DD", "DATE_ERROR")
+
+    load_week, load_day = week_feedback_loaders(db_conn, date_str)
+
+    daily_result, daily_cached = cached_daily_analysis(db_conn, date_str, load_feedback=load_day)
+    weekly_result, weekly_cached = cached_weekly_analysis(db_conn, date_str, load_feedback=load_week)
+
+    alerts = build_alerts(daily_result, weekly_result)
+
+    return {
+        "status": "success",
+        "date": date_str,
+        "data": {
+            "today": daily_result,
+            "week": weekly_result,
+            "quickStats": build_quick_stats(date_str, daily_result, alerts),
+            "alerts": alerts
+        },
+        "sources": {
+            "today": "cache" if daily_cached else "computed",
+            "week": "cache" if weekly_cached else "computed"
+        },
+        "timestamp": datetime.now().isoformat()
+    }
+
+def analyze_dashboard_bundle(date_str):
+    """
+    Build and print the dashboard bundle
+    """
+    db_conn = DatabaseConnection()
+
+    if not db_conn.connect():
+        handle_error("Failed to connect to database", "DATABASE_ERROR")
+        return
+
+    try:
+        safe_json_output(build_dashboard_bundle(db_conn, date_str))
+
+    except AnalysisError as e:
+        handle_error(e.message, e.error_type)
+    except Exception as e:
+        handle_error(f"Dashboard bundle failed: {str(e)}", "ANALYSIS_ERROR")
+    finally:
+        db_conn.close()
+
+def main():
+    """Main entry point for the dashboard bundle script"""
+    if len(sys.argv) > 2:
+        handle_error("Usage: python dashboard_bundle.py [date_string]", "INVALID_ARGS")
+        return
+
+    # Default: yesterday in IST, the latest closed day
+    date_str = sys.argv[1] if len(sys.argv) == 2 else (ist_today() - timedelta(days=1)).strftime('%Y-%m-%d')
+    analyze_dashboard_bundle(date_str)
+
+if __name__ == "__main__":
+    enable_run_metrics()
+    main()
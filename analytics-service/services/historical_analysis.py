@@ -1,24 +1,224 @@
 #!/usr/bin/env python3
 """
 Historical Analysis Service for Hostel Food Analysis
-Analyzes historical feedback data with comparisons and trends
+Analyzes historical feedback data with comparisons, trends, patterns, meal correlations and student segments
 """
 
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.database import DatabaseConnection, get_date_range, safe_json_output, handle_error
+from utils.database import DatabaseConnection, AnalysisError, get_date_range, safe_json_output, stream_json_line, handle_error
+from utils.metrics import enable_run_metrics
+from utils.sentiment import analyze_text_sentiment
+from utils.topics import analyze_comment_topics
+from utils.sketches import analyze_top_phrases
+from utils.dedup import collapse_comment_records
+from utils.downsampling import downsample_daily_averages, MIN_POINTS
+from utils.records import load_feedback_records, aggregate_feedback_partitions
+from utils.kernel import aggregate_feedback, histogram_count, histogram_mean, MEAL_TYPES
+from utils.memory import MemoryMonitor, plan_feedback_load
+from utils.confidence import mean_intervals
+from utils.significance import compare_histograms, linear_trend_test, is_meaningful
+from utils.correlation import analyze_meal_correlations
+from utils.segments import analyze_student_segments
+from utils.sampling import SampledAggregates, sample_feedback_aggregates, SAMPLE_SIZE
+from utils.result_cache import cached_analysis, result_key
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 from collections import defaultdict
 import json
+import argparse
 
-def analyze_historical_data(start_date_str, end_date_str, analysis_type="comparison"):
+# Sections keyed by date that are streamed as one row per day
+DAY_ROW_SECTIONS = ['dailyAverages']
+# Analysis types that only read the per-day histograms and can run on a sample
+APPROXIMATE_TYPES = ['comparison', 'trend', 'pattern']
+
+def emit_sections(emit, sections):
+    """Stream result sections as NDJSON records (no-op without an emitter)"""
+    if emit is None:
+        return
+    for name, value in sections.items():
+        if name in DAY_ROW_SECTIONS:
+            for date_key in sorted(value):
+                emit({"type": "day", "section": name, "date": date_key, "row": value[date_key]})
+        else:
+            emit({"type": "section", "name": name, "data": value})
+
+def build_historical_analysis(db_conn, start_date_str, end_date_str, analysis_type="comparison", emit=None,
+                              max_points=None, memory=None, approximate=False, sample_size=SAMPLE_SIZE):
+    """
+    Build the historical analysis result between two dates
+    analysis_type: 'comparison', 'trend', 'pattern', 'correlation', 'segmentation'
+    emit: optional callback receiving each section as soon as it is computed
+    max_points: optional cap on the trend series length (shape-preserving downsampling)
+    memory: MemoryMonitor of the run (default: budget and profiling from the environment)
+    approximate: estimate from a day-stratified sample of about sample_size feedback documents
+    (utils.sampling); the result gains an 'approximation' section with the sampling error bounds
+    """
+    # Parse dates
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    except ValueError:
+        raise AnalysisError("Invalid date format. Use YYYY-MM-DD", "DATE_ERROR")
+    
+    if start_date >= end_date:
+        raise AnalysisError("Start date must be before end date", "DATE_ERROR")
+    
+    if max_points is not None and max_points < MIN_POINTS:
+        raise AnalysisError(f"maxPoints must be at least {MIN_POINTS}", "INVALID_ARGS")
+    
+    if approximate and analysis_type not in APPROXIMATE_TYPES:
+        raise AnalysisError(f"Approximate mode supports {', '.join(APPROXIMATE_TYPES)} analyses", "INVALID_ARGS")
+    
+    if approximate and sample_size < 1:
+        raise AnalysisError("sampleSize must be at least 1", "INVALID_ARGS")
+    
+    memory = memory or MemoryMonitor("historical")
+    
+    # Get collections
+    feedback_collection = db_conn.get_feedback_collection()
+    users_collection = db_conn.get_users_collection()
+    
+    feedback_query = {
+        "date": {
+            "$gte": start_date,
+            "$lt": end_date + timedelta(days=1)
+        }
+    }
+    document_count = feedback_collection.count_documents(feedback_query)
+    total_students = users_collection.count_documents({"isAdmin": False})
+    
+    if not document_count:
+        result = create_empty_historical_result(start_date_str, end_date_str, analysis_type)
+        emit_sections(emit, result["data"])
+        return result
+    
+    # One pass over the range: every analysis type formats these aggregates. Ranges too large
+    # for the memory budget are aggregated in partitions straight off the cursor (the merged
+    # aggregates still hold every comment record of the range for the comment phases below)
+    # Correlations and segments also keep every rating's (student, day, meal) coordinates for the
+    # rating tensor / the per-day student profiles
+    keep_ratings = analysis_type in ("correlation", "segmentation")
+    strategy, partition_days = (
+        ("sampled", None) if approximate
+        else plan_feedback_load(document_count, (end_date - start_date).days + 1, memory.budget)
+    )
+    if strategy == "sampled":
+        aggregates = sample_feedback_aggregates(feedback_collection, start_date, end_date + timedelta(days=1),
+                                                sample_size)
+    elif strategy == "partitioned":
+        print(f"Debug: Aggregating {document_count} feedback documents in {partition_days}-day partitions", file=sys.stderr)
+        aggregates = aggregate_feedback_partitions(feedback_collection, start_date, end_date + timedelta(days=1),
+                                                   partition_days, keep_ratings=keep_ratings)
+    else:
+        aggregates = aggregate_feedback(load_feedback_records(feedback_collection, feedback_query),
+                                        keep_ratings=keep_ratings)
+    memory.checkpoint("aggregate")
+    range_days = [(start_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((end_date - start_date).days + 1)]
+    
+    # Perform analysis based on type
+    if analysis_type == "comparison":
+        analysis_result = perform_comparison_analysis(aggregates, start_date, end_date, total_students)
+    elif analysis_type == "trend":
+        analysis_result = perform_trend_analysis(aggregates, start_date, end_date, total_students)
+        # Statistics above use every day; only the returned series is downsampled
+        if max_points:
+            analysis_result["dailyAverages"], analysis_result["downsampling"] = downsample_daily_averages(
+                analysis_result["dailyAverages"], max_points
+            )
+    elif analysis_type == "pattern":
+        analysis_result = perform_pattern_analysis(aggregates, start_date, end_date, total_students)
+    elif analysis_type == "correlation":
+        analysis_result = analyze_meal_correlations(aggregates, start_date, end_date)
+    elif analysis_type == "segmentation":
+        analysis_result = analyze_student_segments(db_conn, aggregates, range_days)
+    else:
+        raise AnalysisError(f"Unknown analysis type: {analysis_type}", "ANALYSIS_ERROR")
+    if approximate:
+        analysis_result["approximation"] = aggregates.approximation(sample_size)
+    memory.checkpoint(analysis_type)
+    emit_sections(emit, analysis_result)
+    
+    # Collapse near-duplicate comments (within and across days) for sentiment and topic summaries;
+    # the per-day stores (topic training, phrase sketches) take the raw records and collapse per day.
+    # These phases see the whole range even after a partitioned load (plan_feedback_load counts them)
+    comment_records = aggregates.comment_records
+    unique_records, analysis_result["duplicateComments"] = collapse_comment_records(comment_records)
+    memory.checkpoint("dedup")
+    emit_sections(emit, {"duplicateComments": analysis_result["duplicateComments"]})
+    
+    # Text sentiment vs star rating per meal (scores cached by comment hash)
+    rated_comments = defaultdict(list)
+    for _, meal_type, rating, comment in unique_records:
+        rated_comments[meal_type].append((rating, comment))
+    analysis_result["textSentiment"] = analyze_text_sentiment(db_conn, rated_comments)
+    memory.checkpoint("sentiment")
+    emit_sections(emit, {"textSentiment": analysis_result["textSentiment"]})
+    
+    # Top comment topics per meal from the incrementally trained topic model (a sample never trains it)
+    analysis_result["topTopics"] = analyze_comment_topics(
+        db_conn, unique_records, [] if approximate else comment_records
+    )["topicsPerMeal"]
+    memory.checkpoint("topics")
+    emit_sections(emit, {"topTopics": analysis_result["topTopics"]})
+    
+    # Top phrases merged from the daily phrase sketches of the range (sampled days are not stored)
+    analysis_result["topPhrases"] = analyze_top_phrases(
+        db_conn, range_days, MEAL_TYPES, comment_records, store=not approximate
+    )
+    memory.checkpoint("phrases")
+    memory.report()
+    emit_sections(emit, {"topPhrases": analysis_result["topPhrases"]})
+    
+    # Final result
+    result = {
+        "error": False,
+        "startDate": start_date_str,
+        "endDate": end_date_str,
+        "analysisType": analysis_type,
+        "timestamp": datetime.now().isoformat(),
+        "data": analysis_result
+    }
+    
+    return result
+
+def cached_historical_analysis(db_conn, start_date_str, end_date_str, analysis_type="comparison", max_points=None,
+                               refresh=False, store=None, emit=None, memory=None, approximate=False,
+                               sample_size=SAMPLE_SIZE):
+    """
+    Historical analysis read through the result cache; returns (result, cached)
+    emit: streams the sections as they are computed, or all at once from a cached result
+    approximate: sampled results bypass the cache (a fresh sample costs less than the fingerprint)
+    """
+    build = lambda: build_historical_analysis(db_conn, start_date_str, end_date_str, analysis_type, emit=emit,
+                                              max_points=max_points, memory=memory, approximate=approximate,
+                                              sample_size=sample_size)
+    if approximate:
+        return build(), False
+    
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    except ValueError:
+        return build(), False
+    
+    key = result_key("historical", analysis_type, start_date, end_date, max_points)
+    result, cached = cached_analysis(db_conn, key, start_date, end_date + timedelta(days=1), build, refresh, store)
+    if cached:
+        emit_sections(emit, result["data"])
+    return result, cached
+
+def analyze_historical_data(start_date_str, end_date_str, analysis_type="comparison", max_points=None,
+                            memory_budget=None, profile_memory=None, approximate=False, sample_size=SAMPLE_SIZE):
     """
     Perform historical analysis between two dates or periods
-    analysis_type: 'comparison', 'trend', 'pattern'
+    analysis_type: 'comparison', 'trend', 'pattern', 'correlation', 'segmentation'
+    memory_budget / profile_memory: override the environment's memory budget (bytes) and profiling
+    approximate / sample_size: estimate from a sample of the feedback (see build_historical_analysis)
     """
     db_conn = DatabaseConnection()
     
@@ -27,96 +227,103 @@ def analyze_historical_data(start_date_str, end_date_str, analysis_type="compari
         return
     
     try:
-        # Parse dates
-        try:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-        except ValueError:
-            handle_error("Invalid date format. Use YYYY-MM-DD", "DATE_ERROR")
-            return
-        
-        if start_date >= end_date:
-            handle_error("Start date must be before end date", "DATE_ERROR")
-            return
-        
-        # Get collections
-        feedback_collection = db_conn.get_feedback_collection()
-        users_collection = db_conn.get_users_collection()
-        
-        # Fetch historical data
-        feedback_cursor = feedback_collection.find({
-            "date": {
-                "$gte": start_date,
-                "$lt": end_date + timedelta(days=1)
-            }
-        })
-        
-        feedback_data = list(feedback_cursor)
-        total_students = users_collection.count_documents({"isAdmin": False})
-        
-        if not feedback_data:
-            result = create_empty_historical_result(start_date_str, end_date_str, analysis_type)
-            safe_json_output(result)
-            return
-        
-        # Perform analysis based on type
-        if analysis_type == "comparison":
-            analysis_result = perform_comparison_analysis(feedback_data, start_date, end_date, total_students)
-        elif analysis_type == "trend":
-            analysis_result = perform_trend_analysis(feedback_data, start_date, end_date, total_students)
-        elif analysis_type == "pattern":
-            analysis_result = perform_pattern_analysis(feedback_data, start_date, end_date, total_students)
-        else:
-            handle_error(f"Unknown analysis type: {analysis_type}", "ANALYSIS_ERROR")
-            return
-        
-        # Final result
-        result = {
-            "error": False,
-            "startDate": start_date_str,
-            "endDate": end_date_str,
-            "analysisType": analysis_type,
-            "timestamp": datetime.now().isoformat(),
-            "data": analysis_result
-        }
-        
+        memory = MemoryMonitor("historical", memory_budget, profile_memory)
+        result, _ = cached_historical_analysis(db_conn, start_date_str, end_date_str, analysis_type, max_points,
+                                               memory=memory, approximate=approximate, sample_size=sample_size)
         safe_json_output(result)
         
+    except AnalysisError as e:
+        handle_error(e.message, e.error_type)
+    except MemoryError:
+        handle_error("Historical analysis ran out of memory. Narrow the date range or set ANALYTICS_MEMORY_BUDGET_MB "
+                     "so large ranges are aggregated in partitions", "MEMORY_BUDGET_EXCEEDED")
     except Exception as e:
         handle_error(f"Historical analysis failed: {str(e)}", "ANALYSIS_ERROR")
     finally:
         db_conn.close()
 
-def perform_comparison_analysis(feedback_data, start_date, end_date, total_students):
+def stream_historical_data(start_date_str, end_date_str, analysis_type="comparison", max_points=None,
+                           memory_budget=None, profile_memory=None, approximate=False, sample_size=SAMPLE_SIZE):
+    """
+    Historical analysis as newline-delimited JSON: a header record, then day rows and
+    sections as they are computed, then a summary record
+    """
+    stream_json_line({
+        "type": "header",
+        "startDate": start_date_str,
+        "endDate": end_date_str,
+        "analysisType": analysis_type,
+        "approximate": approximate,
+        "timestamp": datetime.now().isoformat()
+    })
+
+    db_conn = DatabaseConnection()
+
+    if not db_conn.connect():
+        handle_error("Failed to connect to database", "DATABASE_ERROR")
+        return
+
+    try:
+        memory = MemoryMonitor("historical", memory_budget, profile_memory)
+        result, _ = cached_historical_analysis(db_conn, start_date_str, end_date_str, analysis_type, max_points,
+                                               emit=stream_json_line, memory=memory, approximate=approximate,
+                                               sample_size=sample_size)
+        stream_json_line({
+            "type": "summary",
+            "error": False,
+            "message": result.get("message"),
+            "sections": list(result["data"]),
+            "timestamp": datetime.now().isoformat()
+        })
+
+    except AnalysisError as e:
+        handle_error(e.message, e.error_type)
+    except MemoryError:
+        handle_error("Historical analysis ran out of memory. Narrow the date range or set ANALYTICS_MEMORY_BUDGET_MB "
+                     "so large ranges are aggregated in partitions", "MEMORY_BUDGET_EXCEEDED")
+    except Exception as e:
+        handle_error(f"Historical analysis failed: {str(e)}", "ANALYSIS_ERROR")
+    finally:
+        db_conn.close()
+
+def perform_comparison_analysis(aggregates, start_date, end_date, total_students):
     """Compare two periods or specific dates"""
-    meal_types = ['morning', 'afternoon', 'evening', 'night']
+    meal_types = aggregates.meal_types
     
-    # Split data into two periods for comparison
+    # Split the days into two periods for comparison
     total_days = (end_date - start_date).days
     mid_date = start_date + timedelta(days=total_days // 2)
     
-    period1_data = [f for f in feedback_data if f['date'] < mid_date]
-    period2_data = [f for f in feedback_data if f['date'] >= mid_date]
+    period1_days = aggregates.days_where(lambda date: date < mid_date)
+    period2_days = aggregates.days_where(lambda date: date >= mid_date)
+    
+    period1_analysis = analyze_period(aggregates, period1_days, total_students)
+    period2_analysis = analyze_period(aggregates, period2_days, total_students)
     
-    period1_analysis = analyze_period(period1_data, meal_types, total_students)
-    period2_analysis = analyze_period(period2_data, meal_types, total_students)
+    significance_counts = aggregates.significance_counts()
+    period1_counts = significance_counts[period1_days].sum(axis=0)
+    period2_counts = significance_counts[period2_days].sum(axis=0)
     
-    # Calculate improvements/declines
+    # Calculate improvements/declines; a change is only labelled when the rating distributions
+    # differ significantly (Mann-Whitney U on the period histograms) by a non-negligible effect
     comparisons = {}
-    for meal_type in meal_types:
+    for meal, meal_type in enumerate(meal_types):
         period1_rating = period1_analysis["mealPerformance"].get(meal_type, {}).get("averageRating", 0)
         period2_rating = period2_analysis["mealPerformance"].get(meal_type, {}).get("averageRating", 0)
         
         change = period2_rating - period1_rating
+        tests = compare_histograms(period1_counts[meal], period2_counts[meal])
         comparisons[meal_type] = {
             "period1Rating": period1_rating,
             "period2Rating": period2_rating, 
             "change": round(change, 2),
             "changePercentage": round((change / period1_rating * 100), 1) if period1_rating > 0 else 0,
-            "trend": "improved" if change > 0.1 else "declined" if change < -0.1 else "stable"
+            "trend": comparison_trend(change, tests),
+            **tests
         }
     
     overall_change = period2_analysis["overview"]["overallRating"] - period1_analysis["overview"]["overallRating"]
+    overall_tests = compare_histograms(period1_counts, period2_counts)
     
     return {
         "overview": {
@@ -133,7 +340,8 @@ def perform_comparison_analysis(feedback_data, start_date, end_date, total_stude
                 "participationRate": period2_analysis["overview"]["participationRate"]
             },
             "overallChange": round(overall_change, 2),
-            "overallTrend": "improved" if overall_change > 0.1 else "declined" if overall_change < -0.1 else "stable"
+            "overallTrend": comparison_trend(overall_change, overall_tests),
+            "overallTests": overall_tests
         },
         "mealComparisons": comparisons,
         "period1Details": period1_analysis,
@@ -142,32 +350,22 @@ def perform_comparison_analysis(feedback_data, start_date, end_date, total_stude
         "recommendations": generate_comparison_recommendations(comparisons)
     }
 
-def perform_trend_analysis(feedback_data, start_date, end_date, total_students):
+def perform_trend_analysis(aggregates, start_date, end_date, total_students):
     """Analyze trends over the historical period"""
-    meal_types = ['morning', 'afternoon', 'evening', 'night']
+    meal_types = aggregates.meal_types
+    day_index = {date_key: day for day, date_key in enumerate(aggregates.day_keys)}
     
-    # Group data by day
-    daily_data = defaultdict(lambda: {meal: [] for meal in meal_types})
     date_range = []
-    
     current_date = start_date
     while current_date <= end_date:
         date_range.append(current_date)
         current_date += timedelta(days=1)
     
-    for feedback in feedback_data:
-        date_key = feedback['date'].strftime('%Y-%m-%d')
-        for meal_type in meal_types:
-            meal_feedback = feedback['meals'].get(meal_type, {})
-            rating = meal_feedback.get('rating')
-            if rating is not None:
-                daily_data[date_key][meal_type].append(rating)
-    
-    # Calculate daily averages
+    # Calculate daily averages from the per-day histograms
     daily_averages = {}
     for date in date_range:
         date_key = date.strftime('%Y-%m-%d')
-        day_data = daily_data[date_key]
+        day = day_index.get(date_key)
         
         daily_averages[date_key] = {
             "date": date_key,
@@ -176,29 +374,33 @@ def perform_trend_analysis(feedback_data, start_date, end_date, total_students):
             "mealRatings": {}
         }
         
-        all_day_ratings = []
-        for meal_type in meal_types:
-            meal_ratings = day_data[meal_type]
-            avg_rating = np.mean(meal_ratings) if meal_ratings else 0
-            daily_averages[date_key]["mealRatings"][meal_type] = round(avg_rating, 2)
-            if meal_ratings:
-                all_day_ratings.extend(meal_ratings)
+        if day is None:
+            daily_averages[date_key]["mealRatings"] = {meal_type: 0 for meal_type in meal_types}
+            continue
         
-        daily_averages[date_key]["overallRating"] = round(np.mean(all_day_ratings), 2) if all_day_ratings else 0
+        for meal, meal_type in enumerate(meal_types):
+            daily_averages[date_key]["mealRatings"][meal_type] = round(histogram_mean(aggregates.counts[day, meal]), 2)
+        daily_averages[date_key]["overallRating"] = round(histogram_mean(aggregates.counts[day]), 2)
+    
+    # Trend tests over every rating in the period, positioned by day offset from the start
+    day_positions = [(date - start_date).days for date in aggregates.day_dates]
+    significance_counts = aggregates.significance_counts()
     
     # Calculate trend statistics
     trend_stats = {}
-    for meal_type in meal_types:
+    for meal, meal_type in enumerate(meal_types):
         ratings_series = [daily_averages[date_key]["mealRatings"][meal_type] 
                          for date_key in sorted(daily_averages.keys())]
         ratings_series = [r for r in ratings_series if r > 0]  # Remove zero ratings
         
         if len(ratings_series) > 1:
             trend_slope = calculate_trend_slope(ratings_series)
+            trend_test = linear_trend_test(significance_counts[:, meal], day_positions)
             trend_stats[meal_type] = {
                 "averageRating": round(np.mean(ratings_series), 2),
                 "trendSlope": trend_slope,
-                "trendDirection": get_trend_direction(trend_slope),
+                "trendDirection": get_trend_direction(trend_slope, trend_test),
+                "trendTest": trend_test,
                 "volatility": round(np.std(ratings_series), 2),
                 "highestRating": max(ratings_series),
                 "lowestRating": min(ratings_series),
@@ -209,17 +411,21 @@ def perform_trend_analysis(feedback_data, start_date, end_date, total_students):
                 "averageRating": 0,
                 "trendSlope": 0,
                 "trendDirection": "no_data",
+                "trendTest": None,
                 "volatility": 0,
                 "highestRating": 0,
                 "lowestRating": 0,
                 "ratingRange": 0
             }
     
+    overall_trend_test = linear_trend_test(significance_counts, day_positions)
+    
     return {
         "overview": {
             "totalDays": len(date_range),
             "dataAvailableDays": len([d for d in daily_averages.values() if d["overallRating"] > 0]),
-            "overallTrendDirection": analyze_overall_trend(daily_averages),
+            "overallTrendDirection": analyze_overall_trend(daily_averages, overall_trend_test),
+            "overallTrendTest": overall_trend_test,
             "averageRating": round(np.mean([d["overallRating"] for d in daily_averages.values() if d["overallRating"] > 0]), 2)
         },
         "dailyAverages": daily_averages,
@@ -228,21 +434,19 @@ def perform_trend_analysis(feedback_data, start_date, end_date, total_students):
         "recommendations": generate_trend_recommendations(trend_stats)
     }
 
-def perform_pattern_analysis(feedback_data, start_date, end_date, total_students):
+def perform_pattern_analysis(aggregates, start_date, end_date, total_students):
     """Identify patterns in historical data"""
-    meal_types = ['morning', 'afternoon', 'evening', 'night']
-    
     # Analyze day-of-week patterns
-    dow_patterns = analyze_day_of_week_patterns(feedback_data, meal_types)
+    dow_patterns = analyze_day_of_week_patterns(aggregates)
     
     # Analyze monthly patterns (if data spans multiple months)
-    monthly_patterns = analyze_monthly_patterns(feedback_data, meal_types)
+    monthly_patterns = analyze_monthly_patterns(aggregates)
     
     # Analyze meal time patterns
-    meal_time_patterns = analyze_meal_time_patterns(feedback_data, meal_types)
+    meal_time_patterns = analyze_meal_time_patterns(aggregates)
     
     # Analyze participation patterns
-    participation_patterns = analyze_participation_patterns(feedback_data, total_students)
+    participation_patterns = analyze_participation_patterns(aggregates, total_students)
     
     return {
         "dayOfWeekPatterns": dow_patterns,
@@ -253,45 +457,39 @@ def perform_pattern_analysis(feedback_data, start_date, end_date, total_students
         "recommendations": generate_pattern_recommendations(dow_patterns, monthly_patterns)
     }
 
-def analyze_period(feedback_data, meal_types, total_students):
-    """Analyze a specific period of feedback data"""
-    if not feedback_data:
+def analyze_period(aggregates, day_indices, total_students):
+    """Analyze the feedback of a subset of days"""
+    if not day_indices:
         return create_empty_period_analysis()
     
-    all_ratings = []
-    meal_data = {meal: {"ratings": [], "comments": []} for meal in meal_types}
-    participating_students = set()
-    
-    for feedback in feedback_data:
-        participating_students.add(str(feedback['user']))
-        for meal_type in meal_types:
-            meal_feedback = feedback['meals'].get(meal_type, {})
-            rating = meal_feedback.get('rating')
-            comment = meal_feedback.get('comment', '').strip()
-            
-            if rating is not None:
-                meal_data[meal_type]["ratings"].append(rating)
-                all_ratings.append(rating)
-                if comment:
-                    meal_data[meal_type]["comments"].append(comment)
+    meal_counts = aggregates.meal_counts(day_indices)
+    meal_comments = aggregates.day_comments[day_indices].sum(axis=0)
+    # 95% intervals per meal and for the whole period (last entry): the sampling error of
+    # approximate results, otherwise bootstrap intervals
+    if isinstance(aggregates, SampledAggregates):
+        rating_intervals = aggregates.rating_intervals(day_indices)
+    else:
+        rating_intervals = mean_intervals(np.vstack([meal_counts, meal_counts.sum(axis=0)]))
     
     # Calculate metrics
-    overall_rating = np.mean(all_ratings) if all_ratings else 0
-    participation_count = len(participating_students)
+    overall_rating = histogram_mean(meal_counts)
+    participation_count = len(aggregates.participants(day_indices))
     participation_rate = (participation_count / total_students * 100) if total_students > 0 else 0
     
     meal_performance = {}
-    for meal_type in meal_types:
-        ratings = meal_data[meal_type]["ratings"]
-        if ratings:
+    for meal, meal_type in enumerate(aggregates.meal_types):
+        counts = meal_counts[meal]
+        if counts.any():
             meal_performance[meal_type] = {
-                "averageRating": round(np.mean(ratings), 2),
-                "participants": len(ratings),
-                "totalComments": len(meal_data[meal_type]["comments"])
+                "averageRating": round(histogram_mean(counts), 2),
+                "averageRatingInterval": rating_intervals[meal],
+                "participants": histogram_count(counts),
+                "totalComments": int(meal_comments[meal])
             }
         else:
             meal_performance[meal_type] = {
                 "averageRating": 0,
+                "averageRatingInterval": None,
                 "participants": 0,
                 "totalComments": 0
             }
@@ -299,9 +497,10 @@ def analyze_period(feedback_data, meal_types, total_students):
     return {
         "overview": {
             "overallRating": round(overall_rating, 2),
+            "overallRatingInterval": rating_intervals[-1],
             "participationRate": round(participation_rate, 1),
-            "totalFeedbacks": len(feedback_data),
-            "totalRatings": len(all_ratings)
+            "totalFeedbacks": int(aggregates.day_documents[day_indices].sum()),
+            "totalRatings": histogram_count(meal_counts)
         },
         "mealPerformance": meal_performance
     }
@@ -315,8 +514,13 @@ def calculate_trend_slope(ratings_series):
     slope = np.polyfit(x, ratings_series, 1)[0]
     return round(slope, 4)
 
-def get_trend_direction(slope):
-    """Convert slope to trend direction"""
+def get_trend_direction(slope, trend_test=None):
+    """
+    Convert slope to trend direction
+    With a trend test, slopes that are not significant (or negligible in effect) are stable.
+    """
+    if trend_test is not None and not is_meaningful(trend_test, "correlation"):
+        return "stable"
     if slope > 0.05:
         return "strongly_improving"
     elif slope > 0.02:
@@ -328,86 +532,52 @@ def get_trend_direction(slope):
     else:
         return "strongly_declining"
 
-def analyze_overall_trend(daily_averages):
+def analyze_overall_trend(daily_averages, trend_test=None):
     """Analyze overall trend from daily averages"""
     ratings = [d["overallRating"] for d in daily_averages.values() if d["overallRating"] > 0]
     if len(ratings) < 2:
         return "insufficient_data"
     
     slope = calculate_trend_slope(ratings)
-    return get_trend_direction(slope)
+    return get_trend_direction(slope, trend_test)
 
-def analyze_day_of_week_patterns(feedback_data, meal_types):
+def analyze_day_of_week_patterns(aggregates):
     """Analyze patterns by day of week"""
-    dow_data = defaultdict(lambda: {meal: [] for meal in meal_types})
-    
-    for feedback in feedback_data:
-        day_name = feedback['date'].strftime('%A')
-        for meal_type in meal_types:
-            meal_feedback = feedback['meals'].get(meal_type, {})
-            rating = meal_feedback.get('rating')
-            if rating is not None:
-                dow_data[day_name][meal_type].append(rating)
-    
-    # Calculate averages for each day of week
     dow_averages = {}
-    for day_name in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']:
-        if day_name in dow_data:
-            day_data = dow_data[day_name]
-            day_averages = {}
-            
-            for meal_type in meal_types:
-                ratings = day_data[meal_type]
-                day_averages[meal_type] = round(np.mean(ratings), 2) if ratings else 0
-            
-            dow_averages[day_name] = day_averages
+    for day_name, counts in aggregates.weekday_counts().items():
+        dow_averages[day_name] = {
+            meal_type: round(histogram_mean(counts[meal]), 2)
+            for meal, meal_type in enumerate(aggregates.meal_types)
+        }
     
     return dow_averages
 
-def analyze_monthly_patterns(feedback_data, meal_types):
+def analyze_monthly_patterns(aggregates):
     """Analyze patterns by month"""
-    monthly_data = defaultdict(lambda: {meal: [] for meal in meal_types})
-    
-    for feedback in feedback_data:
-        month_key = feedback['date'].strftime('%Y-%m')
-        for meal_type in meal_types:
-            meal_feedback = feedback['meals'].get(meal_type, {})
-            rating = meal_feedback.get('rating')
-            if rating is not None:
-                monthly_data[month_key][meal_type].append(rating)
-    
-    # Calculate monthly averages
     monthly_averages = {}
-    for month_key, month_data in monthly_data.items():
-        month_averages = {}
-        for meal_type in meal_types:
-            ratings = month_data[meal_type]
-            month_averages[meal_type] = round(np.mean(ratings), 2) if ratings else 0
-        monthly_averages[month_key] = month_averages
+    for month_key, counts in aggregates.month_counts().items():
+        monthly_averages[month_key] = {
+            meal_type: round(histogram_mean(counts[meal]), 2)
+            for meal, meal_type in enumerate(aggregates.meal_types)
+        }
     
     return monthly_averages
 
-def analyze_meal_time_patterns(feedback_data, meal_types):
+def analyze_meal_time_patterns(aggregates):
     """Analyze when students submit feedback for each meal"""
-    meal_time_data = {meal: [] for meal in meal_types}
-    
-    for feedback in feedback_data:
-        for meal_type in meal_types:
-            meal_feedback = feedback['meals'].get(meal_type, {})
-            submitted_at = meal_feedback.get('submittedAt')
-            if submitted_at:
-                hour = submitted_at.hour
-                meal_time_data[meal_type].append(hour)
+    hours = np.arange(24)
     
-    # Calculate average submission times
+    # Calculate average submission times from the per-meal hour histograms
     meal_time_averages = {}
-    for meal_type, hours in meal_time_data.items():
-        if hours:
-            avg_hour = np.mean(hours)
+    for meal, meal_type in enumerate(aggregates.meal_types):
+        hour_counts = aggregates.hour_counts[meal]
+        submission_count = int(hour_counts.sum())
+        if submission_count:
             meal_time_averages[meal_type] = {
-                "averageHour": round(avg_hour, 1),
-                "submissionCount": len(hours),
-                "peakHour": max(set(hours), key=hours.count) if hours else 0
+                "averageHour": round(float((hours * hour_counts).sum() / submission_count), 1),
+                "submissionCount": submission_count,
+                # Earliest hour wins a tie
+                "peakHour": int(hour_counts.argmax())
             }
         else:
             meal_time_averages[meal_type] = {
@@ -418,18 +588,12 @@ def analyze_meal_time_patterns(feedback_data, meal_types):
     
     return meal_time_averages
 
-def analyze_participation_patterns(feedback_data, total_students):
+def analyze_participation_patterns(aggregates, total_students):
     """Analyze student participation patterns"""
-    daily_participation = defaultdict(set)
-    
-    for feedback in feedback_data:
-        date_key = feedback['date'].strftime('%Y-%m-%d')
-        daily_participation[date_key].add(str(feedback['user']))
-    
-    participation_rates = []
-    for date_key, participants in daily_participation.items():
-        rate = len(participants) / total_students * 100 if total_students > 0 else 0
-        participation_rates.append(rate)
+    participation_rates = [
+        participants / total_students * 100 if total_students > 0 else 0
+        for participants in aggregates.day_participant_counts()
+    ]
     
     return {
         "averageParticipationRate": round(np.mean(participation_rates), 1) if participation_rates else 0,
@@ -439,6 +603,12 @@ def analyze_participation_patterns(feedback_data, total_students):
     }
 
 # Helper functions for insights and recommendations
+def comparison_trend(change, tests):
+    """improved / declined only when the Mann-Whitney test finds a meaningful shift"""
+    if not is_meaningful(tests["mannWhitney"], "rankBiserial"):
+        return "stable"
+    return "improved" if change > 0 else "declined" if change < 0 else "stable"
+
 def generate_comparison_insights(comparisons, overall_change):
     """Generate insights from comparison analysis"""
     insights = []
@@ -590,12 +760,35 @@ def create_empty_period_analysis():
         }
     }
 
+def main():
+    """Main entry point for the historical analysis script"""
+    parser = argparse.ArgumentParser(description="Historical feedback analysis")
+    parser.add_argument("start_date")
+    parser.add_argument("end_date")
+    parser.add_argument("analysis_type", nargs='?', default="comparison")
+    parser.add_argument("--stream", action="store_true", help="Emit newline-delimited JSON records")
+    parser.add_argument("--max-points", type=int, help="Downsample the trend series to at most N points")
+    parser.add_argument("--memory-budget", type=float, help="Memory budget in MB (default: ANALYTICS_MEMORY_BUDGET_MB)")
+    parser.add_argument("--profile-memory", action="store_true", help="Report per-phase peak memory and allocation sites on stderr")
+    parser.add_argument("--approximate", action="store_true", help="Estimate from a day-stratified sample of the feedback")
+    parser.add_argument("--sample-size", type=int, default=SAMPLE_SIZE, help="Feedback documents to sample (--approximate)")
+
+    try:
+        args = parser.parse_args()
+    except SystemExit:
+        handle_error("Usage: python historical_analysis.py <start_date> <end_date> [analysis_type] [--stream] [--max-points N] "
+                     "[--memory-budget MB] [--profile-memory] [--approximate] [--sample-size N]", "USAGE_ERROR")
+        return
+
+    memory_budget = int(args.memory_budget * 1024 * 1024) if args.memory_budget else None
+    profile_memory = True if args.profile_memory else None
+    if args.stream:
+        stream_historical_data(args.start_date, args.end_date, args.analysis_type, args.max_points,
+                               memory_budget, profile_memory, args.approximate, args.sample_size)
+    else:
+        analyze_historical_data(args.start_date, args.end_date, args.analysis_type, args.max_points,
+                                memory_budget, profile_memory, args.approximate, args.sample_size)
+
 if __name__ == "__main__":
-    if len(sys.argv) not in [3, 4]:
-        handle_error("Usage: python historical_analysis.py <start_date> <end_date> [analysis_type]", "USAGE_ERROR")
-    
-    start_date_str = sys.argv[1]
-    end_date_str = sys.argv[2]
-    analysis_type = sys.argv[3] if len(sys.argv) == 4 else "comparison"
-    
-    analyze_historical_data(start_date_str, end_date_str, analysis_type)
+    enable_run_metrics()
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Precomputation Service for Hostel Food Analysis
+Run after the day closes (IST), e.g. from cron or the backend's nightly trigger. It computes and
+stores the results the morning dashboard asks for: yesterday's daily analysis, the weekly analysis,
+the default comparison window and the standard trend / pattern windows. Computing them also
+fills the per-day rollups (phrase sketches, student profiles) and trains the topic and student
+segment models on the closed days.
+
+Idempotent: results whose feedback has not changed are left alone. Progress is stored in the
+analytics collection, and days missed since the last run are caught up (daily + weekly rollups).
+"""
+
+import sys
+import os
+import time
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import DatabaseConnection, safe_json_output, handle_error
+from utils.metrics import enable_run_metrics
+from utils.result_cache import ist_today
+from utils.segments import update_student_segments
+from daily_analysis import cached_daily_analysis
+from weekly_analysis import cached_weekly_analysis
+from historical_analysis import cached_historical_analysis
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
+
+STATE_ID = "precompute_state"
+LOCK_MINUTES = 60
+MAX_CATCH_UP_DAYS = 14
+
+# Windows ending on the closed day: (analysis type, days), matching the dashboard defaults
+STANDARD_WINDOWS = [
+    ("comparison", 7),
+    ("trend", 30),
+    ("trend", 90),
+    ("pattern", 90)
+]
+
+def acquire_lock(state_collection):
+    """Take the run lock (expires after LOCK_MINUTES so a crashed run cannot block forever)"""
+    now = datetime.now()
+    try:
+        state_collection.find_one_and_update(
+            {"_id": STATE_ID, "$or": [{"lockedUntil": {"$exists": False}}, {"lockedUntil": {"$lt": now}}]},
+            {"$set": {"lockedUntil": now + timedelta(minutes=LOCK_MINUTES), "startedAt": now, "status": "running"}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # The state document exists and is locked by another run
+        return False
+
+def release_lock(state_collection, status, error=None):
+    state_collection.update_one(
+        {"_id": STATE_ID},
+        {"$set": {"status": status, "finishedAt": datetime.now(), "lastError": error},
+         "$unset": {"lockedUntil": ""}}
+    )
+
+def days_to_process(state, closed_day, max_catch_up):
+    """Closed days after the last completed one (at most max_catch_up, oldest first)"""
+    last_completed = state.get("lastCompletedDay")
+    first_day = closed_day - timedelta(days=max_catch_up - 1)
+    if last_completed:
+        first_day = max(first_day, datetime.strptime(last_completed, '%Y-%m-%d') + timedelta(days=1))
+
+    days = []
+    day = first_day
+    while day <= closed_day:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+def run_job(jobs, name, compute):
+    """Run one precompute job and record whether it was computed or already stored"""
+    started = time.perf_counter()
+    try:
+        _, cached = compute()
+        status = "cached" if cached else "computed"
+        error = None
+    except Exception as e:
+        status = "failed"
+        error = str(e)
+        print(f"Debug: Precompute job {name} failed: {error}", file=sys.stderr)
+    jobs.append({"job": name, "status": status, "seconds": round(time.perf_counter() - started, 2), "error": error})
+    return status != "failed"
+
+def segment_job(db_conn, date_key):
+    """Absorb a closed day into the student segment model ("cached" when it already had)"""
+    return None, not update_student_segments(db_conn, [date_key])
+
+def day_jobs(db_conn, day, refresh):
+    """
+    Daily analysis of a closed day and its student segment update, plus its week when the day is
+    a Sunday (the week has closed)
+    """
+    date_key = day.strftime('%Y-%m-%d')
+    jobs = [
+        (f"daily:{date_key}", lambda: cached_daily_analysis(db_conn, date_key, refresh, store=True)),
+        (f"segments:{date_key}", lambda: segment_job(db_conn, date_key))
+    ]
+    if day.weekday() == 6:
+        jobs.append((f"weekly:{date_key}", lambda: cached_weekly_analysis(db_conn, date_key, refresh, store=True)))
+    return jobs
+
+def window_jobs(db_conn, closed_day, refresh):
+    """Dashboard windows ending on the closed day, and the (possibly open) week containing it"""
+    end_key = closed_day.strftime('%Y-%m-%d')
+    jobs = [(f"weekly:{end_key}", lambda: cached_weekly_analysis(db_conn, end_key, refresh, store=True))]
+    for analysis_type, window_days in STANDARD_WINDOWS:
+        start_key = (closed_day - timedelta(days=window_days)).strftime('%Y-%m-%d')
+        jobs.append((
+            f"{analysis_type}:{start_key}:{end_key}",
+            lambda analysis_type=analysis_type, start_key=start_key: cached_historical_analysis(
+                db_conn, start_key, end_key, analysis_type, refresh=refresh, store=True
+            )
+        ))
+    return jobs
+
+def precompute(closed_date_str=None, max_catch_up=MAX_CATCH_UP_DAYS, refresh=False):
+    """
+    Precompute the results for the latest closed day (default: yesterday in IST), catching up
+    the days missed since the last completed run
+    """
+    try:
+        closed_day = (datetime.strptime(closed_date_str, '%Y-%m-%d') if closed_date_str
+                      else ist_today() - timedelta(days=1))
+    except ValueError:
+        handle_error("Invalid date format. Use YYYY-MM-DD", "DATE_ERROR")
+        return
+
+    if closed_day >= ist_today():
+        handle_error(f"{closed_day.strftime('%Y-%m-%d')} has not closed yet (IST)", "DATE_ERROR")
+        return
+
+    db_conn = DatabaseConnection()
+
+    if not db_conn.connect():
+        handle_error("Failed to connect to database", "DATABASE_ERROR")
+        return
+
+    state_collection = db_conn.get_analytics_collection()
+    if not acquire_lock(state_collection):
+        db_conn.close()
+        handle_error("Another precompute run is in progress", "PRECOMPUTE_LOCKED")
+        return
+
+    jobs = []
+    try:
+        state = state_collection.find_one({"_id": STATE_ID}) or {}
+        days = days_to_process(state, closed_day, max_catch_up)
+        if refresh and not days:
+            days = [closed_day]
+        print(f"Debug: Precomputing {len(days)} closed day(s) up to {closed_day.strftime('%Y-%m-%d')}", file=sys.stderr)
+
+        for day in days:
+            day_ok = all([run_job(jobs, name, compute) for name, compute in day_jobs(db_conn, day, refresh)])
+            if not day_ok:
+                # Stop here so the next run retries this day
+                break
+            # Progress is recorded per day, so an interrupted run resumes where it stopped
+            state_collection.update_one(
+                {"_id": STATE_ID},
+                {"$set": {"lastCompletedDay": day.strftime('%Y-%m-%d'), "updatedAt": datetime.now()}}
+            )
+
+        # Windows are cheap to check and always refer to the latest closed day
+        for name, compute in window_jobs(db_conn, closed_day, refresh):
+            run_job(jobs, name, compute)
+
+        failed = [job for job in jobs if job["status"] == "failed"]
+        release_lock(state_collection, "failed" if failed else "idle", failed[0]["error"] if failed else None)
+
+        safe_json_output({
+            "error": bool(failed),
+            "closedDay": closed_day.strftime('%Y-%m-%d'),
+            "daysProcessed": [day.strftime('%Y-%m-%d') for day in days],
+            "computed": sum(1 for job in jobs if job["status"] == "computed"),
+            "cached": sum(1 for job in jobs if job["status"] == "cached"),
+            "failed": len(failed),
+            "jobs": jobs,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        release_lock(state_collection, "failed", str(e))
+        handle_error(f"Precompute failed: {str(e)}", "PRECOMPUTE_ERROR")
+    finally:
+        db_conn.close()
+
+def main():
+    """Main entry point for the precompute script"""
+    parser = argparse.ArgumentParser(description="Precompute analytics for closed days")
+    parser.add_argument("--date", help="Closed day to precompute (YYYY-MM-DD, default: yesterday in IST)")
+    parser.add_argument("--catch-up", type=int, default=MAX_CATCH_UP_DAYS,
+                        help="Maximum number of missed days to catch up")
+    parser.add_argument("--refresh", action="store_true", help="Recompute even when stored results are current")
+
+    try:
+        args = parser.parse_args()
+    except SystemExit:
+        handle_error("Usage: python precompute.py [--date YYYY-MM-DD] [--catch-up N] [--refresh]", "INVALID_ARGS")
+        return
+
+    if args.catch_up < 1:
+        handle_error("--catch-up must be at least 1", "INVALID_ARGS")
+        return
+
+    precompute(args.date, args.catch_up, args.refresh)
+
+if __name__ == "__main__":
+    enable_run_metrics()
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Report Rendering Service for Hostel Food Analysis
+Renders daily, weekly and historical analysis results into PNG/SVG charts and a composed
+PDF report. Charts are drawn in a process pool and cached by result hash, so an identical
+result is never rendered twice.
+"""
+
+import sys
+import os
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import DatabaseConnection, AnalysisError, safe_json_output, stream_json_line, handle_error
+from utils.metrics import enable_run_metrics
+from utils.charts import REPORT_CHARTS, summary_page, plt
+from matplotlib.backends.backend_pdf import PdfPages
+from daily_analysis import cached_daily_analysis
+from weekly_analysis import cached_weekly_analysis
+from historical_analysis import cached_historical_analysis
+from datetime import datetime, timedelta
+
+# Bump when chart drawing changes so cached reports are re-rendered
+RENDERER_VERSION = 1
+REPORTS_DIR = os.getenv(
+    'ANALYTICS_REPORTS_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'reports')
+)
+CHART_FORMATS = ['png', 'svg']
+REPORT_TYPES = ['daily', 'weekly', 'comparison', 'trend', 'pattern']
+
+def result_hash(result, report_type, formats):
+    """Stable hash of a result (ignoring its generation timestamp) and the requested output"""
+    payload = {key: value for key, value in result.items() if key != 'timestamp'}
+    canonical = json.dumps([RENDERER_VERSION, report_type, sorted(formats), payload],
+                           sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def build_result(db_conn, report_type, start_date_str, end_date_str=None):
+    """Run (or read the cached result of) the analysis behind a report type"""
+    if report_type == 'daily':
+        return cached_daily_analysis(db_conn, start_date_str)[0]
+    if report_type == 'weekly':
+        return cached_weekly_analysis(db_conn, start_date_str)[0]
+    if report_type in ('comparison', 'trend', 'pattern'):
+        if not end_date_str:
+            raise AnalysisError(f"{report_type} reports need a start and end date", "INVALID_ARGS")
+        return cached_historical_analysis(db_conn, start_date_str, end_date_str, report_type)[0]
+    raise AnalysisError(f"Unknown report type: {report_type}", "INVALID_ARGS")
+
+def render_chart(result, report_type, chart_name, formats, report_dir):
+    """Draw one chart and save it in each format; returns the written files"""
+    fig = REPORT_CHARTS[report_type][chart_name](result)
+    if fig is None:
+        return []
+    files = []
+    for fmt in formats:
+        path = os.path.join(report_dir, f"{chart_name}.{fmt}")
+        fig.savefig(path, dpi=120)
+        files.append({"chart": chart_name, "format": fmt, "path": path})
+    plt.close(fig)
+    return files
+
+def render_pdf(result, report_type, report_dir):
+    """Compose the summary page and every chart into a single PDF"""
+    path = os.path.join(report_dir, "report.pdf")
+    with PdfPages(path) as pdf:
+        fig = summary_page(result, report_type)
+        pdf.savefig(fig)
+        plt.close(fig)
+        for chart in REPORT_CHARTS[report_type].values():
+            fig = chart(result)
+            if fig is not None:
+                pdf.savefig(fig)
+                plt.close(fig)
+    return {"chart": "report", "format": "pdf", "path": path}
+
+def _render_task(task):
+    """Process pool entry point: one chart in all image formats, or the composed PDF"""
+    result, report_type, chart_name, formats, report_dir = task
+    if chart_name is None:
+        return [render_pdf(result, report_type, report_dir)]
+    return render_chart(result, report_type, chart_name, formats, report_dir)
+
+def render_report(result, report_type, formats, executor=None):
+    """
+    Render a result into charts / PDF under the reports directory
+    Reuses the cached manifest when the same result was already rendered in the same formats.
+    With an executor, charts are drawn in parallel; otherwise in this process.
+    """
+    digest = result_hash(result, report_type, formats)
+    report_dir = os.path.join(REPORTS_DIR, report_type, digest[:16])
+    manifest_path = os.path.join(report_dir, "manifest.json")
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("resultHash") == digest and all(os.path.exists(item["path"]) for item in manifest["files"]):
+            print(f"Debug: Report cache hit {digest[:16]}", file=sys.stderr)
+            return {**manifest, "cached": True}
+
+    os.makedirs(report_dir, exist_ok=True)
+    image_formats = [fmt for fmt in formats if fmt in CHART_FORMATS]
+    tasks = [(result, report_type, chart_name, image_formats, report_dir)
+             for chart_name in REPORT_CHARTS[report_type]] if image_formats else []
+    if 'pdf' in formats:
+        tasks.append((result, report_type, None, image_formats, report_dir))
+
+    task_results = executor.map(_render_task, tasks) if executor else map(_render_task, tasks)
+    files = [item for task_files in task_results for item in task_files]
+
+    manifest = {
+        "reportType": report_type,
+        "resultHash": digest,
+        "status": result.get("status", "success"),
+        "directory": report_dir,
+        "files": files,
+        "renderedAt": datetime.now().isoformat()
+    }
+    # Written last so a partially rendered directory never counts as a cache hit
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return {**manifest, "cached": False}
+
+def _weekly_report_job(job):
+    """Process pool entry point for batch rendering: each worker uses its own connection"""
+    week_start, formats = job
+    db_conn = DatabaseConnection()
+    if not db_conn.connect():
+        return {"weekStart": week_start, "error": True, "message": "Failed to connect to database"}
+    try:
+        result = build_result(db_conn, 'weekly', week_start)
+        return {"weekStart": week_start, "error": False, **render_report(result, 'weekly', formats)}
+    except Exception as e:
+        return {"weekStart": week_start, "error": True, "message": str(e)}
+    finally:
+        db_conn.close()
+
+def render_single_report(report_type, start_date_str, end_date_str, formats, workers):
+    """Build one analysis result and render it with a pool of chart workers"""
+    db_conn = DatabaseConnection()
+
+    if not db_conn.connect():
+        handle_error("Failed to connect to database", "DATABASE_ERROR")
+        return
+
+    try:
+        result = build_result(db_conn, report_type, start_date_str, end_date_str)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rendered = render_report(result, report_type, formats, executor)
+
+        safe_json_output({
+            "error": False,
+            "startDate": start_date_str,
+            "endDate": end_date_str,
+            **rendered,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    except AnalysisError as e:
+        handle_error(e.message, e.error_type)
+    except Exception as e:
+        handle_error(f"Report rendering failed: {str(e)}", "RENDER_ERROR")
+    finally:
+        db_conn.close()
+
+def render_weekly_batch(start_date_str, end_date_str, formats, workers, stream=False):
+    """
+    Render the weekly report of every week between two dates as one parallel batch
+    With stream, each week's report is written as an NDJSON record as soon as it is ready.
+    """
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+    except ValueError:
+        handle_error("Invalid date format. Use YYYY-MM-DD", "DATE_ERROR")
+        return
+
+    if start_date > end_date:
+        handle_error("Start date must be before end date", "DATE_ERROR")
+        return
+
+    week_starts = []
+    monday = start_date - timedelta(days=start_date.weekday())
+    while monday <= end_date:
+        week_starts.append(monday.strftime('%Y-%m-%d'))
+        monday += timedelta(days=7)
+
+    if stream:
+        stream_json_line({
+            "type": "header",
+            "reportType": "weekly",
+            "startDate": start_date_str,
+            "endDate": end_date_str,
+            "weeks": len(week_starts),
+            "timestamp": datetime.now().isoformat()
+        })
+
+    try:
+        reports = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            jobs = [executor.submit(_weekly_report_job, (week_start, formats)) for week_start in week_starts]
+            for job in as_completed(jobs):
+                report = job.result()
+                if stream:
+                    stream_json_line({"type": "report", **report})
+                reports.append(report)
+        reports.sort(key=lambda report: report["weekStart"])
+
+        summary = {
+            "error": any(report["error"] for report in reports),
+            "reportType": "weekly",
+            "startDate": start_date_str,
+            "endDate": end_date_str,
+            "weeks": len(reports),
+            "rendered": sum(1 for report in reports if not report["error"] and not report["cached"]),
+            "cached": sum(1 for report in reports if not report["error"] and report["cached"]),
+            "failed": sum(1 for report in reports if report["error"]),
+            "timestamp": datetime.now().isoformat()
+        }
+        if stream:
+            stream_json_line({"type": "summary", **summary})
+        else:
+            safe_json_output({**summary, "reports": reports})
+
+    except Exception as e:
+        handle_error(f"Batch report rendering failed: {str(e)}", "RENDER_ERROR")
+
+def main():
+    """Main entry point for the report rendering script"""
+    parser = argparse.ArgumentParser(description="Render analysis reports")
+    parser.add_argument("report_type", choices=REPORT_TYPES + ['batch-weekly'])
+    parser.add_argument("start_date")
+    parser.add_argument("end_date", nargs='?')
+    parser.add_argument("--formats", default="png,pdf", help="Comma-separated: png, svg, pdf")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--stream", action="store_true", help="Emit newline-delimited JSON records (batch-weekly)")
+
+    try:
+        args = parser.parse_args()
+    except SystemExit:
+        handle_error("Usage: python report_rendering.py <daily|weekly|comparison|trend|pattern|batch-weekly> "
+                     "<start_date> [end_date] [--formats png,svg,pdf] [--workers N] [--stream]", "INVALID_ARGS")
+        return
+
+    formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+    invalid_formats = [fmt for fmt in formats if fmt not in CHART_FORMATS + ['pdf']]
+    if not formats or invalid_formats:
+        handle_error(f"Unsupported format(s): {', '.join(invalid_formats) or 'none given'}", "INVALID_ARGS")
+        return
+
+    if args.report_type == 'batch-weekly':
+        if not args.end_date:
+            handle_error("batch-weekly needs a start and end date", "INVALID_ARGS")
+            return
+        render_weekly_batch(args.start_date, args.end_date, formats, args.workers, args.stream)
+    else:
+        render_single_report(args.report_type, args.start_date, args.end_date, formats, args.workers)
+
+if __name__ == "__main__":
+    enable_run_metrics()
+    main()
@@ -8,13 +8,33 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.database import DatabaseConnection, get_date_range, safe_json_output, handle_error
+from utils.database import DatabaseConnection, AnalysisError, get_date_range, safe_json_output, handle_error
+from utils.metrics import enable_run_metrics
+from utils.sentiment import analyze_text_sentiment
+from utils.topics import analyze_comment_topics
+from utils.sketches import analyze_top_phrases
+from utils.dedup import collapse_comment_records
+from utils.records import load_feedback_records
+from utils.kernel import aggregate_feedback, histogram_count, histogram_mean, RATING_VALUES
+from utils.confidence import mean_intervals
+from utils.significance import linear_trend_test, is_meaningful
+from utils.alert_rules import evaluate_alert_rules
+from utils.result_cache import cached_analysis, result_key
+from utils.deltas import watermarked_analysis
+from utils.segments import attach_segment_breakdown
+from utils.week_comparison import analyze_week_over_week
 from datetime import datetime, timedelta
-from collections import Counter, defaultdict
+from collections import Counter
 import statistics
+import argparse
+import numpy as np
 
-def generate_weekly_overall_summary(weekly_data, daily_summaries):
-    """Generate AI-powered weekly summary with strategic insights"""
+def generate_weekly_overall_summary(weekly_data, daily_summaries, comparisons=None):
+    """
+    Generate AI-powered weekly summary with strategic insights
+    comparisons: the week's previous-week / baseline deltas (analyze_week_over_week); the trend is
+    taken from the previous week when given, otherwise from the first vs last day of the week
+    """
     
     if not weekly_data["all_ratings"]:
         return {
@@ -30,7 +50,12 @@ def generate_weekly_overall_summary(weekly_data, daily_summaries):
     # Calculate weekly trends
     daily_ratings = [summary["avg_rating"] for summary in daily_summaries.values() if summary["avg_rating"] > 0]
     trend_direction = "stable"
-    if len(daily_ratings) >= 2:
+    trend_span = "through the week"
+    previous_week = ((comparisons or {}).get("previousWeek") or {}).get("overall")
+    if previous_week and previous_week["trend"] != "insufficient_data":
+        trend_direction = {"improved": "improving", "declined": "declining"}.get(previous_week["trend"], "stable")
+        trend_span = "vs last week"
+    elif len(daily_ratings) >= 2:
         if daily_ratings[-1] > daily_ratings[0] + 0.2:
             trend_direction = "improving"
         elif daily_ratings[-1] < daily_ratings[0] - 0.2:
@@ -96,9 +121,9 @@ def generate_weekly_overall_summary(weekly_data, daily_summaries):
     
     # Insight 2: Weekly trend analysis
     if trend_direction == "improving":
-        key_insights.append(f"📈 POSITIVE TREND: Quality improving through the week - great momentum!")
+        key_insights.append(f"📈 POSITIVE TREND: Quality improving {trend_span} - great momentum!")
     elif trend_direction == "declining":
-        key_insights.append(f"📉 CONCERNING TREND: Quality declining through the week - investigate causes")
+        key_insights.append(f"📉 CONCERNING TREND: Quality declining {trend_span} - investigate causes")
     else:
         if len(daily_ratings) >= 3:
             consistency = statistics.stdev(daily_ratings)
@@ -167,204 +192,268 @@ def generate_weekly_overall_summary(weekly_data, daily_summaries):
         }
     }
 
-def analyze_weekly_feedback(date_str):
+def build_weekly_analysis(db_conn, date_str, feedback_data=None, total_students=None):
     """
-    Perform comprehensive weekly analysis
+    Build the weekly analysis result for the week containing date_str
+    feedback_data / total_students: the week's feedback records and student count when the
+    caller already fetched them
     """
-    db_conn = DatabaseConnection()
+    # Get week date range (Monday to Sunday)
+    start_date, end_date = get_date_range(date_str, "week")
     
-    if not db_conn.connect():
-        handle_error("Failed to connect to database", "DATABASE_ERROR")
-        return
+    # Get collections
+    feedback_collection = db_conn.get_feedback_collection()
+    users_collection = db_conn.get_users_collection()
     
-    try:
-        # Get week date range (Monday to Sunday)
-        start_date, end_date = get_date_range(date_str, "week")
-        
-        # Get collections
-        feedback_collection = db_conn.get_feedback_collection()
-        users_collection = db_conn.get_users_collection()
-        
-        # Fetch week's feedback data
-        feedback_cursor = feedback_collection.find({
+    # Fetch week's feedback data
+    if feedback_data is None:
+        feedback_data = load_feedback_records(feedback_collection, {
             "date": {
                 "$gte": start_date,
                 "$lt": end_date
             }
         })
-        
-        feedback_data = list(feedback_cursor)
+    if total_students is None:
         total_students = users_collection.count_documents({"isAdmin": False})
+    
+    if not feedback_data:
+        return create_empty_weekly_result(date_str, start_date, end_date)
+    
+    # Initialize analysis structure
+    meal_types = ['morning', 'afternoon', 'evening', 'night']
+    weekly_analysis = {
+        "overview": {},
+        "dailyBreakdown": {},
+        "mealTrends": {},
+        "participationAnalysis": {},
+        "overallSummary": {},
+        "weeklyInsights": [],
+        "weeklyAlerts": [],
+        "patterns": {},
+        "comparisons": {},
+        "textSentiment": {},
+        "topTopics": {},
+        "topPhrases": {},
+        "duplicateComments": {}
+    }
+    
+    # One pass over the week's documents: per-day rating histograms, participants and comments
+    aggregates = aggregate_feedback(feedback_data, meal_types)
+    comment_records = aggregates.comment_records
+    
+    # 95% bootstrap intervals: per day x meal, per day (last meal column) and for the whole week
+    day_histograms = aggregates.counts
+    interval_histograms = [day_histograms, day_histograms.sum(axis=1, keepdims=True)]
+    day_intervals = mean_intervals(np.concatenate(interval_histograms, axis=1))
+    
+    # Calculate daily metrics (days in the order they appear in the feedback)
+    week_participation = []
+    daily_breakdown = {}
+    
+    for day, date_key in enumerate(aggregates.day_keys):
+        day_counts = aggregates.counts[day]
+        day_meal_performance = {}
         
-        if not feedback_data:
-            result = create_empty_weekly_result(date_str, start_date, end_date)
-            safe_json_output(result)
-            return
-        
-        # Initialize analysis structure
-        meal_types = ['morning', 'afternoon', 'evening', 'night']
-        weekly_analysis = {
-            "overview": {},
-            "dailyBreakdown": {},
-            "mealTrends": {},
-            "participationAnalysis": {},
-            "weeklyInsights": [],
-            "weeklyAlerts": [],
-            "patterns": {},
-            "comparisons": {}
-        }
-        
-        # Group data by day
-        daily_data = defaultdict(lambda: {
-            "date": None,
-            "feedback_count": 0,
-            "ratings": {meal: [] for meal in meal_types},
-            "comments": {meal: [] for meal in meal_types},
-            "participants": set()
-        })
-        
-        for feedback in feedback_data:
-            date_key = feedback['date'].strftime('%Y-%m-%d')
-            day_name = feedback['date'].strftime('%A')
-            
-            daily_data[date_key]["date"] = feedback['date']
-            daily_data[date_key]["day_name"] = day_name
-            daily_data[date_key]["feedback_count"] += 1
-            daily_data[date_key]["participants"].add(str(feedback['user']))
-            
-            for meal_type in meal_types:
-                meal_feedback = feedback['meals'].get(meal_type, {})
-                rating = meal_feedback.get('rating')
-                comment = meal_feedback.get('comment', '').strip()
-                
-                if rating is not None:
-                    daily_data[date_key]["ratings"][meal_type].append(rating)
-                    if comment:
-                        daily_data[date_key]["comments"][meal_type].append(comment)
-        
-        # Calculate daily metrics
-        week_ratings = []
-        week_participation = []
-        daily_breakdown = {}
-        
-        for date_key, day_data in daily_data.items():
-            day_ratings = []
-            day_meal_performance = {}
-            
-            for meal_type in meal_types:
-                meal_ratings = day_data["ratings"][meal_type]
-                if meal_ratings:
-                    avg_rating = statistics.mean(meal_ratings)
-                    day_meal_performance[meal_type] = {
-                        "averageRating": round(avg_rating, 2),
-                        "participants": len(meal_ratings),
-                        "ratingDistribution": dict(Counter(meal_ratings))
-                    }
-                    day_ratings.extend(meal_ratings)
-                else:
-                    day_meal_performance[meal_type] = {
-                        "averageRating": 0,
-                        "participants": 0,
-                        "ratingDistribution": {}
-                    }
-            
-            day_avg_rating = statistics.mean(day_ratings) if day_ratings else 0
-            day_participation = len(day_data["participants"])
-            day_participation_rate = (day_participation / total_students * 100) if total_students > 0 else 0
-            
-            daily_breakdown[date_key] = {
-                "date": date_key,
-                "dayName": day_data.get("day_name", ""),
-                "averageRating": round(day_avg_rating, 2),
-                "participatingStudents": day_participation,
-                "participationRate": round(day_participation_rate, 1),
-                "totalRatings": len(day_ratings),
-                "mealPerformance": day_meal_performance
-            }
-            
-            week_ratings.extend(day_ratings)
-            week_participation.append(day_participation)
-        
-        # Calculate weekly overview
-        week_avg_rating = statistics.mean(week_ratings) if week_ratings else 0
-        week_avg_participation = statistics.mean(week_participation) if week_participation else 0
-        total_week_feedbacks = sum(len(day_data["participants"]) for day_data in daily_data.values())
+        for meal, meal_type in enumerate(meal_types):
+            counts = day_counts[meal]
+            if counts.any():
+                day_meal_performance[meal_type] = {
+                    "averageRating": round(histogram_mean(counts), 2),
+                    "averageRatingInterval": day_intervals[day][meal],
+                    "participants": histogram_count(counts),
+                    "ratingDistribution": {star: int(counts[star - 1]) for star in range(1, 6) if counts[star - 1]}
+                }
+            else:
+                day_meal_performance[meal_type] = {
+                    "averageRating": 0,
+                    "averageRatingInterval": None,
+                    "participants": 0,
+                    "ratingDistribution": {}
+                }
         
-        # Find best and worst days
-        best_day = max(daily_breakdown.items(), key=lambda x: x[1]["averageRating"]) if daily_breakdown else None
-        worst_day = min(daily_breakdown.items(), key=lambda x: x[1]["averageRating"] if x[1]["averageRating"] > 0 else float('inf')) if daily_breakdown else None
+        day_participation = len(aggregates.day_users[day])
+        day_participation_rate = (day_participation / total_students * 100) if total_students > 0 else 0
         
-        weekly_analysis["overview"] = {
-            "weekStart": start_date.strftime('%Y-%m-%d'),
-            "weekEnd": (end_date - timedelta(days=1)).strftime('%Y-%m-%d'),
-            "totalStudents": total_students,
-            "averageRating": round(week_avg_rating, 2),
-            "averageParticipation": round(week_avg_participation, 1),
-            "averageParticipationRate": round((week_avg_participation / total_students * 100), 1) if total_students > 0 else 0,
-            "totalFeedbacks": total_week_feedbacks,
-            "totalRatings": len(week_ratings),
-            "bestDay": {
-                "date": best_day[0],
-                "dayName": best_day[1]["dayName"],
-                "rating": best_day[1]["averageRating"]
-            } if best_day else None,
-            "worstDay": {
-                "date": worst_day[0], 
-                "dayName": worst_day[1]["dayName"],
-                "rating": worst_day[1]["averageRating"]
-            } if worst_day else None
+        daily_breakdown[date_key] = {
+            "date": date_key,
+            "dayName": aggregates.day_dates[day].strftime('%A'),
+            "averageRating": round(histogram_mean(day_counts), 2),
+            "averageRatingInterval": day_intervals[day][-1],
+            "participatingStudents": day_participation,
+            "participationRate": round(day_participation_rate, 1),
+            "totalRatings": histogram_count(day_counts),
+            "mealPerformance": day_meal_performance
         }
         
-        weekly_analysis["dailyBreakdown"] = daily_breakdown
-        
-        # Analyze meal trends across the week
-        meal_trends = {}
-        for meal_type in meal_types:
-            meal_daily_ratings = []
-            meal_daily_participation = []
-            
-            for date_key in sorted(daily_breakdown.keys()):
-                meal_data = daily_breakdown[date_key]["mealPerformance"][meal_type]
-                meal_daily_ratings.append(meal_data["averageRating"])
-                meal_daily_participation.append(meal_data["participants"])
-            
-            meal_avg_rating = statistics.mean([r for r in meal_daily_ratings if r > 0]) if [r for r in meal_daily_ratings if r > 0] else 0
-            meal_avg_participation = statistics.mean(meal_daily_participation)
-            
-            meal_trends[meal_type] = {
-                "weeklyAverage": round(meal_avg_rating, 2) if meal_avg_rating > 0 else 0,
-                "averageParticipation": round(meal_avg_participation, 1),
-                "dailyRatings": meal_daily_ratings,
-                "dailyParticipation": meal_daily_participation,
-                "trend": calculate_trend(meal_daily_ratings),
-                "consistency": calculate_consistency(meal_daily_ratings),
-                "bestDay": get_best_day_for_meal(daily_breakdown, meal_type),
-                "worstDay": get_worst_day_for_meal(daily_breakdown, meal_type)
-            }
-        
-        weekly_analysis["mealTrends"] = meal_trends
+        week_participation.append(day_participation)
+    
+    # Calculate weekly overview
+    week_avg_rating = histogram_mean(aggregates.counts)
+    week_avg_participation = statistics.mean(week_participation) if week_participation else 0
+    total_week_feedbacks = sum(week_participation)
+    
+    # Find best and worst days
+    best_day = max(daily_breakdown.items(), key=lambda x: x[1]["averageRating"]) if daily_breakdown else None
+    worst_day = min(daily_breakdown.items(), key=lambda x: x[1]["averageRating"] if x[1]["averageRating"] > 0 else float('inf')) if daily_breakdown else None
+    
+    weekly_analysis["overview"] = {
+        "weekStart": start_date.strftime('%Y-%m-%d'),
+        "weekEnd": (end_date - timedelta(days=1)).strftime('%Y-%m-%d'),
+        "totalStudents": total_students,
+        "averageRating": round(week_avg_rating, 2),
+        "averageRatingInterval": mean_intervals(aggregates.meal_counts().sum(axis=0)),
+        "averageParticipation": round(week_avg_participation, 1),
+        "averageParticipationRate": round((week_avg_participation / total_students * 100), 1) if total_students > 0 else 0,
+        "totalFeedbacks": total_week_feedbacks,
+        "totalRatings": histogram_count(aggregates.counts),
+        "bestDay": {
+            "date": best_day[0],
+            "dayName": best_day[1]["dayName"],
+            "rating": best_day[1]["averageRating"]
+        } if best_day else None,
+        "worstDay": {
+            "date": worst_day[0], 
+            "dayName": worst_day[1]["dayName"],
+            "rating": worst_day[1]["averageRating"]
+        } if worst_day else None
+    }
+    
+    weekly_analysis["dailyBreakdown"] = daily_breakdown
+    
+    # Analyze meal trends across the week (trend tests position each day by its offset in the week)
+    day_positions = [(date - start_date).days for date in aggregates.day_dates]
+    meal_trends = {}
+    for meal, meal_type in enumerate(meal_types):
+        meal_daily_ratings = []
+        meal_daily_participation = []
         
-        # Analyze participation patterns
-        weekly_analysis["participationAnalysis"] = analyze_weekly_participation(daily_breakdown)
+        for date_key in sorted(daily_breakdown.keys()):
+            meal_data = daily_breakdown[date_key]["mealPerformance"][meal_type]
+            meal_daily_ratings.append(meal_data["averageRating"])
+            meal_daily_participation.append(meal_data["participants"])
         
-        # Generate insights and alerts
-        weekly_analysis["weeklyInsights"] = generate_weekly_insights(weekly_analysis)
-        weekly_analysis["weeklyAlerts"] = generate_weekly_alerts(weekly_analysis)
+        # Pooled over every rating of the meal in the week, like the overview average
+        meal_week_counts = day_histograms[:, meal].sum(axis=0)
+        meal_avg_rating = histogram_mean(meal_week_counts)
+        meal_avg_participation = statistics.mean(meal_daily_participation)
         
-        # Identify patterns
-        weekly_analysis["patterns"] = identify_weekly_patterns(daily_breakdown, meal_trends)
+        # Trend of every rating of the meal against its day of the week
+        meal_trend_test = linear_trend_test(day_histograms[:, meal], day_positions)
         
-        # Final result
-        result = {
-            "error": False,
-            "weekStart": start_date.strftime('%Y-%m-%d'),
-            "weekEnd": (end_date - timedelta(days=1)).strftime('%Y-%m-%d'),
-            "timestamp": datetime.now().isoformat(),
-            "data": weekly_analysis
+        meal_trends[meal_type] = {
+            "weeklyAverage": round(meal_avg_rating, 2) if meal_avg_rating > 0 else 0,
+            "weeklyAverageInterval": mean_intervals(meal_week_counts),
+            "averageParticipation": round(meal_avg_participation, 1),
+            "dailyRatings": meal_daily_ratings,
+            "dailyParticipation": meal_daily_participation,
+            "trend": calculate_trend(meal_trend_test),
+            "trendTest": meal_trend_test,
+            "consistency": calculate_consistency(meal_daily_ratings),
+            "bestDay": get_best_day_for_meal(daily_breakdown, meal_type),
+            "worstDay": get_worst_day_for_meal(daily_breakdown, meal_type)
         }
-        
+    
+    weekly_analysis["mealTrends"] = meal_trends
+    
+    # Analyze participation patterns
+    weekly_analysis["participationAnalysis"] = analyze_weekly_participation(daily_breakdown)
+    
+    # Deltas against the previous week and the 4-week baseline, from the per-day histogram rollups
+    weekly_analysis["comparisons"] = analyze_week_over_week(db_conn, aggregates, start_date)
+    
+    # Headline summary; its trend is the previous-week comparison when that week has feedback
+    meal_histograms = aggregates.meal_counts()
+    weekly_data = {
+        "all_ratings": np.repeat(RATING_VALUES, meal_histograms.sum(axis=0)).tolist(),
+        "meal_ratings": {
+            meal_type: np.repeat(RATING_VALUES, meal_histograms[meal]).tolist()
+            for meal, meal_type in enumerate(meal_types)
+        }
+    }
+    daily_summaries = {
+        date_key: {"avg_rating": daily_breakdown[date_key]["averageRating"],
+                   "day_name": daily_breakdown[date_key]["dayName"]}
+        for date_key in sorted(daily_breakdown)
+    }
+    weekly_analysis["overallSummary"] = generate_weekly_overall_summary(
+        weekly_data, daily_summaries, weekly_analysis["comparisons"]
+    )
+    
+    # Generate insights and alerts
+    weekly_analysis["weeklyInsights"] = generate_weekly_insights(weekly_analysis)
+    weekly_analysis["weeklyAlerts"] = evaluate_alert_rules(aggregates, total_students)
+    
+    # Identify patterns
+    weekly_analysis["patterns"] = identify_weekly_patterns(daily_breakdown, meal_trends)
+    
+    # Collapse near-duplicate comments (within and across days) for sentiment and topic summaries;
+    # the per-day stores (topic training, phrase sketches) take the raw records and collapse per day
+    unique_records, weekly_analysis["duplicateComments"] = collapse_comment_records(comment_records)
+    
+    # Text sentiment vs star rating per meal (scores cached by comment hash)
+    rated_comments = {meal: [] for meal in meal_types}
+    for _, meal_type, rating, comment in unique_records:
+        rated_comments[meal_type].append((rating, comment))
+    weekly_analysis["textSentiment"] = analyze_text_sentiment(db_conn, rated_comments)
+    
+    # Top comment topics per meal from the incrementally trained topic model
+    weekly_analysis["topTopics"] = analyze_comment_topics(db_conn, unique_records, comment_records)["topicsPerMeal"]
+    
+    # Top phrases merged from the daily phrase sketches of the week
+    week_days = [(start_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((end_date - start_date).days)]
+    weekly_analysis["topPhrases"] = analyze_top_phrases(db_conn, week_days, meal_types, comment_records)
+    
+    # Final result
+    result = {
+        "error": False,
+        "weekStart": start_date.strftime('%Y-%m-%d'),
+        "weekEnd": (end_date - timedelta(days=1)).strftime('%Y-%m-%d'),
+        "timestamp": datetime.now().isoformat(),
+        "data": weekly_analysis
+    }
+    
+    return result
+
+def cached_weekly_analysis(db_conn, date_str, refresh=False, store=None, load_feedback=None):
+    """
+    Weekly analysis read through the result cache (keyed by week start); returns (result, cached)
+    load_feedback: optional callable returning (feedback records, total students), only called on a miss
+    """
+    start_date, end_date = get_date_range(date_str, "week")
+    build = lambda: build_weekly_analysis(db_conn, date_str, *(load_feedback() if load_feedback else ()))
+    return cached_analysis(db_conn, result_key("weekly", start_date), start_date, end_date, build, refresh, store)
+
+def polled_weekly_analysis(db_conn, date_str, since=None):
+    """
+    Weekly analysis for polling clients: the full result with a watermark, or "not_modified" /
+    a delta of the changed days and meals when since is a watermark the client already holds
+    """
+    start_date, end_date = get_date_range(date_str, "week")
+    return watermarked_analysis(db_conn, result_key("weekly", start_date), start_date, end_date,
+                                lambda: build_weekly_analysis(db_conn, date_str), since)
+
+def analyze_weekly_feedback(date_str, since=None, segments=False):
+    """
+    Perform comprehensive weekly analysis
+    segments: attach the week's breakdown by student segment (data.segmentBreakdown)
+    """
+    db_conn = DatabaseConnection()
+    
+    if not db_conn.connect():
+        handle_error("Failed to connect to database", "DATABASE_ERROR")
+        return
+    
+    try:
+        result, _ = polled_weekly_analysis(db_conn, date_str, since)
+        if segments:
+            start_date, _ = get_date_range(date_str, "week")
+            attach_segment_breakdown(db_conn, result, [
+                (start_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)
+            ])
         safe_json_output(result)
         
+    except AnalysisError as e:
+        handle_error(e.message, e.error_type)
     except Exception as e:
         handle_error(f"Weekly analysis failed: {str(e)}", "ANALYSIS_ERROR")
     finally:
@@ -393,31 +482,14 @@ def create_empty_weekly_result(date_str, start_date, end_date):
         }
     }
 
-def calculate_trend(ratings):
-    """Calculate trend direction from daily ratings"""
-    valid_ratings = [r for r in ratings if r > 0]
-    if len(valid_ratings) < 2:
+def calculate_trend(trend_test):
+    """Trend direction from the linear trend test of the week's daily rating histograms"""
+    if trend_test is None:
         return "insufficient_data"
     
-    # Simple linear trend calculation
-    x = list(range(len(valid_ratings)))
-    if len(valid_ratings) > 1:
-        # Calculate slope manually
-        n = len(valid_ratings)
-        sum_x = sum(x)
-        sum_y = sum(valid_ratings)
-        sum_xy = sum(x[i] * valid_ratings[i] for i in range(n))
-        sum_x2 = sum(xi * xi for xi in x)
-        slope = (n * sum_xy - sum_x * sum_y) / (n * sum_x2 - sum_x * sum_x)
-    else:
-        slope = 0
-    
-    if slope > 0.1:
-        return "improving"
-    elif slope < -0.1:
-        return "declining"
-    else:
+    if not is_meaningful(trend_test, "correlation"):
         return "stable"
+    return "improving" if trend_test["slope"] > 0 else "declining"
 
 def calculate_consistency(ratings):
     """Calculate consistency score (lower variance = more consistent)"""
@@ -551,41 +623,31 @@ def generate_weekly_insights(analysis_data):
             "impact": "high"
         })
     
-    return insights
-
-def generate_weekly_alerts(analysis_data):
-    """Generate alerts from weekly analysis"""
-    alerts = []
-    
-    meal_trends = analysis_data["mealTrends"]
-    overview = analysis_data["overview"]
+    # Week-over-week insights (only shifts the significance tests confirm)
+    comparisons = analysis_data.get("comparisons") or {}
+    previous_week = (comparisons.get("previousWeek") or {}).get("overall", {})
+    if previous_week.get("trend") in ("improved", "declined"):
+        improved = previous_week["trend"] == "improved"
+        insights.append({
+            "type": "positive" if improved else "negative",
+            "message": f"Average rating {'up' if improved else 'down'} {abs(previous_week['change']):.1f}⭐ vs last week "
+                       f"({previous_week['referenceRating']:.1f}⭐ → {previous_week['currentRating']:.1f}⭐)",
+            "impact": "medium" if improved else "high"
+        })
     
-    # Low rating alerts
-    for meal_type, meal_data in meal_trends.items():
-        if meal_data["weeklyAverage"] > 0 and meal_data["weeklyAverage"] < 3.0:
-            alerts.append({
-                "type": "critical",
-                "meal": meal_type,
-                "message": f"{meal_type.title()} consistently poor this week ({meal_data['weeklyAverage']:.1f}⭐)",
-                "action": "Urgent review of preparation process required"
-            })
-        elif meal_data["weeklyAverage"] > 0 and meal_data["weeklyAverage"] < 3.5:
-            alerts.append({
-                "type": "warning",
-                "meal": meal_type,
-                "message": f"{meal_type.title()} below expectations ({meal_data['weeklyAverage']:.1f}⭐)",
-                "action": "Review and improve preparation"
-            })
-    
-    # Participation alerts
-    if overview["averageParticipationRate"] < 70:
-        alerts.append({
+    below_baseline = [
+        f"{meal.title()} ({delta['change']:+.1f}⭐)"
+        for meal, delta in ((comparisons.get("baseline") or {}).get("perMeal") or {}).items()
+        if delta["trend"] == "declined"
+    ]
+    if below_baseline:
+        insights.append({
             "type": "warning",
-            "message": f"Low weekly participation: {overview['averageParticipationRate']:.1f}%",
-            "action": "Investigate timing and food availability"
+            "message": f"Below the {comparisons['baseline']['weeks']}-week baseline: {', '.join(below_baseline)}",
+            "impact": "high"
         })
     
-    return alerts
+    return insights
 
 def identify_weekly_patterns(daily_breakdown, meal_trends):
     """Identify patterns in weekly data"""
@@ -629,8 +691,15 @@ def identify_weekly_patterns(daily_breakdown, meal_trends):
     return patterns
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        handle_error("Usage: python weekly_analysis.py <date_string>", "USAGE_ERROR")
+    enable_run_metrics()
+    parser = argparse.ArgumentParser(description="Weekly feedback analysis")
+    parser.add_argument("date")
+    parser.add_argument("--since", help="Watermark of the result the client holds")
+    parser.add_argument("--segments", action="store_true", help="Attach the breakdown by student segment")
+    
+    try:
+        args = parser.parse_args()
+    except SystemExit:
+        handle_error("Usage: python weekly_analysis.py <date_string> [--since WATERMARK] [--segments]", "USAGE_ERROR")
     
-    date_string = sys.argv[1]
-    analyze_weekly_feedback(date_string)
+    analyze_weekly_feedback(args.date, args.since, args.segments)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Shared fixtures for the analytics service tests
+Run from analytics-service with: python -m pytest
+MongoDB is replaced by mongomock, so the tests need no running database.
+"""
+
+import os
+import sys
+import random
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_ROOT)
+sys.path.insert(0, os.path.join(SERVICE_ROOT, "services"))
+
+from utils.database import DatabaseConnection
+from utils.kernel import MEAL_TYPES
+
+FIXTURE_START = datetime(2025, 9, 1)
+FIXTURE_DAYS = 21
+FIXTURE_STUDENTS = 40
+COMMENTS = {
+    1: ["Food was ice cold and hard to eat", "Found a hair in the curry today"],
+    2: ["Too salty and the rice was dry", "Portion was far too small today"],
+    3: ["Average taste, nothing special", "Okay meal but could be better"],
+    4: ["Good taste and well cooked", "Nice meal, enjoyed the dal"],
+    5: ["Excellent food, really enjoyed it", "Perfect seasoning and fresh ingredients"]
+}
+
+def make_feedback(start=FIXTURE_START, days=FIXTURE_DAYS, students=FIXTURE_STUDENTS, seed=7):
+    """Feedback documents of a synthetic hostel: one per student and day, ~70% participation"""
+    rng = random.Random(seed)
+    users = [ObjectId() for _ in range(students)]
+    documents = []
+    for offset in range(days):
+        date = start + timedelta(days=offset)
+        # Some days are better than others, so trends and comparisons have something to find
+        mood = rng.choice([-1, 0, 0, 1])
+        for user in users:
+            if rng.random() < 0.3:
+                continue
+            meals = {}
+            for meal, meal_type in enumerate(MEAL_TYPES):
+                if rng.random() < 0.2:
+                    meals[meal_type] = {"rating": None, "comment": "", "submittedAt": None}
+                    continue
+                rating = min(5, max(1, rng.choice([2, 3, 3, 4, 4, 4, 5]) + mood))
+                submitted_at = date + timedelta(hours=7 + 4 * meal, minutes=rng.randrange(180))
+                comment = rng.choice(COMMENTS[rating]) if rng.random() < 0.5 else ""
+                meals[meal_type] = {"rating": rating, "comment": comment, "submittedAt": submitted_at}
+            submitted = [entry["submittedAt"] for entry in meals.values() if entry["submittedAt"]]
+            documents.append({
+                "_id": ObjectId(),
+                "user": user,
+                "date": date,
+                "meals": meals,
+                "createdAt": date,
+                "updatedAt": max(submitted) if submitted else date
+            })
+    return documents
+
+@pytest.fixture
+def db_conn():
+    """DatabaseConnection on an empty in-memory (mongomock) database"""
+    conn = DatabaseConnection()
+    conn.client = mongomock.MongoClient()
+    conn.db = conn.client["hostel-food-analysis"]
+    return conn
+
+@pytest.fixture
+def feedback_documents():
+    return make_feedback()
+
+@pytest.fixture
+def seeded_db(db_conn, feedback_documents):
+    """db_conn holding the synthetic feedback and its students"""
+    db_conn.get_feedback_collection().insert_many(feedback_documents)
+    students = {document["user"] for document in feedback_documents}
+    db_conn.get_users_collection().insert_many([{"_id": user, "isAdmin": False} for user in students])
+    return db_conn
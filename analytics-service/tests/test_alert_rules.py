@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Tests for the declarative alert rules (utils.alert_rules)"""
+
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from utils.alert_rules import load_alert_rules, evaluate_alert_rules, RULES_PATH
+from utils.database import AnalysisError
+from utils.kernel import MEAL_TYPES, aggregate_feedback
+from utils.records import decode_feedback
+
+def rated_aggregates(ratings, date=datetime(2025, 9, 1)):
+    """Aggregates of one day; ratings maps a meal type to the list of its ratings (one per student)"""
+    students = max(len(values) for values in ratings.values())
+    documents = []
+    for student in range(students):
+        meals = {}
+        for meal_type in MEAL_TYPES:
+            values = ratings.get(meal_type, [])
+            if student < len(values):
+                meals[meal_type] = {"rating": values[student], "comment": "", "submittedAt": None}
+        documents.append({"_id": ObjectId(), "user": ObjectId(), "date": date, "meals": meals})
+    return aggregate_feedback(decode_feedback(documents))
+
+def rule(**overrides):
+    return {"id": "test", "scope": "meal", "metric": "avg_rating", "comparator": "<", "threshold": 3.0,
+            **overrides}
+
+def write_rules(tmp_path, rules, name="rules.json"):
+    path = tmp_path / name
+    path.write_text(json.dumps({"version": 1, "rules": rules}))
+    return str(path)
+
+def test_the_shipped_rules_load():
+    rules = load_alert_rules(RULES_PATH)
+    assert rules and all(entry["id"] for entry in rules)
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"scope": "week"}, "unknown scope"),
+    ({"metric": "mood"}, "unknown metric"),
+    ({"metric": "meal_gap"}, "needs scope day or period"),
+    ({"comparator": "!="}, "unknown comparator"),
+    ({"threshold": "3"}, "threshold must be a number")
+])
+def test_invalid_rules_are_config_errors(tmp_path, overrides, message):
+    with pytest.raises(AnalysisError) as error:
+        load_alert_rules(write_rules(tmp_path, [rule(**overrides)]))
+    assert error.value.error_type == "CONFIG_ERROR" and message in error.value.message
+
+def test_unreadable_rules_file_is_a_config_error(tmp_path):
+    with pytest.raises(AnalysisError) as error:
+        load_alert_rules(str(tmp_path / "missing.json"))
+    assert error.value.error_type == "CONFIG_ERROR"
+
+def test_rules_fire_per_cell_and_respect_min_samples():
+    aggregates = rated_aggregates({"morning": [1, 2, 2, 3, 5], "evening": [1, 2, 1]})
+    rules = [rule(id="poor", metric="poor_rate", comparator=">", threshold=50, minSamples=4,
+                  message="{meal_name} {poor_rate:.0f}%")]
+
+    alerts = evaluate_alert_rules(aggregates, total_students=5, rules=rules)
+
+    # Evening is worse but has only 3 ratings
+    assert [(alert["meal"], alert["value"]) for alert in alerts] == [("morning", 60.0)]
+    assert alerts[0]["message"] == "Breakfast 60%" and alerts[0]["threshold"] == 50
+
+def test_only_the_first_matching_rule_of_a_group_fires():
+    aggregates = rated_aggregates({"morning": [1, 1, 2, 2], "afternoon": [3, 3, 4, 3]})
+    rules = [
+        rule(id="critical", threshold=2.0, group="rating", type="critical"),
+        rule(id="warning", threshold=3.5, group="rating", type="warning"),
+        rule(id="count", metric="ratings", comparator=">=", threshold=4)
+    ]
+
+    alerts = evaluate_alert_rules(aggregates, total_students=4, rules=rules)
+
+    assert [(alert["rule"], alert["meal"]) for alert in alerts] == [
+        ("critical", "morning"), ("warning", "afternoon"), ("count", "morning"), ("count", "afternoon")
+    ]
+
+def test_period_meal_gap_names_the_best_and_worst_meal():
+    aggregates = rated_aggregates({"morning": [5, 5, 4, 5], "night": [2, 1, 2, 2]})
+    rules = [rule(id="gap", scope="period", metric="meal_gap", comparator=">", threshold=1.0,
+                  message="{best_meal} vs {worst_meal}")]
+
+    [alert] = evaluate_alert_rules(aggregates, total_students=4, rules=rules)
+
+    assert alert["message"] == "Breakfast vs Night Snacks"
+    assert alert["value"] == 3.0
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Tests for the CSV / Parquet export of aggregated analytics (services/bulk_export.py)"""
+
+import csv
+import os
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+import bulk_export
+from bulk_export import export_aggregates, EXPORT_TABLES, TABLE_COLUMNS
+from utils.database import AnalysisError
+from utils.kernel import MEAL_TYPES, aggregate_feedback
+from utils.records import decode_feedback
+from tests.conftest import FIXTURE_START, FIXTURE_DAYS
+
+START = FIXTURE_START.strftime('%Y-%m-%d')
+END = (FIXTURE_START + timedelta(days=FIXTURE_DAYS - 1)).strftime('%Y-%m-%d')
+
+@pytest.fixture
+def aggregates(feedback_documents):
+    return aggregate_feedback(decode_feedback(feedback_documents), keep_ratings=True)
+
+def expected_rows(aggregates):
+    """Rows of each table for the whole fixture"""
+    return {
+        "day": FIXTURE_DAYS * len(MEAL_TYPES),
+        "meal": len(MEAL_TYPES),
+        "weekday": 7 * len(MEAL_TYPES),
+        "student": int((aggregates.user_counts.sum(axis=2) > 0).sum())
+    }
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+@pytest.mark.parametrize("chunk_days", [1, 7, 30])
+def test_csv_row_counts(seeded_db, aggregates, tmp_path, chunk_days):
+    result = export_aggregates(seeded_db, START, END, "csv", output_dir=str(tmp_path), chunk_days=chunk_days)
+
+    assert result["documents"] == aggregates.total_documents and result["days"] == FIXTURE_DAYS
+    assert result["students"] == len(aggregates.user_keys)
+    expected = expected_rows(aggregates)
+    for item in result["files"]:
+        rows = read_csv(item["path"])
+        assert item["rows"] == len(rows) == expected[item["table"]]
+        assert list(rows[0]) == [name for name, _ in TABLE_COLUMNS[item["table"]]]
+    assert not [name for name in os.listdir(tmp_path / f"{START}_{END}") if name.endswith(".partial")]
+
+def test_csv_totals_match_the_kernel(seeded_db, aggregates, tmp_path):
+    result = export_aggregates(seeded_db, START, END, "csv", output_dir=str(tmp_path), chunk_days=4)
+    paths = {item["table"]: item["path"] for item in result["files"]}
+    stars = [f"rating_{value}" for value in range(1, 6)]
+    histogram = lambda rows: np.array([[int(row[column]) for column in stars] for row in rows]).sum(axis=0)
+
+    expected = aggregates.counts.sum(axis=(0, 1))
+    for table in EXPORT_TABLES:
+        assert np.array_equal(histogram(read_csv(paths[table])), expected)
+
+    days = read_csv(paths["day"])
+    assert [row["date"] for row in days] == sorted(row["date"] for row in days)
+    for meal, row in enumerate(read_csv(paths["meal"])):
+        assert np.array_equal(histogram([row]), aggregates.counts[:, meal].sum(axis=0))
+
+def test_a_subset_of_tables(seeded_db, tmp_path):
+    result = export_aggregates(seeded_db, START, END, "csv", tables=["meal"], output_dir=str(tmp_path))
+    assert [item["table"] for item in result["files"]] == ["meal"]
+    assert result["students"] is None
+    assert os.listdir(tmp_path / f"{START}_{END}") == ["meal.csv"]
+
+def test_parquet_row_counts(seeded_db, aggregates, tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    result = export_aggregates(seeded_db, START, END, "parquet", output_dir=str(tmp_path), chunk_days=7)
+
+    expected = expected_rows(aggregates)
+    for item in result["files"]:
+        metadata = parquet.ParquetFile(item["path"]).metadata
+        assert item["rows"] == metadata.num_rows == expected[item["table"]]
+    day_file = next(item["path"] for item in result["files"] if item["table"] == "day")
+    # One row group per chunk of days
+    assert parquet.ParquetFile(day_file).metadata.num_row_groups == 3
+
+def test_parquet_without_pyarrow_fails_before_reading(seeded_db, tmp_path, monkeypatch):
+    def missing_pyarrow():
+        raise AnalysisError("Parquet export needs pyarrow (pip install pyarrow)", "MISSING_DEPENDENCY")
+    monkeypatch.setattr(bulk_export, "load_pyarrow", missing_pyarrow)
+
+    with pytest.raises(AnalysisError) as error:
+        export_aggregates(seeded_db, START, END, "parquet", output_dir=str(tmp_path))
+    assert error.value.error_type == "MISSING_DEPENDENCY"
+    assert not os.listdir(tmp_path)
+
+def test_a_failed_export_leaves_no_files(seeded_db, tmp_path, monkeypatch):
+    def failing_day_batch(aggregates, meal_types):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(bulk_export, "day_batch", failing_day_batch)
+
+    with pytest.raises(RuntimeError):
+        export_aggregates(seeded_db, START, END, "csv", output_dir=str(tmp_path))
+    assert os.listdir(tmp_path / f"{START}_{END}") == []
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Tests for the persistent comment index (utils.comment_index)"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from utils.comment_index import update_comment_index, search_comments
+
+DAY = datetime(2025, 9, 1)
+
+def feedback(comments, date=DAY, updated_minutes=0):
+    """Feedback document with {meal_type: (rating, comment)}"""
+    return {
+        "_id": ObjectId(),
+        "user": ObjectId(),
+        "date": date,
+        "meals": {meal_type: {"rating": rating, "comment": comment} for meal_type, (rating, comment) in comments.items()},
+        "updatedAt": DAY + timedelta(hours=20, minutes=updated_minutes)
+    }
+
+@pytest.fixture
+def indexed_db(db_conn):
+    documents = [
+        feedback({"morning": (1, "Tea was ice cold"), "evening": (4, "Hot and fresh rotis")}),
+        feedback({"morning": (2, "Cold tea and ice in the juice")}, updated_minutes=1),
+        feedback({"night": (2, "Milk was ice cold again")}, date=DAY + timedelta(days=1), updated_minutes=2)
+    ]
+    db_conn.get_feedback_collection().insert_many(documents)
+    assert update_comment_index(db_conn) == 3
+    return db_conn, documents
+
+def matched(result):
+    return sorted((hit["feedbackId"], hit["mealType"]) for hit in result["results"])
+
+def test_phrases_need_consecutive_terms(indexed_db):
+    db_conn, documents = indexed_db
+    result = search_comments(db_conn, '"ice cold"')
+    assert result["total"] == 2
+    assert matched(result) == sorted([(str(documents[0]["_id"]), "morning"), (str(documents[2]["_id"]), "night")])
+
+    # Both words, anywhere in the comment
+    assert search_comments(db_conn, "ice cold")["total"] == 3
+
+def test_meal_rating_and_date_filters(indexed_db):
+    db_conn, documents = indexed_db
+    assert search_comments(db_conn, "cold", meals=["night"])["total"] == 1
+    assert search_comments(db_conn, "cold", min_rating=2)["total"] == 2
+    assert search_comments(db_conn, "cold", max_rating=1)["total"] == 1
+    assert search_comments(db_conn, "cold", start_date=DAY, end_date=DAY)["total"] == 2
+    assert search_comments(db_conn, "fresh", meals=["morning"])["total"] == 0
+
+def test_edits_after_the_watermark_are_reindexed(indexed_db):
+    db_conn, documents = indexed_db
+    db_conn.get_feedback_collection().update_one(
+        {"_id": documents[0]["_id"]},
+        {"$set": {"meals.morning.comment": "Tea was lovely", "updatedAt": DAY + timedelta(hours=21)}}
+    )
+
+    # The document at the watermark is indexed again along with the edited one
+    assert update_comment_index(db_conn) == 2
+    assert search_comments(db_conn, '"ice cold"')["total"] == 1
+    assert matched(search_comments(db_conn, "lovely")) == [(str(documents[0]["_id"]), "morning")]
+    assert update_comment_index(db_conn) == 1
+
+def test_deleted_feedback_is_not_counted_and_its_postings_are_pruned(indexed_db):
+    db_conn, documents = indexed_db
+    db_conn.get_feedback_collection().delete_one({"_id": documents[2]["_id"]})
+
+    result = search_comments(db_conn, "cold")
+    assert result["total"] == len(result["results"]) == 2
+    assert db_conn.get_comment_index_collection().count_documents({"feedbackId": documents[2]["_id"]}) == 0
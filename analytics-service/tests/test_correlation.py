@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Tests for the meal correlation analysis (utils.correlation)"""
+
+from datetime import timedelta
+
+import numpy as np
+
+from utils.correlation import (MIN_PAIRS, pairwise_correlation, within_student, next_meal,
+                               analyze_meal_correlations)
+from utils.kernel import MEAL_TYPES, aggregate_feedback
+from utils.records import decode_feedback
+from tests.conftest import FIXTURE_START, FIXTURE_DAYS
+
+def complete_pearson(x, y):
+    both = ~np.isnan(x) & ~np.isnan(y)
+    return np.corrcoef(x[both], y[both])[0, 1], both.sum()
+
+def test_pairwise_correlation_matches_corrcoef_on_complete_pairs():
+    rng = np.random.default_rng(3)
+    x = rng.normal(size=(200, 3))
+    y = np.column_stack([x[:, 0] * 0.5 + rng.normal(size=200), rng.normal(size=200)])
+    x[rng.random(x.shape) < 0.2] = np.nan
+    y[rng.random(y.shape) < 0.2] = np.nan
+
+    r, n = pairwise_correlation(x, y)
+
+    assert r.shape == n.shape == (3, 2)
+    for a in range(3):
+        for b in range(2):
+            expected_r, expected_n = complete_pearson(x[:, a], y[:, b])
+            assert n[a, b] == expected_n
+            assert np.isclose(r[a, b], expected_r)
+
+def test_pairwise_correlation_needs_min_pairs_and_variance():
+    x = np.arange(MIN_PAIRS - 1, dtype=np.float64)[:, None]
+    r, n = pairwise_correlation(x, x)
+    assert n[0, 0] == MIN_PAIRS - 1 and np.isnan(r[0, 0])
+
+    constant = np.ones((MIN_PAIRS * 2, 1))
+    r, _ = pairwise_correlation(constant, np.arange(MIN_PAIRS * 2, dtype=np.float64)[:, None])
+    assert np.isnan(r[0, 0])
+
+def test_next_meal_runs_into_the_next_day():
+    tensor = np.arange(2 * 3 * 4, dtype=np.float64).reshape(2, 3, 4)
+    following = next_meal(tensor)
+    assert following[0, 0, 0] == tensor[0, 0, 1]
+    assert following[1, 0, 3] == tensor[1, 1, 0]
+    assert np.isnan(following[:, -1, -1]).all()
+
+def test_within_student_removes_each_students_meal_mean():
+    tensor = np.array([[[4.0, 2.0], [5.0, np.nan], [3.0, np.nan]]])
+    deviations = within_student(tensor)
+    assert np.allclose(deviations[0, :, 0], [0, 1, -1])
+    # A meal rated once has no deviation
+    assert np.isnan(deviations[0, :, 1]).all()
+
+def test_meal_correlations_of_the_fixture(feedback_documents):
+    aggregates = aggregate_feedback(decode_feedback(feedback_documents), keep_ratings=True)
+    end = FIXTURE_START + timedelta(days=FIXTURE_DAYS - 1)
+
+    result = analyze_meal_correlations(aggregates, FIXTURE_START, end)
+
+    assert result["overview"]["days"] == FIXTURE_DAYS
+    assert result["overview"]["ratings"] == aggregates.counts.sum()
+    assert set(result["withinStudent"]) == set(result["raw"]) == {"crossMeal", "nextMeal", "nextDay"}
+    cross = result["raw"]["crossMeal"]
+    assert set(cross) == set(MEAL_TYPES) and all(meal not in cross[meal] for meal in MEAL_TYPES)
+    # The fixture's good and bad days move every meal together
+    entries = [entry for row in cross.values() for entry in row.values() if entry]
+    assert entries and all(-1 <= entry["r"] <= 1 for entry in entries)
+    assert np.mean([entry["r"] for entry in entries]) > 0
+    assert isinstance(result["insights"], list) and isinstance(result["recommendations"], list)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Tests for the daily overall summary (services/daily_analysis.py)"""
+
+import re
+
+from daily_analysis import generate_overall_summary
+from utils.dedup import collapse_comment_records
+
+MEAL_COUNTS = {"morning": [3, 4, 5, 6, 2], "evening": [2, 3, 4, 5, 1]}
+COPIED_COMPLAINT = "The dal was ice cold and the rice was cold too"
+COMPLAINTS = [COPIED_COMPLAINT] * 5 + [
+    "Soup was lukewarm again, please fix the warmers",
+    "Lunch was fine, nothing to report today"
+]
+
+def temperature_mentions(summary):
+    """Mentions in the summary's TOP ISSUES insight ("🟠 Temperature Issues: 2 mentions")"""
+    match = re.search(r"Temperature Issues: (\d+) mentions", " ".join(summary["key_insights"]))
+    return int(match.group(1)) if match else 0
+
+def test_mentions_count_comments_not_keywords():
+    summary = generate_overall_summary(MEAL_COUNTS, [COPIED_COMPLAINT, "Soup was lukewarm again, please fix the warmers"])
+    # "ice cold" and "cold" in one comment are one mention
+    assert temperature_mentions(summary) == 2
+
+def test_collapsed_duplicates_do_not_inflate_mentions():
+    records = [("2025-09-01", "evening", 2, comment) for comment in COMPLAINTS]
+    unique_records, stats = collapse_comment_records(records)
+    unique_comments = [record[3] for record in unique_records]
+
+    assert temperature_mentions(generate_overall_summary(MEAL_COUNTS, COMPLAINTS)) == 6
+    assert temperature_mentions(generate_overall_summary(MEAL_COUNTS, unique_comments)) == 2
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Tests for watermarked responses of polled analyses (utils.deltas)"""
+
+import copy
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from utils.deltas import result_sections, section_changes, record_version, watermarked_analysis, _digest
+from tests.conftest import FIXTURE_START
+
+def section_hashes(result):
+    return {path: _digest(value) for path, value in result_sections(result).items()}
+
+def apply_changes(base, changes):
+    patched = copy.deepcopy(base)
+    for change in changes:
+        target = patched
+        for key in change["path"][:-1]:
+            target = target.setdefault(key, {})
+        if change.get("removed"):
+            target.pop(change["path"][-1], None)
+        else:
+            target[change["path"][-1]] = change["value"]
+    return patched
+
+class CountingCollection:
+    """Collection wrapper that counts writes"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.writes = 0
+
+    def find_one(self, *args, **kwargs):
+        return self.collection.find_one(*args, **kwargs)
+
+    def update_one(self, *args, **kwargs):
+        self.writes += 1
+        return self.collection.update_one(*args, **kwargs)
+
+def test_sections_split_keyed_records_and_skip_volatile_fields():
+    result = {
+        "status": "success",
+        "timestamp": "now",
+        "data": {
+            "overview": {"overallRating": 3.4},
+            "dailyBreakdown": {"2025-09-01": {"rating": 3.1}, "2025-09-02": {"rating": 3.6}},
+            "insights": ["steady week"]
+        }
+    }
+    assert set(result_sections(result)) == {
+        ("status",), ("data", "overview"), ("data", "insights"),
+        ("data", "dailyBreakdown", "2025-09-01"), ("data", "dailyBreakdown", "2025-09-02")
+    }
+
+def test_changes_turn_the_base_version_into_the_new_one():
+    base = {"status": "success", "data": {"days": {"a": {"n": 1}, "b": {"n": 2}}, "overview": {"n": 3}}}
+    new = {"status": "success", "data": {"days": {"a": {"n": 1}, "c": {"n": 5}}, "overview": {"n": 4}}}
+    changes = section_changes(result_sections(new), section_hashes(new), section_hashes(base))
+
+    assert sorted(tuple(change["path"]) for change in changes) == [
+        ("data", "days", "b"), ("data", "days", "c"), ("data", "overview")
+    ]
+    assert apply_changes(base, changes) == new
+
+def test_record_version_only_writes_new_versions(db_conn):
+    collection = CountingCollection(db_conn.get_analytics_collection())
+    hashes = {("status",): "1", ("data", "overview"): "2"}
+
+    versions = record_version(collection, "result:daily:2025-09-01", "w1", hashes)
+    assert versions == {"w1": hashes} and collection.writes == 1
+
+    # Polling the same version again is read-only
+    assert record_version(collection, "result:daily:2025-09-01", "w1", hashes) == {"w1": hashes}
+    assert collection.writes == 1
+
+    changed = {**hashes, ("data", "overview"): "3"}
+    versions = record_version(collection, "result:daily:2025-09-01", "w2", changed)
+    assert list(versions) == ["w1", "w2"] and collection.writes == 2
+
+def test_watermarked_analysis_answers_not_modified_then_deltas(seeded_db):
+    day = FIXTURE_START + timedelta(days=3)
+    key = "result:test:" + day.strftime('%Y-%m-%d')
+    builds = []
+
+    def build():
+        documents = seeded_db.get_feedback_collection().count_documents({"date": day})
+        builds.append(documents)
+        return {"status": "success", "data": {"overview": {"documents": documents}, "notes": {"a": {"n": 1}}}}
+
+    first, _ = watermarked_analysis(seeded_db, key, day, day + timedelta(days=1), build, store=False)
+    watermark = first["watermark"]
+
+    unchanged, cached = watermarked_analysis(seeded_db, key, day, day + timedelta(days=1), build, since=watermark,
+                                             store=False)
+    assert unchanged["status"] == "not_modified" and cached and len(builds) == 1
+
+    seeded_db.get_feedback_collection().insert_one({
+        "_id": ObjectId(), "user": ObjectId(), "date": day, "meals": {}, "updatedAt": datetime(2025, 9, 30)
+    })
+    delta, _ = watermarked_analysis(seeded_db, key, day, day + timedelta(days=1), build, since=watermark,
+                                    store=False)
+    assert delta["status"] == "delta" and delta["watermark"] != watermark
+    assert delta["changes"] == [{"path": ["data", "overview"], "value": {"documents": builds[-1]}}]
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Tests for LTTB downsampling of the trend series (utils.downsampling)"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utils.downsampling import lttb_indices, downsample_daily_averages, MIN_POINTS
+
+def daily_rows(ratings, start=datetime(2024, 1, 1)):
+    return {
+        (start + timedelta(days=offset)).strftime('%Y-%m-%d'): {"overallRating": rating, "morning": rating}
+        for offset, rating in enumerate(ratings)
+    }
+
+def test_lttb_keeps_endpoints_and_the_requested_number_of_points():
+    y = np.sin(np.linspace(0, 12, 500))
+    indices = lttb_indices(y, 40)
+    assert len(indices) == 40
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert np.all(np.diff(indices) > 0)
+
+def test_lttb_returns_every_index_for_short_series_or_tiny_thresholds():
+    y = [1.0, 2.0, 3.0, 2.0]
+    assert list(lttb_indices(y, 10)) == [0, 1, 2, 3]
+    assert list(lttb_indices(y, MIN_POINTS - 1)) == [0, 1, 2, 3]
+
+def test_lttb_keeps_an_isolated_spike():
+    y = np.full(300, 3.0)
+    y[137] = 5.0
+    assert 137 in lttb_indices(y, 20)
+
+def test_downsample_leaves_short_series_untouched():
+    rows = daily_rows([3.5, 4.0, 3.2])
+    kept, info = downsample_daily_averages(rows, 10)
+    assert kept is rows
+    assert info["returnedPoints"] == info["originalPoints"] == 3
+    assert info["bucketDays"] == 1
+
+def test_downsample_drops_empty_days_and_keeps_whole_rows():
+    ratings = [3 + np.sin(day / 9) if day % 11 else 0 for day in range(400)]
+    rows = daily_rows(ratings)
+    kept, info = downsample_daily_averages(rows, 50)
+
+    assert len(kept) == info["returnedPoints"] == 50
+    assert info["originalPoints"] == 400
+    assert all(row["overallRating"] > 0 for row in kept.values())
+    assert all(kept[date_key] is rows[date_key] for date_key in kept)
+    assert min(kept) == min(key for key, row in rows.items() if row["overallRating"] > 0)
+    assert info["bucketDays"] > 1
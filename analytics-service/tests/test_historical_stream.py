@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Tests for the NDJSON output of the historical analysis (services/historical_analysis.py --stream)"""
+
+import json
+from collections import defaultdict
+
+import pytest
+
+import historical_analysis
+
+START, END = "2025-09-01", "2025-09-21"
+
+@pytest.fixture
+def stream(seeded_db, monkeypatch, capsys):
+    """Run stream_historical_data against the seeded database; returns its stdout lines"""
+    monkeypatch.setattr(historical_analysis, "DatabaseConnection", lambda: seeded_db)
+    monkeypatch.setattr(seeded_db, "connect", lambda: True)
+    monkeypatch.setattr(seeded_db, "close", lambda: None)
+
+    def run(*args):
+        historical_analysis.stream_historical_data(*args)
+        return capsys.readouterr().out.split("\n")
+    return run
+
+def assemble(records):
+    """The result data the section and day records add up to"""
+    data = defaultdict(dict)
+    for record in records:
+        if record["type"] == "section":
+            data[record["name"]] = record["data"]
+        elif record["type"] == "day":
+            data[record["section"]][record["date"]] = record["row"]
+    return dict(data)
+
+@pytest.mark.parametrize("analysis_type", ["trend", "comparison"])
+def test_each_line_is_one_record(seeded_db, stream, analysis_type):
+    lines = stream(START, END, analysis_type)
+    # Newline-terminated records, nothing after the last one
+    assert lines[-1] == ""
+    records = [json.loads(line) for line in lines[:-1]]
+
+    assert records[0]["type"] == "header" and records[0]["analysisType"] == analysis_type
+    assert records[-1]["type"] == "summary" and records[-1]["error"] is False
+    assert {record["type"] for record in records[1:-1]} <= {"section", "day"}
+
+    expected = historical_analysis.build_historical_analysis(seeded_db, START, END, analysis_type)["data"]
+    assert assemble(records) == json.loads(json.dumps(expected, default=str))
+    assert records[-1]["sections"] == list(expected)
+
+def test_day_rows_are_streamed_in_date_order(stream):
+    records = [json.loads(line) for line in stream(START, END, "trend") if line]
+    days = [record["date"] for record in records if record["type"] == "day"]
+    assert days and days == sorted(days)
+    assert all(record["section"] == "dailyAverages" for record in records if record["type"] == "day")
+
+def test_a_cached_result_streams_the_same_records(stream, capsys):
+    computed = [json.loads(line) for line in stream(START, END, "trend") if line]
+    historical_analysis.stream_historical_data(START, END, "trend")
+    output = capsys.readouterr()
+    assert "Result cache hit" in output.err
+    cached = [json.loads(line) for line in output.out.splitlines()]
+    assert assemble(cached) == assemble(computed)
+
+def test_errors_are_a_single_record(stream, capsys):
+    with pytest.raises(SystemExit):
+        stream(END, START, "trend")
+    lines = capsys.readouterr().out.splitlines()
+    assert json.loads(lines[0])["type"] == "header"
+    error = json.loads(lines[1])
+    assert error["error"] is True and error["type"] == "DATE_ERROR"
+    assert len(lines) == 2
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Tests for the single-pass analysis kernel (utils.kernel)"""
+
+import numpy as np
+
+from utils.kernel import MEAL_TYPES, aggregate_feedback, merge_aggregates, histogram_mean, histogram_count
+from utils.records import decode_feedback
+
+def brute_force_counts(documents):
+    """{(date_key, meal_type): [count of 1..5 stars]} straight from the documents"""
+    counts = {}
+    for document in documents:
+        date_key = document["date"].strftime('%Y-%m-%d')
+        for meal_type in MEAL_TYPES:
+            rating = document["meals"][meal_type]["rating"]
+            if rating:
+                counts.setdefault((date_key, meal_type), [0] * 5)[rating - 1] += 1
+    return counts
+
+def test_histogram_helpers():
+    assert histogram_mean([0, 0, 0, 0, 0]) == 0
+    assert histogram_mean([1, 0, 0, 0, 1]) == 3
+    assert histogram_count([[1, 2, 0, 0, 0], [0, 0, 0, 0, 4]]) == 7
+
+def test_aggregate_matches_a_brute_force_count(feedback_documents):
+    aggregates = aggregate_feedback(decode_feedback(feedback_documents))
+    expected = brute_force_counts(feedback_documents)
+
+    for day, date_key in enumerate(aggregates.day_keys):
+        for meal, meal_type in enumerate(MEAL_TYPES):
+            assert aggregates.counts[day, meal].tolist() == expected.get((date_key, meal_type), [0] * 5)
+
+    assert aggregates.total_documents == len(feedback_documents)
+    assert sum(len(users) for users in aggregates.day_users) == len(feedback_documents)
+    assert aggregates.user_counts.sum() == aggregates.counts.sum()
+    assert aggregates.hour_counts.sum() == sum(
+        1 for document in feedback_documents for entry in document["meals"].values() if entry["submittedAt"]
+    )
+
+def test_comment_records_and_day_comments_agree(feedback_documents):
+    aggregates = aggregate_feedback(decode_feedback(feedback_documents))
+    assert len(aggregates.comment_records) == aggregates.day_comments.sum()
+    date_key, meal_type, rating, comment = aggregates.comment_records[0]
+    assert meal_type in MEAL_TYPES and 1 <= rating <= 5 and comment
+
+def test_rating_tensor_places_every_rating(feedback_documents):
+    aggregates = aggregate_feedback(decode_feedback(feedback_documents), keep_ratings=True)
+    tensor = aggregates.rating_tensor()
+    assert tensor.shape == (len(aggregates.user_keys), len(aggregates.day_keys), len(MEAL_TYPES))
+    assert (~np.isnan(tensor)).sum() == aggregates.counts.sum()
+    assert np.isclose(np.nanmean(tensor, dtype=np.float64), histogram_mean(aggregates.counts))
+
+def test_merge_of_partitions_equals_a_single_pass(feedback_documents):
+    whole = aggregate_feedback(decode_feedback(feedback_documents), keep_ratings=True)
+    cut = sorted({document["date"] for document in feedback_documents})[8]
+    parts = [
+        aggregate_feedback(decode_feedback([d for d in feedback_documents if d["date"] < cut]), keep_ratings=True),
+        aggregate_feedback(decode_feedback([d for d in feedback_documents if d["date"] >= cut]), keep_ratings=True)
+    ]
+    merged = merge_aggregates(parts)
+
+    assert merged.day_keys == whole.day_keys
+    assert np.array_equal(merged.counts, whole.counts)
+    assert np.array_equal(merged.day_documents, whole.day_documents)
+    assert np.array_equal(merged.day_comments, whole.day_comments)
+    assert np.array_equal(merged.hour_counts, whole.hour_counts)
+    assert merged.comment_records == whole.comment_records
+    # Students may be numbered differently; their histograms and ratings may not
+    merged_users = dict(zip(merged.user_keys, merged.user_counts.tolist()))
+    assert merged_users == dict(zip(whole.user_keys, whole.user_counts.tolist()))
+    assert np.array_equal(np.nan_to_num(merged.rating_tensor()[[merged.user_keys.index(u) for u in whole.user_keys]]),
+                          np.nan_to_num(whole.rating_tensor()))
+
+def test_significance_and_participation_views_of_exact_aggregates(feedback_documents):
+    aggregates = aggregate_feedback(decode_feedback(feedback_documents))
+    assert aggregates.significance_counts() is aggregates.counts
+    assert np.array_equal(aggregates.day_participant_counts(), aggregates.day_documents)
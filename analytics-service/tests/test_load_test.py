@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Tests for the load test driver: request mix, worker status and the report (load_test.py)"""
+
+import sys
+import time
+import random
+import argparse
+from datetime import datetime
+
+import pytest
+
+import load_test
+from load_test import parse_mix, run_worker, summarize, run_load_test, REQUEST_KINDS
+
+FIRST_DAY, LAST_DAY = datetime(2025, 9, 1), datetime(2025, 9, 21)
+
+def test_parse_mix():
+    assert parse_mix("daily=5, weekly=3,bundle") == {"daily": 5.0, "weekly": 3.0, "bundle": 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("daily=1,monthly=2")
+
+def test_requests_target_days_in_the_range():
+    rng = random.Random(1)
+    for _ in range(50):
+        for kind, request in REQUEST_KINDS.items():
+            script, args = request(rng, FIRST_DAY, LAST_DAY)
+            dates = [datetime.strptime(arg, '%Y-%m-%d') for arg in args[:2]]
+            assert script.endswith(".py")
+            assert all(FIRST_DAY <= date <= LAST_DAY for date in dates)
+            if kind == "historical":
+                assert dates[0] <= dates[1] and args[2] in load_test.HISTORICAL_TYPES
+
+@pytest.mark.parametrize("source, expected", [
+    ("print('{\"error\": false, \"data\": {}}')", "ok"),
+    ("print('{\"error\": true, \"type\": \"DATABASE_ERROR\"}')", "error"),
+    ("print('not json')", "error"),
+    ("import sys; sys.exit(1)", "error"),
+    ("import time; time.sleep(5)", "timeout")
+])
+def test_worker_status(tmp_path, source, expected):
+    script = tmp_path / "service.py"
+    script.write_text(source)
+    status, seconds, peak_rss = run_worker(sys.executable, str(script), [], None, timeout=1)
+    assert status == expected
+    assert seconds < 5 and peak_rss > 0
+
+def test_summary():
+    samples = [
+        {"status": "ok", "latency": 1.0, "serviceTime": 0.5, "peakRss": 100 * 1024 * 1024},
+        {"status": "ok", "latency": 2.0, "serviceTime": 2.0, "peakRss": 120 * 1024 * 1024},
+        {"status": "error", "latency": 3.0, "serviceTime": 1.0, "peakRss": 80 * 1024 * 1024},
+        {"status": "timeout", "latency": 4.0, "serviceTime": 4.0, "peakRss": 90 * 1024 * 1024}
+    ]
+    summary = summarize(samples, wall_seconds=2.0)
+    assert summary["throughput"] == 2.0
+    assert summary["errorRate"] == 25.0 and summary["timeoutRate"] == 25.0
+    assert summary["latency"]["p50"] == 2.5 and summary["latency"]["max"] == 4.0
+    assert summary["queueWait"]["max"] == 2.0
+    assert summary["peakRssMb"] == {"p50": 95.0, "max": 120.0}
+    assert summarize([], 1.0)["latency"]["p50"] is None
+
+def test_every_request_is_sampled_once(monkeypatch):
+    calls = []
+    def fake_worker(python, script, args, env, timeout):
+        calls.append(script)
+        time.sleep(0.02)
+        return "ok", 0.02, 1024
+    monkeypatch.setattr(load_test, "run_worker", fake_worker)
+    options = argparse.Namespace(seed=3, mix="daily=1,historical=1", start="2025-09-01", end="2025-09-21",
+                                 mongodb_uri=None, python=sys.executable, timeout=1.0, verbose=False,
+                                 concurrency=2, requests=20, rate=0)
+
+    samples, wall_seconds = run_load_test(options)
+    assert len(samples) == len(calls) == 20
+    assert {sample["kind"] for sample in samples} == {"daily", "historical"}
+    assert set(calls) == {"daily_analysis.py", "historical_analysis.py"}
+    # Closed loop with two workers: later arrivals wait in the queue, and that counts as latency
+    assert all(sample["latency"] >= sample["serviceTime"] for sample in samples)
+    assert summarize(samples, wall_seconds)["queueWait"]["max"] > 0.1
+    assert wall_seconds > 0
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Tests for memory budgets and partitioned loads (utils.memory, utils.records)"""
+
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+import historical_analysis
+import utils.memory as memory
+from utils.database import AnalysisError
+from utils.kernel import aggregate_feedback
+from utils.records import decode_feedback, aggregate_feedback_partitions
+from tests.conftest import FIXTURE_START, FIXTURE_DAYS
+
+MB = 1024 * 1024
+
+@pytest.fixture
+def no_baseline(monkeypatch):
+    monkeypatch.setattr(memory, "current_rss", lambda: 0)
+
+def test_no_budget_loads_in_memory():
+    assert memory.plan_feedback_load(10 ** 9, 365, None) == ("in_memory", None)
+
+def test_plan_partitions_ranges_over_the_budget(no_baseline):
+    assert memory.plan_feedback_load(10000, 100, 1000 * MB) == ("in_memory", None)
+    # A million documents: ~1230 MB in memory, 430 MB retained and 150 MB of comment phases
+    assert memory.plan_feedback_load(10 ** 6, 365, 800 * MB) == ("partitioned", memory.MAX_PARTITION_DAYS)
+    # Ten dense days of 22 MB working set each
+    assert memory.plan_feedback_load(10 ** 6, 10, 600 * MB) == ("partitioned", 7)
+
+def test_comment_phases_must_fit_even_when_partitioned(no_baseline):
+    # Room for a partition and the retained aggregates, not for the comment phases of the range
+    with pytest.raises(AnalysisError) as error:
+        memory.plan_feedback_load(10 ** 6, 365, 570 * MB)
+    assert error.value.error_type == "MEMORY_BUDGET_EXCEEDED"
+
+def test_partitioned_aggregates_equal_a_single_pass(seeded_db, feedback_documents):
+    end = FIXTURE_START + timedelta(days=FIXTURE_DAYS)
+    whole = aggregate_feedback(decode_feedback(feedback_documents))
+    partitioned = aggregate_feedback_partitions(seeded_db.get_feedback_collection(), FIXTURE_START, end, 4)
+
+    assert partitioned.day_keys == whole.day_keys
+    assert np.array_equal(partitioned.counts, whole.counts)
+    assert np.array_equal(partitioned.day_documents, whole.day_documents)
+    assert np.array_equal(partitioned.hour_counts, whole.hour_counts)
+    assert partitioned.comment_records == whole.comment_records
+
+@pytest.mark.parametrize("analysis_type", ["comparison", "trend", "pattern"])
+def test_partitioned_analysis_equals_the_in_memory_one(seeded_db, monkeypatch, analysis_type):
+    start = FIXTURE_START.strftime('%Y-%m-%d')
+    end = (FIXTURE_START + timedelta(days=FIXTURE_DAYS - 1)).strftime('%Y-%m-%d')
+    exact = historical_analysis.build_historical_analysis(seeded_db, start, end, analysis_type)
+
+    monkeypatch.setattr(historical_analysis, "plan_feedback_load", lambda *args: ("partitioned", 3))
+    partitioned = historical_analysis.build_historical_analysis(seeded_db, start, end, analysis_type)
+
+    assert partitioned["data"] == exact["data"]
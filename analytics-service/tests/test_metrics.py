@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""Tests for the per-run metrics line (utils.metrics)"""
+
+import subprocess
+import sys
+
+from tests.conftest import SERVICE_ROOT
+from utils.metrics import METRICS_PREFIX
+
+def stderr_of(code):
+    return subprocess.run([sys.executable, "-c", code], cwd=SERVICE_ROOT, capture_output=True, text=True,
+                          check=True).stderr
+
+def test_importing_the_database_layer_prints_no_metrics():
+    assert METRICS_PREFIX not in stderr_of("import utils.database")
+
+def test_enabled_metrics_are_printed_once_at_exit():
+    code = "from utils.metrics import enable_run_metrics, record_cache\n" \
+           "enable_run_metrics(); enable_run_metrics(); record_cache('result', hits=1)"
+    lines = [line for line in stderr_of(code).splitlines() if line.startswith(METRICS_PREFIX)]
+    assert len(lines) == 1 and '"cache": "result"' in lines[0]
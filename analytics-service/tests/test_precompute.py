@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Tests for the nightly precompute run: its lock and day-by-day catch-up (services/precompute.py)"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import precompute
+from precompute import STATE_ID, acquire_lock, release_lock, days_to_process
+
+CLOSED_DAY = datetime(2025, 9, 5)
+
+@pytest.fixture
+def run_precompute(seeded_db, monkeypatch, capsys):
+    """precompute() against the seeded database on 2025-09-06 (IST), without the dashboard windows"""
+    monkeypatch.setattr(precompute, "DatabaseConnection", lambda: seeded_db)
+    monkeypatch.setattr(seeded_db, "connect", lambda: True)
+    monkeypatch.setattr(seeded_db, "close", lambda: None)
+    monkeypatch.setattr(precompute, "ist_today", lambda: CLOSED_DAY + timedelta(days=1))
+    monkeypatch.setattr(precompute, "window_jobs", lambda *args: [])
+
+    def run(*args):
+        precompute.precompute(*args)
+        return json.loads(capsys.readouterr().out)
+    return run
+
+def state(db_conn):
+    return db_conn.get_analytics_collection().find_one({"_id": STATE_ID})
+
+def test_a_held_lock_is_not_taken_again(db_conn):
+    state_collection = db_conn.get_analytics_collection()
+    assert acquire_lock(state_collection)
+    # The locked state document no longer matches, so the upsert collides on _id (DuplicateKeyError)
+    assert not acquire_lock(state_collection)
+
+    release_lock(state_collection, "idle")
+    assert acquire_lock(state_collection)
+
+def test_an_expired_lock_is_taken_over(db_conn):
+    state_collection = db_conn.get_analytics_collection()
+    state_collection.insert_one({"_id": STATE_ID, "lockedUntil": datetime.now() - timedelta(minutes=1)})
+    assert acquire_lock(state_collection)
+    assert state(db_conn)["status"] == "running"
+
+def test_days_to_process():
+    assert days_to_process({}, CLOSED_DAY, 3) == [CLOSED_DAY - timedelta(days=2), CLOSED_DAY - timedelta(days=1), CLOSED_DAY]
+    assert days_to_process({"lastCompletedDay": "2025-09-04"}, CLOSED_DAY, 14) == [CLOSED_DAY]
+    assert days_to_process({"lastCompletedDay": "2025-09-05"}, CLOSED_DAY, 14) == []
+
+def test_missed_days_are_caught_up_one_by_one(seeded_db, run_precompute):
+    seeded_db.get_analytics_collection().insert_one({"_id": STATE_ID, "lastCompletedDay": "2025-09-02"})
+
+    output = run_precompute("2025-09-05")
+    assert output["daysProcessed"] == ["2025-09-03", "2025-09-04", "2025-09-05"]
+    assert [job["job"] for job in output["jobs"]] == [
+        f"{job}:2025-09-0{day}" for day in (3, 4, 5) for job in ("daily", "segments")
+    ]
+    assert output["failed"] == 0
+    assert state(seeded_db)["lastCompletedDay"] == "2025-09-05"
+    assert state(seeded_db)["status"] == "idle" and "lockedUntil" not in state(seeded_db)
+
+    # Nothing left to catch up; a refresh recomputes the closed day alone
+    assert run_precompute("2025-09-05")["daysProcessed"] == []
+    assert run_precompute("2025-09-05", 14, True)["daysProcessed"] == ["2025-09-05"]
+
+def test_a_failed_day_stops_the_catch_up(seeded_db, run_precompute, monkeypatch):
+    cached_daily_analysis = precompute.cached_daily_analysis
+    def failing_daily_analysis(db_conn, date_key, *args, **kwargs):
+        if date_key == "2025-09-04":
+            raise RuntimeError("feedback unavailable")
+        return cached_daily_analysis(db_conn, date_key, *args, **kwargs)
+    monkeypatch.setattr(precompute, "cached_daily_analysis", failing_daily_analysis)
+
+    output = run_precompute("2025-09-05", 3)
+    assert output["error"] and output["failed"] == 1
+    # 09-05 is not attempted; the next run starts again from 09-04
+    assert {job["job"].split(":")[1] for job in output["jobs"]} == {"2025-09-03", "2025-09-04"}
+    assert state(seeded_db)["lastCompletedDay"] == "2025-09-03"
+    assert state(seeded_db)["status"] == "failed" and state(seeded_db)["lastError"] == "feedback unavailable"
+
+def test_a_running_precompute_refuses_to_start(seeded_db, run_precompute, capsys):
+    acquire_lock(seeded_db.get_analytics_collection())
+    with pytest.raises(SystemExit):
+        run_precompute("2025-09-05")
+    assert json.loads(capsys.readouterr().out)["type"] == "PRECOMPUTE_LOCKED"
+    assert "lastCompletedDay" not in state(seeded_db)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Smoke tests for chart and PDF rendering in the process pool (services/report_rendering.py)"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import report_rendering
+from report_rendering import REPORT_CHARTS, build_result, render_report
+
+@pytest.fixture
+def reports_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_rendering, "REPORTS_DIR", str(tmp_path))
+    return tmp_path
+
+@pytest.fixture
+def weekly_result(seeded_db):
+    return build_result(seeded_db, "weekly", "2025-09-10")
+
+def test_the_pool_renders_every_chart_and_the_pdf(reports_dir, weekly_result):
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        rendered = render_report(weekly_result, "weekly", ["png", "svg", "pdf"], executor)
+
+    assert not rendered["cached"]
+    assert rendered["directory"].startswith(str(reports_dir))
+    assert os.path.exists(os.path.join(rendered["directory"], "manifest.json"))
+    charts = {item["chart"] for item in rendered["files"] if item["format"] == "png"}
+    assert charts and charts <= set(REPORT_CHARTS["weekly"])
+    assert {item["format"] for item in rendered["files"]} == {"png", "svg", "pdf"}
+    for item in rendered["files"]:
+        assert os.path.getsize(item["path"]) > 0
+    with open(next(item["path"] for item in rendered["files"] if item["format"] == "pdf"), "rb") as f:
+        assert f.read(5) == b"%PDF-"
+
+def test_an_identical_result_is_not_rendered_again(reports_dir, weekly_result):
+    first = render_report(weekly_result, "weekly", ["png"])
+    # Only the generation timestamp differs
+    again = render_report({**weekly_result, "timestamp": "later"}, "weekly", ["png"])
+    assert again["cached"] and again["files"] == first["files"]
+
+    # Other formats are a different report
+    assert not render_report(weekly_result, "weekly", ["svg"])["cached"]
+
+def test_a_partially_rendered_report_is_rendered_again(reports_dir, weekly_result):
+    first = render_report(weekly_result, "weekly", ["png"])
+    os.remove(first["files"][0]["path"])
+    again = render_report(weekly_result, "weekly", ["png"])
+    assert not again["cached"] and os.path.exists(first["files"][0]["path"])
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Tests for approximate analyses from a day-stratified sample (utils.sampling)"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from utils.sampling import (MIN_DAY_SAMPLE, SampledAggregates, sampling_probabilities, sample_query,
+                            sample_feedback_aggregates)
+from utils.kernel import aggregate_feedback, histogram_mean
+from utils.records import decode_feedback
+from tests.conftest import FIXTURE_START, FIXTURE_DAYS
+from historical_analysis import build_historical_analysis
+
+FIXTURE_END = FIXTURE_START + timedelta(days=FIXTURE_DAYS - 1)
+
+def day_counts(*sizes):
+    return {datetime(2025, 1, 1) + timedelta(days=day): size for day, size in enumerate(sizes)}
+
+def expected_size(counts, probabilities):
+    return sum(counts[date] * probabilities[date] for date in counts)
+
+def test_small_ranges_are_read_whole():
+    counts = day_counts(30, 40, 50)
+    probabilities, _, expected = sampling_probabilities(counts, 200)
+    assert set(probabilities.values()) == {1.0} and expected == 120
+
+def test_quiet_days_keep_the_minimum_within_the_budget():
+    counts = day_counts(*([500] * 20 + [25] * 10))
+    probabilities, minimum, expected = sampling_probabilities(counts, 2000)
+
+    assert minimum == MIN_DAY_SAMPLE
+    assert all(counts[date] * probabilities[date] >= MIN_DAY_SAMPLE for date in counts)
+    assert expected == pytest.approx(expected_size(counts, probabilities))
+    assert expected <= 2000
+
+@pytest.mark.parametrize("sizes, sample_size", [
+    ([30] * 300 + [5000] * 5, 3000),
+    ([21] * 365, 1000),
+    ([1] * 50 + [800] * 10, 60)
+])
+def test_minimum_is_lowered_rather_than_exceeding_the_budget(sizes, sample_size):
+    counts = day_counts(*sizes)
+    probabilities, minimum, expected = sampling_probabilities(counts, sample_size)
+
+    assert minimum < MIN_DAY_SAMPLE
+    assert expected <= sample_size
+    assert expected == pytest.approx(expected_size(counts, probabilities))
+    assert all(0 < probability <= 1 for probability in probabilities.values())
+
+def test_sample_query_only_draws_randomly_below_probability_one():
+    counts = day_counts(10, 10, 10)
+    dates = list(counts)
+    query = sample_query({dates[0]: 1.0, dates[1]: 0.25, dates[2]: 0.25})
+
+    whole, sampled = query["$or"][1], query["$or"][0]
+    assert "$expr" not in whole
+    assert sampled["$expr"] == {"$lt": [{"$rand": {}}, 0.25]}
+    assert "$expr" not in sample_query({dates[0]: 1.0})
+
+def test_estimates_of_a_seeded_sample_cover_the_exact_ratings(feedback_documents):
+    rng = np.random.default_rng(11)
+    sample_documents = [document for document in feedback_documents if rng.random() < 0.5]
+    counts = {}
+    for document in feedback_documents:
+        counts[document["date"]] = counts.get(document["date"], 0) + 1
+    sample = aggregate_feedback(decode_feedback(sample_documents), keep_ratings=True)
+    aggregates = SampledAggregates(sample, counts, np.zeros((4, 24)), None)
+    exact = aggregate_feedback(decode_feedback(feedback_documents))
+
+    estimates, margins = aggregates.rating_estimates()
+
+    truth = [histogram_mean(meal_counts) for meal_counts in exact.counts.sum(axis=0)] + [histogram_mean(exact.counts)]
+    assert np.all(margins > 0)
+    assert np.all(np.abs(estimates - truth) <= 3 * margins)
+    assert np.array_equal(aggregates.day_documents, exact.day_documents)
+
+def test_a_budget_covering_the_range_reproduces_the_exact_aggregates(seeded_db, feedback_documents):
+    aggregates = sample_feedback_aggregates(seeded_db.get_feedback_collection(), FIXTURE_START,
+                                            FIXTURE_END + timedelta(days=1), sample_size=len(feedback_documents))
+    exact = aggregate_feedback(decode_feedback(feedback_documents))
+
+    estimates, margins = aggregates.rating_estimates()
+    assert np.array_equal(aggregates.counts, exact.counts)
+    assert np.allclose(margins, 0)
+    assert aggregates.approximation()["expectedDocuments"] == len(feedback_documents)
+
+def test_approximate_comparison_agrees_with_exact_on_a_whole_sample(seeded_db, feedback_documents):
+    start, end = FIXTURE_START.strftime('%Y-%m-%d'), FIXTURE_END.strftime('%Y-%m-%d')
+    exact = build_historical_analysis(seeded_db, start, end, "comparison")["data"]
+    approximate = build_historical_analysis(seeded_db, start, end, "comparison", approximate=True,
+                                            sample_size=len(feedback_documents))["data"]
+
+    assert approximate["overview"] == exact["overview"]
+    assert approximate["mealComparisons"] == exact["mealComparisons"]
+    assert approximate["approximation"]["sampledDocuments"] == len(feedback_documents)
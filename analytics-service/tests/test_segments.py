@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Tests for student segmentation on the sparse behavior matrix (utils.segments)"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from utils.kernel import MEAL_TYPES, aggregate_feedback
+from utils.records import decode_feedback
+from utils.segments import (build_day_profiles, load_or_build_day_profiles, load_segment_model, update_segment_model,
+                            segment_features, segment_label, update_student_segments, analyze_segment_breakdown,
+                            MIN_RATINGS, N_SEGMENTS, UNASSIGNED)
+from tests.conftest import FIXTURE_START, FIXTURE_DAYS, FIXTURE_STUDENTS
+
+DATE_KEYS = [(FIXTURE_START + timedelta(days=day)).strftime('%Y-%m-%d') for day in range(FIXTURE_DAYS)]
+
+@pytest.fixture
+def aggregates(feedback_documents):
+    return aggregate_feedback(decode_feedback(feedback_documents), keep_ratings=True)
+
+@pytest.fixture
+def trained_model(seeded_db):
+    assert update_student_segments(seeded_db, DATE_KEYS) == FIXTURE_DAYS
+    return load_segment_model(seeded_db)
+
+def test_day_profiles_add_up_to_the_day_histograms(aggregates, feedback_documents):
+    profiles = build_day_profiles(aggregates)
+    assert list(profiles) == aggregates.day_keys
+
+    for day, date_key in enumerate(aggregates.day_keys):
+        profile = profiles[date_key]
+        assert np.array_equal(profile["counts"].sum(axis=0), aggregates.counts[day])
+        raters = {str(document["user"]) for document in feedback_documents
+                  if document["date"].strftime('%Y-%m-%d') == date_key
+                  and any(meal["rating"] for meal in document["meals"].values())}
+        assert sorted(profile["users"]) == sorted(raters)
+        comments = sum(1 for record in aggregates.comment_records if record[0] == date_key)
+        assert profile["comments"].sum() == comments
+
+    # Requested days without ratings get empty profiles
+    empty = build_day_profiles(aggregates, ["2025-08-31"])["2025-08-31"]
+    assert empty["users"] == [] and empty["counts"].shape == (0, len(MEAL_TYPES), 5)
+
+def test_features_are_sparse_rating_shares(trained_model):
+    rows = np.arange(len(trained_model["users"]))
+    features = segment_features(trained_model, rows)
+    n_bands = len(MEAL_TYPES) * 3
+
+    assert sparse.issparse(features) and features.shape == (len(rows), n_bands + 2)
+    assert np.allclose(features[:, :n_bands].sum(axis=1), 1)
+    participation, comment_rate = features[:, n_bands].toarray(), features[:, n_bands + 1].toarray()
+    assert ((0 < participation) & (participation <= 1)).all()
+    assert ((0 <= comment_rate) & (comment_rate <= 1)).all()
+
+def test_a_single_meal_rater_only_has_weight_on_that_meal(trained_model):
+    model = {**trained_model, "counts": trained_model["counts"].copy()}
+    model["counts"][0] = 0
+    model["counts"][0, MEAL_TYPES.index("evening")] = [0, 1, 2, 3, 0]
+    row = segment_features(model, np.array([0]))
+
+    evening = MEAL_TYPES.index("evening")
+    assert row.nnz <= 3 + 2
+    assert set(row.indices[row.indices < len(MEAL_TYPES) * 3]) == {evening * 3, evening * 3 + 1, evening * 3 + 2}
+    assert segment_label({"mealShare": {"Dinner": 100.0, "Lunch": 0.0}, "lowRatingShare": 50.0,
+                          "highRatingShare": 0.0, "participation": 10.0, "commentRate": 0.0}) == "Dinner-only raters"
+
+def test_fixture_students_are_segmented(trained_model, aggregates):
+    eligible = trained_model["counts"].sum(axis=(1, 2)) >= MIN_RATINGS
+    assert len(trained_model["users"]) == FIXTURE_STUDENTS
+    assert len(trained_model["labels"]) == N_SEGMENTS == len(set(trained_model["labels"]))
+    assert (trained_model["segments"][eligible] != UNASSIGNED).all()
+    assert (trained_model["segments"][~eligible] == UNASSIGNED).all()
+    assert np.array_equal(trained_model["counts"].sum(axis=0), aggregates.counts.sum(axis=0))
+
+def test_closed_days_are_absorbed_once(seeded_db, trained_model):
+    assert update_student_segments(seeded_db, DATE_KEYS) == 0
+    model = update_segment_model(seeded_db, load_segment_model(seeded_db), {})
+    assert model["version"] == trained_model["version"]
+    assert len(model["trained_days"]) == FIXTURE_DAYS
+
+def test_breakdown_covers_the_period_students(seeded_db, trained_model, aggregates):
+    week = DATE_KEYS[:7]
+    breakdown = analyze_segment_breakdown(seeded_db, week)
+    profiles = build_day_profiles(aggregates, week)
+    students = {user for profile in profiles.values() for user in profile["users"]}
+    ratings = sum(int(profile["counts"].sum()) for profile in profiles.values())
+
+    assert breakdown["status"] == "success" and breakdown["modelDays"] == FIXTURE_DAYS
+    assert breakdown["students"] == len(students)
+    assert sum(segment["students"] for segment in breakdown["segments"].values()) + breakdown["unassignedStudents"] == len(students)
+    assignable = sum(segment["ratings"] for segment in breakdown["segments"].values())
+    assert assignable <= ratings
+
+def test_profile_rollups_are_rebuilt_when_the_day_changes(seeded_db, feedback_documents, capsys):
+    date_key = DATE_KEYS[0]
+    first = load_or_build_day_profiles(seeded_db, [date_key])[date_key]
+    stored = load_or_build_day_profiles(seeded_db, [date_key])[date_key]
+    assert "Student profiles from rollups: 1, built: 0" in capsys.readouterr().err
+    assert stored["users"] == first["users"] and np.array_equal(stored["counts"], first["counts"])
+
+    # An edit to the closed day
+    feedback = seeded_db.get_feedback_collection()
+    document = next(document for document in feedback_documents
+                    if document["date"] == FIXTURE_START and document["meals"]["morning"]["rating"])
+    rating = document["meals"]["morning"]["rating"]
+    feedback.update_one({"_id": document["_id"]}, {"$set": {
+        "meals.morning.rating": 1 if rating != 1 else 5, "updatedAt": datetime(2025, 9, 3)
+    }})
+
+    rebuilt = load_or_build_day_profiles(seeded_db, [date_key])[date_key]
+    assert "Student profiles from rollups: 0, built: 1" in capsys.readouterr().err
+    assert rebuilt["counts"].sum() == first["counts"].sum()
+    assert not np.array_equal(rebuilt["counts"], first["counts"])
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Tests that the histogram-native tests match scipy on the expanded ratings (utils.significance)"""
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from utils.kernel import MEAL_TYPES, aggregate_feedback
+from utils.records import decode_feedback
+from utils.significance import RATING_VALUES, mann_whitney_test, chi_square_test, linear_trend_test
+
+@pytest.fixture
+def day_histograms(feedback_documents):
+    """(days, meals, 5) rating histograms of the fixture"""
+    return aggregate_feedback(decode_feedback(feedback_documents)).counts
+
+def expand(histogram):
+    return np.repeat(RATING_VALUES, histogram)
+
+def halves(day_histograms):
+    middle = len(day_histograms) // 2
+    return day_histograms[:middle].sum(axis=0), day_histograms[middle:].sum(axis=0)
+
+@pytest.mark.parametrize("meal", range(len(MEAL_TYPES)))
+def test_mann_whitney_matches_scipy(day_histograms, meal):
+    first, second = halves(day_histograms)
+    result = mann_whitney_test(first[meal], second[meal])
+    expected = stats.mannwhitneyu(expand(second[meal]), expand(first[meal]), alternative='two-sided',
+                                  use_continuity=True, method='asymptotic')
+
+    assert result["u"] == pytest.approx(expected.statistic, abs=0.05)
+    assert result["pValue"] == pytest.approx(expected.pvalue, abs=1e-4)
+    assert result["rankBiserial"] == pytest.approx(
+        2 * expected.statistic / (first[meal].sum() * second[meal].sum()) - 1, abs=1e-3
+    )
+
+def test_mann_whitney_of_every_meal_together(day_histograms):
+    first, second = halves(day_histograms)
+    expected = stats.mannwhitneyu(expand(second.sum(axis=0)), expand(first.sum(axis=0)), method='asymptotic')
+    assert mann_whitney_test(first, second)["pValue"] == pytest.approx(expected.pvalue, abs=1e-4)
+
+@pytest.mark.parametrize("meal", range(len(MEAL_TYPES)))
+def test_chi_square_matches_scipy(day_histograms, meal):
+    first, second = halves(day_histograms)
+    result = chi_square_test(first[meal], second[meal])
+    table = np.array([np.bincount(expand(counts), minlength=6)[1:] for counts in (first[meal], second[meal])])
+    statistic, p_value, dof, _ = stats.chi2_contingency(table[:, table.sum(axis=0) > 0], correction=False)
+
+    assert result["statistic"] == pytest.approx(statistic, abs=1e-3)
+    assert result["pValue"] == pytest.approx(p_value, abs=1e-4)
+    assert result["dof"] == dof
+
+@pytest.mark.parametrize("meal", [None, *range(len(MEAL_TYPES))])
+def test_trend_matches_linregress(day_histograms, meal):
+    histograms = day_histograms if meal is None else day_histograms[:, meal]
+    result = linear_trend_test(histograms)
+    per_day = histograms.sum(axis=1) if meal is None else histograms
+    days = np.concatenate([np.full(day.sum(), position) for position, day in enumerate(per_day)])
+    ratings = np.concatenate([expand(day) for day in per_day])
+    expected = stats.linregress(days, ratings)
+
+    assert result["ratings"] == len(ratings)
+    assert result["slope"] == pytest.approx(expected.slope, abs=1e-4)
+    assert result["correlation"] == pytest.approx(expected.rvalue, abs=1e-3)
+    assert result["pValue"] == pytest.approx(expected.pvalue, abs=1e-4)
+
+def test_trend_honours_day_positions(day_histograms):
+    # Days two apart: the slope halves, the test is unchanged
+    spread = linear_trend_test(day_histograms, positions=np.arange(len(day_histograms)) * 2)
+    result = linear_trend_test(day_histograms)
+    assert spread["slope"] == pytest.approx(result["slope"] / 2, abs=1e-4)
+    assert spread["pValue"] == result["pValue"]
+
+def test_untestable_inputs():
+    assert mann_whitney_test([0, 0, 0, 0, 0], [1, 2, 3, 4, 5]) is None
+    assert chi_square_test([0, 0, 3, 0, 0], [0, 0, 0, 0, 0]) is None
+    assert mann_whitney_test([0, 0, 4, 0, 0], [0, 0, 6, 0, 0])["pValue"] == 1.0
+    assert linear_trend_test([[0, 0, 2, 0, 0]]) is None
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Tests for the incrementally trained comment topic model (utils.topics)"""
+
+from datetime import datetime
+
+import utils.rollups as rollups
+from utils.topics import load_topic_model, update_topic_model
+from tests.conftest import COMMENTS
+
+def comments_of(*date_keys):
+    texts = [comment for rating_comments in COMMENTS.values() for comment in rating_comments]
+    return {date_key: texts for date_key in date_keys}
+
+def test_only_days_closed_in_ist_are_absorbed(db_conn, monkeypatch):
+    # 20:00 UTC on 2025-09-10 is already 2025-09-11 in IST: the 10th is closed, the 11th is not
+    monkeypatch.setattr(rollups, "ist_today", lambda: datetime(2025, 9, 11))
+    model = update_topic_model(db_conn, load_topic_model(db_conn),
+                               comments_of("2025-09-09", "2025-09-10", "2025-09-11"))
+
+    assert model["trained_days"] == {"2025-09-09", "2025-09-10"}
+    assert load_topic_model(db_conn)["trained_days"] == {"2025-09-09", "2025-09-10"}
+
+    # Once the IST day ends it is absorbed, exactly once
+    monkeypatch.setattr(rollups, "ist_today", lambda: datetime(2025, 9, 12))
+    model = update_topic_model(db_conn, model, comments_of("2025-09-10", "2025-09-11"))
+    assert model["trained_days"] == {"2025-09-09", "2025-09-10", "2025-09-11"}
+    assert model["n_docs"] == 3 * len(comments_of("x")["x"])
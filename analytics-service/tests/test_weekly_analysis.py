@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Tests for the weekly summary and its week-over-week trend (services/weekly_analysis.py)"""
+
+import pytest
+
+from weekly_analysis import build_weekly_analysis, generate_weekly_overall_summary
+
+WEEK_DATA = {
+    "all_ratings": [4, 4, 3, 5, 4, 3],
+    "meal_ratings": {"morning": [4, 4, 3], "afternoon": [5, 4, 3], "evening": [], "night": []}
+}
+# Within the week the rating rises from Monday to Wednesday
+DAILY_SUMMARIES = {
+    "2025-09-15": {"avg_rating": 3.2, "day_name": "Monday"},
+    "2025-09-16": {"avg_rating": 3.8, "day_name": "Tuesday"},
+    "2025-09-17": {"avg_rating": 4.2, "day_name": "Wednesday"}
+}
+
+def previous_week(trend):
+    return {"previousWeek": {"overall": {"trend": trend}}}
+
+def test_trend_comes_from_the_previous_week():
+    summary = generate_weekly_overall_summary(WEEK_DATA, DAILY_SUMMARIES, previous_week("declined"))
+    assert summary["weekly_trends"]["direction"] == "declining"
+    assert any("declining vs last week" in insight for insight in summary["key_weekly_insights"])
+    assert "Trend: DECLINING" in summary["weekly_performance_summary"]
+
+def test_a_steady_previous_week_overrides_the_days_of_the_week():
+    summary = generate_weekly_overall_summary(WEEK_DATA, DAILY_SUMMARIES, previous_week("stable"))
+    assert summary["weekly_trends"]["direction"] == "stable"
+
+def test_without_a_previous_week_the_trend_runs_through_the_week():
+    for comparisons in (None, previous_week("insufficient_data")):
+        summary = generate_weekly_overall_summary(WEEK_DATA, DAILY_SUMMARIES, comparisons)
+        assert summary["weekly_trends"]["direction"] == "improving"
+        assert any("improving through the week" in insight for insight in summary["key_weekly_insights"])
+
+def test_weekly_result_carries_the_summary_of_its_comparisons(seeded_db):
+    data = build_weekly_analysis(seeded_db, "2025-09-17")["data"]
+
+    overall = data["comparisons"]["previousWeek"]["overall"]
+    expected = {"improved": "improving", "declined": "declining"}.get(overall["trend"], "stable")
+    summary = data["overallSummary"]
+    assert summary["weekly_trends"]["direction"] == expected
+    assert f"Trend: {expected.upper()}" in summary["weekly_performance_summary"]
+    if expected != "stable":
+        assert any(f"{expected} vs last week" in insight for insight in summary["key_weekly_insights"])
+    assert f"Total Responses: {data['overview']['totalRatings']}" in summary["weekly_performance_summary"]
+
+def test_meal_averages_and_intervals_pool_the_week(seeded_db):
+    data = build_weekly_analysis(seeded_db, "2025-09-17")["data"]
+
+    for meal_type, trend in data["mealTrends"].items():
+        ratings = [performance["mealPerformance"][meal_type] for performance in data["dailyBreakdown"].values()]
+        total = sum(meal["participants"] for meal in ratings)
+        pooled = sum(meal["averageRating"] * meal["participants"] for meal in ratings) / total
+        assert trend["weeklyAverage"] == pytest.approx(pooled, abs=0.01)
+        assert trend["weeklyAverageInterval"]["low"] <= trend["weeklyAverage"] <= trend["weeklyAverageInterval"]["high"]
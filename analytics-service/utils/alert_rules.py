@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Declarative alert rules evaluated over the analysis kernel's aggregates
+Rules are loaded from config/alert_rules.json (or ALERT_RULES_PATH). Each rule names a metric,
+a scope, a comparator, a threshold and a minimum number of ratings:
+
+    {"id": "meal-rating-critical", "scope": "meal", "metric": "avg_rating_ci_high",
+     "comparator": "<", "threshold": 3.0, "minSamples": 5, "type": "critical",
+     "group": "meal-rating", "message": "{meal_title} ... {avg_rating:.1f}", "action": "..."}
+
+Scopes: meal (each meal over the range), day (each day, all meals), day_meal (each day x meal)
+and period (the whole range). For every scope a rule uses, all metric columns are computed once
+over all cells from the rating histograms; a rule is then one vectorized comparison, so adding
+a rule adds a column test, not another loop over the feedback.
+
+Metrics: ratings, avg_rating, avg_rating_ci_low / avg_rating_ci_high (95% bootstrap interval),
+poor_rate / poor_count (1-2 stars), good_rate (4-5 stars), participation_rate (% of students
+per day), and for day / period scopes meal_gap / meal_gap_ci_low (best minus worst meal).
+Within a group only the first matching rule (in file order) fires for a cell.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+from utils.database import AnalysisError
+from utils.kernel import RATING_VALUES
+from utils.confidence import bootstrap_means, percentile_interval
+
+RULES_PATH = os.environ.get("ALERT_RULES_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "alert_rules.json"
+)
+
+SCOPES = ("meal", "day", "day_meal", "period")
+COMPARATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal
+}
+METRICS = {
+    "ratings", "avg_rating", "avg_rating_ci_low", "avg_rating_ci_high", "poor_rate", "poor_count",
+    "good_rate", "participation_rate", "meal_gap", "meal_gap_ci_low"
+}
+# Metrics comparing the meals inside a cell, so only defined where a cell spans every meal
+MEAL_GAP_METRICS = {"meal_gap", "meal_gap_ci_low"}
+MEAL_NAMES = {'morning': 'Breakfast', 'afternoon': 'Lunch', 'evening': 'Dinner', 'night': 'Night Snacks'}
+
+_rules_cache = {}
+
+def load_alert_rules(path=RULES_PATH):
+    """Load and validate the alert rules (cached per path for the life of the process)"""
+    if path in _rules_cache:
+        return _rules_cache[path]
+
+    try:
+        with open(path, encoding='utf-8') as rules_file:
+            rules = json.load(rules_file)["rules"]
+    except (OSError, ValueError, KeyError) as e:
+        raise AnalysisError(f"Cannot load alert rules from {path}: {e}", "CONFIG_ERROR")
+
+    for rule in rules:
+        rule_id = rule.get("id", "?")
+        if rule.get("scope") not in SCOPES:
+            raise AnalysisError(f"Alert rule {rule_id}: unknown scope {rule.get('scope')}", "CONFIG_ERROR")
+        if rule.get("metric") not in METRICS:
+            raise AnalysisError(f"Alert rule {rule_id}: unknown metric {rule.get('metric')}", "CONFIG_ERROR")
+        if rule["metric"] in MEAL_GAP_METRICS and rule["scope"] not in ("day", "period"):
+            raise AnalysisError(f"Alert rule {rule_id}: {rule['metric']} needs scope day or period", "CONFIG_ERROR")
+        if rule.get("comparator") not in COMPARATORS:
+            raise AnalysisError(f"Alert rule {rule_id}: unknown comparator {rule.get('comparator')}", "CONFIG_ERROR")
+        if not isinstance(rule.get("threshold"), (int, float)):
+            raise AnalysisError(f"Alert rule {rule_id}: threshold must be a number", "CONFIG_ERROR")
+
+    _rules_cache[path] = rules
+    return rules
+
+def rules_digest(path=RULES_PATH):
+    """Short hash of the rules file, so stored results are recomputed when the rules change"""
+    try:
+        with open(path, 'rb') as rules_file:
+            return hashlib.sha1(rules_file.read()).hexdigest()[:12]
+    except OSError:
+        return None
+
+def scope_cells(aggregates, scope, total_students):
+    """
+    Cells of a scope: labels, rating histograms (cells, 5), per-meal histograms (cells, meals, 5)
+    for day / period cells, and participation rates (cells,)
+    """
+    counts = aggregates.counts
+    n_days = max(len(aggregates.day_keys), 1)
+    students = total_students if total_students > 0 else np.nan
+    day_participants = np.array([len(users) for users in aggregates.day_users], dtype=np.float64)
+
+    if scope == "day_meal":
+        labels = [{"date": date_key, "meal": meal_type}
+                  for date_key in aggregates.day_keys for meal_type in aggregates.meal_types]
+        histograms = counts.reshape(-1, 5)
+        participation = histograms.sum(axis=1) / students * 100
+        return labels, histograms, None, participation
+    if scope == "day":
+        labels = [{"date": date_key} for date_key in aggregates.day_keys]
+        return labels, counts.sum(axis=1), counts, day_participants / students * 100
+    if scope == "meal":
+        labels = [{"meal": meal_type} for meal_type in aggregates.meal_types]
+        histograms = counts.sum(axis=0)
+        return labels, histograms, None, histograms.sum(axis=1) / n_days / students * 100
+    per_meal = counts.sum(axis=0)[None]
+    participation = np.array([day_participants.sum() / n_days / students * 100])
+    return [{}], per_meal.sum(axis=1), per_meal, participation
+
+def metric_columns(histograms, per_meal, participation, metrics):
+    """Every metric a scope's rules need, as one array over the scope's cells"""
+    histograms = np.asarray(histograms, dtype=np.int64)
+    ratings = histograms.sum(axis=1)
+    rated = np.where(ratings > 0, ratings, np.nan)
+    columns = {
+        "ratings": ratings,
+        "avg_rating": (histograms @ RATING_VALUES) / rated,
+        "poor_count": histograms[:, 0] + histograms[:, 1],
+        "poor_rate": (histograms[:, 0] + histograms[:, 1]) / rated * 100,
+        "good_rate": (histograms[:, 3] + histograms[:, 4]) / rated * 100,
+        "participation_rate": participation
+    }
+
+    if metrics & {"avg_rating_ci_low", "avg_rating_ci_high"}:
+        columns["avg_rating_ci_low"], columns["avg_rating_ci_high"] = percentile_interval(bootstrap_means(histograms))
+
+    if per_meal is not None:
+        meal_ratings = per_meal.sum(axis=2)
+        meal_means = np.where(meal_ratings > 0, (per_meal @ RATING_VALUES) / np.maximum(meal_ratings, 1), np.nan)
+        has_gap = (meal_ratings > 0).sum(axis=1) >= 2
+        best = np.argmax(np.nan_to_num(meal_means, nan=-np.inf), axis=1)
+        worst = np.argmin(np.nan_to_num(meal_means, nan=np.inf), axis=1)
+        cells = np.arange(len(per_meal))
+        columns["best_meal_index"], columns["worst_meal_index"] = best, worst
+        columns["best_rating"] = meal_means[cells, best]
+        columns["worst_rating"] = meal_means[cells, worst]
+        columns["meal_gap"] = np.where(has_gap, columns["best_rating"] - columns["worst_rating"], np.nan)
+        if "meal_gap_ci_low" in metrics:
+            # Bootstrap the best and worst meal of every cell together: samples (S, cells, meals)
+            samples = bootstrap_means(per_meal)
+            gap_low, _ = percentile_interval(samples[:, cells, best] - samples[:, cells, worst])
+            columns["meal_gap_ci_low"] = np.where(has_gap, gap_low, np.nan)
+
+    return columns
+
+def format_alert(rule, label, columns, cell, meal_types):
+    """Alert dict of one rule firing for one cell, message filled from the cell's values"""
+    values = {name: column[cell].item() for name, column in columns.items()}
+    fields = dict(values)
+    if "meal" in label:
+        fields.update(meal=label["meal"], meal_title=label["meal"].title(),
+                      meal_name=MEAL_NAMES.get(label["meal"], label["meal"]))
+        fields["MEAL_NAME"] = fields["meal_name"].upper()
+    if "date" in label:
+        fields["date"] = label["date"]
+    if "best_meal_index" in values:
+        fields["best_meal"] = MEAL_NAMES.get(meal_types[values["best_meal_index"]])
+        fields["worst_meal"] = MEAL_NAMES.get(meal_types[values["worst_meal_index"]])
+
+    alert = {"type": rule.get("type", "warning"), "rule": rule["id"], **label}
+    alert["message"] = rule.get("message", rule["id"]).format(**fields)
+    if rule.get("action"):
+        alert["action"] = rule["action"]
+    alert["value"] = round(values[rule["metric"]], 2)
+    alert["threshold"] = rule["threshold"]
+    return alert
+
+def evaluate_alert_rules(aggregates, total_students, rules=None):
+    """
+    Evaluate the alert rules over aggregates (any date range); returns the alerts in rule order
+    """
+    rules = load_alert_rules() if rules is None else rules
+    scope_tables = {}
+    for scope in SCOPES:
+        scope_rules = [rule for rule in rules if rule["scope"] == scope]
+        if not scope_rules:
+            continue
+        labels, histograms, per_meal, participation = scope_cells(aggregates, scope, total_students)
+        metrics = {rule["metric"] for rule in scope_rules}
+        scope_tables[scope] = (labels, metric_columns(histograms, per_meal, participation, metrics))
+
+    alerts = []
+    fired = set()
+    for rule in rules:
+        labels, columns = scope_tables[rule["scope"]]
+        values = columns[rule["metric"]]
+        with np.errstate(invalid='ignore'):
+            matches = (COMPARATORS[rule["comparator"]](values, rule["threshold"])
+                       & ~np.isnan(values) & (columns["ratings"] >= rule.get("minSamples", 1)))
+
+        for cell in np.flatnonzero(matches):
+            group = rule.get("group")
+            if group is not None:
+                if (group, rule["scope"], cell) in fired:
+                    continue
+                fired.add((group, rule["scope"], cell))
+            alerts.append(format_alert(rule, labels[cell], columns, cell, aggregates.meal_types))
+    return alerts
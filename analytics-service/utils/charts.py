@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Chart drawing for analysis results
+Each chart function takes an analysis result (as produced by the daily / weekly / historical
+services) and returns a matplotlib Figure, or None when the result has nothing to draw.
+"""
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import seaborn as sns
+from wordcloud import WordCloud
+
+MEAL_TYPES = ['morning', 'afternoon', 'evening', 'night']
+MEAL_NAMES = {
+    'morning': 'Breakfast',
+    'afternoon': 'Lunch',
+    'evening': 'Dinner',
+    'night': 'Night Snacks'
+}
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+STAR_COLORS = ['#d7191c', '#fdae61', '#ffffbf', '#a6d96a', '#1a9641']
+
+sns.set_theme(style="whitegrid")
+
+def _bar_chart(title, labels, values, ylabel, ylim=None):
+    fig, ax = plt.subplots(figsize=(8, 4.5))
+    sns.barplot(x=labels, y=values, ax=ax, color='#4c72b0')
+    ax.set_title(title)
+    ax.set_ylabel(ylabel)
+    if ylim:
+        ax.set_ylim(*ylim)
+    for i, value in enumerate(values):
+        ax.text(i, value, f"{value:g}", ha='center', va='bottom', fontsize=9)
+    fig.tight_layout()
+    return fig
+
+def _rating_heatmap(title, rows, row_labels):
+    """rows: list of {meal_type: rating} in row_labels order"""
+    if not rows:
+        return None
+    values = [[row.get(meal, 0) for meal in MEAL_TYPES] for row in rows]
+    fig, ax = plt.subplots(figsize=(8, 0.5 * len(rows) + 2))
+    sns.heatmap(values, annot=True, fmt=".2f", cmap="RdYlGn", vmin=1, vmax=5, ax=ax,
+                xticklabels=[MEAL_NAMES[meal] for meal in MEAL_TYPES], yticklabels=row_labels)
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+def _word_cloud(title, phrases):
+    """phrases: list of {"phrase", "count"}"""
+    frequencies = {}
+    for item in phrases:
+        frequencies[item["phrase"]] = frequencies.get(item["phrase"], 0) + item["count"]
+    if not frequencies:
+        return None
+    cloud = WordCloud(width=1200, height=600, background_color='white', random_state=42)
+    cloud.generate_from_frequencies(frequencies)
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.imshow(cloud, interpolation='bilinear')
+    ax.axis('off')
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+# Daily
+
+def daily_average_ratings(result):
+    averages = result.get("data", {}).get("averageRatingPerMeal")
+    if not averages:
+        return None
+    return _bar_chart(f"Average Rating per Meal - {result.get('date')}",
+                      list(averages), list(averages.values()), "Average rating", (0, 5))
+
+def daily_rating_distribution(result):
+    distribution = result.get("data", {}).get("feedbackDistributionPerMeal")
+    if not distribution:
+        return None
+    meals = list(distribution)
+    fig, ax = plt.subplots(figsize=(8, 4.5))
+    bottoms = [0] * len(meals)
+    for star in range(1, 6):
+        counts = [distribution[meal][f"{star}_star"] for meal in meals]
+        ax.bar(meals, counts, bottom=bottoms, color=STAR_COLORS[star - 1], label=f"{star} star")
+        bottoms = [bottom + count for bottom, count in zip(bottoms, counts)]
+    ax.set_title(f"Rating Distribution per Meal - {result.get('date')}")
+    ax.set_ylabel("Responses")
+    ax.legend(loc='upper right', fontsize=8)
+    fig.tight_layout()
+    return fig
+
+def daily_participation(result):
+    participants = result.get("data", {}).get("studentRatingPerMeal")
+    if not participants:
+        return None
+    return _bar_chart(f"Students Rating Each Meal - {result.get('date')}",
+                      list(participants), list(participants.values()), "Students")
+
+def daily_phrases(result):
+    phrases_per_meal = result.get("data", {}).get("topPhrasesPerMeal") or {}
+    return _word_cloud(f"Frequent Phrases - {result.get('date')}",
+                       [item for phrases in phrases_per_meal.values() for item in phrases])
+
+# Weekly
+
+def _weekly_days(result):
+    breakdown = result.get("data", {}).get("dailyBreakdown") or {}
+    return [breakdown[date_key] for date_key in sorted(breakdown)]
+
+def weekly_meal_trends(result):
+    days = _weekly_days(result)
+    if not days:
+        return None
+    fig, ax = plt.subplots(figsize=(9, 4.5))
+    labels = [day["dayName"][:3] for day in days]
+    for meal in MEAL_TYPES:
+        ratings = [day["mealPerformance"].get(meal, {}).get("averageRating") or None for day in days]
+        ax.plot(labels, ratings, marker='o', label=MEAL_NAMES[meal])
+    ax.set_ylim(1, 5)
+    ax.set_title(f"Daily Meal Ratings - week of {result.get('weekStart')}")
+    ax.set_ylabel("Average rating")
+    ax.legend(fontsize=8)
+    fig.tight_layout()
+    return fig
+
+def weekly_participation(result):
+    days = _weekly_days(result)
+    if not days:
+        return None
+    return _bar_chart(f"Daily Participation - week of {result.get('weekStart')}",
+                      [day["dayName"][:3] for day in days],
+                      [day.get("participationRate", 0) for day in days], "Participation rate (%)", (0, 100))
+
+def weekly_heatmap(result):
+    days = _weekly_days(result)
+    return _rating_heatmap(
+        f"Ratings by Day and Meal - week of {result.get('weekStart')}",
+        [{meal: day["mealPerformance"].get(meal, {}).get("averageRating", 0) for meal in MEAL_TYPES} for day in days],
+        [day["dayName"] for day in days]
+    )
+
+def period_phrases(result):
+    top_phrases = result.get("data", {}).get("topPhrases") or {}
+    return _word_cloud("Frequent Phrases", top_phrases.get("overall", []))
+
+# Historical
+
+def comparison_meals(result):
+    comparisons = result.get("data", {}).get("mealComparisons")
+    if not comparisons:
+        return None
+    meals = [meal for meal in MEAL_TYPES if meal in comparisons]
+    fig, ax = plt.subplots(figsize=(8, 4.5))
+    positions = range(len(meals))
+    ax.bar([p - 0.2 for p in positions], [comparisons[meal]["period1Rating"] for meal in meals], 0.4, label="Period 1")
+    ax.bar([p + 0.2 for p in positions], [comparisons[meal]["period2Rating"] for meal in meals], 0.4, label="Period 2")
+    ax.set_xticks(list(positions))
+    ax.set_xticklabels([MEAL_NAMES[meal] for meal in meals])
+    ax.set_ylim(0, 5)
+    ax.set_ylabel("Average rating")
+    ax.set_title(f"Period Comparison - {result.get('startDate')} to {result.get('endDate')}")
+    ax.legend(fontsize=8)
+    fig.tight_layout()
+    return fig
+
+def trend_daily_averages(result):
+    daily_averages = result.get("data", {}).get("dailyAverages")
+    if not daily_averages:
+        return None
+    date_keys = sorted(daily_averages)
+    fig, ax = plt.subplots(figsize=(11, 4.5))
+    for meal in MEAL_TYPES:
+        ax.plot(date_keys, [daily_averages[d]["mealRatings"].get(meal) for d in date_keys],
+                linewidth=1, alpha=0.6, label=MEAL_NAMES[meal])
+    ax.plot(date_keys, [daily_averages[d]["overallRating"] for d in date_keys],
+            color='black', linewidth=2, label="Overall")
+    ax.set_ylim(1, 5)
+    ax.set_ylabel("Average rating")
+    ax.set_title(f"Rating Trend - {result.get('startDate')} to {result.get('endDate')}")
+    step = max(1, len(date_keys) // 10)
+    ax.set_xticks(date_keys[::step])
+    ax.tick_params(axis='x', rotation=45, labelsize=8)
+    ax.legend(fontsize=8, ncol=5)
+    fig.tight_layout()
+    return fig
+
+def pattern_day_of_week(result):
+    patterns = result.get("data", {}).get("dayOfWeekPatterns") or {}
+    days = [day for day in DAY_ORDER if day in patterns]
+    return _rating_heatmap("Ratings by Day of Week", [patterns[day] for day in days], days)
+
+def pattern_monthly(result):
+    patterns = result.get("data", {}).get("monthlyPatterns") or {}
+    months = sorted(patterns)
+    return _rating_heatmap("Ratings by Month", [patterns[month] for month in months], months)
+
+def pattern_submissions(result):
+    patterns = result.get("data", {}).get("mealTimePatterns")
+    if not patterns:
+        return None
+    meals = [meal for meal in MEAL_TYPES if meal in patterns]
+    return _bar_chart("Submissions per Meal", [MEAL_NAMES[meal] for meal in meals],
+                      [patterns[meal]["submissionCount"] for meal in meals], "Submissions")
+
+REPORT_CHARTS = {
+    "daily": {
+        "average_ratings": daily_average_ratings,
+        "rating_distribution": daily_rating_distribution,
+        "participation": daily_participation,
+        "phrases": daily_phrases
+    },
+    "weekly": {
+        "meal_trends": weekly_meal_trends,
+        "participation": weekly_participation,
+        "heatmap": weekly_heatmap,
+        "phrases": period_phrases
+    },
+    "comparison": {
+        "meal_comparison": comparison_meals,
+        "phrases": period_phrases
+    },
+    "trend": {
+        "daily_averages": trend_daily_averages,
+        "phrases": period_phrases
+    },
+    "pattern": {
+        "day_of_week": pattern_day_of_week,
+        "monthly": pattern_monthly,
+        "submissions": pattern_submissions,
+        "phrases": period_phrases
+    }
+}
+
+def summary_page(result, report_type):
+    """Title page for the composed report: period, headline metrics and insights"""
+    data = result.get("data", {})
+    period = result.get("date") or (
+        f"{result.get('weekStart') or result.get('startDate')} to {result.get('weekEnd') or result.get('endDate')}"
+    )
+    lines = [f"{report_type.capitalize()} Food Feedback Report", period, ""]
+
+    overview = data.get("overview") or {}
+    for key, value in overview.items():
+        if not isinstance(value, (dict, list)):
+            lines.append(f"{key}: {value}")
+
+    insights = data.get("insights") or data.get("weeklyInsights") or \
+        (data.get("overallSummary") or {}).get("key_insights") or []
+    if insights:
+        lines.append("")
+        lines.append("Insights")
+        for insight in insights[:8]:
+            lines.append(f"- {insight.get('message', insight) if isinstance(insight, dict) else insight}")
+
+    if result.get("status") == "no_data":
+        lines.append(result.get("message", "No data available"))
+
+    fig = plt.figure(figsize=(8.27, 11.69))
+    fig.text(0.08, 0.92, lines[0], fontsize=18, weight='bold')
+    fig.text(0.08, 0.89, lines[1], fontsize=12)
+    for i, line in enumerate(lines[2:]):
+        # Insight messages carry emoji the default font cannot draw
+        fig.text(0.08, 0.85 - i * 0.025, line.encode('ascii', 'ignore').decode()[:110], fontsize=10)
+    return fig
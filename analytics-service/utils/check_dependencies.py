@@ -18,6 +18,7 @@ def check_dependencies():
         'matplotlib',
         'seaborn',
         'scikit-learn',
+        'scipy',
         'wordcloud',
         'python-dotenv'
     ]
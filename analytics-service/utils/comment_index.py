@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Persistent inverted index over feedback comments
+term -> postings (feedback id, day, meal, rating, token positions), built incrementally
+from feedback updated since the last indexing run. Deleted feedback leaves no update behind,
+so its postings are pruned when a search first matches them.
+"""
+
+import re
+import sys
+from collections import defaultdict
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING
+
+STATE_ID = "comment_index_state"
+BATCH_SIZE = 500
+MEAL_TYPES = ['morning', 'afternoon', 'evening', 'night']
+
+_token_pattern = re.compile(r"[a-z0-9']+")
+_query_pattern = re.compile(r'"([^"]+)"|(\S+)')
+
+def tokenize(text):
+    """Lowercase word tokens; positions are indexes into this list"""
+    return _token_pattern.findall(text.lower())
+
+def ensure_index_collections(db_conn):
+    """Create the posting-list indexes (no-op when they already exist)"""
+    postings = db_conn.get_comment_index_collection()
+    postings.create_index([("term", ASCENDING), ("date", DESCENDING)])
+    postings.create_index([("feedbackId", ASCENDING)])
+
+def build_postings(feedback):
+    """Posting documents for every term in every comment of one feedback document"""
+    postings = []
+    for meal_type in MEAL_TYPES:
+        meal_data = feedback.get('meals', {}).get(meal_type, {})
+        comment = (meal_data.get('comment') or '').strip()
+        if not comment:
+            continue
+
+        positions = defaultdict(list)
+        for position, term in enumerate(tokenize(comment)):
+            positions[term].append(position)
+
+        for term, term_positions in positions.items():
+            postings.append({
+                "term": term,
+                "feedbackId": feedback['_id'],
+                "date": feedback['date'],
+                "meal": meal_type,
+                "rating": meal_data.get('rating'),
+                "positions": term_positions
+            })
+    return postings
+
+def update_comment_index(db_conn):
+    """Index feedback created or updated since the stored watermark; returns documents indexed"""
+    ensure_index_collections(db_conn)
+    feedback_collection = db_conn.get_feedback_collection()
+    postings_collection = db_conn.get_comment_index_collection()
+    state_collection = db_conn.get_analytics_collection()
+
+    state = state_collection.find_one({"_id": STATE_ID}) or {}
+    watermark = state.get("watermark")
+
+    # $gte so documents sharing the watermark timestamp are never skipped; re-indexing is idempotent
+    query = {"updatedAt": {"$gte": watermark}} if watermark else {}
+    cursor = feedback_collection.find(query, {"date": 1, "meals": 1, "updatedAt": 1}).sort("updatedAt", ASCENDING)
+
+    indexed = 0
+    batch = []
+    for feedback in cursor:
+        batch.append(feedback)
+        if len(batch) >= BATCH_SIZE:
+            indexed += _index_batch(postings_collection, state_collection, batch)
+            batch = []
+    if batch:
+        indexed += _index_batch(postings_collection, state_collection, batch)
+
+    print(f"Debug: Comment index updated with {indexed} feedback document(s)", file=sys.stderr)
+    return indexed
+
+def _index_batch(postings_collection, state_collection, batch):
+    """Replace the postings of a batch of feedback documents and advance the watermark"""
+    postings_collection.delete_many({"feedbackId": {"$in": [feedback['_id'] for feedback in batch]}})
+
+    postings = [posting for feedback in batch for posting in build_postings(feedback)]
+    if postings:
+        postings_collection.insert_many(postings, ordered=False)
+
+    state_collection.update_one(
+        {"_id": STATE_ID},
+        {"$set": {"watermark": batch[-1].get('updatedAt'), "updatedAt": datetime.now()}},
+        upsert=True
+    )
+    return len(batch)
+
+def parse_query(query):
+    """Split a query into terms and quoted phrases (each phrase is a list of terms)"""
+    terms = []
+    phrases = []
+    for phrase, word in _query_pattern.findall(query):
+        tokens = tokenize(phrase or word)
+        if len(tokens) > 1:
+            phrases.append(tokens)
+        elif tokens:
+            terms.append(tokens[0])
+    return terms, phrases
+
+def _phrase_matches(phrase, positions_by_term):
+    """True if the phrase terms occur at consecutive positions"""
+    starts = set(positions_by_term.get(phrase[0], []))
+    for offset, term in enumerate(phrase[1:], start=1):
+        term_positions = set(positions_by_term.get(term, []))
+        starts = {start for start in starts if start + offset in term_positions}
+        if not starts:
+            return False
+    return bool(starts)
+
+def search_comments(db_conn, query, start_date=None, end_date=None, meals=None,
+                    min_rating=None, max_rating=None, limit=50):
+    """
+    Search indexed comments; all terms and quoted phrases must match
+    Dates are inclusive datetimes, meals a list of meal types, ratings an inclusive range.
+    """
+    terms, phrases = parse_query(query)
+    all_terms = list(dict.fromkeys(terms + [term for phrase in phrases for term in phrase]))
+    if not all_terms:
+        return {"query": query, "total": 0, "results": []}
+
+    posting_filter = {}
+    if start_date or end_date:
+        posting_filter["date"] = {}
+        if start_date:
+            posting_filter["date"]["$gte"] = start_date
+        if end_date:
+            posting_filter["date"]["$lte"] = end_date
+    if meals:
+        posting_filter["meal"] = {"$in": meals}
+    if min_rating is not None or max_rating is not None:
+        posting_filter["rating"] = {}
+        if min_rating is not None:
+            posting_filter["rating"]["$gte"] = min_rating
+        if max_rating is not None:
+            posting_filter["rating"]["$lte"] = max_rating
+
+    postings_collection = db_conn.get_comment_index_collection()
+
+    # Intersect posting lists on (feedback id, meal), keeping positions for phrase checks
+    matches = None
+    for term in all_terms:
+        term_matches = {}
+        for posting in postings_collection.find({"term": term, **posting_filter},
+                                                {"feedbackId": 1, "meal": 1, "date": 1, "rating": 1, "positions": 1}):
+            key = (posting["feedbackId"], posting["meal"])
+            term_matches[key] = posting
+        if matches is None:
+            matches = {key: {"posting": posting, "positions": {term: posting["positions"]}}
+                       for key, posting in term_matches.items()}
+        else:
+            matches = {key: match for key, match in matches.items() if key in term_matches}
+            for key, match in matches.items():
+                match["positions"][term] = term_matches[key]["positions"]
+        if not matches:
+            break
+
+    hits = [
+        match["posting"] for match in (matches or {}).values()
+        if all(_phrase_matches(phrase, match["positions"]) for phrase in phrases)
+    ]
+    hits = _live_hits(db_conn, postings_collection, hits)
+    hits.sort(key=lambda posting: posting["date"], reverse=True)
+
+    return {
+        "query": query,
+        "total": len(hits),
+        "results": _load_comments(db_conn, hits[:limit])
+    }
+
+def _live_hits(db_conn, postings_collection, hits):
+    """Hits whose feedback still exists; the postings of deleted feedback are removed"""
+    hit_ids = list({hit["feedbackId"] for hit in hits})
+    if not hit_ids:
+        return hits
+
+    live_ids = {
+        feedback['_id']
+        for feedback in db_conn.get_feedback_collection().find({"_id": {"$in": hit_ids}}, {"_id": 1})
+    }
+    deleted_ids = [feedback_id for feedback_id in hit_ids if feedback_id not in live_ids]
+    if deleted_ids:
+        postings_collection.delete_many({"feedbackId": {"$in": deleted_ids}})
+        print(f"Debug: Pruned comment index postings of {len(deleted_ids)} deleted feedback document(s)",
+              file=sys.stderr)
+    return [hit for hit in hits if hit["feedbackId"] in live_ids]
+
+def _load_comments(db_conn, hits):
+    """Fetch comment text and author for the returned hits only"""
+    if not hits:
+        return []
+
+    feedback_by_id = {
+        feedback['_id']: feedback
+        for feedback in db_conn.get_feedback_collection().find(
+            {"_id": {"$in": list({hit["feedbackId"] for hit in hits})}},
+            {"user": 1, "date": 1, "meals": 1}
+        )
+    }
+    users_by_id = {
+        user['_id']: user
+        for user in db_conn.get_users_collection().find(
+            {"_id": {"$in": list({feedback['user'] for feedback in feedback_by_id.values()})}},
+            {"name": 1, "rollNumber": 1}
+        )
+    }
+
+    results = []
+    for hit in hits:
+        feedback = feedback_by_id.get(hit["feedbackId"])
+        if not feedback:
+            continue
+        meal_data = feedback['meals'].get(hit["meal"], {})
+        user = users_by_id.get(feedback['user'], {})
+        results.append({
+            "feedbackId": str(feedback['_id']),
+            "date": feedback['date'].strftime('%Y-%m-%d'),
+            "mealType": hit["meal"],
+            "rating": meal_data.get('rating'),
+            "comment": meal_data.get('comment', ''),
+            "submittedAt": meal_data.get('submittedAt'),
+            "user": {
+                "id": str(feedback['user']),
+                "name": user.get('name'),
+                "rollNumber": user.get('rollNumber')
+            }
+        })
+    return results
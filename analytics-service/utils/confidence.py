@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Bootstrap confidence intervals for average ratings
+Resampling is done on the 5-bin rating histogram (a multinomial draw per bootstrap sample),
+so the cost depends on the number of histograms and samples, not on the number of ratings.
+A fixed seed keeps intervals (and therefore cached / rendered results) reproducible.
+"""
+
+import numpy as np
+
+BOOTSTRAP_SAMPLES = 2000
+CONFIDENCE_LEVEL = 0.95
+BOOTSTRAP_SEED = 42
+RATING_VALUES = np.arange(1, 6)
+
+def bootstrap_means(histograms, samples=BOOTSTRAP_SAMPLES, seed=BOOTSTRAP_SEED):
+    """
+    Bootstrap distribution of the mean rating of each histogram
+    histograms: int array (..., 5). Returns float array (samples, ...); NaN where a histogram is empty.
+    """
+    histograms = np.asarray(histograms, dtype=np.int64)
+    shape = histograms.shape[:-1]
+    counts = histograms.reshape(-1, 5)
+    totals = counts.sum(axis=1)
+    rated = totals > 0
+
+    means = np.full((samples, counts.shape[0]), np.nan)
+    if rated.any():
+        rng = np.random.default_rng(seed)
+        draws = rng.multinomial(totals[rated], counts[rated] / totals[rated, None], size=(samples, int(rated.sum())))
+        means[:, rated] = (draws @ RATING_VALUES) / totals[rated]
+    return means.reshape((samples,) + shape)
+
+def percentile_interval(sample_values, level=CONFIDENCE_LEVEL):
+    """(low, high) percentile interval over the first axis of bootstrap samples"""
+    alpha = (1 - level) / 2
+    low, high = np.quantile(sample_values, [alpha, 1 - alpha], axis=0)
+    return low, high
+
+def interval_dict(low, high, level=CONFIDENCE_LEVEL):
+    """JSON form of one interval (None when there were no ratings)"""
+    if np.isnan(low) or np.isnan(high):
+        return None
+    return {"low": round(float(low), 2), "high": round(float(high), 2), "level": level}
+
+def mean_intervals(histograms, level=CONFIDENCE_LEVEL):
+    """Interval dicts for the mean of each histogram, shaped like histograms[..., 0] (as nested lists)"""
+    histograms = np.asarray(histograms)
+    means = bootstrap_means(histograms)
+    low, high = percentile_interval(means.reshape(means.shape[0], -1), level)
+    intervals = [interval_dict(l, h, level) for l, h in zip(low, high)]
+    return np.array(intervals, dtype=object).reshape(histograms.shape[:-1]).tolist()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Cross-meal and lagged rating correlations over a student x day x meal rating tensor
+The tensor (utils.kernel rating_tensor) is laid on the calendar so "next day" is always the
+next date, with NaN where a student did not rate. Every correlation is pairwise-complete
+Pearson computed for all meal pairs at once from masked matrix products, so the cost is a
+few passes over the tensor whatever the number of pairs:
+
+- crossMeal: meal a vs meal b on the same day and student
+- nextMeal: each meal vs the student's next meal (night -> next day's morning)
+- nextDay: meal a on a day vs meal b on the following day (e.g. dinner -> next breakfast)
+
+Each is reported on the raw ratings and on within-student deviations (each student's own
+mean per meal removed), which keeps generous and strict raters from looking like meals
+that move together.
+"""
+
+import numpy as np
+from scipy import stats
+from utils.significance import SIGNIFICANCE_LEVEL, is_meaningful
+
+MIN_PAIRS = 10
+MEAL_NAMES = {'morning': 'Breakfast', 'afternoon': 'Lunch', 'evening': 'Dinner', 'night': 'Night Snacks'}
+
+def pairwise_correlation(x, y):
+    """
+    Pearson r of every column of x (N, A) with every column of y (N, B), each over the rows
+    where both values are present; returns (r, n) as (A, B) arrays (r NaN when undefined)
+    """
+    x_present = ~np.isnan(x)
+    y_present = ~np.isnan(y)
+    xm, ym = x_present.astype(np.float64), y_present.astype(np.float64)
+    x0, y0 = np.where(x_present, x, 0).astype(np.float64), np.where(y_present, y, 0).astype(np.float64)
+
+    n = xm.T @ ym
+    sum_x = x0.T @ ym                  # sum of x over rows where y is present too
+    sum_y = xm.T @ y0
+    sum_xx = (x0 ** 2).T @ ym
+    sum_yy = xm.T @ (y0 ** 2)
+    sum_xy = x0.T @ y0
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = sum_xy - sum_x * sum_y / n
+        variance_x = sum_xx - sum_x ** 2 / n
+        variance_y = sum_yy - sum_y ** 2 / n
+        r = covariance / np.sqrt(variance_x * variance_y)
+    r[(n < MIN_PAIRS) | ~np.isfinite(r)] = np.nan
+    return np.clip(r, -1, 1), n.astype(np.int64)
+
+def correlation_tests(r, n):
+    """Two-sided t-test of r != 0 for arrays of r and n; p-values as an array (NaN where untestable)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = r * np.sqrt((n - 2) / np.maximum(1 - r ** 2, 1e-12))
+        return 2 * stats.t.sf(np.abs(t), np.maximum(n - 2, 1))
+
+def test_entry(r, n, p_value):
+    """JSON-ready result of one correlation (None when there are too few pairs)"""
+    if np.isnan(r):
+        return None
+    return {
+        "r": round(float(r), 3),
+        "n": int(n),
+        "pValue": round(float(p_value), 4),
+        "significant": bool(p_value < SIGNIFICANCE_LEVEL)
+    }
+
+def within_student(tensor):
+    """Ratings minus each student's mean for that meal; NaN for meals a student rated only once"""
+    counts = (~np.isnan(tensor)).sum(axis=1, keepdims=True)
+    sums = np.nansum(tensor, axis=1, keepdims=True)
+    means = np.where(counts >= 2, sums / np.maximum(counts, 1), np.nan)
+    return tensor - means
+
+def next_meal(tensor):
+    """Tensor of each slot's following meal: (d, m) -> (d, m + 1), (d, last) -> (d + 1, first)"""
+    users, days, meals = tensor.shape
+    flat = tensor.reshape(users, days * meals)
+    following = np.full_like(flat, np.nan)
+    following[:, :-1] = flat[:, 1:]
+    return following.reshape(users, days, meals)
+
+def correlation_matrix(x, y, meal_types, skip_diagonal=False):
+    """{meal a: {meal b: test}} of pairwise_correlation(x, y)"""
+    r, n = pairwise_correlation(x, y)
+    p_values = correlation_tests(r, n)
+    return {
+        from_meal: {
+            to_meal: test_entry(r[a, b], n[a, b], p_values[a, b])
+            for b, to_meal in enumerate(meal_types) if not (skip_diagonal and a == b)
+        }
+        for a, from_meal in enumerate(meal_types)
+    }
+
+def lag_correlations(tensor, meal_types):
+    """The three correlation families of one tensor (raw or within-student)"""
+    meals = len(meal_types)
+    same_day = tensor.reshape(-1, meals)
+    following = next_meal(tensor)
+    r, n = pairwise_correlation(same_day, following.reshape(-1, meals))
+    p_values = correlation_tests(r, n)
+
+    return {
+        "crossMeal": correlation_matrix(same_day, same_day, meal_types, skip_diagonal=True),
+        "nextMeal": {
+            meal_type: test_entry(r[m, m], n[m, m], p_values[m, m])
+            for m, meal_type in enumerate(meal_types)
+        },
+        "nextDay": correlation_matrix(tensor[:, :-1].reshape(-1, meals), tensor[:, 1:].reshape(-1, meals), meal_types)
+    }
+
+def analyze_meal_correlations(aggregates, start_date, end_date):
+    """
+    Correlation analysis of aggregates built with keep_ratings over [start_date, end_date]
+    """
+    meal_types = aggregates.meal_types
+    n_days = (end_date - start_date).days + 1
+    positions = [(date - start_date).days for date in aggregates.day_dates]
+    tensor = aggregates.rating_tensor(positions, n_days)
+
+    raw = lag_correlations(tensor, meal_types)
+    deviations = lag_correlations(within_student(tensor), meal_types)
+
+    return {
+        "overview": {
+            "students": int(tensor.shape[0]),
+            "days": n_days,
+            "ratings": int(len(aggregates.rating_stars)),
+            "minPairs": MIN_PAIRS
+        },
+        "nextMealOrder": {
+            meal_type: meal_types[m + 1] if m + 1 < len(meal_types) else f"next day {meal_types[0]}"
+            for m, meal_type in enumerate(meal_types)
+        },
+        "withinStudent": deviations,
+        "raw": raw,
+        "insights": generate_correlation_insights(deviations, meal_types),
+        "recommendations": generate_correlation_recommendations(deviations, meal_types)
+    }
+
+def strongest_links(correlations, meal_types):
+    """Meaningful lagged links (from, to, kind, test), strongest first"""
+    links = []
+    for from_meal, test in correlations["nextMeal"].items():
+        if is_meaningful(test, "r"):
+            position = meal_types.index(from_meal)
+            to_meal = meal_types[(position + 1) % len(meal_types)]
+            kind = "next meal" if position + 1 < len(meal_types) else "next day"
+            links.append((from_meal, to_meal, kind, test))
+    for from_meal, row in correlations["nextDay"].items():
+        for to_meal, test in row.items():
+            # Night -> next morning is already the next-meal link
+            if is_meaningful(test, "r") and not (from_meal == meal_types[-1] and to_meal == meal_types[0]):
+                links.append((from_meal, to_meal, "next day", test))
+    return sorted(links, key=lambda link: -abs(link[3]["r"]))
+
+def link_target(kind, meal):
+    """'the next day's Breakfast' / 'the following Lunch'"""
+    name = MEAL_NAMES.get(meal, meal)
+    return f"the next day's {name}" if kind == "next day" else f"the following {name}"
+
+def generate_correlation_insights(correlations, meal_types):
+    """Generate insights from the within-student correlations"""
+    insights = []
+
+    for from_meal, to_meal, kind, test in strongest_links(correlations, meal_types)[:3]:
+        direction = "carry over to" if test["r"] > 0 else "move against"
+        insights.append({
+            "type": "warning" if test["r"] > 0 else "info",
+            "message": f"{MEAL_NAMES.get(from_meal, from_meal)} ratings {direction} "
+                       f"{link_target(kind, to_meal)} (r = {test['r']:.2f})"
+        })
+
+    together = [
+        (first, second, test)
+        for a, first in enumerate(meal_types)
+        for second, test in correlations["crossMeal"][first].items()
+        if meal_types.index(second) > a and is_meaningful(test, "r")
+    ]
+    if together:
+        first, second, test = max(together, key=lambda item: abs(item[2]["r"]))
+        insights.append({
+            "type": "info",
+            "message": f"{MEAL_NAMES.get(first, first)} and {MEAL_NAMES.get(second, second)} ratings move "
+                       f"{'together' if test['r'] > 0 else 'in opposite directions'} on the same day (r = {test['r']:.2f})"
+        })
+
+    if not insights:
+        insights.append({"type": "info", "message": "No meaningful carry-over between meals in this period"})
+    return insights
+
+def generate_correlation_recommendations(correlations, meal_types):
+    """Generate recommendations from the within-student correlations"""
+    recommendations = []
+
+    for from_meal, to_meal, kind, test in strongest_links(correlations, meal_types):
+        if test["r"] <= 0:
+            continue
+        recommendations.append({
+            "priority": "high" if test["r"] >= 0.3 else "medium",
+            "action": f"When {MEAL_NAMES.get(to_meal, to_meal)} ratings drop, review the previous "
+                      f"{MEAL_NAMES.get(from_meal, from_meal)} first: a poor {MEAL_NAMES.get(from_meal, from_meal)} "
+                      f"lowers {link_target(kind, to_meal)} rating"
+        })
+        if len(recommendations) == 2:
+            break
+
+    return recommendations
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate comment detection with MinHash and locality-sensitive hashing
+Flags copy-pasted or bot-like comments so they can be collapsed before keyword counting
+and sampling. Candidate pairs come from LSH buckets, so cost stays close to linear.
+"""
+
+import re
+import zlib
+from collections import defaultdict
+import numpy as np
+
+# 16 bands x 8 rows: pairs at 0.8 similarity collide with ~95% probability, pairs at 0.5 with ~6%
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 4
+SIMILARITY_THRESHOLD = 0.8
+# Short generic comments ("good food") are legitimately repeated and never treated as duplicates
+MIN_TOKENS = 4
+
+# Multiply-shift hash family: ((a * x + b) mod 2^64) >> 32, with odd a
+_rng = np.random.RandomState(42)
+_perm_a = _rng.randint(0, 2 ** 63, size=NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_perm_b = _rng.randint(0, 2 ** 63, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_band_mix = _rng.randint(0, 2 ** 63, size=LSH_ROWS, dtype=np.uint64) | np.uint64(1)
+
+_non_word = re.compile(r"[^a-z0-9 ]+")
+
+def normalize_text(text):
+    return " ".join(_non_word.sub(" ", text.lower()).split())
+
+def _shingle_hashes(normalized):
+    shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(max(1, len(normalized) - SHINGLE_SIZE + 1))}
+    return [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+
+def minhash_signatures(normalized_texts, chunk_size=512):
+    """MinHash signatures (one row per text) over character shingles, computed in vectorized chunks"""
+    signatures = np.empty((len(normalized_texts), NUM_PERMUTATIONS), dtype=np.uint64)
+    for start in range(0, len(normalized_texts), chunk_size):
+        shingle_lists = [_shingle_hashes(text) for text in normalized_texts[start:start + chunk_size]]
+        offsets = np.cumsum([0] + [len(hashes) for hashes in shingle_lists[:-1]])
+        hashes = np.fromiter((h for hashes in shingle_lists for h in hashes), dtype=np.uint64)
+        # uint64 arithmetic wraps, which is exactly the mod 2^64 of the hash family
+        permuted = (np.outer(_perm_a, hashes) + _perm_b[:, None]) >> np.uint64(32)
+        signatures[start:start + len(shingle_lists)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return signatures
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def detect_near_duplicates(texts):
+    """
+    Group near-duplicate texts
+    Returns the groups (index lists, first index is the representative), the indices to drop
+    when collapsing, and duplicate-rate statistics.
+    """
+    parent = list(range(len(texts)))
+
+    # Exact copies (after normalization) are grouped directly; only distinct texts go through LSH
+    first_by_text = {}
+    for i, text in enumerate(texts):
+        normalized = normalize_text(text)
+        if len(normalized.split()) < MIN_TOKENS:
+            continue
+        if normalized in first_by_text:
+            parent[i] = first_by_text[normalized]
+        else:
+            first_by_text[normalized] = i
+
+    indices = np.fromiter(first_by_text.values(), dtype=np.int64, count=len(first_by_text))
+    signature_rows = minhash_signatures(list(first_by_text))
+    signatures = dict(zip(indices.tolist(), signature_rows))
+
+    # One key per band (wrapping dot product of the band rows); equal keys share a bucket
+    band_keys = (signature_rows.reshape(len(indices), LSH_BANDS, LSH_ROWS) * _band_mix).sum(axis=2)
+    buckets = []
+    for band in range(LSH_BANDS):
+        order = np.argsort(band_keys[:, band], kind='stable')
+        sorted_keys = band_keys[order, band]
+        boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(sorted_keys)]))
+        shared = ends - starts > 1
+        for start, end in zip(starts[shared], ends[shared]):
+            buckets.append(indices[order[start:end]].tolist())
+
+    # Only texts sharing a band bucket are compared, each against one representative
+    # per group already seen in that bucket
+    for members in buckets:
+        representatives = [members[0]]
+        for i in members[1:]:
+            rep_signatures = np.array([signatures[rep] for rep in representatives])
+            similarity = (rep_signatures == signatures[i]).mean(axis=1)
+            best = int(similarity.argmax())
+            if similarity[best] >= SIMILARITY_THRESHOLD:
+                rep_root, root = _find(parent, representatives[best]), _find(parent, i)
+                parent[max(rep_root, root)] = min(rep_root, root)
+            else:
+                representatives.append(i)
+
+    grouped = defaultdict(list)
+    for i in range(len(texts)):
+        if parent[i] != i or i in signatures:
+            grouped[_find(parent, i)].append(i)
+    groups = sorted((sorted(members) for members in grouped.values() if len(members) > 1), key=len, reverse=True)
+
+    duplicate_indices = {i for members in groups for i in members[1:]}
+    total = len(texts)
+    return {
+        "groups": groups,
+        "duplicate_indices": duplicate_indices,
+        "stats": {
+            "totalComments": total,
+            "uniqueComments": total - len(duplicate_indices),
+            "duplicateComments": len(duplicate_indices),
+            "duplicateRate": round(len(duplicate_indices) / total * 100, 1) if total else 0,
+            "duplicateGroups": len(groups),
+            "largestGroups": [
+                {"comment": texts[members[0]], "count": len(members)} for members in groups[:3]
+            ]
+        }
+    }
+
+def collapse_comment_records(comment_records):
+    """
+    Drop near-duplicate comment records, keeping the first of each group
+    comment_records: list of (date_key, meal_key, rating, comment)
+    """
+    result = detect_near_duplicates([record[3] for record in comment_records])
+    unique_records = [record for i, record in enumerate(comment_records) if i not in result["duplicate_indices"]]
+    return unique_records, result["stats"]
+
+def canonical_day_order(comment_records):
+    """Order one day's records by meal and text, so per-day summaries do not depend on query order"""
+    return sorted(comment_records, key=lambda record: (record[1], record[3], record[2]))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Watermarked responses for polled analyses
+A watermark names one version of a result: a hash of the feedback fingerprint it was computed
+from. A client that sends its watermark back (since) gets "not_modified" when no feedback
+changed - decided from the fingerprint query alone, without recomputing - or, when its version
+is one of the last DELTA_HISTORY, only the sections that changed. Sections are the top-level
+result fields and the data sections, split per key (day / meal) when they are keyed records.
+"""
+
+import json
+import hashlib
+from datetime import datetime
+from utils.result_cache import RESULT_CACHE_VERSION, period_fingerprint, cached_analysis
+
+DELTA_HISTORY = 8
+# Fields that change on every response and are not part of a version
+VOLATILE_FIELDS = {"timestamp", "watermark"}
+
+def _digest(value):
+    text = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+def result_watermark(fingerprint):
+    """Watermark of the result computed from a period fingerprint"""
+    return _digest([RESULT_CACHE_VERSION, fingerprint])
+
+def result_sections(result):
+    """
+    Delta units of a result as {path: value}, path being a tuple of keys from the result root:
+    ("status",), ("data", "overview"), ("data", "dailyBreakdown", "2025-09-10"), ...
+    """
+    sections = {}
+    for name, value in result.items():
+        if name in VOLATILE_FIELDS:
+            continue
+        if name != "data" or not isinstance(value, dict):
+            sections[(name,)] = value
+            continue
+        for section, section_value in value.items():
+            if isinstance(section_value, dict) and section_value and all(
+                    isinstance(entry, dict) for entry in section_value.values()):
+                for entry_key, entry in section_value.items():
+                    sections[("data", section, entry_key)] = entry
+            else:
+                sections[("data", section)] = section_value
+    return sections
+
+def record_version(collection, key, watermark, hashes):
+    """
+    Remember the section hashes of a version; returns the known versions {watermark: hashes}
+    Polls of an unchanged version only read: the write is skipped when it is already the latest
+    """
+    stored = collection.find_one({"_id": f"versions:{key}"}) or {}
+    versions = stored.get("versions", [])
+    known = {
+        version["watermark"]: {tuple(path): digest for path, digest in version["hashes"]}
+        for version in versions
+    }
+    if versions and versions[-1]["watermark"] == watermark and known[watermark] == hashes:
+        return known
+
+    versions = [version for version in versions if version["watermark"] != watermark]
+    versions.append({"watermark": watermark, "hashes": [[list(path), digest] for path, digest in hashes.items()]})
+    versions = versions[-DELTA_HISTORY:]
+    collection.update_one({"_id": f"versions:{key}"}, {"$set": {"versions": versions}}, upsert=True)
+    return {
+        version["watermark"]: {tuple(path): digest for path, digest in version["hashes"]}
+        for version in versions
+    }
+
+def section_changes(sections, hashes, base_hashes):
+    """Operations turning the base version into this one: set a path to a value, or remove it"""
+    changes = [
+        {"path": list(path), "value": sections[path]}
+        for path, digest in hashes.items() if base_hashes.get(path) != digest
+    ]
+    changes.extend({"path": list(path), "removed": True} for path in base_hashes if path not in hashes)
+    return changes
+
+def watermarked_analysis(db_conn, key, start_date, end_date, build, since=None, refresh=False, store=None):
+    """
+    cached_analysis for polling clients; returns (response, cached)
+    response: {"status": "not_modified"} when since is the current watermark, {"status": "delta",
+    "changes": [...]} when since is a recent version, otherwise the full result; always with the
+    current "watermark"
+    """
+    fingerprint = period_fingerprint(db_conn, start_date, end_date)
+    watermark = result_watermark(fingerprint)
+
+    if since == watermark and not refresh:
+        return {"status": "not_modified", "since": since, "watermark": watermark}, True
+
+    result, cached = cached_analysis(db_conn, key, start_date, end_date, build, refresh, store, fingerprint)
+    sections = result_sections(result)
+    hashes = {path: _digest(value) for path, value in sections.items()}
+    versions = record_version(db_conn.get_analytics_collection(), key, watermark, hashes)
+
+    base_hashes = versions.get(since) if since and since != watermark else None
+    if base_hashes is None:
+        return {**result, "watermark": watermark}, cached
+
+    return {
+        "status": "delta",
+        "since": since,
+        "watermark": watermark,
+        "changes": section_changes(sections, hashes, base_hashes),
+        "timestamp": datetime.now().isoformat()
+    }, cached
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Shape-preserving downsampling of long daily series
+Largest-Triangle-Three-Buckets (LTTB) keeps the points that best preserve the visual shape
+of a series, so multi-year trends stay drawable with a bounded number of points.
+"""
+
+from datetime import datetime
+import numpy as np
+
+MIN_POINTS = 3
+
+def lttb_indices(y, threshold):
+    """
+    Indices of the points LTTB keeps from y (x is the point index)
+    Always keeps the first and last point; returns every index when y is short enough.
+    """
+    n = len(y)
+    if threshold >= n or threshold < MIN_POINTS:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=float)
+    x = np.arange(n, dtype=float)
+    # Interior points split into threshold - 2 buckets of (almost) equal size
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # The next bucket's mean is the third triangle vertex (the last point for the final bucket)
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+            next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(areas.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+def downsample_daily_averages(daily_averages, max_points):
+    """
+    Downsample trend dailyAverages ({date_key: row}) to at most max_points rows
+    Points are chosen by LTTB on the overall rating of days with data; each kept row is
+    returned whole (including its meal ratings). Returns (rows, downsampling info).
+    """
+    date_keys = [date_key for date_key in sorted(daily_averages) if daily_averages[date_key]["overallRating"] > 0]
+    info = {
+        "method": "lttb",
+        "series": "overallRating",
+        "maxPoints": max_points,
+        "originalPoints": len(daily_averages),
+        "returnedPoints": len(daily_averages),
+        "bucketDays": 1
+    }
+    if len(daily_averages) <= max_points:
+        return daily_averages, info
+
+    # Days without feedback are dropped rather than drawn as dips to zero
+    indices = lttb_indices([daily_averages[date_key]["overallRating"] for date_key in date_keys], max_points)
+    kept = {date_keys[i]: daily_averages[date_keys[i]] for i in indices}
+
+    info["returnedPoints"] = len(kept)
+    if len(date_keys) > max_points:
+        span_days = (datetime.strptime(date_keys[-1], '%Y-%m-%d') - datetime.strptime(date_keys[0], '%Y-%m-%d')).days
+        info["bucketDays"] = round(span_days / (max_points - 2), 1)
+    return kept, info
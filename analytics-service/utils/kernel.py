@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Single-pass analysis kernel for feedback records
+One walk over the decoded feedback (utils.records) produces every aggregate the daily, weekly and historical
+services need: rating histograms per day x meal (and per user), submission hours per meal,
+day participants and the comment records. Weekday, month and period views are sums over
+the per-day histograms, so no service has to walk the documents again.
+"""
+
+import numpy as np
+
+MEAL_TYPES = ['morning', 'afternoon', 'evening', 'night']
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+RATING_VALUES = np.arange(1, 6)
+
+def histogram_count(counts):
+    """Number of ratings in a rating histogram (last axis = stars 1..5)"""
+    return int(np.asarray(counts).sum())
+
+def histogram_mean(counts):
+    """Mean rating of a 5-bin histogram; 0 when empty (same value as averaging the raw ratings)"""
+    counts = np.asarray(counts)
+    total = int(counts.sum())
+    return int((counts * RATING_VALUES).sum()) / total if total else 0
+
+class FeedbackAggregates:
+    """
+    Aggregates of one pass over feedback documents
+    day_keys: 'YYYY-MM-DD' in order of first appearance; day_dates: the matching datetimes
+    counts: int array (days, meals, 5) of rating histograms
+    user_keys / user_counts: int array (users, meals, 5) of rating histograms per student
+    day_documents / day_rated_documents: feedback documents per day (all / with a rating)
+    day_users: set of student ids with a feedback document, per day
+    day_comments: int array (days, meals) of non-empty comments on rated meals
+    hour_counts: int array (meals, 24) of submissions per hour of day
+    comment_records: (date_key, meal_type, rating, comment) in document order
+    rating_days / rating_users / rating_meals / rating_stars / rating_commented: one entry per rating
+    (day index, user index, meal index, stars, whether it came with a comment), kept only when
+    aggregated with keep_ratings
+    """
+
+    def __init__(self, meal_types):
+        self.meal_types = list(meal_types)
+        self.day_keys = []
+        self.day_dates = []
+        self.user_keys = []
+        self.day_documents = np.zeros(0, dtype=np.int64)
+        self.day_rated_documents = np.zeros(0, dtype=np.int64)
+        self.day_users = []
+        self.counts = np.zeros((0, len(self.meal_types), 5), dtype=np.int64)
+        self.user_counts = np.zeros((0, len(self.meal_types), 5), dtype=np.int64)
+        self.day_comments = np.zeros((0, len(self.meal_types)), dtype=np.int64)
+        self.hour_counts = np.zeros((len(self.meal_types), 24), dtype=np.int64)
+        self.comment_records = []
+        self.rating_days = self.rating_users = self.rating_meals = self.rating_stars = None
+        self.rating_commented = None
+
+    @property
+    def total_documents(self):
+        return int(self.day_documents.sum())
+
+    def days_where(self, predicate):
+        """Indices of the days whose datetime satisfies predicate"""
+        return [i for i, date in enumerate(self.day_dates) if predicate(date)]
+
+    def meal_counts(self, day_indices=None):
+        """Rating histograms per meal (meals, 5), over all days or the given day indices"""
+        counts = self.counts if day_indices is None else self.counts[day_indices]
+        return counts.sum(axis=0)
+
+    def participants(self, day_indices=None):
+        """Distinct students with a feedback document on the given days"""
+        indices = range(len(self.day_keys)) if day_indices is None else day_indices
+        return set().union(*(self.day_users[i] for i in indices))
+
+    def significance_counts(self):
+        """Per-day histograms the significance tests run on: the counts themselves for exact aggregates"""
+        return self.counts
+
+    def day_participant_counts(self):
+        """Number of students with a feedback document, per day"""
+        return np.array([len(users) for users in self.day_users], dtype=np.int64)
+
+    def weekday_counts(self):
+        """{weekday name: (meals, 5) histograms} for weekdays with at least one rating, Monday first"""
+        weekdays = np.array([date.weekday() for date in self.day_dates], dtype=np.int64)
+        totals = np.zeros((7, len(self.meal_types), 5), dtype=np.int64)
+        np.add.at(totals, weekdays, self.counts)
+        return {WEEKDAY_NAMES[day]: totals[day] for day in range(7) if totals[day].any()}
+
+    def rating_tensor(self, day_positions=None, n_positions=None):
+        """
+        Ratings as a float32 (users, days, meals) tensor, NaN where a student did not rate a meal
+        day_positions: position of each day on the tensor's day axis (default: day index), e.g.
+        calendar offsets so missing days stay empty; n_positions: length of that axis
+        """
+        if self.rating_days is None:
+            raise ValueError("Aggregates were built without keep_ratings")
+        positions = np.arange(len(self.day_keys)) if day_positions is None else np.asarray(day_positions)
+        n_positions = len(self.day_keys) if n_positions is None else n_positions
+        tensor = np.full((len(self.user_keys), n_positions, len(self.meal_types)), np.nan, dtype=np.float32)
+        tensor[self.rating_users, positions[self.rating_days], self.rating_meals] = self.rating_stars
+        return tensor
+
+    def month_counts(self):
+        """{'YYYY-MM': (meals, 5) histograms} for months with at least one rating, in first-seen order"""
+        months = {}
+        for i, date in enumerate(self.day_dates):
+            if self.counts[i].any():
+                month_key = date.strftime('%Y-%m')
+                months[month_key] = months.get(month_key, 0) + self.counts[i]
+        return months
+
+def aggregate_feedback(records, meal_types=MEAL_TYPES, keep_ratings=False):
+    """
+    Walk the feedback records once and build every per-day / per-meal / per-user aggregate
+    records: FeedbackRecords decoded with the same meal_types (see utils.records)
+    keep_ratings: also keep every rating's coordinates (for rating_tensor)
+    """
+    aggregates = FeedbackAggregates(meal_types)
+    n_meals = len(meal_types)
+
+    day_index = {}
+    user_index = {}
+    day_documents = []
+    day_rated_documents = []
+    # Flat (day, user, meal, star) coordinates, histogrammed with one bincount at the end
+    rating_days, rating_users, rating_cells = [], [], []
+    rating_commented = []
+    comment_cells = []
+    hour_cells = []
+
+    for record in records:
+        date = record.date
+        day = day_index.get(date)
+        if day is None:
+            day = day_index[date] = len(aggregates.day_keys)
+            aggregates.day_keys.append(date.strftime('%Y-%m-%d'))
+            aggregates.day_dates.append(date)
+            aggregates.day_users.append(set())
+            day_documents.append(0)
+            day_rated_documents.append(0)
+        date_key = aggregates.day_keys[day]
+
+        user_key = record.user
+        user = user_index.get(user_key)
+        if user is None:
+            user = user_index[user_key] = len(aggregates.user_keys)
+            aggregates.user_keys.append(user_key)
+
+        day_documents[day] += 1
+        aggregates.day_users[day].add(user_key)
+
+        for meal, hour in enumerate(record.hours):
+            if hour >= 0:
+                hour_cells.append(meal * 24 + hour)
+
+        rated = False
+        comments = record.comments
+        for meal, rating in enumerate(record.ratings):
+            if not rating:
+                continue
+            rated = True
+            rating_days.append(day)
+            rating_users.append(user)
+            rating_cells.append(meal * 5 + rating - 1)
+
+            comment = comments[meal] if comments else None
+            if keep_ratings:
+                rating_commented.append(bool(comment))
+            if comment:
+                comment_cells.append(day * n_meals + meal)
+                aggregates.comment_records.append((date_key, meal_types[meal], rating, comment))
+
+        if rated:
+            day_rated_documents[day] += 1
+
+    n_days = len(aggregates.day_keys)
+    n_users = len(aggregates.user_keys)
+    cells = np.array(rating_cells, dtype=np.int64)
+    aggregates.day_documents = np.array(day_documents, dtype=np.int64)
+    aggregates.day_rated_documents = np.array(day_rated_documents, dtype=np.int64)
+    aggregates.counts = np.bincount(
+        np.array(rating_days, dtype=np.int64) * n_meals * 5 + cells, minlength=n_days * n_meals * 5
+    ).reshape(n_days, n_meals, 5)
+    aggregates.user_counts = np.bincount(
+        np.array(rating_users, dtype=np.int64) * n_meals * 5 + cells, minlength=n_users * n_meals * 5
+    ).reshape(n_users, n_meals, 5)
+    aggregates.day_comments = np.bincount(
+        np.array(comment_cells, dtype=np.int64), minlength=n_days * n_meals
+    ).reshape(n_days, n_meals)
+    aggregates.hour_counts = np.bincount(
+        np.array(hour_cells, dtype=np.int64), minlength=n_meals * 24
+    ).reshape(n_meals, 24)
+    if keep_ratings:
+        aggregates.rating_days = np.array(rating_days, dtype=np.int32)
+        aggregates.rating_users = np.array(rating_users, dtype=np.int32)
+        aggregates.rating_meals = (cells // 5).astype(np.int8)
+        aggregates.rating_stars = (cells % 5 + 1).astype(np.int8)
+        aggregates.rating_commented = np.array(rating_commented, dtype=bool)
+    return aggregates
+
+def merge_aggregates(parts, meal_types=MEAL_TYPES):
+    """
+    Combine the aggregates of disjoint date partitions (in date order) into one FeedbackAggregates,
+    as if the partitions' records had been aggregated in a single pass
+    """
+    merged = FeedbackAggregates(meal_types)
+    if not parts:
+        return merged
+
+    user_index = {}
+    user_rows = []
+    for part in parts:
+        merged.day_keys.extend(part.day_keys)
+        merged.day_dates.extend(part.day_dates)
+        merged.day_users.extend(part.day_users)
+        merged.comment_records.extend(part.comment_records)
+        rows = []
+        for user_key in part.user_keys:
+            row = user_index.get(user_key)
+            if row is None:
+                row = user_index[user_key] = len(merged.user_keys)
+                merged.user_keys.append(user_key)
+            rows.append(row)
+        user_rows.append(np.array(rows, dtype=np.int64))
+
+    merged.counts = np.concatenate([part.counts for part in parts])
+    merged.day_documents = np.concatenate([part.day_documents for part in parts])
+    merged.day_rated_documents = np.concatenate([part.day_rated_documents for part in parts])
+    merged.day_comments = np.concatenate([part.day_comments for part in parts])
+    merged.hour_counts = sum(part.hour_counts for part in parts)
+    merged.user_counts = np.zeros((len(merged.user_keys), len(merged.meal_types), 5), dtype=np.int64)
+    for part, rows in zip(parts, user_rows):
+        # A student appears once per partition, so the rows are distinct
+        merged.user_counts[rows] += part.user_counts
+
+    if all(part.rating_days is not None for part in parts):
+        day_offsets = np.cumsum([0] + [len(part.day_keys) for part in parts[:-1]])
+        merged.rating_days = np.concatenate([
+            part.rating_days + offset for part, offset in zip(parts, day_offsets)
+        ]).astype(np.int32)
+        merged.rating_users = np.concatenate([
+            rows[part.rating_users] for part, rows in zip(parts, user_rows)
+        ]).astype(np.int32)
+        merged.rating_meals = np.concatenate([part.rating_meals for part in parts])
+        merged.rating_stars = np.concatenate([part.rating_stars for part in parts])
+        merged.rating_commented = np.concatenate([part.rating_commented for part in parts])
+    return merged
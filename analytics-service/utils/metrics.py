@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Per-run operational metrics for the analysis services
+Every service process counts its MongoDB round trips and the documents it read per collection
+(from a pymongo command listener on the connection) and its cache lookups. Service entry points
+call enable_run_metrics(); at exit the totals are then written to stderr as one line,
+"Metrics: {...}", which the backend folds into the service's Prometheus metrics
+(backend/services/analyticsMetrics.js). Importing the module alone (tests, tooling) prints nothing.
+"""
+
+import sys
+import json
+import atexit
+from collections import Counter
+from pymongo import monitoring
+
+METRICS_PREFIX = "Metrics: "
+# Commands whose replies carry documents: find / aggregate (firstBatch) and getMore (nextBatch)
+CURSOR_COMMANDS = {"find": "firstBatch", "aggregate": "firstBatch", "getMore": "nextBatch"}
+
+class RunMetrics:
+    """Counters of one service process"""
+
+    def __init__(self):
+        self.round_trips = Counter()      # command name -> count
+        self.documents_read = Counter()   # collection -> documents returned
+        self.cache_lookups = Counter()    # (cache, "hit" | "miss") -> count
+
+    def record_cache(self, cache, hits=0, misses=0):
+        """Count lookups of one cache (result, sentiment, rollup, ...)"""
+        if hits:
+            self.cache_lookups[(cache, "hit")] += hits
+        if misses:
+            self.cache_lookups[(cache, "miss")] += misses
+
+    def to_dict(self):
+        return {
+            "mongoRoundTrips": dict(self.round_trips),
+            "documentsRead": dict(self.documents_read),
+            "cacheLookups": [
+                {"cache": cache, "result": result, "count": count}
+                for (cache, result), count in self.cache_lookups.items()
+            ]
+        }
+
+run_metrics = RunMetrics()
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts every command sent to MongoDB and the documents its cursor replies return"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.collections = {}
+
+    def started(self, event):
+        self.metrics.round_trips[event.command_name] += 1
+        if event.command_name in CURSOR_COMMANDS:
+            command = event.command
+            collection = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+            self.collections[event.request_id] = collection if isinstance(collection, str) else "unknown"
+
+    def succeeded(self, event):
+        collection = self.collections.pop(event.request_id, None)
+        if collection is None:
+            return
+        cursor = event.reply.get("cursor") or {}
+        self.metrics.documents_read[collection] += len(cursor.get(CURSOR_COMMANDS[event.command_name], ()))
+
+    def failed(self, event):
+        self.collections.pop(event.request_id, None)
+
+command_counter = CommandCounter(run_metrics)
+
+def record_cache(cache, hits=0, misses=0):
+    run_metrics.record_cache(cache, hits, misses)
+
+def emit_run_metrics():
+    """Write this process's counters to stderr for the backend to collect"""
+    print(METRICS_PREFIX + json.dumps(run_metrics.to_dict()), file=sys.stderr)
+
+def enable_run_metrics():
+    """Emit the counters when this process exits (once, however often it is called)"""
+    atexit.unregister(emit_run_metrics)
+    atexit.register(emit_run_metrics)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Compact feedback records decoded from the feedback cursor
+The services only need the date, the student and each meal's rating, comment and submission
+hour, so documents are projected to those fields and decoded straight off the cursor into
+slotted records: ratings and hours as array('b') (one byte per meal), student ids and comment
+texts shared through intern tables. A week of feedback then costs a few hundred bytes per
+document instead of the nested BSON dicts.
+"""
+
+from array import array
+from datetime import datetime, timedelta
+from utils.kernel import MEAL_TYPES, aggregate_feedback, merge_aggregates
+
+NO_RATING = 0
+NO_HOUR = -1
+
+def feedback_projection(meal_types=MEAL_TYPES):
+    """Fields of a feedback document the analysis kernel reads"""
+    projection = {"_id": 0, "date": 1, "user": 1}
+    for meal_type in meal_types:
+        for field in ("rating", "comment", "submittedAt"):
+            projection[f"meals.{meal_type}.{field}"] = 1
+    return projection
+
+class FeedbackRecord:
+    """
+    One feedback document
+    ratings: array('b') per meal, NO_RATING when the meal was not rated
+    hours: array('b') per meal, hour of submission or NO_HOUR
+    comments: tuple of stripped comments per meal (None for an empty one), or None without comments
+    """
+    __slots__ = ('date', 'user', 'ratings', 'hours', 'comments')
+
+    def __init__(self, date, user, ratings, hours, comments):
+        self.date = date
+        self.user = user
+        self.ratings = ratings
+        self.hours = hours
+        self.comments = comments
+
+def decode_feedback(documents, meal_types=MEAL_TYPES):
+    """Decode feedback documents (e.g. a cursor) into FeedbackRecords, one document at a time"""
+    users = {}
+    texts = {}
+    for feedback in documents:
+        user_key = str(feedback['user'])
+        user_key = users.setdefault(user_key, user_key)
+
+        ratings = array('b', bytes(len(meal_types)))
+        hours = array('b', [NO_HOUR]) * len(meal_types)
+        comments = None
+        meals = feedback.get('meals') or {}
+        for meal, meal_type in enumerate(meal_types):
+            meal_feedback = meals.get(meal_type)
+            if not meal_feedback:
+                continue
+            submitted_at = meal_feedback.get('submittedAt')
+            if submitted_at:
+                hours[meal] = submitted_at.hour
+
+            rating = meal_feedback.get('rating')
+            if rating is None:
+                continue
+            ratings[meal] = int(rating)
+
+            comment = (meal_feedback.get('comment') or '').strip()
+            if comment:
+                if comments is None:
+                    comments = [None] * len(meal_types)
+                # Repeated texts ("good", "ok") share one string
+                comments[meal] = texts.setdefault(comment, comment)
+
+        yield FeedbackRecord(feedback['date'], user_key, ratings, hours,
+                             tuple(comments) if comments is not None else None)
+
+def days_query(date_keys):
+    """Feedback query covering the given days, one date range per run of consecutive days"""
+    ranges = []
+    for date_key in sorted(date_keys):
+        day = datetime.strptime(date_key, '%Y-%m-%d')
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    clauses = [{"date": {"$gte": start, "$lt": end}} for start, end in ranges]
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+def load_feedback_records(feedback_collection, query, meal_types=MEAL_TYPES):
+    """Fetch the feedback matching query as a list of FeedbackRecords"""
+    cursor = feedback_collection.find(query, feedback_projection(meal_types))
+    return list(decode_feedback(cursor, meal_types))
+
+def iter_feedback_partitions(feedback_collection, start_date, end_date, partition_days, meal_types=MEAL_TYPES,
+                             keep_ratings=False):
+    """
+    Aggregate the feedback of [start_date, end_date) partition_days at a time, decoding each
+    partition straight off its cursor; yields (partition_start, partition_end, aggregates) in date order
+    """
+    partition_start = start_date
+    while partition_start < end_date:
+        partition_end = min(partition_start + timedelta(days=partition_days), end_date)
+        cursor = feedback_collection.find({
+            "date": {
+                "$gte": partition_start,
+                "$lt": partition_end
+            }
+        }, feedback_projection(meal_types))
+        yield partition_start, partition_end, aggregate_feedback(decode_feedback(cursor, meal_types), meal_types,
+                                                                 keep_ratings)
+        partition_start = partition_end
+
+def aggregate_feedback_partitions(feedback_collection, start_date, end_date, partition_days, meal_types=MEAL_TYPES,
+                                  keep_ratings=False):
+    """
+    Aggregate the feedback of [start_date, end_date) in partitions (iter_feedback_partitions) and
+    merge them, so only one partition's working set is alive at once
+    """
+    parts = [
+        aggregates for _, _, aggregates in iter_feedback_partitions(
+            feedback_collection, start_date, end_date, partition_days, meal_types, keep_ratings
+        )
+    ]
+    return merge_aggregates(parts, meal_types)
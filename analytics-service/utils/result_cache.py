@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Result cache for analysis entry points
+Complete analysis results are stored in the analytics collection together with a fingerprint
+of the feedback they were computed from (document count, latest update, student count) and
+of the alert rules.
+A stored result is served only while the fingerprint still matches, so late or edited
+feedback is never hidden behind a stale result.
+"""
+
+import sys
+import json
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from utils.alert_rules import rules_digest
+from utils.metrics import record_cache
+
+# Bump when the result format of any analysis changes so stored results are recomputed
+RESULT_CACHE_VERSION = 7
+IST = ZoneInfo('Asia/Kolkata')
+
+def ist_today():
+    """Start of the current day in IST, as the naive midnight feedback dates are stored with"""
+    return datetime.now(IST).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+def is_closed_period(end_date):
+    """A period (end exclusive) is closed once its last day has ended in IST"""
+    return end_date <= ist_today()
+
+def result_key(kind, *params):
+    """Cache key of one analysis request, e.g. result:daily:2025-09-10"""
+    parts = [param.strftime('%Y-%m-%d') if isinstance(param, datetime) else str(param)
+             for param in params if param is not None]
+    return ":".join(["result", kind] + parts)
+
+def period_fingerprint(db_conn, start_date, end_date):
+    """Cheap summary of the feedback a result depends on (one indexed aggregation and a count) and of the alert rules"""
+    stats = next(db_conn.get_feedback_collection().aggregate([
+        {"$match": {"date": {"$gte": start_date, "$lt": end_date}}},
+        {"$group": {"_id": None, "documents": {"$sum": 1}, "lastUpdated": {"$max": "$updatedAt"}}}
+    ]), {})
+    return {
+        "documents": stats.get("documents", 0),
+        "lastUpdated": stats.get("lastUpdated"),
+        "students": db_conn.get_users_collection().count_documents({"isAdmin": False}),
+        "alertRules": rules_digest()
+    }
+
+def cached_analysis(db_conn, key, start_date, end_date, build, refresh=False, store=None, fingerprint=None):
+    """
+    Read-through cache for one analysis result; returns (result, cached)
+    build: computes the result on a miss. refresh skips the lookup.
+    store: save the computed result (default: only when the period is closed).
+    fingerprint: the period fingerprint when the caller already read it
+    """
+    collection = db_conn.get_analytics_collection()
+    if fingerprint is None:
+        fingerprint = period_fingerprint(db_conn, start_date, end_date)
+
+    if not refresh:
+        stored = collection.find_one({"_id": key})
+        if stored and stored.get("version") == RESULT_CACHE_VERSION and stored.get("fingerprint") == fingerprint:
+            print(f"Debug: Result cache hit {key}", file=sys.stderr)
+            record_cache("result", hits=1)
+            return json.loads(stored["result"]), True
+        record_cache("result", misses=1)
+
+    result = build()
+
+    if store if store is not None else is_closed_period(end_date):
+        # Stored as JSON text: exactly what the entry point prints, whatever the key / number types
+        collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "version": RESULT_CACHE_VERSION,
+                "fingerprint": fingerprint,
+                "result": json.dumps(result, default=str, ensure_ascii=False),
+                "computedAt": datetime.now()
+            }},
+            upsert=True
+        )
+    return result, False
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Daily rollup store for analytics service
+Keeps precomputed per-day sections (one document per day) so weekly and historical
+requests can merge them instead of rescanning raw feedback
+Each section is stored with the source it was built from (the day's feedback document count and
+latest update), so a day whose feedback changed after it closed is rebuilt instead of served frozen.
+"""
+
+from datetime import datetime
+
+from utils.records import days_query
+from utils.result_cache import ist_today
+
+def is_closed_day(date_key):
+    """A day is closed (safe to roll up) once it has ended in IST"""
+    return date_key < ist_today().strftime('%Y-%m-%d')
+
+def day_sources(db_conn, date_keys):
+    """
+    {date_key: {"documents": feedback documents, "updatedAt": latest update}} of the given days
+    Read before the days' feedback, so a change made in between makes the stored source stale.
+    """
+    sources = {date_key: {"documents": 0, "updatedAt": None} for date_key in date_keys}
+    if not sources:
+        return sources
+
+    for doc in db_conn.get_feedback_collection().aggregate([
+        {"$match": days_query(sources)},
+        {"$group": {"_id": "$date", "documents": {"$sum": 1}, "updatedAt": {"$max": "$updatedAt"}}}
+    ]):
+        source = sources.get(doc["_id"].strftime('%Y-%m-%d'))
+        if source is None:
+            continue
+        source["documents"] += doc["documents"]
+        if doc["updatedAt"] is not None and (source["updatedAt"] is None or doc["updatedAt"] > source["updatedAt"]):
+            source["updatedAt"] = doc["updatedAt"]
+    return sources
+
+def load_daily_rollups(db_conn, date_keys, section, sources=None):
+    """
+    Load one rollup section for the given days: {date_key: payload}
+    sources: day_sources of the days; rollups stored from a different source are left out (rebuilt by the caller)
+    """
+    if not date_keys:
+        return {}
+
+    collection = db_conn.get_rollups_collection()
+    rollups = {}
+    for doc in collection.find({"_id": {"$in": list(date_keys)}, section: {"$exists": True}},
+                               {section: 1, f"sources.{section}": 1}):
+        if sources is not None and doc.get("sources", {}).get(section) != sources.get(doc["_id"]):
+            continue
+        rollups[doc["_id"]] = doc[section]
+    return rollups
+
+def save_daily_rollup(db_conn, date_key, section, payload, source=None):
+    """Store one rollup section for a closed day, with the source it was built from (upsert, safe to repeat)"""
+    if not is_closed_day(date_key):
+        return False
+
+    fields = {section: payload, f"updatedAt.{section}": datetime.now()}
+    if source is not None:
+        fields[f"sources.{section}"] = source
+    db_conn.get_rollups_collection().update_one({"_id": date_key}, {"$set": fields}, upsert=True)
+    return True
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Approximate historical analyses from a stratified sample of feedback documents
+Every day of the range is a stratum. Its documents are drawn independently with one probability
+($rand in the feedback query, so only the sample leaves the database), so that the expected sample
+stays within SAMPLE_SIZE documents with at least MIN_DAY_SAMPLE a day (lowered when the days'
+minimums alone would not fit). A document holds all the meals of its day, so each day stratum is
+also a stratum of every meal: meals cannot be drawn separately. The sample goes through the analysis
+kernel and each day is scaled up to its exact document count (one grouped count per range), so
+the per-day x meal histograms are unbiased estimates and the services format them unchanged.
+
+Average ratings come with intervals of the sampling error (stratified ratio estimator with its
+linearized variance), in place of the bootstrap intervals of exact results. Significance tests
+run on the same day weighting scaled to the sample size, so a change is only reported when the
+sample itself supports it. Participation stays exact: a student has at most one feedback
+document a day, so a day's participants are its document count, and distinct students come from
+one distinct query.
+"""
+
+import sys
+import numpy as np
+from scipy import stats
+
+from utils.kernel import MEAL_TYPES, FeedbackAggregates, aggregate_feedback, histogram_mean
+from utils.records import feedback_projection, decode_feedback, days_query
+from utils.confidence import CONFIDENCE_LEVEL, interval_dict
+
+SAMPLE_SIZE = 10000
+MIN_DAY_SAMPLE = 20
+# Boosted day probabilities are rounded up to this step, so the sample query has a few clauses
+PROBABILITY_STEP = 0.01
+BISECTION_STEPS = 50
+
+def day_document_counts(feedback_collection, start_date, end_date):
+    """{day datetime: feedback documents} of [start_date, end_date)"""
+    return {
+        doc["_id"]: doc["documents"]
+        for doc in feedback_collection.aggregate([
+            {"$match": {"date": {"$gte": start_date, "$lt": end_date}}},
+            {"$group": {"_id": "$date", "documents": {"$sum": 1}}}
+        ])
+    }
+
+def _largest_within(expected_size, high, sample_size):
+    """Largest x in [0, high] with expected_size(x) <= sample_size (expected_size non-decreasing)"""
+    if expected_size(high) <= sample_size:
+        return high
+    low = 0.0
+    for _ in range(BISECTION_STEPS):
+        middle = (low + high) / 2
+        if expected_size(middle) <= sample_size:
+            low = middle
+        else:
+            high = middle
+    return low
+
+def sampling_probabilities(day_counts, sample_size=SAMPLE_SIZE):
+    """
+    {day datetime: probability a document of that day is drawn}, the per-day minimum used and the
+    expected sample size, which never exceeds sample_size
+    """
+    dates = list(day_counts)
+    documents = np.array([day_counts[date] for date in dates], dtype=np.float64)
+    if documents.sum() <= sample_size:
+        return {date: 1.0 for date in dates}, float(MIN_DAY_SAMPLE), float(documents.sum())
+
+    def boosted(minimum):
+        return np.minimum(1.0, np.ceil(minimum / documents / PROBABILITY_STEP) * PROBABILITY_STEP)
+
+    # The per-day minimum is lowered until the boosted days alone fit the budget, then the
+    # other days get the largest common rate that keeps the expected total within it
+    minimum = _largest_within(lambda m: (boosted(m) * documents).sum(),
+                              min(MIN_DAY_SAMPLE, sample_size / len(dates)), sample_size)
+    floor = boosted(minimum)
+    base = _largest_within(lambda rate: (np.maximum(floor, rate) * documents).sum(), 1.0, sample_size)
+    probabilities = np.maximum(floor, base)
+    return (
+        {date: float(probability) for date, probability in zip(dates, probabilities)},
+        minimum,
+        float((probabilities * documents).sum())
+    )
+
+def sample_query(probabilities):
+    """Feedback query drawing each day's documents with its probability (days grouped by probability)"""
+    days_by_probability = {}
+    for date, probability in probabilities.items():
+        days_by_probability.setdefault(probability, []).append(date.strftime('%Y-%m-%d'))
+
+    clauses = []
+    for probability, date_keys in sorted(days_by_probability.items()):
+        clause = days_query(date_keys)
+        if probability < 1:
+            clause = {**clause, "$expr": {"$lt": [{"$rand": {}}, probability]}}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+class SampledAggregates(FeedbackAggregates):
+    """
+    FeedbackAggregates estimated from a day-stratified sample
+    counts, day_comments, day_rated_documents and hour_counts are scaled to the whole range;
+    day_documents are exact. sample_documents: sampled documents per day. Per-student arrays,
+    rating coordinates and comment_records describe the sample itself.
+    """
+
+    def __init__(self, sample, day_counts, hour_counts, feedback_collection, min_day_sample=MIN_DAY_SAMPLE,
+                 expected_documents=None):
+        super().__init__(sample.meal_types)
+        self.__dict__.update({key: value for key, value in sample.__dict__.items() if key != "meal_types"})
+        self.feedback_collection = feedback_collection
+        self.min_day_sample = min_day_sample
+        self.expected_documents = expected_documents
+        self.sample_documents = sample.day_documents
+        self.day_documents = np.array([day_counts[date] for date in sample.day_dates], dtype=np.int64)
+        self.unsampled_days = len(day_counts) - len(sample.day_dates)
+        weights = self.day_documents / np.maximum(self.sample_documents, 1)
+
+        self.counts = np.rint(sample.counts * weights[:, None, None]).astype(np.int64)
+        # The same weighting at the size of the sample, so tests see the evidence actually drawn
+        sample_weights = weights * self.sample_documents.sum() / self.day_documents.sum()
+        self._significance_counts = np.rint(sample.counts * sample_weights[:, None, None]).astype(np.int64)
+        self.day_comments = np.rint(sample.day_comments * weights[:, None]).astype(np.int64)
+        self.day_rated_documents = np.rint(sample.day_rated_documents * weights).astype(np.int64)
+        self.hour_counts = np.rint(hour_counts).astype(np.int64)
+
+    def significance_counts(self):
+        """Day-weighted histograms scaled to the sample size: tests on the scaled-up counts would be overconfident"""
+        return self._significance_counts
+
+    def participants(self, day_indices=None):
+        """Distinct students with a feedback document on the given days (exact)"""
+        indices = range(len(self.day_keys)) if day_indices is None else day_indices
+        date_keys = [self.day_keys[i] for i in indices]
+        if not date_keys:
+            return set()
+        return {str(user) for user in self.feedback_collection.distinct("user", days_query(date_keys))}
+
+    def day_participant_counts(self):
+        """One feedback document per student and day: participants are the exact document counts"""
+        return self.day_documents.copy()
+
+    def rating_estimates(self, day_indices=None, level=CONFIDENCE_LEVEL):
+        """
+        Estimated average rating per meal and over all meals (last entry) of the given days,
+        with the margin of error of each at the confidence level; margins are NaN without ratings
+        """
+        n_days, n_meals = len(self.day_keys), len(self.meal_types)
+        selected = np.zeros(n_days, dtype=bool)
+        selected[np.arange(n_days) if day_indices is None else np.asarray(day_indices, dtype=np.int64)] = True
+        counts = self.counts[selected].sum(axis=0)
+        estimates = np.array([histogram_mean(counts[meal]) for meal in range(n_meals)] + [histogram_mean(counts)])
+        rated = np.append(counts.sum(axis=1), counts.sum())
+
+        in_range = selected[self.rating_days]
+        days = self.rating_days[in_range].astype(np.int64)
+        meals = self.rating_meals[in_range].astype(np.int64)
+        stars = self.rating_stars[in_range].astype(np.float64)
+
+        # Residuals of the ratio estimator, summed per document: per meal a document holds at most
+        # one rating; over all meals a document's residual is the sum over its rated meals
+        meal_residuals = stars - estimates[meals]
+        meal_sums = np.bincount(days * n_meals + meals, weights=meal_residuals, minlength=n_days * n_meals)
+        meal_squares = np.bincount(days * n_meals + meals, weights=meal_residuals ** 2, minlength=n_days * n_meals)
+
+        documents, document_index = np.unique(days * len(self.user_keys) + self.rating_users[in_range],
+                                              return_inverse=True)
+        document_residuals = np.bincount(document_index, weights=stars - estimates[-1], minlength=len(documents))
+        document_days = documents // max(len(self.user_keys), 1)
+        overall_sums = np.bincount(document_days, weights=document_residuals, minlength=n_days)
+        overall_squares = np.bincount(document_days, weights=document_residuals ** 2, minlength=n_days)
+
+        sums = np.column_stack([meal_sums.reshape(n_days, n_meals), overall_sums])
+        squares = np.column_stack([meal_squares.reshape(n_days, n_meals), overall_squares])
+
+        # Stratified variance of the residual total: N_d^2 (1 - n_d / N_d) s_d^2 / n_d per day
+        sampled = self.sample_documents.astype(np.float64)[:, None]
+        population = self.day_documents.astype(np.float64)[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            day_variance = np.where(sampled > 1, (squares - sums ** 2 / sampled) / (sampled - 1), 0)
+            total_variance = (population ** 2 * (1 - sampled / population) * day_variance / sampled)[selected].sum(axis=0)
+            margins = stats.norm.ppf(0.5 + level / 2) * np.sqrt(np.maximum(total_variance, 0)) / rated
+        margins[rated == 0] = np.nan
+        return estimates, margins
+
+    def rating_intervals(self, day_indices=None, level=CONFIDENCE_LEVEL):
+        """Interval dicts of rating_estimates, per meal then overall (like mean_intervals)"""
+        estimates, margins = self.rating_estimates(day_indices, level)
+        return [
+            interval_dict(max(estimate - margin, 1), min(estimate + margin, 5), level) if not np.isnan(margin) else None
+            for estimate, margin in zip(estimates, margins)
+        ]
+
+    def approximation(self, sample_size=SAMPLE_SIZE, level=CONFIDENCE_LEVEL):
+        """JSON summary of the sample and of the estimated average ratings over the whole range"""
+        estimates, margins = self.rating_estimates(level=level)
+        intervals = self.rating_intervals(level=level)
+
+        def estimate_entry(position):
+            if np.isnan(margins[position]):
+                return None
+            return {
+                "estimate": round(float(estimates[position]), 2),
+                "marginOfError": round(float(margins[position]), 3),
+                "interval": intervals[position]
+            }
+
+        sampled = int(self.sample_documents.sum())
+        total = int(self.day_documents.sum())
+        expected = self.expected_documents if self.expected_documents is not None else sampled
+        return {
+            "approximate": True,
+            "method": "day-stratified document sample",
+            "sampleSize": sample_size,
+            "minDaySample": round(float(self.min_day_sample), 1),
+            # Cost: the documents read and decoded (the day counts come from one grouped query)
+            "expectedDocuments": int(round(expected)),
+            "sampledDocuments": sampled,
+            "totalDocuments": total,
+            "samplingRate": round(sampled / total, 4) if total else 0,
+            "daysSampled": len(self.day_keys),
+            "daysWithoutSample": self.unsampled_days,
+            "confidenceLevel": level,
+            "overallRating": estimate_entry(-1),
+            "mealRatings": {meal_type: estimate_entry(meal) for meal, meal_type in enumerate(self.meal_types)},
+            "maxMarginOfError": round(float(np.nanmax(margins)), 3) if not np.isnan(margins).all() else None
+        }
+
+def sample_feedback_aggregates(feedback_collection, start_date, end_date, sample_size=SAMPLE_SIZE,
+                               meal_types=MEAL_TYPES):
+    """SampledAggregates of [start_date, end_date) from about sample_size feedback documents"""
+    day_counts = day_document_counts(feedback_collection, start_date, end_date)
+    if not day_counts:
+        return aggregate_feedback([], meal_types, keep_ratings=True)
+
+    probabilities, min_day_sample, expected_documents = sampling_probabilities(day_counts, sample_size)
+    records = list(decode_feedback(
+        feedback_collection.find(sample_query(probabilities), feedback_projection(meal_types)), meal_types
+    ))
+    sample = aggregate_feedback(records, meal_types, keep_ratings=True)
+
+    # Submission hours have no day axis in the kernel, so they are weighted per record here
+    weights = {
+        date: day_counts[date] / sampled
+        for date, sampled in zip(sample.day_dates, sample.day_documents)
+    }
+    hour_cells, hour_weights = [], []
+    for record in records:
+        for meal, hour in enumerate(record.hours):
+            if hour >= 0:
+                hour_cells.append(meal * 24 + hour)
+                hour_weights.append(weights[record.date])
+    hour_counts = np.bincount(
+        np.array(hour_cells, dtype=np.int64), weights=np.array(hour_weights, dtype=np.float64),
+        minlength=len(meal_types) * 24
+    ).reshape(len(meal_types), 24)
+
+    print(f"Debug: Sampled {len(records)} of {sum(day_counts.values())} feedback documents "
+          f"over {len(day_counts)} days", file=sys.stderr)
+    return SampledAggregates(sample, day_counts, hour_counts, feedback_collection, min_day_sample,
+                             expected_documents)
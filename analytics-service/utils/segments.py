@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+Student segments by rating behavior
+Every student is one row of a sparse student x feature matrix: the share of their ratings per
+meal that were low (1-2 stars), neutral (3) or high (4-5), so a dinner-only rater has weight on
+the dinner columns only; how regularly they rate (days rated / service days since their first
+rating); and how often a rating comes with a comment. Rows are clustered with mini-batch k-means
+and each cluster is named from its centroid ("Critical regulars", "Silent satisfied",
+"Dinner-only raters").
+
+The model is stored in MongoDB like the topic model and absorbs each closed day exactly once,
+from the day's student profiles (per-student rating histograms, kept in the rollup store): the
+students who rated that day get one partial_fit step and every student's assignment is stored.
+Daily and weekly results are broken down by segment from the stored profiles and assignments,
+without recomputing the analysis.
+"""
+
+import sys
+import pickle
+from datetime import datetime, timedelta
+import numpy as np
+from bson.binary import Binary
+from pymongo.errors import DuplicateKeyError
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+
+from utils.kernel import MEAL_TYPES, aggregate_feedback, histogram_mean
+from utils.records import load_feedback_records
+from utils.rollups import load_daily_rollups, save_daily_rollup, is_closed_day, day_sources
+from utils.metrics import record_cache
+
+MODEL_ID = "student_segments"
+ROLLUP_SECTION = "studentProfiles"
+N_SEGMENTS = 6
+# Students with fewer ratings than this are not clustered (reported as unassigned)
+MIN_RATINGS = 5
+UNASSIGNED = -1
+
+# Centroid thresholds used to name segments
+SINGLE_MEAL_SHARE = 0.7
+CRITICAL_SHARE = 0.4
+SATISFIED_SHARE = 0.6
+SILENT_COMMENT_RATE = 0.05
+VOCAL_COMMENT_RATE = 0.5
+REGULAR_PARTICIPATION = 0.5
+
+MEAL_NAMES = {'morning': 'Breakfast', 'afternoon': 'Lunch', 'evening': 'Dinner', 'night': 'Night Snacks'}
+SEGMENT_LABELS = {
+    "silent": {"critical": "Silent critics", "satisfied": "Silent satisfied", "mixed": "Silent mixed raters"},
+    "vocal": {"critical": "Vocal critics", "satisfied": "Vocal fans", "mixed": "Vocal mixed raters"},
+    "regular": {"critical": "Critical regulars", "satisfied": "Satisfied regulars", "mixed": "Mixed regulars"},
+    "occasional": {"critical": "Occasional critics", "satisfied": "Occasional satisfied raters", "mixed": "Occasional raters"}
+}
+
+def build_day_profiles(aggregates, date_keys=None):
+    """
+    Student profiles of each day from aggregates built with keep_ratings:
+    {date_key: {"users": [student ids], "counts": (students, meals, 5) histograms, "comments": (students,)}}
+    date_keys: days to include (default: the aggregates' days); days without ratings get empty profiles
+    """
+    n_meals = len(aggregates.meal_types)
+    day_positions = {date_key: day for day, date_key in enumerate(aggregates.day_keys)}
+    order = np.argsort(aggregates.rating_days, kind='stable')
+    bounds = np.searchsorted(aggregates.rating_days[order], np.arange(len(aggregates.day_keys) + 1))
+
+    profiles = {}
+    for date_key in (aggregates.day_keys if date_keys is None else date_keys):
+        day = day_positions.get(date_key)
+        ratings = order[bounds[day]:bounds[day + 1]] if day is not None else order[:0]
+        users, rows = np.unique(aggregates.rating_users[ratings], return_inverse=True)
+        cells = (rows * n_meals + aggregates.rating_meals[ratings]) * 5 + aggregates.rating_stars[ratings] - 1
+        profiles[date_key] = {
+            "users": [aggregates.user_keys[user] for user in users],
+            "counts": np.bincount(cells, minlength=len(users) * n_meals * 5).reshape(len(users), n_meals, 5),
+            "comments": np.bincount(rows, weights=aggregates.rating_commented[ratings], minlength=len(users)).astype(np.int64)
+        }
+    return profiles
+
+def profile_document(profile):
+    return {
+        "users": profile["users"],
+        "counts": Binary(profile["counts"].astype(np.uint8).tobytes()),
+        "comments": Binary(profile["comments"].astype(np.uint8).tobytes())
+    }
+
+def profile_from_document(doc, n_meals):
+    return {
+        "users": doc["users"],
+        "counts": np.frombuffer(doc["counts"], dtype=np.uint8).astype(np.int64).reshape(len(doc["users"]), n_meals, 5),
+        "comments": np.frombuffer(doc["comments"], dtype=np.uint8).astype(np.int64)
+    }
+
+def load_or_build_day_profiles(db_conn, date_keys, meal_types=MEAL_TYPES, aggregates=None):
+    """
+    Student profiles of the requested days, read from the rollup store where available
+    Days without a stored rollup (or whose feedback changed since) are built from aggregates
+    (keep_ratings) when given, otherwise from those days' feedback, and stored once closed.
+    """
+    sources = day_sources(db_conn, date_keys)
+    stored = load_daily_rollups(db_conn, date_keys, ROLLUP_SECTION, sources)
+    missing_days = sorted(date_key for date_key in date_keys if date_key not in stored)
+
+    profiles = {date_key: profile_from_document(doc, len(meal_types)) for date_key, doc in stored.items()}
+
+    if missing_days:
+        if aggregates is None:
+            first_day = datetime.strptime(missing_days[0], '%Y-%m-%d')
+            last_day = datetime.strptime(missing_days[-1], '%Y-%m-%d')
+            records = load_feedback_records(db_conn.get_feedback_collection(), {
+                "date": {"$gte": first_day, "$lt": last_day + timedelta(days=1)}
+            }, meal_types)
+            aggregates = aggregate_feedback(records, meal_types, keep_ratings=True)
+        for date_key, profile in build_day_profiles(aggregates, missing_days).items():
+            profiles[date_key] = profile
+            if is_closed_day(date_key):
+                save_daily_rollup(db_conn, date_key, ROLLUP_SECTION, profile_document(profile), sources[date_key])
+
+    print(f"Debug: Student profiles from rollups: {len(stored)}, built: {len(missing_days)}", file=sys.stderr)
+    record_cache("profile_rollup", hits=len(stored), misses=len(missing_days))
+    return profiles
+
+def load_segment_model(db_conn, n_meals=len(MEAL_TYPES)):
+    """Load the persisted segment model, or return a fresh untrained one"""
+    doc = db_conn.get_segment_models_collection().find_one({"_id": MODEL_ID})
+    if doc:
+        try:
+            users = doc["users"]
+            return {
+                "version": doc["version"],
+                "kmeans": pickle.loads(doc["kmeans"]) if doc.get("kmeans") else None,
+                "trained_days": set(doc.get("trainedDays", [])),
+                "service_days": np.array(doc.get("serviceDays", []), dtype=np.int64),
+                "users": users,
+                "user_index": {user: row for row, user in enumerate(users)},
+                "counts": np.frombuffer(doc["counts"], dtype=np.int32).reshape(len(users), n_meals, 5).astype(np.int64),
+                "days": np.frombuffer(doc["days"], dtype=np.int32).astype(np.int64),
+                "comments": np.frombuffer(doc["comments"], dtype=np.int32).astype(np.int64),
+                "first_day": np.frombuffer(doc["firstDay"], dtype=np.int32).astype(np.int64),
+                "segments": np.frombuffer(doc["segments"], dtype=np.int16).astype(np.int64),
+                "labels": doc.get("labels", [])
+            }
+        except Exception as e:
+            print(f"Debug: Discarding unreadable segment model: {str(e)}", file=sys.stderr)
+
+    return {
+        "version": 0,
+        "kmeans": None,
+        "trained_days": set(),
+        "service_days": np.zeros(0, dtype=np.int64),
+        "users": [],
+        "user_index": {},
+        "counts": np.zeros((0, n_meals, 5), dtype=np.int64),
+        "days": np.zeros(0, dtype=np.int64),
+        "comments": np.zeros(0, dtype=np.int64),
+        "first_day": np.zeros(0, dtype=np.int64),
+        "segments": np.zeros(0, dtype=np.int64),
+        "labels": []
+    }
+
+def save_segment_model(db_conn, model):
+    """Persist the model; skipped if another process saved a newer version meanwhile"""
+    collection = db_conn.get_segment_models_collection()
+    new_version = model["version"] + 1
+    document = {
+        "version": new_version,
+        "kmeans": Binary(pickle.dumps(model["kmeans"])),
+        "trainedDays": sorted(model["trained_days"]),
+        "serviceDays": model["service_days"].tolist(),
+        "users": model["users"],
+        "counts": Binary(model["counts"].astype(np.int32).tobytes()),
+        "days": Binary(model["days"].astype(np.int32).tobytes()),
+        "comments": Binary(model["comments"].astype(np.int32).tobytes()),
+        "firstDay": Binary(model["first_day"].astype(np.int32).tobytes()),
+        "segments": Binary(model["segments"].astype(np.int16).tobytes()),
+        "labels": model["labels"],
+        "updatedAt": datetime.now()
+    }
+
+    if model["version"] == 0:
+        try:
+            collection.insert_one({"_id": MODEL_ID, **document})
+            saved = True
+        except DuplicateKeyError:
+            saved = False
+    else:
+        result = collection.update_one({"_id": MODEL_ID, "version": model["version"]}, {"$set": document})
+        saved = result.modified_count > 0
+
+    if saved:
+        model["version"] = new_version
+    else:
+        print("Debug: Segment model was updated concurrently, keeping the stored version", file=sys.stderr)
+    return saved
+
+def segment_features(model, rows):
+    """
+    Sparse feature rows of the given students: per meal low / neutral / high shares of all their
+    ratings, then participation and comment rate
+    """
+    counts = model["counts"][rows]
+    bands = np.stack([counts[:, :, :2].sum(axis=2), counts[:, :, 2], counts[:, :, 3:].sum(axis=2)], axis=2)
+    totals = np.maximum(counts.sum(axis=(1, 2)), 1)
+
+    # Service days on or after each student's first rated day
+    service_days = model["service_days"]
+    active_days = len(service_days) - np.searchsorted(service_days, model["first_day"][rows])
+    participation = np.minimum(model["days"][rows] / np.maximum(active_days, 1), 1)
+    comment_rate = model["comments"][rows] / totals
+
+    shares = sparse.csr_matrix(bands.reshape(len(rows), -1)).multiply(1 / totals[:, None])
+    behaviour = sparse.csr_matrix(np.column_stack([participation, comment_rate]))
+    return sparse.hstack([shares, behaviour], format='csr')
+
+def segment_traits(centroid, meal_types):
+    """Readable profile of a cluster centroid"""
+    n_meals = len(meal_types)
+    bands = centroid[:n_meals * 3].reshape(n_meals, 3)
+    total = bands.sum() or 1
+    return {
+        "mealShare": {MEAL_NAMES.get(meal_type, meal_type): round(float(bands[m].sum() / total * 100), 1)
+                      for m, meal_type in enumerate(meal_types)},
+        "lowRatingShare": round(float(bands[:, 0].sum() / total * 100), 1),
+        "highRatingShare": round(float(bands[:, 2].sum() / total * 100), 1),
+        "participation": round(float(centroid[n_meals * 3]) * 100, 1),
+        "commentRate": round(float(centroid[n_meals * 3 + 1]) * 100, 1)
+    }
+
+def segment_label(traits):
+    """Name of a segment from its traits (percentages)"""
+    meal_name, meal_share = max(traits["mealShare"].items(), key=lambda item: item[1])
+    if meal_share >= SINGLE_MEAL_SHARE * 100:
+        return f"{meal_name}-only raters"
+
+    if traits["lowRatingShare"] >= CRITICAL_SHARE * 100:
+        tone = "critical"
+    elif traits["highRatingShare"] >= SATISFIED_SHARE * 100:
+        tone = "satisfied"
+    else:
+        tone = "mixed"
+
+    if traits["commentRate"] < SILENT_COMMENT_RATE * 100:
+        return SEGMENT_LABELS["silent"][tone]
+    if traits["commentRate"] >= VOCAL_COMMENT_RATE * 100:
+        return SEGMENT_LABELS["vocal"][tone]
+    return SEGMENT_LABELS["regular" if traits["participation"] >= REGULAR_PARTICIPATION * 100 else "occasional"][tone]
+
+def segment_labels(model, meal_types):
+    """Unique label per cluster, numbered when two centroids get the same name"""
+    labels = []
+    for centroid in model["kmeans"].cluster_centers_:
+        label = segment_label(segment_traits(centroid, meal_types))
+        duplicates = sum(1 for existing in labels if existing == label or existing.startswith(f"{label} ("))
+        labels.append(f"{label} ({duplicates + 1})" if duplicates else label)
+    return labels
+
+def update_segment_model(db_conn, model, profiles, meal_types=MEAL_TYPES):
+    """
+    Absorb closed days that the model has not seen yet: add their profiles to the students'
+    totals, run one mini-batch step over the students who rated and reassign every student
+    profiles: {date_key: day profile}
+    """
+    new_days = sorted(day for day in profiles if is_closed_day(day) and day not in model["trained_days"])
+    if not new_days:
+        return model
+
+    changed = set()
+    for date_key in new_days:
+        profile = profiles[date_key]
+        if not profile["users"]:
+            continue
+        ordinal = datetime.strptime(date_key, '%Y-%m-%d').toordinal()
+
+        new_users = [user for user in profile["users"] if user not in model["user_index"]]
+        if new_users:
+            for user in new_users:
+                model["user_index"][user] = len(model["users"])
+                model["users"].append(user)
+            model["counts"] = np.concatenate([model["counts"], np.zeros((len(new_users), len(meal_types), 5), dtype=np.int64)])
+            model["days"] = np.concatenate([model["days"], np.zeros(len(new_users), dtype=np.int64)])
+            model["comments"] = np.concatenate([model["comments"], np.zeros(len(new_users), dtype=np.int64)])
+            model["first_day"] = np.concatenate([model["first_day"], np.full(len(new_users), ordinal, dtype=np.int64)])
+            model["segments"] = np.concatenate([model["segments"], np.full(len(new_users), UNASSIGNED, dtype=np.int64)])
+
+        rows = np.array([model["user_index"][user] for user in profile["users"]], dtype=np.int64)
+        model["counts"][rows] += profile["counts"]
+        model["days"][rows] += 1
+        model["comments"][rows] += profile["comments"]
+        model["first_day"][rows] = np.minimum(model["first_day"][rows], ordinal)
+        model["service_days"] = np.union1d(model["service_days"], [ordinal])
+        changed.update(rows.tolist())
+
+    model["trained_days"].update(new_days)
+    eligible = np.flatnonzero(model["counts"].sum(axis=(1, 2)) >= MIN_RATINGS)
+
+    if model["kmeans"] is None:
+        if len(eligible) >= N_SEGMENTS:
+            model["kmeans"] = MiniBatchKMeans(n_clusters=N_SEGMENTS, random_state=0, n_init=3)
+            model["kmeans"].partial_fit(segment_features(model, eligible))
+        else:
+            print(f"Debug: Not enough students ({len(eligible)}) to initialise the segment model", file=sys.stderr)
+    else:
+        batch = np.intersect1d(eligible, np.fromiter(changed, dtype=np.int64, count=len(changed)))
+        if len(batch):
+            model["kmeans"].partial_fit(segment_features(model, batch))
+
+    if model["kmeans"] is not None:
+        # Participation of students who did not rate moves too, so every student is reassigned
+        model["segments"][:] = UNASSIGNED
+        model["segments"][eligible] = model["kmeans"].predict(segment_features(model, eligible))
+        model["labels"] = segment_labels(model, meal_types)
+
+    print(f"Debug: Segment model absorbed {len(new_days)} day(s), {len(changed)} student(s)", file=sys.stderr)
+    save_segment_model(db_conn, model)
+    return model
+
+def summarize_segments(model, profiles, meal_types):
+    """
+    Ratings of the period's students grouped by their segment
+    profiles: {date_key: day profile} of the period
+    """
+    n_segments = len(model["labels"])
+    students = {}
+    for profile in profiles.values():
+        for user, counts, comments in zip(profile["users"], profile["counts"], profile["comments"]):
+            entry = students.get(user)
+            if entry is None:
+                students[user] = [counts.copy(), int(comments)]
+            else:
+                entry[0] += counts
+                entry[1] += int(comments)
+
+    segment_counts = np.zeros((n_segments + 1, len(meal_types), 5), dtype=np.int64)
+    segment_students = np.zeros(n_segments + 1, dtype=np.int64)
+    segment_comments = np.zeros(n_segments + 1, dtype=np.int64)
+    for user, (counts, comments) in students.items():
+        row = model["user_index"].get(user)
+        segment = model["segments"][row] if row is not None else UNASSIGNED
+        # Unassigned students go to the last slot
+        segment = n_segments if segment == UNASSIGNED else segment
+        segment_counts[segment] += counts
+        segment_students[segment] += 1
+        segment_comments[segment] += comments
+
+    total_students = max(len(students), 1)
+    total_ratings = max(int(segment_counts.sum()), 1)
+    segments = {}
+    for segment, label in enumerate(model["labels"]):
+        if not segment_students[segment]:
+            continue
+        ratings = int(segment_counts[segment].sum())
+        segments[label] = {
+            "segmentId": segment,
+            "students": int(segment_students[segment]),
+            "studentShare": round(segment_students[segment] / total_students * 100, 1),
+            "ratings": ratings,
+            "ratingShare": round(ratings / total_ratings * 100, 1),
+            "averageRating": round(histogram_mean(segment_counts[segment]), 2),
+            "averageRatingPerMeal": {
+                MEAL_NAMES.get(meal_type, meal_type): round(histogram_mean(segment_counts[segment, m]), 2)
+                for m, meal_type in enumerate(meal_types)
+            },
+            "comments": int(segment_comments[segment])
+        }
+
+    return {
+        "students": len(students),
+        "unassignedStudents": int(segment_students[n_segments]),
+        "segments": segments
+    }
+
+def analyze_segment_breakdown(db_conn, date_keys, meal_types=MEAL_TYPES, aggregates=None):
+    """
+    Segment-level breakdown of a period (e.g. a day or a week) from the stored day profiles and
+    the current assignments; closed days the model has not seen yet are absorbed first
+    aggregates: the period's aggregates built with keep_ratings, when the caller already has them
+    """
+    profiles = load_or_build_day_profiles(db_conn, date_keys, meal_types, aggregates)
+    model = update_segment_model(db_conn, load_segment_model(db_conn, len(meal_types)), profiles, meal_types)
+
+    if model["kmeans"] is None:
+        return {"status": "insufficient_data", "segments": {}}
+
+    return {
+        "status": "success",
+        "modelDays": len(model["trained_days"]),
+        **summarize_segments(model, profiles, meal_types)
+    }
+
+def attach_segment_breakdown(db_conn, result, date_keys, meal_types=MEAL_TYPES):
+    """Add data.segmentBreakdown to a full daily / weekly result (no_data, delta and not_modified answers are left as they are)"""
+    data = result.get("data")
+    if result.get("error") or result.get("status") not in (None, "success") or not isinstance(data, dict):
+        return result
+    data["segmentBreakdown"] = analyze_segment_breakdown(db_conn, date_keys, meal_types)
+    return result
+
+def update_student_segments(db_conn, date_keys, meal_types=MEAL_TYPES):
+    """Absorb the given closed days into the segment model; returns how many days were new to it"""
+    profiles = load_or_build_day_profiles(db_conn, date_keys, meal_types)
+    model = load_segment_model(db_conn, len(meal_types))
+    trained = len(model["trained_days"])
+    model = update_segment_model(db_conn, model, profiles, meal_types)
+    return len(model["trained_days"]) - trained
+
+def analyze_student_segments(db_conn, aggregates, date_keys):
+    """
+    Segmentation analysis of a range: the segments (traits and size over all students the model
+    has seen) and the range's ratings broken down by segment
+    aggregates: the range's aggregates built with keep_ratings
+    """
+    meal_types = aggregates.meal_types
+    profiles = load_or_build_day_profiles(db_conn, date_keys, meal_types, aggregates)
+    model = update_segment_model(db_conn, load_segment_model(db_conn, len(meal_types)), profiles, meal_types)
+
+    if model["kmeans"] is None:
+        return {
+            "status": "insufficient_data",
+            "overview": {"modelDays": len(model["trained_days"]), "modelStudents": len(model["users"]), "minRatings": MIN_RATINGS},
+            "segments": {},
+            "breakdown": {},
+            "insights": [{"type": "info", "message": "Not enough closed days of ratings to segment students yet"}],
+            "recommendations": []
+        }
+
+    sizes = np.bincount(model["segments"][model["segments"] != UNASSIGNED], minlength=len(model["labels"]))
+    assigned = max(int(sizes.sum()), 1)
+    segments = {
+        label: {
+            "segmentId": segment,
+            "students": int(sizes[segment]),
+            "share": round(sizes[segment] / assigned * 100, 1),
+            "traits": segment_traits(model["kmeans"].cluster_centers_[segment], meal_types)
+        }
+        for segment, label in enumerate(model["labels"])
+    }
+    breakdown = summarize_segments(model, profiles, meal_types)
+
+    return {
+        "status": "success",
+        "overview": {
+            "modelDays": len(model["trained_days"]),
+            "modelStudents": len(model["users"]),
+            "assignedStudents": int(sizes.sum()),
+            "minRatings": MIN_RATINGS,
+            "periodStudents": breakdown["students"]
+        },
+        "segments": segments,
+        "breakdown": breakdown,
+        "insights": generate_segment_insights(segments, breakdown),
+        "recommendations": generate_segment_recommendations(segments, breakdown)
+    }
+
+def generate_segment_insights(segments, breakdown):
+    """Generate insights from the segments and the period breakdown"""
+    insights = []
+
+    largest = max(segments.items(), key=lambda item: item[1]["students"])
+    insights.append({
+        "type": "info",
+        "message": f"Largest segment: {largest[0]} ({largest[1]['share']:.0f}% of students)"
+    })
+
+    rated = [(label, entry) for label, entry in breakdown["segments"].items() if entry["ratings"]]
+    if len(rated) >= 2:
+        lowest = min(rated, key=lambda item: item[1]["averageRating"])
+        highest = max(rated, key=lambda item: item[1]["averageRating"])
+        insights.append({
+            "type": "warning" if lowest[1]["averageRating"] < 3 else "info",
+            "message": f"{lowest[0]} rated {lowest[1]['averageRating']:.1f}/5 this period against "
+                       f"{highest[1]['averageRating']:.1f}/5 from {highest[0]}"
+        })
+
+    silent = [label for label, entry in rated if entry["ratings"] and entry["comments"] / entry["ratings"] < SILENT_COMMENT_RATE]
+    if silent:
+        insights.append({
+            "type": "info",
+            "message": f"{', '.join(silent)} rarely comment: their ratings are the only signal from them"
+        })
+    return insights
+
+def generate_segment_recommendations(segments, breakdown):
+    """Generate recommendations from the segments and the period breakdown"""
+    recommendations = []
+
+    for label, entry in sorted(breakdown["segments"].items(), key=lambda item: item[1]["averageRating"]):
+        if entry["averageRating"] >= 3 or not entry["ratings"]:
+            break
+        worst_meal = min(((meal, rating) for meal, rating in entry["averageRatingPerMeal"].items() if rating),
+                         key=lambda item: item[1])
+        recommendations.append({
+            "priority": "high" if segments[label]["share"] >= 15 else "medium",
+            "action": f"Follow up with {label} ({entry['students']} students this period) - "
+                      f"their lowest rated meal is {worst_meal[0]} ({worst_meal[1]:.1f}/5)"
+        })
+        if len(recommendations) == 2:
+            break
+
+    single_meal = [label for label in segments if label.endswith("-only raters")]
+    if single_meal:
+        recommendations.append({
+            "priority": "low",
+            "action": f"Invite {', '.join(single_meal)} to rate the other meals too, so those meals "
+                      f"are not judged by a narrower group"
+        })
+    return recommendations
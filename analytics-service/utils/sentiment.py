@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Text sentiment scoring for feedback comments
+Scores comments in batches with TextBlob and memoizes the scores by comment hash
+"""
+
+import sys
+import hashlib
+from datetime import datetime
+from pymongo import UpdateOne
+from textblob import TextBlob
+from utils.metrics import record_cache
+
+# Bump when the scoring method changes so cached scores are recomputed
+SENTIMENT_MODEL = "textblob-0.17.1"
+
+# Polarity cut-offs used to bucket text sentiment
+POSITIVE_POLARITY = 0.1
+NEGATIVE_POLARITY = -0.1
+
+# Number of hashes looked up / written per MongoDB round-trip
+BATCH_SIZE = 500
+
+# In-process memo so repeated calls within one run never hit the cache collection twice
+_polarity_memo = {}
+
+def normalize_comment(comment):
+    """Normalize comment text so trivially different copies share one score"""
+    return " ".join(comment.lower().split())
+
+def comment_hash(comment):
+    """Stable hash of the normalized comment text"""
+    return hashlib.sha1(normalize_comment(comment).encode('utf-8')).hexdigest()
+
+def score_comments(db_conn, comments):
+    """
+    Score a batch of comments and return {comment_hash: polarity}
+    Only comments never scored before are passed to TextBlob; the rest come from the cache
+    """
+    texts_by_hash = {}
+    for comment in comments:
+        if comment and comment.strip():
+            texts_by_hash.setdefault(comment_hash(comment), comment)
+
+    missing = [h for h in texts_by_hash if h not in _polarity_memo]
+    if missing:
+        cache_collection = db_conn.get_sentiment_cache_collection()
+
+        # Load previously scored comments in batches
+        for i in range(0, len(missing), BATCH_SIZE):
+            batch = missing[i:i + BATCH_SIZE]
+            for doc in cache_collection.find({"_id": {"$in": batch}, "model": SENTIMENT_MODEL}, {"polarity": 1}):
+                _polarity_memo[doc["_id"]] = doc["polarity"]
+
+        to_score = [h for h in missing if h not in _polarity_memo]
+        print(f"Debug: Sentiment cache hits: {len(missing) - len(to_score)}, scoring: {len(to_score)}", file=sys.stderr)
+        record_cache("sentiment", hits=len(missing) - len(to_score), misses=len(to_score))
+
+        # Score the remaining comments and persist them for future runs
+        now = datetime.now()
+        for i in range(0, len(to_score), BATCH_SIZE):
+            batch = to_score[i:i + BATCH_SIZE]
+            operations = []
+            for h in batch:
+                polarity = round(TextBlob(normalize_comment(texts_by_hash[h])).sentiment.polarity, 4)
+                _polarity_memo[h] = polarity
+                operations.append(UpdateOne(
+                    {"_id": h},
+                    {"$set": {"polarity": polarity, "model": SENTIMENT_MODEL, "scoredAt": now}},
+                    upsert=True
+                ))
+            cache_collection.bulk_write(operations, ordered=False)
+
+    return {h: _polarity_memo[h] for h in texts_by_hash}
+
+def polarity_label(polarity):
+    """Bucket a polarity score into positive / neutral / negative"""
+    if polarity > POSITIVE_POLARITY:
+        return "positive"
+    elif polarity < NEGATIVE_POLARITY:
+        return "negative"
+    return "neutral"
+
+def rating_label(rating):
+    """Bucket a star rating the same way the rating-based sentiment does"""
+    if rating >= 4:
+        return "positive"
+    elif rating <= 2:
+        return "negative"
+    return "neutral"
+
+def summarize_text_sentiment(rated_comments, scores):
+    """
+    Compare text sentiment with star ratings for one meal
+    rated_comments: list of (rating, comment) pairs; scores: output of score_comments
+    """
+    polarities = []
+    text_distribution = {"positive": 0, "neutral": 0, "negative": 0}
+    disagreements = 0
+    positive_text_low_rating = []
+    negative_text_high_rating = []
+
+    for rating, comment in rated_comments:
+        if not comment or not comment.strip():
+            continue
+        polarity = scores.get(comment_hash(comment))
+        if polarity is None:
+            continue
+
+        polarities.append(polarity)
+        text_sentiment = polarity_label(polarity)
+        star_sentiment = rating_label(rating)
+        text_distribution[text_sentiment] += 1
+
+        if text_sentiment != star_sentiment:
+            disagreements += 1
+            if text_sentiment == "positive" and star_sentiment == "negative":
+                positive_text_low_rating.append(comment)
+            elif text_sentiment == "negative" and star_sentiment == "positive":
+                negative_text_high_rating.append(comment)
+
+    scored = len(polarities)
+    if scored == 0:
+        return {
+            "scored_comments": 0,
+            "average_polarity": 0,
+            "text_distribution": text_distribution,
+            "agreement_rate": 0,
+            "disagreement": {
+                "count": 0,
+                "percentage": 0,
+                "positive_text_low_rating": {"count": 0, "sample_comments": []},
+                "negative_text_high_rating": {"count": 0, "sample_comments": []}
+            }
+        }
+
+    return {
+        "scored_comments": scored,
+        "average_polarity": round(sum(polarities) / scored, 3),
+        "text_distribution": text_distribution,
+        "agreement_rate": round((scored - disagreements) / scored * 100, 1),
+        "disagreement": {
+            "count": disagreements,
+            "percentage": round(disagreements / scored * 100, 1),
+            "positive_text_low_rating": {
+                "count": len(positive_text_low_rating),
+                "sample_comments": positive_text_low_rating[:2]
+            },
+            "negative_text_high_rating": {
+                "count": len(negative_text_high_rating),
+                "sample_comments": negative_text_high_rating[:2]
+            }
+        }
+    }
+
+def analyze_text_sentiment(db_conn, rated_comments_by_meal):
+    """
+    Batch-score every comment across all meals and summarize each meal
+    rated_comments_by_meal: {meal_key: [(rating, comment), ...]}
+    """
+    all_comments = [comment for pairs in rated_comments_by_meal.values() for _, comment in pairs]
+    scores = score_comments(db_conn, all_comments)
+
+    return {
+        meal_key: summarize_text_sentiment(pairs, scores)
+        for meal_key, pairs in rated_comments_by_meal.items()
+    }
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Significance tests computed from 5-bin rating histograms
+Ratings only take the values 1..5, so every rank statistic and regression sum can be
+computed from the counts per star: the cost is constant per histogram, whatever the number
+of ratings behind it. Each test returns a JSON-ready dict with a p-value and an effect size
+(None when there are not enough ratings to test).
+"""
+
+import numpy as np
+from scipy import stats
+
+RATING_VALUES = np.arange(1, 6)
+SIGNIFICANCE_LEVEL = 0.05
+# Effects below this size (|rank-biserial| or |r|) are reported but never labelled as a change
+NEGLIGIBLE_EFFECT = 0.1
+
+def _as_counts(histogram):
+    return np.asarray(histogram, dtype=np.int64).reshape(-1, 5).sum(axis=0)
+
+def mann_whitney_test(first, second):
+    """
+    Mann-Whitney U test of second vs first (normal approximation with tie and continuity
+    correction, as scipy.stats.mannwhitneyu on the raw ratings)
+    Effect size: rank-biserial correlation, positive when second tends to be rated higher.
+    """
+    first, second = _as_counts(first), _as_counts(second)
+    n1, n2 = int(first.sum()), int(second.sum())
+    if n1 == 0 or n2 == 0:
+        return None
+
+    # U of the second sample: pairs where it is higher, ties counting one half
+    below_first = np.concatenate(([0], np.cumsum(first)[:-1]))
+    u = float((second * (below_first + 0.5 * first)).sum())
+
+    n = n1 + n2
+    ties = (first + second).astype(np.float64)
+    variance = n1 * n2 / 12 * ((n + 1) - (ties ** 3 - ties).sum() / (n * (n - 1))) if n > 1 else 0
+    expected = n1 * n2 / 2
+    if variance <= 0:
+        # Every rating is the same star: no evidence of a difference
+        z, p_value = 0.0, 1.0
+    else:
+        z = (abs(u - expected) - 0.5) / np.sqrt(variance)
+        z = max(z, 0.0) * np.sign(u - expected)
+        p_value = float(min(1.0, 2 * stats.norm.sf(abs(z))))
+
+    return {
+        "u": round(u, 1),
+        "z": round(float(z), 3),
+        "pValue": round(p_value, 4),
+        "rankBiserial": round(2 * u / (n1 * n2) - 1, 3),
+        "significant": p_value < SIGNIFICANCE_LEVEL
+    }
+
+def chi_square_test(first, second):
+    """
+    Chi-square test of homogeneity of the two star distributions (2 x 5 table, stars nobody
+    gave are dropped). Effect size: Cramer's V.
+    """
+    table = np.vstack([_as_counts(first), _as_counts(second)])
+    if not table[0].any() or not table[1].any():
+        return None
+
+    table = table[:, table.sum(axis=0) > 0]
+    if table.shape[1] < 2:
+        statistic, p_value, dof = 0.0, 1.0, 0
+    else:
+        statistic, p_value, dof, _ = stats.chi2_contingency(table, correction=False)
+
+    return {
+        "statistic": round(float(statistic), 3),
+        "dof": int(dof),
+        "pValue": round(float(p_value), 4),
+        "cramersV": round(float(np.sqrt(statistic / table.sum())), 3),
+        "significant": float(p_value) < SIGNIFICANCE_LEVEL
+    }
+
+def linear_trend_test(histograms, positions=None):
+    """
+    Linear trend of the ratings over ordered periods (e.g. days): least squares of every
+    rating against its period position, from the per-period histograms (periods, [meals,] 5).
+    Effect size: correlation r; slope is in stars per unit of position.
+    """
+    histograms = np.asarray(histograms, dtype=np.int64)
+    if histograms.ndim == 3:
+        # (periods, meals, 5): all meals of a period together
+        histograms = histograms.sum(axis=1)
+    positions = np.arange(len(histograms), dtype=np.float64) if positions is None else np.asarray(positions, dtype=np.float64)
+
+    n_t = histograms.sum(axis=1).astype(np.float64)
+    n = n_t.sum()
+    if n < 3 or np.count_nonzero(n_t) < 2:
+        return None
+
+    sum_t = histograms @ RATING_VALUES
+    square_t = histograms @ (RATING_VALUES ** 2)
+    mean_x = (n_t * positions).sum() / n
+    mean_y = sum_t.sum() / n
+    sxx = (n_t * positions ** 2).sum() - n * mean_x ** 2
+    syy = square_t.sum() - n * mean_y ** 2
+    sxy = (positions * sum_t).sum() - n * mean_x * mean_y
+
+    slope = sxy / sxx
+    if syy <= 0:
+        # Every rating is the same star
+        r, p_value = 0.0, 1.0
+    else:
+        r = float(np.clip(sxy / np.sqrt(sxx * syy), -1.0, 1.0))
+        if abs(r) == 1.0:
+            p_value = 0.0
+        else:
+            t = r * np.sqrt((n - 2) / (1 - r * r))
+            p_value = float(2 * stats.t.sf(abs(t), n - 2))
+
+    return {
+        "slope": round(float(slope), 4),
+        "correlation": round(r, 3),
+        "pValue": round(p_value, 4),
+        "ratings": int(n),
+        "significant": p_value < SIGNIFICANCE_LEVEL
+    }
+
+def is_meaningful(test, effect_key):
+    """A test result is a real change when it is significant and the effect is not negligible"""
+    return bool(test) and test["significant"] and abs(test[effect_key]) >= NEGLIGIBLE_EFFECT
+
+def compare_histograms(first, second):
+    """Both two-sample tests of a period comparison"""
+    return {
+        "mannWhitney": mann_whitney_test(first, second),
+        "chiSquare": chi_square_test(first, second)
+    }
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Bounded-memory phrase frequency sketches for feedback comments
+A Count-Min sketch plus a bounded top-K candidate set per day and meal. Daily sketches are
+stored in the rollup store and merged for weekly / historical top phrases.
+"""
+
+import sys
+import hashlib
+import heapq
+from collections import defaultdict
+import numpy as np
+from bson.binary import Binary
+from sklearn.feature_extraction.text import CountVectorizer
+
+from utils.rollups import load_daily_rollups, save_daily_rollup, is_closed_day, day_sources
+from utils.dedup import collapse_comment_records, canonical_day_order
+from utils.metrics import record_cache
+
+ROLLUP_SECTION = "phraseSketches"
+SKETCH_WIDTH = 1024
+SKETCH_DEPTH = 4
+TOP_K = 50
+TOP_PHRASES = 10
+
+# Unigrams to trigrams with English stop words removed
+_phrase_analyzer = CountVectorizer(stop_words='english', ngram_range=(1, 3)).build_analyzer()
+
+def _rank_key(item):
+    """Highest count first, ties broken alphabetically so output is stable across runs"""
+    return (-item[1], item[0])
+
+class PhraseSketch:
+    """Count-Min sketch with a bounded set of heavy-hitter candidates"""
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, top_k=TOP_K):
+        self.width = width
+        self.depth = depth
+        self.top_k = top_k
+        self.total = 0
+        self.table = np.zeros((depth, width), dtype=np.int32)
+        self.candidates = {}
+
+    def _buckets(self, phrase):
+        """One bucket per row, taken from a single digest that is stable across processes"""
+        digest = hashlib.blake2b(phrase.encode('utf-8'), digest_size=4 * self.depth).digest()
+        return [int.from_bytes(digest[4 * row:4 * row + 4], 'little') % self.width for row in range(self.depth)]
+
+    def estimate(self, phrase):
+        """Upper-bound frequency estimate for a phrase"""
+        return int(min(self.table[row, bucket] for row, bucket in enumerate(self._buckets(phrase))))
+
+    def add(self, phrase, count=1):
+        buckets = self._buckets(phrase)
+        for row, bucket in enumerate(buckets):
+            self.table[row, bucket] += count
+        self.total += count
+        self.candidates[phrase] = int(min(self.table[row, bucket] for row, bucket in enumerate(buckets)))
+        if len(self.candidates) > 2 * self.top_k:
+            self._prune()
+
+    def add_text(self, text):
+        for phrase in _phrase_analyzer(text):
+            self.add(phrase)
+
+    def merge(self, other):
+        """Merge another sketch of the same shape into this one"""
+        self.table += other.table
+        self.total += other.total
+        phrases = set(self.candidates) | set(other.candidates)
+        self.candidates = {phrase: self.estimate(phrase) for phrase in phrases}
+        self._prune()
+        return self
+
+    def _prune(self):
+        self.candidates = dict(heapq.nsmallest(self.top_k, self.candidates.items(), key=_rank_key))
+
+    def top(self, n=TOP_PHRASES):
+        return [
+            {"phrase": phrase, "count": count}
+            for phrase, count in heapq.nsmallest(n, self.candidates.items(), key=_rank_key)
+        ]
+
+    def error_bound(self):
+        """Count-Min over-estimate bound (e / width * total) with high probability"""
+        return round(np.e / self.width * self.total, 1)
+
+    def to_document(self):
+        return {
+            "width": self.width,
+            "depth": self.depth,
+            "topK": self.top_k,
+            "total": self.total,
+            "table": Binary(self.table.tobytes()),
+            "candidates": [[phrase, count] for phrase, count in self.candidates.items()]
+        }
+
+    @classmethod
+    def from_document(cls, doc):
+        sketch = cls(doc["width"], doc["depth"], doc["topK"])
+        sketch.total = doc["total"]
+        sketch.table = np.frombuffer(doc["table"], dtype=np.int32).reshape(doc["depth"], doc["width"]).copy()
+        sketch.candidates = {phrase: count for phrase, count in doc["candidates"]}
+        return sketch
+
+def build_daily_sketches(comment_records):
+    """
+    Build one sketch per day and meal, collapsing near-duplicate comments within each day
+    Records are put in a canonical order first, so a stored day never depends on the caller.
+    comment_records: list of (date_key, meal_key, rating, comment)
+    """
+    records_by_day = defaultdict(list)
+    for record in comment_records:
+        records_by_day[record[0]].append(record)
+
+    sketches = defaultdict(dict)
+    for date_key, day_records in records_by_day.items():
+        unique_records, _ = collapse_comment_records(canonical_day_order(day_records))
+        day_sketches = sketches[date_key]
+        for _, meal_key, _, comment in unique_records:
+            if meal_key not in day_sketches:
+                day_sketches[meal_key] = PhraseSketch()
+            day_sketches[meal_key].add_text(comment)
+    return sketches
+
+def load_or_build_daily_sketches(db_conn, date_keys, meal_types, comment_records, store=True):
+    """
+    Daily sketches for the requested days, read from the rollup store where available
+    Days without a stored rollup (or whose feedback changed since) are sketched from the comment
+    records and, with store, stored once closed.
+    """
+    sources = day_sources(db_conn, date_keys)
+    stored = load_daily_rollups(db_conn, date_keys, ROLLUP_SECTION, sources)
+    missing_days = {date_key for date_key in date_keys if date_key not in stored}
+
+    daily_sketches = {
+        date_key: {meal: PhraseSketch.from_document(doc) for meal, doc in meals.items()}
+        for date_key, meals in stored.items()
+    }
+
+    if missing_days:
+        built = build_daily_sketches([record for record in comment_records if record[0] in missing_days])
+        for date_key in missing_days:
+            day_sketches = {meal: sketch for meal, sketch in built.get(date_key, {}).items() if meal in meal_types}
+            daily_sketches[date_key] = day_sketches
+            if store and is_closed_day(date_key):
+                save_daily_rollup(db_conn, date_key, ROLLUP_SECTION,
+                                  {meal: sketch.to_document() for meal, sketch in day_sketches.items()},
+                                  sources[date_key])
+
+    print(f"Debug: Phrase sketches from rollups: {len(stored)}, built: {len(missing_days)}", file=sys.stderr)
+    record_cache("phrase_rollup", hits=len(stored), misses=len(missing_days))
+    return daily_sketches
+
+def summarize_top_phrases(daily_sketches, meal_types):
+    """Merge daily sketches into top phrases per meal and for the whole period"""
+    meal_sketches = {meal: PhraseSketch() for meal in meal_types}
+    for day_sketches in daily_sketches.values():
+        for meal in meal_types:
+            if meal in day_sketches:
+                meal_sketches[meal].merge(day_sketches[meal])
+
+    period_sketch = PhraseSketch()
+    for sketch in meal_sketches.values():
+        period_sketch.merge(sketch)
+
+    return {
+        "perMeal": {meal: sketch.top() for meal, sketch in meal_sketches.items()},
+        "overall": period_sketch.top(),
+        "totalPhrases": period_sketch.total,
+        "maxOvercount": period_sketch.error_bound(),
+        "daysSketched": len(daily_sketches)
+    }
+
+def analyze_top_phrases(db_conn, date_keys, meal_types, comment_records, store=True):
+    """
+    Top phrases per meal and per period from merged daily sketches
+    store: keep the sketches built for missing days (off when comment_records are only a sample)
+    """
+    daily_sketches = load_or_build_daily_sketches(db_conn, date_keys, meal_types, comment_records, store)
+    return summarize_top_phrases(daily_sketches, meal_types)
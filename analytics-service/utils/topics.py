@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Incremental topic clustering for feedback comments
+TF-IDF features (hashed vocabulary + persisted document frequencies) clustered with
+mini-batch k-means. The model is stored in MongoDB and absorbs each closed day exactly once.
+"""
+
+import sys
+import pickle
+from collections import Counter, defaultdict
+from datetime import datetime
+import numpy as np
+from bson.binary import Binary
+from pymongo.errors import DuplicateKeyError
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+from utils.dedup import collapse_comment_records, canonical_day_order
+from utils.rollups import is_closed_day
+
+MODEL_ID = "comment_topics"
+N_FEATURES = 2 ** 14
+N_TOPICS = 8
+TERMS_PER_TOPIC = 25
+REPRESENTATIVE_COMMENTS = 2
+TOP_TOPICS_PER_MEAL = 5
+
+# Stateless vectorizer: the vocabulary never has to be refit, only the IDF counts grow
+_vectorizer = HashingVectorizer(
+    n_features=N_FEATURES,
+    alternate_sign=False,
+    norm=None,
+    stop_words='english',
+    ngram_range=(1, 2)
+)
+_analyzer = _vectorizer.build_analyzer()
+
+def load_topic_model(db_conn):
+    """Load the persisted topic model, or return a fresh untrained one"""
+    doc = db_conn.get_topic_models_collection().find_one({"_id": MODEL_ID})
+    if doc:
+        try:
+            return {
+                "version": doc["version"],
+                "doc_freq": np.frombuffer(doc["docFreq"], dtype=np.float64).copy(),
+                "n_docs": doc["nDocs"],
+                "kmeans": pickle.loads(doc["kmeans"]) if doc.get("kmeans") else None,
+                "topic_terms": {int(k): Counter(v) for k, v in doc.get("topicTerms", {}).items()},
+                "trained_days": set(doc.get("trainedDays", []))
+            }
+        except Exception as e:
+            print(f"Debug: Discarding unreadable topic model: {str(e)}", file=sys.stderr)
+
+    return {
+        "version": 0,
+        "doc_freq": np.zeros(N_FEATURES),
+        "n_docs": 0,
+        "kmeans": None,
+        "topic_terms": {},
+        "trained_days": set()
+    }
+
+def save_topic_model(db_conn, model):
+    """Persist the model; skipped if another process saved a newer version meanwhile"""
+    collection = db_conn.get_topic_models_collection()
+    new_version = model["version"] + 1
+    document = {
+        "version": new_version,
+        "docFreq": Binary(model["doc_freq"].tobytes()),
+        "nDocs": model["n_docs"],
+        "kmeans": Binary(pickle.dumps(model["kmeans"])),
+        "topicTerms": {str(k): dict(v) for k, v in model["topic_terms"].items()},
+        "trainedDays": sorted(model["trained_days"]),
+        "updatedAt": datetime.now()
+    }
+
+    if model["version"] == 0:
+        try:
+            collection.insert_one({"_id": MODEL_ID, **document})
+            saved = True
+        except DuplicateKeyError:
+            saved = False
+    else:
+        result = collection.update_one({"_id": MODEL_ID, "version": model["version"]}, {"$set": document})
+        saved = result.modified_count > 0
+
+    if saved:
+        model["version"] = new_version
+    else:
+        print("Debug: Topic model was updated concurrently, keeping the stored version", file=sys.stderr)
+    return saved
+
+def tfidf_features(model, comments):
+    """Hashed term counts weighted by the persisted IDF, L2-normalized"""
+    counts = _vectorizer.transform(comments)
+    idf = np.log((1 + model["n_docs"]) / (1 + model["doc_freq"])) + 1
+    features = counts.multiply(idf).tocsr()
+    features.data = np.log1p(features.data)
+    return normalize(features)
+
+def update_topic_model(db_conn, model, comments_by_day):
+    """
+    Absorb closed days that the model has not seen yet (one mini-batch step over their comments)
+    comments_by_day: {date_key: [comment, ...]}
+    """
+    new_days = sorted(day for day in comments_by_day if is_closed_day(day) and day not in model["trained_days"])
+    comments = [comment for day in new_days for comment in comments_by_day[day]]
+
+    if not new_days:
+        return model
+    if model["kmeans"] is None and len(comments) < N_TOPICS:
+        print(f"Debug: Not enough comments ({len(comments)}) to initialise the topic model", file=sys.stderr)
+        return model
+
+    if comments:
+        # Update document frequencies first so the new batch is weighted consistently
+        counts = _vectorizer.transform(comments)
+        model["doc_freq"] += np.bincount(counts.indices, minlength=N_FEATURES)
+        model["n_docs"] += len(comments)
+        features = tfidf_features(model, comments)
+
+        if model["kmeans"] is None:
+            model["kmeans"] = MiniBatchKMeans(n_clusters=N_TOPICS, random_state=0, n_init=3)
+        model["kmeans"].partial_fit(features)
+
+        # Keep a bounded term tally per topic for human-readable labels
+        for comment, topic in zip(comments, model["kmeans"].predict(features)):
+            terms = model["topic_terms"].setdefault(int(topic), Counter())
+            terms.update(_analyzer(comment))
+        for topic, terms in model["topic_terms"].items():
+            model["topic_terms"][topic] = Counter(dict(terms.most_common(TERMS_PER_TOPIC)))
+
+    model["trained_days"].update(new_days)
+    print(f"Debug: Topic model absorbed {len(new_days)} day(s), {len(comments)} comment(s)", file=sys.stderr)
+    save_topic_model(db_conn, model)
+    return model
+
+def topic_label(model, topic):
+    """Short label from the most frequent terms of a topic"""
+    terms = model["topic_terms"].get(topic)
+    if not terms:
+        return f"Topic {topic + 1}"
+    return ", ".join(term for term, _ in terms.most_common(3))
+
+def summarize_topics(model, comment_records):
+    """
+    Assign comments to topics and report the top topics per meal
+    comment_records: list of (date_key, meal_key, rating, comment)
+    """
+    if not comment_records:
+        return {}
+
+    comments = [record[3] for record in comment_records]
+    features = tfidf_features(model, comments)
+    distances = model["kmeans"].transform(features)
+    assignments = distances.argmin(axis=1)
+
+    grouped = defaultdict(lambda: defaultdict(list))
+    for index, (topic, record) in enumerate(zip(assignments, comment_records)):
+        grouped[record[1]][int(topic)].append(index)
+
+    topics_per_meal = {}
+    for meal_key, topics in grouped.items():
+        meal_total = sum(len(indices) for indices in topics.values())
+        ranked = sorted(topics.items(), key=lambda x: len(x[1]), reverse=True)[:TOP_TOPICS_PER_MEAL]
+
+        meal_topics = []
+        for topic, indices in ranked:
+            # Representative comments are the ones closest to the topic centroid
+            representatives = []
+            for index in sorted(indices, key=lambda i: distances[i, topic]):
+                if comments[index] not in representatives:
+                    representatives.append(comments[index])
+                if len(representatives) >= REPRESENTATIVE_COMMENTS:
+                    break
+
+            ratings = [comment_records[i][2] for i in indices]
+            meal_topics.append({
+                "topicId": topic,
+                "label": topic_label(model, topic),
+                "count": len(indices),
+                "percentage": round(len(indices) / meal_total * 100, 1),
+                "averageRating": round(sum(ratings) / len(ratings), 2),
+                "representativeComments": representatives
+            })
+        topics_per_meal[meal_key] = meal_topics
+
+    return topics_per_meal
+
+def analyze_comment_topics(db_conn, comment_records, training_records=None):
+    """
+    Update the persisted topic model with newly closed days and report top topics per meal
+    comment_records: list of (date_key, meal_key, rating, comment) to summarize
+    training_records: records the model absorbs days from (defaults to comment_records);
+    near-duplicates are collapsed within each day, so what a day contributes does not
+    depend on the range of the request that first absorbed it
+    """
+    model = load_topic_model(db_conn)
+
+    records_by_day = defaultdict(list)
+    for record in (comment_records if training_records is None else training_records):
+        if record[0] not in model["trained_days"]:
+            records_by_day[record[0]].append(record)
+    comments_by_day = {
+        date_key: [record[3] for record in collapse_comment_records(canonical_day_order(day_records))[0]]
+        for date_key, day_records in records_by_day.items()
+    }
+    model = update_topic_model(db_conn, model, comments_by_day)
+
+    if model["kmeans"] is None:
+        return {"status": "insufficient_data", "topicsPerMeal": {}}
+
+    return {
+        "status": "success",
+        "modelDays": len(model["trained_days"]),
+        "topicsPerMeal": summarize_topics(model, comment_records)
+    }
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Week-over-week comparisons for the weekly analysis
+The previous week and the 4-week baseline are read from per-day rating histograms kept in the
+rollup store (one (meals, 5) histogram and a participant count per closed day), so comparing a
+week costs one rollup read instead of rescanning up to five weeks of feedback. The analysed
+week's closed days missing from the store are stored from its own aggregates; prior days missing
+from the store (or whose feedback changed since) are aggregated once, in one query, and stored.
+Weeks are compared like for like: only the weekdays the current week has reached.
+"""
+
+from datetime import timedelta
+import numpy as np
+
+from utils.kernel import MEAL_TYPES, aggregate_feedback, histogram_count, histogram_mean
+from utils.records import load_feedback_records, days_query
+from utils.rollups import load_daily_rollups, save_daily_rollup, is_closed_day, day_sources
+from utils.significance import compare_histograms, is_meaningful
+from utils.metrics import record_cache
+from utils.result_cache import ist_today
+
+ROLLUP_SECTION = "mealHistograms"
+BASELINE_WEEKS = 4
+
+def day_histograms(aggregates, date_keys):
+    """{date_key: (histograms (meals, 5), participants)} of the given days; empty days get zeros"""
+    day_positions = {date_key: day for day, date_key in enumerate(aggregates.day_keys)}
+    histograms = {}
+    for date_key in date_keys:
+        day = day_positions.get(date_key)
+        if day is None:
+            histograms[date_key] = (np.zeros((len(aggregates.meal_types), 5), dtype=np.int64), 0)
+        else:
+            histograms[date_key] = (aggregates.counts[day], len(aggregates.day_users[day]))
+    return histograms
+
+def save_day_histograms(db_conn, histograms, sources):
+    """Store the closed days' histograms in the rollup store, with the day_sources they were built from"""
+    for date_key, (counts, participants) in histograms.items():
+        if is_closed_day(date_key):
+            save_daily_rollup(db_conn, date_key, ROLLUP_SECTION, {
+                "counts": counts.tolist(),
+                "participants": int(participants)
+            }, sources[date_key])
+
+def load_or_build_day_histograms(db_conn, date_keys, meal_types=MEAL_TYPES):
+    """
+    Per-day histograms of the requested days, read from the rollup store where available
+    Days without a stored rollup (or whose feedback changed since) are aggregated from their
+    feedback and stored once closed.
+    """
+    sources = day_sources(db_conn, date_keys)
+    stored = load_daily_rollups(db_conn, date_keys, ROLLUP_SECTION, sources)
+    missing_days = [date_key for date_key in date_keys if date_key not in stored]
+
+    histograms = {
+        date_key: (np.array(doc["counts"], dtype=np.int64), doc["participants"])
+        for date_key, doc in stored.items()
+    }
+
+    if missing_days:
+        records = load_feedback_records(db_conn.get_feedback_collection(), days_query(missing_days), meal_types)
+        built = day_histograms(aggregate_feedback(records, meal_types), missing_days)
+        save_day_histograms(db_conn, built, sources)
+        histograms.update(built)
+
+    record_cache("histogram_rollup", hits=len(stored), misses=len(missing_days))
+    return histograms
+
+def delta_entry(current, reference):
+    """Current vs reference rating histograms, with both two-sample tests of the shift"""
+    current_rating = histogram_mean(current)
+    reference_rating = histogram_mean(reference)
+    entry = {
+        "currentRating": round(current_rating, 2),
+        "referenceRating": round(reference_rating, 2),
+        "currentRatings": histogram_count(current),
+        "referenceRatings": histogram_count(reference)
+    }
+    if not entry["currentRatings"] or not entry["referenceRatings"]:
+        return {**entry, "change": None, "changePercentage": None, "trend": "insufficient_data"}
+
+    change = current_rating - reference_rating
+    tests = compare_histograms(reference, current)
+    if not is_meaningful(tests["mannWhitney"], "rankBiserial"):
+        trend = "stable"
+    else:
+        trend = "improved" if change > 0 else "declined" if change < 0 else "stable"
+    return {
+        **entry,
+        "change": round(change, 2),
+        "changePercentage": round(change / reference_rating * 100, 1),
+        "trend": trend,
+        **tests
+    }
+
+def participation_entry(current, reference):
+    """Average daily participants, current vs reference (None when the reference days had no feedback)"""
+    return {
+        "current": round(float(current), 1),
+        "reference": round(float(reference), 1) if reference is not None else None,
+        "change": round(float(current - reference), 1) if reference is not None else None
+    }
+
+def compare_to_reference(current_days, reference_days, histograms, meal_types):
+    """
+    Overall, per-meal and per-day deltas of the current days against reference days
+    current_days: [(date_key, day name, counts, participants)]
+    reference_days: for each current day, the date keys it is compared with (same weekday)
+    """
+    current_total = sum(counts for _, _, counts, _ in current_days)
+    reference_total = sum(histograms[date_key][0] for dates in reference_days for date_key in dates)
+
+    # Reference participation only counts days that had feedback (a week before data started is not a zero)
+    reference_participants = [histograms[date_key][1] for dates in reference_days for date_key in dates
+                              if histograms[date_key][1]]
+    overall = delta_entry(current_total, reference_total)
+    overall["dailyParticipants"] = participation_entry(
+        np.mean([participants for _, _, _, participants in current_days]),
+        np.mean(reference_participants) if reference_participants else None
+    )
+
+    per_day = {}
+    for (date_key, day_name, counts, participants), dates in zip(current_days, reference_days):
+        day_participants = [histograms[reference][1] for reference in dates if histograms[reference][1]]
+        per_day[date_key] = {
+            "dayName": day_name,
+            "referenceDates": dates,
+            **delta_entry(counts, sum(histograms[reference][0] for reference in dates)),
+            "participants": participation_entry(participants, np.mean(day_participants) if day_participants else None)
+        }
+
+    return {
+        "overall": overall,
+        "perMeal": {
+            meal_type: delta_entry(current_total[meal], reference_total[meal])
+            for meal, meal_type in enumerate(meal_types)
+        },
+        "perDay": per_day
+    }
+
+def analyze_week_over_week(db_conn, aggregates, week_start, week_days=7):
+    """
+    Deltas of a week against the previous week and the BASELINE_WEEKS weeks before it
+    aggregates: the week's aggregates (their closed days are stored for later weeks' baselines)
+    """
+    meal_types = aggregates.meal_types
+    compared_days = max(1, min(week_days, (ist_today() - week_start).days + 1))
+
+    current_dates = [week_start + timedelta(days=offset) for offset in range(compared_days)]
+    current = day_histograms(aggregates, [date.strftime('%Y-%m-%d') for date in current_dates])
+
+    # Only closed days the store lacks (or holds from older feedback) are written
+    closed_days = [date_key for date_key in current if is_closed_day(date_key)]
+    sources = day_sources(db_conn, closed_days)
+    stored = load_daily_rollups(db_conn, closed_days, ROLLUP_SECTION, sources)
+    save_day_histograms(db_conn, {date_key: current[date_key] for date_key in closed_days if date_key not in stored},
+                        sources)
+
+    # reference_dates[day][week - 1]: the same weekday `week` weeks earlier
+    reference_dates = [
+        [(date - timedelta(weeks=week)).strftime('%Y-%m-%d') for week in range(1, BASELINE_WEEKS + 1)]
+        for date in current_dates
+    ]
+    histograms = load_or_build_day_histograms(
+        db_conn, sorted({date_key for dates in reference_dates for date_key in dates}), meal_types
+    )
+
+    current_days = [
+        (date.strftime('%Y-%m-%d'), date.strftime('%A'), *current[date.strftime('%Y-%m-%d')])
+        for date in current_dates
+    ]
+    baseline_start = week_start - timedelta(weeks=BASELINE_WEEKS)
+    weeks_with_data = sum(
+        1 for week in range(BASELINE_WEEKS)
+        if any(histograms[dates[week]][0].any() for dates in reference_dates)
+    )
+
+    return {
+        "daysCompared": compared_days,
+        "previousWeek": {
+            "weekStart": (week_start - timedelta(weeks=1)).strftime('%Y-%m-%d'),
+            "weekEnd": (week_start - timedelta(days=1)).strftime('%Y-%m-%d'),
+            **compare_to_reference(current_days, [dates[:1] for dates in reference_dates], histograms, meal_types)
+        },
+        "baseline": {
+            "weeks": BASELINE_WEEKS,
+            "weeksWithData": weeks_with_data,
+            "startDate": baseline_start.strftime('%Y-%m-%d'),
+            "endDate": (week_start - timedelta(days=1)).strftime('%Y-%m-%d'),
+            **compare_to_reference(current_days, reference_dates, histograms, meal_types)
+        }
+    }
@@ -4,9 +4,50 @@ import Feedback from '../models/Feedback.js';
 import User from '../models/User.js';
 import { authenticateFirebaseToken, requireAdmin } from '../middleware/firebaseAuth.js';
 import analyticsService from '../services/analyticsService.js';
+import analyticsScheduler, { AnalyticsBusyError, AnalyticsBatchDisabledError } from '../services/analyticsScheduler.js';
 
 const router = express.Router();
 
+/**
+ * Scheduler errors for jobs it will not run: a full queue, or batch work with no slot to spare
+ */
+const isAnalyticsUnavailable = (error) =>
+  error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError;
+
+/**
+ * 503 response for isAnalyticsUnavailable errors (Retry-After only when retrying can help)
+ */
+const sendAnalyticsUnavailable = (res, error) => {
+  if (error.retryAfter !== undefined) {
+    res.setHeader('Retry-After', String(error.retryAfter));
+  }
+  return res.status(503).json({
+    status: 'error',
+    code: error.code,
+    message: error.message,
+    retryAfter: error.retryAfter
+  });
+};
+
+/**
+ * Watermark sent back by polling clients (?since=), as issued with a previous response
+ */
+const parseSince = (req) => {
+  const { since } = req.query;
+  return typeof since === 'string' && /^[0-9a-f]{16}$/.test(since) ? since : undefined;
+};
+
+/**
+ * not_modified / delta answer to a request carrying a watermark
+ */
+const sendWatermarked = (res, analysis) => res.json({
+  status: analysis.status,
+  since: analysis.since,
+  watermark: analysis.watermark,
+  ...(analysis.changes ? { changes: analysis.changes } : {}),
+  timestamp: analysis.timestamp
+});
+
 // Helper function to get AI suggestions using free Hugging Face API
 const getAISuggestions = async (analyticsData) => {
   try {
@@ -350,9 +391,72 @@ router.get('/comments', [authenticateFirebaseToken, requireAdmin], async (req, r
   }
 });
 
+// @route   GET /api/analytics/comments/search
+// @desc    Search comments by terms / "quoted phrases" with date, meal and rating filters
+// @access  Private/Admin
+router.get('/comments/search', [authenticateFirebaseToken, requireAdmin], async (req, res) => {
+  try {
+    const { q, startDate, endDate, mealType, minRating, maxRating, limit } = req.query;
+
+    if (!q || !q.trim()) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'Search query (q) is required'
+      });
+    }
+
+    if ((startDate && !/^\d{4}-\d{2}-\d{2}$/.test(startDate)) || (endDate && !/^\d{4}-\d{2}-\d{2}$/.test(endDate))) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'Invalid date format. Use YYYY-MM-DD'
+      });
+    }
+
+    const toInt = (value) => (value !== undefined && /^\d+$/.test(value) ? parseInt(value, 10) : undefined);
+
+    const search = await analyticsService.searchComments({
+      query: q.trim(),
+      startDate,
+      endDate,
+      mealType,
+      minRating: toInt(minRating),
+      maxRating: toInt(maxRating),
+      limit: toInt(limit)
+    });
+
+    if (search.error) {
+      return res.status(500).json({
+        status: 'error',
+        message: search.message
+      });
+    }
+
+    res.json({
+      status: 'success',
+      data: {
+        comments: search.results,
+        totalComments: search.total,
+        filters: search.filters
+      }
+    });
+
+  } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
+    console.error('Comment search error:', error);
+    res.status(500).json({
+      status: 'error',
+      message: 'Failed to search comments',
+      error: process.env.NODE_ENV === 'development' ? error.message : undefined
+    });
+  }
+});
+
 /**
  * @route   GET /api/analytics/daily/:date
- * @desc    Get comprehensive daily analysis
+ * @desc    Get comprehensive daily analysis (?since=<watermark> for not_modified / delta answers,
+ *          ?segments=1 to add the breakdown by student segment)
  * @access  Admin only
  */
 router.get('/daily/:date', authenticateFirebaseToken, requireAdmin, async (req, res) => {
@@ -367,7 +471,10 @@ router.get('/daily/:date', authenticateFirebaseToken, requireAdmin, async (req,
       });
     }
     
-    const analysis = await analyticsService.getDailyAnalysis(date);
+    const analysis = await analyticsService.getDailyAnalysis(date, {
+      since: parseSince(req),
+      segments: req.query.segments === '1'
+    });
     
     if (analysis.error) {
       return res.status(500).json({
@@ -377,6 +484,10 @@ router.get('/daily/:date', authenticateFirebaseToken, requireAdmin, async (req,
     }
 
     // Handle different response types
+    if (analysis.status === 'not_modified' || analysis.status === 'delta') {
+      return sendWatermarked(res, analysis);
+    }
+    
     if (analysis.status === 'no_data') {
       return res.json({
         status: 'no_data',
@@ -384,6 +495,7 @@ router.get('/daily/:date', authenticateFirebaseToken, requireAdmin, async (req,
         message: analysis.message,
         date: analysis.date,
         data: analysis.data,
+        watermark: analysis.watermark,
         timestamp: analysis.timestamp
       });
     }
@@ -393,10 +505,14 @@ router.get('/daily/:date', authenticateFirebaseToken, requireAdmin, async (req,
       status: 'success',
       data: analysis.data,
       date: analysis.date,
+      watermark: analysis.watermark,
       timestamp: analysis.timestamp
     });
     
   } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
     console.error('Daily analytics error:', error);
     res.status(500).json({
       status: 'error',
@@ -408,7 +524,8 @@ router.get('/daily/:date', authenticateFirebaseToken, requireAdmin, async (req,
 
 /**
  * @route   GET /api/analytics/weekly/:date
- * @desc    Get comprehensive weekly analysis
+ * @desc    Get comprehensive weekly analysis (?since=<watermark> for not_modified / delta answers,
+ *          ?segments=1 to add the breakdown by student segment)
  * @access  Admin only
  */
 router.get('/weekly/:date', authenticateFirebaseToken, requireAdmin, async (req, res) => {
@@ -423,7 +540,10 @@ router.get('/weekly/:date', authenticateFirebaseToken, requireAdmin, async (req,
       });
     }
     
-    const analysis = await analyticsService.getWeeklyAnalysis(date);
+    const analysis = await analyticsService.getWeeklyAnalysis(date, {
+      since: parseSince(req),
+      segments: req.query.segments === '1'
+    });
     
     if (analysis.error) {
       return res.status(500).json({
@@ -432,15 +552,23 @@ router.get('/weekly/:date', authenticateFirebaseToken, requireAdmin, async (req,
       });
     }
     
+    if (analysis.status === 'not_modified' || analysis.status === 'delta') {
+      return sendWatermarked(res, analysis);
+    }
+    
     res.json({
       status: 'success',
       data: analysis.data,
       weekStart: analysis.weekStart,
       weekEnd: analysis.weekEnd,
+      watermark: analysis.watermark,
       timestamp: analysis.timestamp
     });
     
   } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
     console.error('Weekly analytics error:', error);
     res.status(500).json({
       status: 'error',
@@ -450,6 +578,45 @@ router.get('/weekly/:date', authenticateFirebaseToken, requireAdmin, async (req,
   }
 });
 
+/**
+ * Stream a historical analysis to the client as NDJSON while it is computed
+ */
+const streamHistorical = async (res, startDate, endDate, analysisType, options = {}) => {
+  res.setHeader('Content-Type', 'application/x-ndjson');
+  res.setHeader('Cache-Control', 'no-cache');
+  
+  try {
+    await analyticsService.streamHistoricalAnalysis(startDate, endDate, analysisType, (record) => {
+      res.write(JSON.stringify(record) + '\n');
+    }, options);
+  } catch (error) {
+    if (isAnalyticsUnavailable(error) && !res.headersSent) {
+      return sendAnalyticsUnavailable(res, error);
+    }
+    console.error(`Historical ${analysisType} stream error:`, error);
+    res.write(JSON.stringify({ error: true, message: `Historical analysis failed: ${error.message}` }) + '\n');
+  }
+  res.end();
+};
+
+/**
+ * Approximate-mode options of a historical request (?approximate=1 [&sampleSize=N]);
+ * null when sampleSize is not a positive integer
+ */
+const approximateOptions = (query) => {
+  if (query.approximate !== '1') return {};
+  if (query.sampleSize !== undefined && !/^[1-9]\d*$/.test(query.sampleSize)) return null;
+  return {
+    approximate: true,
+    sampleSize: query.sampleSize !== undefined ? parseInt(query.sampleSize, 10) : undefined
+  };
+};
+
+const invalidSampleSize = (res) => res.status(400).json({
+  status: 'error',
+  message: 'sampleSize must be a positive integer'
+});
+
 /**
  * @route   GET /api/analytics/historical/comparison
  * @desc    Get historical comparison analysis
@@ -474,7 +641,17 @@ router.get('/historical/comparison', authenticateFirebaseToken, requireAdmin, as
       });
     }
     
-    const analysis = await analyticsService.getHistoricalAnalysis(startDate, endDate, 'comparison');
+    // ?approximate=1: estimates from a sample, with error bounds in data.approximation
+    const options = approximateOptions(req.query);
+    if (!options) {
+      return invalidSampleSize(res);
+    }
+    
+    if (req.query.stream === '1') {
+      return streamHistorical(res, startDate, endDate, 'comparison', options);
+    }
+    
+    const analysis = await analyticsService.getHistoricalAnalysis(startDate, endDate, 'comparison', options);
     
     if (analysis.error) {
       return res.status(500).json({
@@ -493,6 +670,9 @@ router.get('/historical/comparison', authenticateFirebaseToken, requireAdmin, as
     });
     
   } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
     console.error('Historical comparison error:', error);
     res.status(500).json({
       status: 'error',
@@ -509,7 +689,7 @@ router.get('/historical/comparison', authenticateFirebaseToken, requireAdmin, as
  */
 router.get('/historical/trends', authenticateFirebaseToken, requireAdmin, async (req, res) => {
   try {
-    const { startDate, endDate } = req.query;
+    const { startDate, endDate, maxPoints } = req.query;
     
     if (!startDate || !endDate) {
       return res.status(400).json({
@@ -518,7 +698,24 @@ router.get('/historical/trends', authenticateFirebaseToken, requireAdmin, async
       });
     }
     
-    const analysis = await analyticsService.getHistoricalAnalysis(startDate, endDate, 'trend');
+    // Optional cap on the returned daily series (downsampled server-side, shape preserving)
+    if (maxPoints !== undefined && (!/^\d+$/.test(maxPoints) || parseInt(maxPoints, 10) < 3)) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'maxPoints must be an integer of at least 3'
+      });
+    }
+    const approximate = approximateOptions(req.query);
+    if (!approximate) {
+      return invalidSampleSize(res);
+    }
+    const options = { maxPoints: maxPoints !== undefined ? parseInt(maxPoints, 10) : undefined, ...approximate };
+    
+    if (req.query.stream === '1') {
+      return streamHistorical(res, startDate, endDate, 'trend', options);
+    }
+    
+    const analysis = await analyticsService.getHistoricalAnalysis(startDate, endDate, 'trend', options);
     
     if (analysis.error) {
       return res.status(500).json({
@@ -537,6 +734,9 @@ router.get('/historical/trends', authenticateFirebaseToken, requireAdmin, async
     });
     
   } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
     console.error('Trend analysis error:', error);
     res.status(500).json({
       status: 'error',
@@ -562,7 +762,16 @@ router.get('/historical/patterns', authenticateFirebaseToken, requireAdmin, asyn
       });
     }
     
-    const analysis = await analyticsService.getHistoricalAnalysis(startDate, endDate, 'pattern');
+    const options = approximateOptions(req.query);
+    if (!options) {
+      return invalidSampleSize(res);
+    }
+    
+    if (req.query.stream === '1') {
+      return streamHistorical(res, startDate, endDate, 'pattern', options);
+    }
+    
+    const analysis = await analyticsService.getHistoricalAnalysis(startDate, endDate, 'pattern', options);
     
     if (analysis.error) {
       return res.status(500).json({
@@ -581,6 +790,9 @@ router.get('/historical/patterns', authenticateFirebaseToken, requireAdmin, asyn
     });
     
   } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
     console.error('Pattern analysis error:', error);
     res.status(500).json({
       status: 'error',
@@ -590,6 +802,161 @@ router.get('/historical/patterns', authenticateFirebaseToken, requireAdmin, asyn
   }
 });
 
+/**
+ * @route   GET /api/analytics/historical/correlations
+ * @desc    Get cross-meal and next-meal / next-day rating correlations
+ * @access  Admin only
+ */
+router.get('/historical/correlations', authenticateFirebaseToken, requireAdmin, async (req, res) => {
+  try {
+    const { startDate, endDate } = req.query;
+    
+    if (!startDate || !endDate) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'Both startDate and endDate are required'
+      });
+    }
+    
+    if (req.query.stream === '1') {
+      return streamHistorical(res, startDate, endDate, 'correlation');
+    }
+    
+    const analysis = await analyticsService.getHistoricalAnalysis(startDate, endDate, 'correlation');
+    
+    if (analysis.error) {
+      return res.status(500).json({
+        status: 'error',
+        message: analysis.message
+      });
+    }
+    
+    res.json({
+      status: 'success',
+      data: analysis.data,
+      startDate: analysis.startDate,
+      endDate: analysis.endDate,
+      analysisType: analysis.analysisType,
+      timestamp: analysis.timestamp
+    });
+    
+  } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
+    console.error('Correlation analysis error:', error);
+    res.status(500).json({
+      status: 'error',
+      message: 'Failed to fetch correlation analysis',
+      error: process.env.NODE_ENV === 'development' ? error.message : undefined
+    });
+  }
+});
+
+/**
+ * @route   GET /api/analytics/historical/segments
+ * @desc    Get student segments by rating behavior and the range's ratings per segment
+ * @access  Admin only
+ */
+router.get('/historical/segments', authenticateFirebaseToken, requireAdmin, async (req, res) => {
+  try {
+    const { startDate, endDate } = req.query;
+    
+    if (!startDate || !endDate) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'Both startDate and endDate are required'
+      });
+    }
+    
+    if (req.query.stream === '1') {
+      return streamHistorical(res, startDate, endDate, 'segmentation');
+    }
+    
+    const analysis = await analyticsService.getHistoricalAnalysis(startDate, endDate, 'segmentation');
+    
+    if (analysis.error) {
+      return res.status(500).json({
+        status: 'error',
+        message: analysis.message
+      });
+    }
+    
+    res.json({
+      status: 'success',
+      data: analysis.data,
+      startDate: analysis.startDate,
+      endDate: analysis.endDate,
+      analysisType: analysis.analysisType,
+      timestamp: analysis.timestamp
+    });
+    
+  } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
+    console.error('Segmentation analysis error:', error);
+    res.status(500).json({
+      status: 'error',
+      message: 'Failed to fetch segmentation analysis',
+      error: process.env.NODE_ENV === 'development' ? error.message : undefined
+    });
+  }
+});
+
+/**
+ * @route   GET /api/analytics/dashboard/bundle
+ * @desc    Get the day, its week, quick stats and alerts in one payload (query: date, default yesterday)
+ * @access  Admin only
+ */
+router.get('/dashboard/bundle', authenticateFirebaseToken, requireAdmin, async (req, res) => {
+  try {
+    let { date } = req.query;
+    
+    if (!date) {
+      const yesterday = new Date();
+      yesterday.setDate(yesterday.getDate() - 1);
+      date = yesterday.toISOString().split('T')[0];
+    }
+    
+    if (!/^\d{4}-\d{2}-\d{2}$/.test(date)) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'Invalid date format. Use YYYY-MM-DD'
+      });
+    }
+    
+    const bundle = await analyticsService.getDashboardBundle(date);
+    
+    if (bundle.error) {
+      return res.status(500).json({
+        status: 'error',
+        message: bundle.message
+      });
+    }
+    
+    res.json({
+      status: 'success',
+      date: bundle.date,
+      data: bundle.data,
+      alertCounts: bundle.alertCounts,
+      sources: bundle.sources,
+      timestamp: bundle.timestamp
+    });
+    
+  } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
+    console.error('Dashboard bundle error:', error);
+    res.status(500).json({
+      status: 'error',
+      message: 'Failed to fetch dashboard bundle',
+      error: process.env.NODE_ENV === 'development' ? error.message : undefined
+    });
+  }
+});
+
 /**
  * @route   GET /api/analytics/dashboard/quick-stats
  * @desc    Get quick stats for dashboard overview
@@ -617,6 +984,9 @@ router.get('/dashboard/quick-stats', authenticateFirebaseToken, requireAdmin, as
     });
     
   } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
     console.error('Quick stats error:', error);
     res.status(500).json({
       status: 'error',
@@ -628,12 +998,31 @@ router.get('/dashboard/quick-stats', authenticateFirebaseToken, requireAdmin, as
 
 /**
  * @route   GET /api/analytics/alerts
- * @desc    Get current alerts and notifications
+ * @desc    Get current alerts and notifications (query: startDate, endDate to evaluate the
+ *          alert rules over a range instead of yesterday and its week)
  * @access  Admin only
  */
 router.get('/alerts', authenticateFirebaseToken, requireAdmin, async (req, res) => {
   try {
-    const alerts = await analyticsService.getCurrentAlerts();
+    const { startDate, endDate } = req.query;
+    
+    if (Boolean(startDate) !== Boolean(endDate)) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'Both startDate and endDate are required for a date range'
+      });
+    }
+    
+    if (startDate && (!/^\d{4}-\d{2}-\d{2}$/.test(startDate) || !/^\d{4}-\d{2}-\d{2}$/.test(endDate))) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'Invalid date format. Use YYYY-MM-DD'
+      });
+    }
+    
+    const alerts = startDate
+      ? await analyticsService.getRangeAlerts(startDate, endDate)
+      : await analyticsService.getCurrentAlerts();
     
     if (alerts.error) {
       return res.status(500).json({
@@ -654,6 +1043,9 @@ router.get('/alerts', authenticateFirebaseToken, requireAdmin, async (req, res)
     });
     
   } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
     console.error('Alerts fetch error:', error);
     res.status(500).json({
       status: 'error',
@@ -694,13 +1086,17 @@ router.post('/reports/generate', authenticateFirebaseToken, requireAdmin, async
     }
     
     // Set appropriate headers for file download
-    const contentType = format === 'csv' ? 'text/csv' : 'application/json';
+    const contentTypes = { csv: 'text/csv', pdf: 'application/pdf' };
+    const contentType = contentTypes[format] || 'application/json';
     res.setHeader('Content-Type', contentType);
     res.setHeader('Content-Disposition', `attachment; filename="${report.filename}"`);
     
     res.send(report.data);
     
   } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
     console.error('Report generation error:', error);
     res.status(500).json({
       status: 'error',
@@ -710,6 +1106,166 @@ router.post('/reports/generate', authenticateFirebaseToken, requireAdmin, async
   }
 });
 
+/**
+ * @route   POST /api/analytics/reports/weekly-batch
+ * @desc    Render weekly reports for every week between two dates (e.g. end of term)
+ * @access  Admin only
+ */
+router.post('/reports/weekly-batch', authenticateFirebaseToken, requireAdmin, async (req, res) => {
+  try {
+    const { startDate, endDate, formats = 'png,pdf', stream = false } = req.body;
+    
+    if (!startDate || !endDate || !/^\d{4}-\d{2}-\d{2}$/.test(startDate) || !/^\d{4}-\d{2}-\d{2}$/.test(endDate)) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'startDate and endDate are required (YYYY-MM-DD)'
+      });
+    }
+    
+    if (stream) {
+      res.setHeader('Content-Type', 'application/x-ndjson');
+      const streamed = await analyticsService.renderWeeklyReports(startDate, endDate, formats, (record) => {
+        res.write(JSON.stringify(record) + '\n');
+      });
+      if (streamed.error) {
+        res.write(JSON.stringify({ error: true, message: streamed.message }) + '\n');
+      }
+      return res.end();
+    }
+    
+    const batch = await analyticsService.renderWeeklyReports(startDate, endDate, formats);
+    
+    if (batch.error && !batch.reports) {
+      return res.status(500).json({
+        status: 'error',
+        message: batch.message
+      });
+    }
+    
+    res.json({
+      status: batch.failed ? 'partial' : 'success',
+      data: {
+        weeks: batch.weeks,
+        rendered: batch.rendered,
+        cached: batch.cached,
+        failed: batch.failed,
+        reports: batch.reports
+      }
+    });
+    
+  } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
+    console.error('Batch report rendering error:', error);
+    res.status(500).json({
+      status: 'error',
+      message: 'Failed to render weekly reports',
+      error: process.env.NODE_ENV === 'development' ? error.message : undefined
+    });
+  }
+});
+
+/**
+ * @route   POST /api/analytics/precompute
+ * @desc    Precompute analytics for the latest closed day (normally run nightly)
+ * @access  Admin only
+ */
+router.post('/precompute', authenticateFirebaseToken, requireAdmin, async (req, res) => {
+  try {
+    const { date, refresh = false } = req.body;
+    
+    if (date && !/^\d{4}-\d{2}-\d{2}$/.test(date)) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'Invalid date format. Use YYYY-MM-DD'
+      });
+    }
+    
+    const run = await analyticsService.runPrecompute({ date, refresh: Boolean(refresh) });
+    
+    if (run.error && !run.jobs) {
+      return res.status(500).json({
+        status: 'error',
+        message: run.message
+      });
+    }
+    
+    res.json({
+      status: run.failed ? 'partial' : 'success',
+      data: run
+    });
+    
+  } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
+    console.error('Analytics precompute error:', error);
+    res.status(500).json({
+      status: 'error',
+      message: 'Failed to precompute analytics',
+      error: process.env.NODE_ENV === 'development' ? error.message : undefined
+    });
+  }
+});
+
+/**
+ * @route   POST /api/analytics/exports
+ * @desc    Export aggregated analytics for a date range to CSV or Parquet files (for BI tools)
+ * @access  Admin only
+ */
+router.post('/exports', authenticateFirebaseToken, requireAdmin, async (req, res) => {
+  try {
+    const { startDate, endDate, format = 'csv', tables } = req.body;
+    
+    if (!startDate || !endDate || !/^\d{4}-\d{2}-\d{2}$/.test(startDate) || !/^\d{4}-\d{2}-\d{2}$/.test(endDate)) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'startDate and endDate are required (YYYY-MM-DD)'
+      });
+    }
+    
+    if (!['csv', 'parquet'].includes(format)) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'format must be csv or parquet'
+      });
+    }
+    
+    if (tables && !/^(day|meal|weekday|student)(,(day|meal|weekday|student))*$/.test(tables)) {
+      return res.status(400).json({
+        status: 'error',
+        message: 'tables must be a comma-separated list of day, meal, weekday, student'
+      });
+    }
+    
+    const exported = await analyticsService.exportAggregates({ startDate, endDate, format, tables });
+    
+    if (exported.error) {
+      return res.status(500).json({
+        status: 'error',
+        message: exported.message
+      });
+    }
+    
+    res.json({
+      status: 'success',
+      data: exported
+    });
+    
+  } catch (error) {
+    if (isAnalyticsUnavailable(error)) {
+      return sendAnalyticsUnavailable(res, error);
+    }
+    console.error('Analytics export error:', error);
+    res.status(500).json({
+      status: 'error',
+      message: 'Failed to export analytics',
+      error: process.env.NODE_ENV === 'development' ? error.message : undefined
+    });
+  }
+});
+
 /**
  * @route   GET /api/analytics/system/health
  * @desc    Check analytics system health and dependencies
@@ -724,6 +1280,7 @@ router.get('/system/health', authenticateFirebaseToken, requireAdmin, async (req
       data: {
         pythonAvailable: !healthCheck.error,
         dependencies: healthCheck,
+        scheduler: analyticsScheduler.getStatus(),
         timestamp: new Date().toISOString()
       }
     });
@@ -12,6 +12,8 @@ import userRoutes from './routes/users.js';
 import feedbackRoutes from './routes/feedback.js';
 import analyticsRoutes from './routes/analytics.js';
 import menuRoutes from './routes/menu.js';
+import { startNightlyPrecompute } from './services/nightlyPrecompute.js';
+import analyticsMetrics from './services/analyticsMetrics.js';
 
 // Load environment variables
 dotenv.config();
@@ -58,6 +60,17 @@ app.get('/health', (req, res) => {
   });
 });
 
+// Prometheus metrics of the analytics path; local scrapers only unless METRICS_TOKEN is set
+app.get('/metrics', (req, res) => {
+  const token = process.env.METRICS_TOKEN;
+  const isLocal = ['127.0.0.1', '::1', '::ffff:127.0.0.1'].includes(req.socket.remoteAddress);
+  const authorized = token ? req.get('Authorization') === `Bearer ${token}` : isLocal;
+  if (!authorized) {
+    return res.status(403).json({ status: 'error', message: 'Metrics are only available to local or authorized scrapers' });
+  }
+  res.type('text/plain; version=0.0.4').send(analyticsMetrics.render());
+});
+
 // API Routes
 app.use('/api/auth', authRoutes);
 app.use('/api/users', userRoutes);
@@ -89,4 +102,5 @@ const PORT = process.env.PORT || 5000;
 app.listen(PORT, () => {
   console.log(`🚀 Server running on port ${PORT} in ${process.env.NODE_ENV} mode`);
   console.log(`📊 Health check available at http://localhost:${PORT}/health`);
+  startNightlyPrecompute();
 });
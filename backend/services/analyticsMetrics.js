@@ -0,0 +1,192 @@
+import fs from 'fs/promises';
+
+// Seconds; analyses run from well under a second (cache hits) up to the 60s timeout
+const DURATION_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60];
+const METRICS_PREFIX = 'Metrics: ';
+
+const escapeLabel = (value) => String(value).replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n');
+
+const formatLabels = (labels) => {
+  const entries = Object.entries(labels);
+  if (entries.length === 0) return '';
+  return `{${entries.map(([name, value]) => `${name}="${escapeLabel(value)}"`).join(',')}}`;
+};
+
+/**
+ * Counter / histogram series keyed by their label set
+ */
+class Series {
+  constructor() {
+    this.values = new Map();
+  }
+
+  entry(labels, create) {
+    const key = JSON.stringify(labels);
+    if (!this.values.has(key)) {
+      this.values.set(key, { labels, value: create() });
+    }
+    return this.values.get(key);
+  }
+
+  inc(labels, amount = 1) {
+    this.entry(labels, () => 0).value += amount;
+  }
+
+  observe(labels, seconds) {
+    const { value } = this.entry(labels, () => ({ buckets: DURATION_BUCKETS.map(() => 0), sum: 0, count: 0 }));
+    DURATION_BUCKETS.forEach((bound, index) => {
+      if (seconds <= bound) value.buckets[index] += 1;
+    });
+    value.sum += seconds;
+    value.count += 1;
+  }
+}
+
+/**
+ * Operational metrics of the analytics path in Prometheus text format
+ * Requests, latency and queue wait are measured here; documents read, MongoDB round trips and
+ * cache lookups come from the "Metrics: {...}" line each Python process writes to stderr.
+ * Served at GET /metrics and, when ANALYTICS_METRICS_FILE is set, written to that file after
+ * every run (for a node_exporter textfile collector or a test).
+ */
+class AnalyticsMetrics {
+  constructor({ metricsFile = process.env.ANALYTICS_METRICS_FILE } = {}) {
+    this.metricsFile = metricsFile;
+    this.statusSource = () => ({});
+    this.requests = new Series();
+    this.durations = new Series();
+    this.queueWaits = new Series();
+    this.roundTrips = new Series();
+    this.documentsRead = new Series();
+    this.cacheLookups = new Series();
+    this.writing = null;
+  }
+
+  /**
+   * Gauges (queue depth, running jobs) are read from the scheduler when metrics are rendered
+   */
+  setStatusSource(statusSource) {
+    this.statusSource = statusSource;
+  }
+
+  /**
+   * Analysis label of a script run: the script name, plus the type for historical analyses
+   */
+  analysisLabel(scriptName, args = []) {
+    const name = scriptName.replace(/(_analysis)?\.py$/, '');
+    return name === 'historical' && args[2] && !args[2].startsWith('--') ? `historical_${args[2]}` : name;
+  }
+
+  /**
+   * Split the Python metrics line out of a script's stderr; returns { metrics, stderr }
+   */
+  extractRunMetrics(stderr) {
+    let metrics = null;
+    const lines = stderr.split('\n').filter((line) => {
+      if (!line.startsWith(METRICS_PREFIX)) return true;
+      try {
+        metrics = JSON.parse(line.slice(METRICS_PREFIX.length));
+      } catch (error) {
+        console.error('Analytics metrics parse error:', error.message);
+      }
+      return false;
+    });
+    return { metrics, stderr: lines.join('\n') };
+  }
+
+  /**
+   * Record one finished script run
+   * status: 'ok' | 'error' | 'timeout'; runMetrics: the parsed Python metrics line, if any
+   */
+  observeRun({ scriptName, args, status, seconds, runMetrics }) {
+    const analysis = this.analysisLabel(scriptName, args);
+    this.requests.inc({ analysis, status });
+    this.durations.observe({ analysis }, seconds);
+
+    if (runMetrics) {
+      for (const [command, count] of Object.entries(runMetrics.mongoRoundTrips || {})) {
+        this.roundTrips.inc({ analysis, command }, count);
+      }
+      for (const [collection, count] of Object.entries(runMetrics.documentsRead || {})) {
+        this.documentsRead.inc({ analysis, collection }, count);
+      }
+      for (const { cache, result, count } of runMetrics.cacheLookups || []) {
+        this.cacheLookups.inc({ analysis, cache, result }, count);
+      }
+    }
+
+    this.writeFile();
+  }
+
+  observeQueueWait(priority, seconds) {
+    this.queueWaits.observe({ priority }, seconds);
+  }
+
+  render() {
+    const lines = [];
+    const counter = (name, help, series) => {
+      lines.push(`# HELP ${name} ${help}`, `# TYPE ${name} counter`);
+      for (const { labels, value } of series.values.values()) {
+        lines.push(`${name}${formatLabels(labels)} ${value}`);
+      }
+    };
+    const histogram = (name, help, series) => {
+      lines.push(`# HELP ${name} ${help}`, `# TYPE ${name} histogram`);
+      for (const { labels, value } of series.values.values()) {
+        DURATION_BUCKETS.forEach((bound, index) => {
+          lines.push(`${name}_bucket${formatLabels({ ...labels, le: bound })} ${value.buckets[index]}`);
+        });
+        lines.push(`${name}_bucket${formatLabels({ ...labels, le: '+Inf' })} ${value.count}`);
+        lines.push(`${name}_sum${formatLabels(labels)} ${value.sum}`);
+        lines.push(`${name}_count${formatLabels(labels)} ${value.count}`);
+      }
+    };
+    const gauge = (name, help, value) => {
+      lines.push(`# HELP ${name} ${help}`, `# TYPE ${name} gauge`, `${name} ${value ?? 0}`);
+    };
+
+    counter('analytics_requests_total', 'Analysis script runs by analysis and outcome (ok, error, timeout)', this.requests);
+    histogram('analytics_request_duration_seconds', 'Wall time of analysis script runs', this.durations);
+    histogram('analytics_queue_wait_seconds', 'Time jobs waited in the analytics queue before starting', this.queueWaits);
+    counter('analytics_documents_read_total', 'Documents returned to analysis scripts by MongoDB, per collection', this.documentsRead);
+    counter('analytics_mongo_round_trips_total', 'MongoDB commands sent by analysis scripts', this.roundTrips);
+    counter('analytics_cache_lookups_total', 'Cache lookups by cache (result, sentiment, phrase_rollup, profile_rollup, histogram_rollup) and result (hit, miss)', this.cacheLookups);
+
+    const status = this.statusSource();
+    gauge('analytics_queue_depth', 'Analysis jobs waiting for a worker slot', status.queued);
+    gauge('analytics_running_jobs', 'Analysis scripts currently running', status.running);
+    gauge('analytics_max_concurrent_jobs', 'Worker slot limit', status.maxConcurrent);
+    for (const [name, help] of [['started', 'Jobs started'], ['coalesced', 'Requests that joined an identical in-flight job'], ['rejected', 'Requests rejected with 503 because the queue was full']]) {
+      lines.push(`# HELP analytics_jobs_${name}_total ${help}`, `# TYPE analytics_jobs_${name}_total counter`,
+        `analytics_jobs_${name}_total ${status[name] ?? 0}`);
+    }
+
+    return `${lines.join('\n')}\n`;
+  }
+
+  /**
+   * Rewrite the metrics file (write then rename, so a scraper never reads a partial file);
+   * runs finishing while a write is in progress are picked up by one follow-up write
+   */
+  writeFile() {
+    if (!this.metricsFile) return;
+    if (this.writing) {
+      this.pendingWrite = true;
+      return;
+    }
+
+    const tempFile = `${this.metricsFile}.tmp`;
+    this.writing = fs.writeFile(tempFile, this.render())
+      .then(() => fs.rename(tempFile, this.metricsFile))
+      .catch((error) => console.error('Analytics metrics file error:', error.message))
+      .finally(() => {
+        this.writing = null;
+        if (this.pendingWrite) {
+          this.pendingWrite = false;
+          this.writeFile();
+        }
+      });
+  }
+}
+
+export default new AnalyticsMetrics();
@@ -0,0 +1,166 @@
+import os from 'os';
+import analyticsMetrics from './analyticsMetrics.js';
+
+export const PRIORITY = {
+  interactive: 0,
+  batch: 1
+};
+
+/**
+ * Raised when the analytics queue is full; routes answer it with 503 and Retry-After
+ */
+export class AnalyticsBusyError extends Error {
+  constructor(message, retryAfterSeconds) {
+    super(message);
+    this.name = 'AnalyticsBusyError';
+    this.code = 'ANALYTICS_BUSY';
+    this.retryAfter = retryAfterSeconds;
+  }
+}
+
+/**
+ * Raised for batch work when no slot can be spared for it (ANALYTICS_MAX_CONCURRENT=1)
+ */
+export class AnalyticsBatchDisabledError extends Error {
+  constructor(message) {
+    super(message);
+    this.name = 'AnalyticsBatchDisabledError';
+    this.code = 'ANALYTICS_BATCH_DISABLED';
+  }
+}
+
+/**
+ * Admission control for Python analysis jobs
+ * - single-flight: identical in-flight requests (same key) share one job and its result
+ * - at most maxConcurrent jobs run at once; batch jobs never take the last free slot, so with a
+ *   single slot batch work (reports, exports) is rejected rather than queued behind the dashboard
+ * - waiting jobs form a bounded queue, interactive before batch, FIFO within a priority
+ */
+export class AnalyticsScheduler {
+  constructor({
+    maxConcurrent = Number(process.env.ANALYTICS_MAX_CONCURRENT) || Math.max(2, Math.floor(os.cpus().length / 2)),
+    maxQueue = Number(process.env.ANALYTICS_MAX_QUEUE) || 20,
+    retryAfterSeconds = 5
+  } = {}) {
+    this.maxConcurrent = maxConcurrent;
+    // Keep one slot for interactive work so a long batch render cannot starve the dashboard
+    this.maxBatchConcurrent = maxConcurrent - 1;
+    this.maxQueue = maxQueue;
+    this.retryAfterSeconds = retryAfterSeconds;
+
+    this.running = 0;
+    this.runningBatch = 0;
+    this.queue = [];
+    this.inFlight = new Map();
+    this.sequence = 0;
+    this.stats = { started: 0, coalesced: 0, rejected: 0 };
+  }
+
+  /**
+   * Run task() under the concurrency cap
+   * key: identical keys while a job is queued or running share its promise (null disables sharing)
+   */
+  run(task, { key = null, priority = 'interactive' } = {}) {
+    if (key !== null && this.inFlight.has(key)) {
+      this.stats.coalesced += 1;
+      return this.inFlight.get(key);
+    }
+
+    if (priority === 'batch' && this.maxBatchConcurrent < 1) {
+      this.stats.rejected += 1;
+      return Promise.reject(new AnalyticsBatchDisabledError(
+        'Batch analytics needs ANALYTICS_MAX_CONCURRENT of at least 2 (one slot is kept for interactive requests)'
+      ));
+    }
+
+    const job = {
+      task,
+      priority: PRIORITY[priority] ?? PRIORITY.interactive,
+      sequence: this.sequence++,
+      submittedAt: Date.now()
+    };
+    const promise = new Promise((resolve, reject) => {
+      job.resolve = resolve;
+      job.reject = reject;
+    });
+
+    if (!this.canStart(job)) {
+      if (this.queue.length >= this.maxQueue) {
+        this.stats.rejected += 1;
+        return Promise.reject(new AnalyticsBusyError(
+          `Analytics is busy (${this.running} running, ${this.queue.length} queued), retry shortly`,
+          this.retryAfterSeconds
+        ));
+      }
+      this.enqueue(job);
+    } else {
+      this.start(job);
+    }
+
+    if (key !== null) {
+      this.inFlight.set(key, promise);
+      const release = () => this.inFlight.delete(key);
+      promise.then(release, release);
+    }
+    return promise;
+  }
+
+  canStart(job) {
+    if (this.running >= this.maxConcurrent) return false;
+    return job.priority !== PRIORITY.batch || this.runningBatch < this.maxBatchConcurrent;
+  }
+
+  enqueue(job) {
+    // Sorted by (priority, arrival); the queue is small so a linear insert is enough
+    const index = this.queue.findIndex((queued) =>
+      queued.priority > job.priority || (queued.priority === job.priority && queued.sequence > job.sequence)
+    );
+    if (index === -1) {
+      this.queue.push(job);
+    } else {
+      this.queue.splice(index, 0, job);
+    }
+  }
+
+  start(job) {
+    const isBatch = job.priority === PRIORITY.batch;
+    this.running += 1;
+    if (isBatch) this.runningBatch += 1;
+    this.stats.started += 1;
+    analyticsMetrics.observeQueueWait(isBatch ? 'batch' : 'interactive', (Date.now() - job.submittedAt) / 1000);
+
+    Promise.resolve()
+      .then(job.task)
+      .then(job.resolve, job.reject)
+      .finally(() => {
+        this.running -= 1;
+        if (isBatch) this.runningBatch -= 1;
+        this.drain();
+      });
+  }
+
+  drain() {
+    while (this.queue.length > 0) {
+      const index = this.queue.findIndex((job) => this.canStart(job));
+      if (index === -1) return;
+      this.start(this.queue.splice(index, 1)[0]);
+    }
+  }
+
+  getStatus() {
+    return {
+      maxConcurrent: this.maxConcurrent,
+      maxQueue: this.maxQueue,
+      running: this.running,
+      runningBatch: this.runningBatch,
+      queued: this.queue.length,
+      inFlightKeys: this.inFlight.size,
+      ...this.stats
+    };
+  }
+}
+
+const analyticsScheduler = new AnalyticsScheduler();
+analyticsMetrics.setStatusSource(() => analyticsScheduler.getStatus());
+
+export default analyticsScheduler;
@@ -2,11 +2,16 @@ import { spawn } from 'child_process';
 import path from 'path';
 import fs from 'fs/promises';
 import { fileURLToPath } from 'url';
+import analyticsScheduler, { AnalyticsBusyError, AnalyticsBatchDisabledError } from './analyticsScheduler.js';
+import analyticsMetrics from './analyticsMetrics.js';
 
 // Get current directory for ES modules
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
+// A timed-out script gets SIGTERM, then SIGKILL after this grace period
+const KILL_GRACE_MS = 5000;
+
 class AnalyticsService {
   constructor() {
     this.analyticsPath = path.join(__dirname, '../../analytics-service');
@@ -15,11 +20,23 @@ class AnalyticsService {
 
   /**
    * Execute Python script and return parsed JSON result
+   * Runs under the analytics scheduler: identical concurrent calls share one process, and
+   * interactive calls are admitted ahead of batch/report work (priority: 'interactive' | 'batch')
    */
-  async executePythonScript(scriptName, args = []) {
+  async executePythonScript(scriptName, args = [], timeoutMs = 60000, priority = 'interactive') {
+    return analyticsScheduler.run(
+      () => this.spawnPythonScript(scriptName, args, timeoutMs),
+      { key: JSON.stringify([scriptName, ...args]), priority }
+    );
+  }
+
+  spawnPythonScript(scriptName, args, timeoutMs) {
     return new Promise((resolve, reject) => {
       const scriptPath = path.join(this.analyticsPath, 'services', scriptName);
       const process = spawn(this.pythonExecutable, [scriptPath, ...args]);
+      const startedAt = Date.now();
+      let timedOut = false;
+      let killTimer = null;
       
       let stdout = '';
       let stderr = '';
@@ -32,17 +49,33 @@ class AnalyticsService {
         stderr += data.toString();
       });
       
+      const observe = (status, runMetrics) => analyticsMetrics.observeRun({
+        scriptName, args, status, seconds: (Date.now() - startedAt) / 1000, runMetrics
+      });
+      
       process.on('close', (code) => {
+        clearTimeout(timer);
+        clearTimeout(killTimer);
+        const { metrics: runMetrics, stderr: log } = analyticsMetrics.extractRunMetrics(stderr);
+        if (timedOut) {
+          observe('timeout', runMetrics);
+          reject(new Error('Python script timeout'));
+          return;
+        }
+        
         if (code !== 0) {
-          console.error(`Python script error (${scriptName}):`, stderr);
-          reject(new Error(`Python script failed with code ${code}: ${stderr}`));
+          observe('error', runMetrics);
+          console.error(`Python script error (${scriptName}):`, log);
+          reject(new Error(`Python script failed with code ${code}: ${log}`));
           return;
         }
         
         try {
           const result = JSON.parse(stdout);
+          observe(result.error ? 'error' : 'ok', runMetrics);
           resolve(result);
         } catch (parseError) {
+          observe('error', runMetrics);
           console.error('JSON parse error:', parseError);
           console.error('Python output:', stdout);
           reject(new Error(`Failed to parse Python script output: ${parseError.message}`));
@@ -50,24 +83,124 @@ class AnalyticsService {
       });
       
       process.on('error', (error) => {
+        clearTimeout(timer);
+        observe('error', null);
         reject(new Error(`Failed to start Python script: ${error.message}`));
       });
       
-      // Set timeout for long-running processes
-      setTimeout(() => {
+      // Set timeout for long-running processes; the promise (and the scheduler slot) is only
+      // released on close, once the process has actually exited
+      const timer = setTimeout(() => {
+        timedOut = true;
+        process.kill('SIGTERM');
+        killTimer = setTimeout(() => process.kill('SIGKILL'), KILL_GRACE_MS);
+      }, timeoutMs); // 60 second timeout by default
+    });
+  }
+
+  /**
+   * Execute a Python script in NDJSON mode, passing each record to onRecord as soon as its line arrives
+   * Streams are never shared between callers but still count against the concurrency cap
+   */
+  async executePythonScriptStream(scriptName, args = [], onRecord, timeoutMs = 60000, priority = 'interactive') {
+    return analyticsScheduler.run(
+      () => this.spawnPythonScriptStream(scriptName, args, onRecord, timeoutMs),
+      { priority }
+    );
+  }
+
+  spawnPythonScriptStream(scriptName, args, onRecord, timeoutMs) {
+    return new Promise((resolve, reject) => {
+      const scriptPath = path.join(this.analyticsPath, 'services', scriptName);
+      const process = spawn(this.pythonExecutable, [scriptPath, ...args]);
+      const startedAt = Date.now();
+      let timedOut = false;
+      
+      let killTimer = null;
+      
+      let buffer = '';
+      let stderr = '';
+      let sawError = false;
+      
+      const handleLine = (line) => {
+        if (!line.trim()) {
+          return;
+        }
+        try {
+          const record = JSON.parse(line);
+          if (record.error === true) {
+            sawError = true;
+          }
+          onRecord(record);
+        } catch (parseError) {
+          console.error('NDJSON parse error:', parseError, line);
+        }
+      };
+      
+      // utf8 decoding keeps multi-byte characters intact across chunk boundaries
+      process.stdout.setEncoding('utf8');
+      process.stdout.on('data', (data) => {
+        buffer += data;
+        let newline;
+        while ((newline = buffer.indexOf('\n')) !== -1) {
+          handleLine(buffer.slice(0, newline));
+          buffer = buffer.slice(newline + 1);
+        }
+      });
+      
+      process.stderr.on('data', (data) => {
+        stderr += data.toString();
+      });
+      
+      const observe = (status, runMetrics) => analyticsMetrics.observeRun({
+        scriptName, args, status, seconds: (Date.now() - startedAt) / 1000, runMetrics
+      });
+      
+      // As in spawnPythonScript, a timeout only settles once the process has exited
+      const timer = setTimeout(() => {
+        timedOut = true;
         process.kill('SIGTERM');
-        reject(new Error('Python script timeout'));
-      }, 60000); // 60 second timeout
+        killTimer = setTimeout(() => process.kill('SIGKILL'), KILL_GRACE_MS);
+      }, timeoutMs);
+      
+      process.on('close', (code) => {
+        clearTimeout(timer);
+        clearTimeout(killTimer);
+        handleLine(buffer);
+        const { metrics: runMetrics, stderr: log } = analyticsMetrics.extractRunMetrics(stderr);
+        if (timedOut) {
+          observe('timeout', runMetrics);
+          reject(new Error('Python script timeout'));
+          return;
+        }
+        observe(code !== 0 || sawError ? 'error' : 'ok', runMetrics);
+        // A failing script has already streamed its error record to the consumer
+        if (code !== 0 && !sawError) {
+          console.error(`Python script error (${scriptName}):`, log);
+          reject(new Error(`Python script failed with code ${code}: ${log}`));
+          return;
+        }
+        resolve();
+      });
+      
+      process.on('error', (error) => {
+        clearTimeout(timer);
+        observe('error', null);
+        reject(new Error(`Failed to start Python script: ${error.message}`));
+      });
     });
   }
 
   /**
    * Get daily analysis for a specific date
    */
-  async getDailyAnalysis(dateString) {
+  async getDailyAnalysis(dateString, { since, segments } = {}) {
     try {
       console.log(`Fetching daily analysis for: ${dateString}`);
-      const result = await this.executePythonScript('daily_analysis.py', [dateString]);
+      const args = [dateString];
+      if (since) args.push('--since', since);
+      if (segments) args.push('--segments');
+      const result = await this.executePythonScript('daily_analysis.py', args);
       
       // Handle different response types from Python script
       if (result.status === 'success') {
@@ -75,6 +208,7 @@ class AnalyticsService {
           status: 'success',
           data: result.data,
           date: result.date,
+          watermark: result.watermark,
           timestamp: new Date().toISOString()
         };
       } else if (result.status === 'no_data') {
@@ -84,14 +218,18 @@ class AnalyticsService {
           message: result.message,
           date: result.date,
           data: result.data || null,
+          watermark: result.watermark,
           timestamp: new Date().toISOString()
         };
+      } else if (result.status === 'not_modified' || result.status === 'delta') {
+        return this.formatWatermarkedResponse(result);
       } else if (result.error) {
         throw new Error(result.message);
       }
       
       return result;
     } catch (error) {
+      if (error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError) throw error;
       console.error('Daily analysis error:', error);
       return {
         error: true,
@@ -104,17 +242,25 @@ class AnalyticsService {
   /**
    * Get weekly analysis for a specific date (finds the week containing this date)
    */
-  async getWeeklyAnalysis(dateString) {
+  async getWeeklyAnalysis(dateString, { since, segments } = {}) {
     try {
       console.log(`Fetching weekly analysis for week containing: ${dateString}`);
-      const result = await this.executePythonScript('weekly_analysis.py', [dateString]);
+      const args = [dateString];
+      if (since) args.push('--since', since);
+      if (segments) args.push('--segments');
+      const result = await this.executePythonScript('weekly_analysis.py', args);
       
       if (result.error) {
         throw new Error(result.message);
       }
       
+      if (result.status === 'not_modified' || result.status === 'delta') {
+        return this.formatWatermarkedResponse(result);
+      }
+      
       return result;
     } catch (error) {
+      if (error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError) throw error;
       console.error('Weekly analysis error:', error);
       return {
         error: true,
@@ -126,11 +272,17 @@ class AnalyticsService {
 
   /**
    * Get historical analysis between two dates
+   * approximate: estimate from a sample of the feedback (data.approximation holds the error bounds);
+   * the same call without it refines to the exact result
    */
-  async getHistoricalAnalysis(startDate, endDate, analysisType = 'comparison') {
+  async getHistoricalAnalysis(startDate, endDate, analysisType = 'comparison', { maxPoints, approximate, sampleSize } = {}) {
     try {
-      console.log(`Fetching historical ${analysisType} analysis: ${startDate} to ${endDate}`);
-      const result = await this.executePythonScript('historical_analysis.py', [startDate, endDate, analysisType]);
+      console.log(`Fetching historical ${analysisType} analysis: ${startDate} to ${endDate}${approximate ? ' (approximate)' : ''}`);
+      const args = [startDate, endDate, analysisType];
+      if (maxPoints) args.push('--max-points', String(maxPoints));
+      if (approximate) args.push('--approximate');
+      if (approximate && sampleSize) args.push('--sample-size', String(sampleSize));
+      const result = await this.executePythonScript('historical_analysis.py', args);
       
       if (result.error) {
         throw new Error(result.message);
@@ -138,6 +290,7 @@ class AnalyticsService {
       
       return result;
     } catch (error) {
+      if (error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError) throw error;
       console.error('Historical analysis error:', error);
       return {
         error: true,
@@ -147,14 +300,95 @@ class AnalyticsService {
     }
   }
 
+  /**
+   * Stream historical analysis as NDJSON records (header, day rows, sections, summary)
+   */
+  async streamHistoricalAnalysis(startDate, endDate, analysisType, onRecord, { maxPoints, approximate, sampleSize } = {}) {
+    console.log(`Streaming historical ${analysisType} analysis: ${startDate} to ${endDate}`);
+    const args = [startDate, endDate, analysisType, '--stream'];
+    if (maxPoints) args.push('--max-points', String(maxPoints));
+    if (approximate) args.push('--approximate');
+    if (approximate && sampleSize) args.push('--sample-size', String(sampleSize));
+    await this.executePythonScriptStream('historical_analysis.py', args, onRecord);
+  }
+
+  /**
+   * Search feedback comments through the inverted comment index
+   */
+  async searchComments({ query, startDate, endDate, mealType, minRating, maxRating, limit }) {
+    try {
+      const args = [query];
+      if (startDate) args.push('--start', startDate);
+      if (endDate) args.push('--end', endDate);
+      if (mealType) args.push('--meals', mealType);
+      if (minRating !== undefined) args.push('--min-rating', String(minRating));
+      if (maxRating !== undefined) args.push('--max-rating', String(maxRating));
+      if (limit !== undefined) args.push('--limit', String(limit));
+
+      const result = await this.executePythonScript('comment_search.py', args);
+
+      if (result.error) {
+        throw new Error(result.message);
+      }
+
+      return result;
+    } catch (error) {
+      if (error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError) throw error;
+      console.error('Comment search error:', error);
+      return {
+        error: true,
+        message: `Comment search failed: ${error.message}`,
+        results: []
+      };
+    }
+  }
+
+  /**
+   * Get the dashboard bundle for a date: the day, its week, quick stats and alerts computed
+   * in one Python process from a single read of the week's feedback
+   */
+  async getDashboardBundle(dateString) {
+    try {
+      console.log(`Fetching dashboard bundle for: ${dateString}`);
+      const result = await this.executePythonScript('dashboard_bundle.py', [dateString]);
+      
+      if (result.error) {
+        throw new Error(result.message);
+      }
+      
+      const alerts = this.processAlerts(result.data.alerts || [], dateString);
+      
+      return {
+        error: false,
+        date: result.date,
+        data: {
+          ...result.data,
+          alerts
+        },
+        alertCounts: this.countAlerts(alerts),
+        sources: result.sources,
+        timestamp: result.timestamp
+      };
+    } catch (error) {
+      if (error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError) throw error;
+      console.error('Dashboard bundle error:', error);
+      return {
+        error: true,
+        message: `Dashboard bundle failed: ${error.message}`,
+        data: null
+      };
+    }
+  }
+
   /**
    * Get quick stats for dashboard
    */
   async getQuickStats(dateString) {
     try {
-      const dailyAnalysis = await this.getDailyAnalysis(dateString);
+      // Same arguments as the alerts request, so concurrent dashboard calls share one job
+      const bundle = await this.getDashboardBundle(dateString);
       
-      if (dailyAnalysis.error) {
+      if (bundle.error) {
         return {
           error: true,
           message: 'Failed to fetch quick stats',
@@ -162,20 +396,12 @@ class AnalyticsService {
         };
       }
       
-      const data = dailyAnalysis.data;
-      
       return {
-        date: dateString,
-        overallRating: data.overview.overallRating,
-        participationRate: data.overview.participationRate,
-        totalFeedbacks: data.overview.totalFeedbacks,
-        alertsCount: data.alerts.length,
-        bestMeal: this.getBestMeal(data.mealPerformance),
-        worstMeal: this.getWorstMeal(data.mealPerformance),
-        trend: this.calculateTrendIndicator(data.mealPerformance),
+        ...bundle.data.quickStats,
         timestamp: new Date().toISOString()
       };
     } catch (error) {
+      if (error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError) throw error;
       console.error('Quick stats error:', error);
       return {
         error: true,
@@ -185,6 +411,39 @@ class AnalyticsService {
     }
   }
 
+  /**
+   * Get the alerts the configured alert rules raise over a date range
+   */
+  async getRangeAlerts(startDate, endDate) {
+    try {
+      console.log(`Evaluating alert rules for: ${startDate} to ${endDate}`);
+      const result = await this.executePythonScript('alerts_analysis.py', [startDate, endDate]);
+      
+      if (result.error) {
+        throw new Error(result.message);
+      }
+      
+      const alerts = this.processAlerts(result.data || [], endDate);
+      
+      return {
+        error: false,
+        data: alerts,
+        startDate: result.startDate,
+        endDate: result.endDate,
+        rulesEvaluated: result.rulesEvaluated,
+        ...this.countAlerts(alerts)
+      };
+    } catch (error) {
+      if (error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError) throw error;
+      console.error('Range alerts error:', error);
+      return {
+        error: true,
+        message: `Failed to evaluate alerts: ${error.message}`,
+        data: []
+      };
+    }
+  }
+
   /**
    * Get current alerts from latest analysis
    */
@@ -194,9 +453,9 @@ class AnalyticsService {
       yesterday.setDate(yesterday.getDate() - 1);
       const dateString = yesterday.toISOString().split('T')[0];
       
-      const dailyAnalysis = await this.getDailyAnalysis(dateString);
+      const bundle = await this.getDashboardBundle(dateString);
       
-      if (dailyAnalysis.error) {
+      if (bundle.error) {
         return {
           error: true,
           message: 'Failed to fetch alerts',
@@ -204,26 +463,13 @@ class AnalyticsService {
         };
       }
       
-      const alerts = dailyAnalysis.data.alerts || [];
-      
-      // Add severity levels and timestamps
-      const processedAlerts = alerts.map(alert => ({
-        ...alert,
-        id: this.generateAlertId(alert),
-        severity: this.getAlertSeverity(alert.type),
-        timestamp: new Date().toISOString(),
-        date: dateString
-      }));
-      
       return {
         error: false,
-        data: processedAlerts,
-        total: processedAlerts.length,
-        critical: processedAlerts.filter(a => a.type === 'critical').length,
-        warning: processedAlerts.filter(a => a.type === 'warning').length,
-        info: processedAlerts.filter(a => a.type === 'info').length
+        data: bundle.data.alerts,
+        ...bundle.alertCounts
       };
     } catch (error) {
+      if (error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError) throw error;
       console.error('Alerts fetch error:', error);
       return {
         error: true,
@@ -240,6 +486,11 @@ class AnalyticsService {
     try {
       const { reportType, startDate, endDate, format = 'json' } = options;
       
+      // PDF reports are rendered (and cached) by the Python report renderer
+      if (format === 'pdf') {
+        return await this.renderPdfReport(reportType, startDate, endDate);
+      }
+      
       let analysisResult;
       
       switch (reportType) {
@@ -280,6 +531,7 @@ class AnalyticsService {
       };
       
     } catch (error) {
+      if (error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError) throw error;
       console.error('Report generation error:', error);
       return {
         error: true,
@@ -288,6 +540,137 @@ class AnalyticsService {
     }
   }
 
+  /**
+   * Render a composed PDF report; identical results are served from the render cache
+   */
+  async renderPdfReport(reportType, startDate, endDate) {
+    const rendererType = { trends: 'trend', patterns: 'pattern' }[reportType] || reportType;
+    const args = [rendererType, startDate];
+    if (!['daily', 'weekly'].includes(rendererType)) {
+      args.push(endDate);
+    }
+    args.push('--formats', 'pdf');
+    
+    const rendered = await this.executePythonScript('report_rendering.py', args, 60000, 'batch');
+    if (rendered.error) {
+      return {
+        error: true,
+        message: rendered.message
+      };
+    }
+    
+    const pdf = rendered.files.find((file) => file.format === 'pdf');
+    const timestamp = new Date().toISOString().replace(/[:.]/g, '-');
+    
+    return {
+      error: false,
+      data: await fs.readFile(pdf.path),
+      filename: `${reportType}-report-${timestamp}.pdf`,
+      format: 'pdf',
+      cached: rendered.cached
+    };
+  }
+
+  /**
+   * Render weekly reports (charts + PDF) for every week in a date range as one parallel batch
+   */
+  async renderWeeklyReports(startDate, endDate, formats = 'png,pdf', onRecord = null) {
+    try {
+      if (onRecord) {
+        await this.executePythonScriptStream(
+          'report_rendering.py',
+          ['batch-weekly', startDate, endDate, '--formats', formats, '--stream'],
+          onRecord,
+          15 * 60 * 1000,
+          'batch'
+        );
+        return { error: false };
+      }
+      
+      const result = await this.executePythonScript(
+        'report_rendering.py',
+        ['batch-weekly', startDate, endDate, '--formats', formats],
+        15 * 60 * 1000, // a full semester can take several minutes
+        'batch'
+      );
+      
+      if (result.error && !result.reports) {
+        throw new Error(result.message);
+      }
+      
+      return result;
+    } catch (error) {
+      if (error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError) throw error;
+      console.error('Batch report rendering error:', error);
+      return {
+        error: true,
+        message: `Batch report rendering failed: ${error.message}`
+      };
+    }
+  }
+
+  /**
+   * Precompute results for the latest closed day (IST) and catch up missed days
+   */
+  async runPrecompute({ date, refresh = false } = {}) {
+    try {
+      const args = [];
+      if (date) args.push('--date', date);
+      if (refresh) args.push('--refresh');
+      
+      const result = await this.executePythonScript(
+        'precompute.py',
+        args,
+        30 * 60 * 1000, // catching up two weeks of closed days can take a while
+        'batch'
+      );
+      
+      if (result.error && !result.jobs) {
+        throw new Error(result.message);
+      }
+      
+      return result;
+    } catch (error) {
+      if (error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError) throw error;
+      console.error('Analytics precompute error:', error);
+      return {
+        error: true,
+        message: `Analytics precompute failed: ${error.message}`
+      };
+    }
+  }
+
+  /**
+   * Export per-day, per-meal, per-weekday and per-student aggregates of a date range to CSV or
+   * Parquet files (written under the analytics exports directory) for BI tools
+   */
+  async exportAggregates({ startDate, endDate, format = 'csv', tables } = {}) {
+    try {
+      const args = [startDate, endDate, '--format', format];
+      if (tables) args.push('--tables', tables);
+      
+      const result = await this.executePythonScript(
+        'bulk_export.py',
+        args,
+        10 * 60 * 1000,
+        'batch'
+      );
+      
+      if (result.error) {
+        throw new Error(result.message);
+      }
+      
+      return result;
+    } catch (error) {
+      if (error instanceof AnalyticsBusyError || error instanceof AnalyticsBatchDisabledError) throw error;
+      console.error('Analytics export error:', error);
+      return {
+        error: true,
+        message: `Analytics export failed: ${error.message}`
+      };
+    }
+  }
+
   /**
    * Check if Python dependencies are installed
    */
@@ -333,6 +716,17 @@ class AnalyticsService {
   }
 
   // Helper methods
+  formatWatermarkedResponse(result) {
+    // not_modified: nothing changed since the client's watermark; delta: only the changed sections
+    return {
+      status: result.status,
+      since: result.since,
+      watermark: result.watermark,
+      ...(result.status === 'delta' ? { changes: result.changes } : {}),
+      timestamp: new Date().toISOString()
+    };
+  }
+
   getBestMeal(mealPerformance) {
     let bestMeal = null;
     let bestRating = 0;
@@ -377,6 +771,26 @@ class AnalyticsService {
     return 'poor';
   }
 
+  processAlerts(alerts, dateString) {
+    // Add ids, severity levels and timestamps
+    return alerts.map(alert => ({
+      ...alert,
+      id: this.generateAlertId(alert),
+      severity: this.getAlertSeverity(alert.type),
+      timestamp: new Date().toISOString(),
+      date: dateString
+    }));
+  }
+
+  countAlerts(alerts) {
+    return {
+      total: alerts.length,
+      critical: alerts.filter(a => a.type === 'critical').length,
+      warning: alerts.filter(a => a.type === 'warning').length,
+      info: alerts.filter(a => a.type === 'info').length
+    };
+  }
+
   generateAlertId(alert) {
     // Generate a simple ID based on alert content
     const content = `${alert.type}-${alert.meal || 'general'}-${alert.message}`;
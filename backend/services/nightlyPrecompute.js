@@ -0,0 +1,57 @@
+import analyticsService from './analyticsService.js';
+
+const IST_OFFSET_MS = 5.5 * 60 * 60 * 1000;
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+/**
+ * Milliseconds until the next HH:MM in IST
+ */
+export const msUntilNextRun = (time, now = new Date()) => {
+  const [hours, minutes] = time.split(':').map(Number);
+  const istNow = now.getTime() + IST_OFFSET_MS;
+  const istMidnight = istNow - (istNow % DAY_MS);
+  let next = istMidnight + (hours * 60 + minutes) * 60 * 1000;
+  if (next <= istNow) next += DAY_MS;
+  return next - istNow;
+};
+
+const runPrecompute = async () => {
+  try {
+    const run = await analyticsService.runPrecompute();
+    if (run.error && !run.jobs) {
+      console.error('Nightly analytics precompute failed:', run.message);
+      return;
+    }
+    console.log(`📊 Analytics precompute for ${run.closedDay}: ${run.computed} computed, ${run.cached} current, ${run.failed} failed`);
+  } catch (error) {
+    console.error('Nightly analytics precompute failed:', error.message);
+  }
+};
+
+/**
+ * Warm the analytics result cache shortly after each IST day closes
+ * Enabled with ANALYTICS_PRECOMPUTE_NIGHTLY=true; ANALYTICS_PRECOMPUTE_TIME is the IST run time (HH:MM).
+ * A run at startup catches up any days missed while the server was down.
+ */
+export const startNightlyPrecompute = () => {
+  if (process.env.ANALYTICS_PRECOMPUTE_NIGHTLY !== 'true') {
+    return;
+  }
+  
+  const time = process.env.ANALYTICS_PRECOMPUTE_TIME || '00:15';
+  if (!/^\d{2}:\d{2}$/.test(time)) {
+    console.error(`Invalid ANALYTICS_PRECOMPUTE_TIME "${time}", nightly precompute disabled`);
+    return;
+  }
+  
+  const scheduleNext = () => {
+    setTimeout(async () => {
+      await runPrecompute();
+      scheduleNext();
+    }, msUntilNextRun(time));
+  };
+  
+  runPrecompute();
+  scheduleNext();
+  console.log(`📊 Nightly analytics precompute scheduled at ${time} IST`);
+};
@@ -0,0 +1,50 @@
+import { AnalyticsScheduler, AnalyticsBusyError, AnalyticsBatchDisabledError } from '../services/analyticsScheduler.js';
+
+const deferred = () => {
+  let resolve;
+  const promise = new Promise((done) => { resolve = done; });
+  return { promise, resolve };
+};
+
+describe('AnalyticsScheduler', () => {
+  test('rejects batch work when a single slot is configured', async () => {
+    const scheduler = new AnalyticsScheduler({ maxConcurrent: 1 });
+    let started = false;
+
+    const rejection = scheduler.run(async () => { started = true; }, { priority: 'batch' });
+    await expect(rejection).rejects.toBeInstanceOf(AnalyticsBatchDisabledError);
+    await expect(rejection).rejects.toMatchObject({ code: 'ANALYTICS_BATCH_DISABLED' });
+    expect(started).toBe(false);
+    expect(scheduler.getStatus()).toMatchObject({ running: 0, queued: 0, rejected: 1 });
+
+    // Interactive work still runs on the only slot
+    await expect(scheduler.run(async () => 'daily')).resolves.toBe('daily');
+  });
+
+  test('batch work never takes the last free slot', async () => {
+    const scheduler = new AnalyticsScheduler({ maxConcurrent: 2 });
+    const report = deferred();
+    const firstReport = scheduler.run(() => report.promise, { priority: 'batch' });
+    const secondReport = scheduler.run(async () => 'second', { priority: 'batch' });
+
+    expect(scheduler.getStatus()).toMatchObject({ running: 1, runningBatch: 1, queued: 1 });
+    await expect(scheduler.run(async () => 'daily')).resolves.toBe('daily');
+
+    report.resolve('first');
+    await expect(firstReport).resolves.toBe('first');
+    await expect(secondReport).resolves.toBe('second');
+  });
+
+  test('a full queue is answered with AnalyticsBusyError', async () => {
+    const scheduler = new AnalyticsScheduler({ maxConcurrent: 1, maxQueue: 0, retryAfterSeconds: 7 });
+    const job = deferred();
+    const running = scheduler.run(() => job.promise);
+
+    const rejection = scheduler.run(async () => 'late');
+    await expect(rejection).rejects.toBeInstanceOf(AnalyticsBusyError);
+    await expect(rejection).rejects.toMatchObject({ retryAfter: 7 });
+
+    job.resolve('done');
+    await expect(running).resolves.toBe('done');
+  });
+});
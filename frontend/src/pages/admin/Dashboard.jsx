@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { analyticsAPI, feedbackAPI } from '../../config/api';
 import LoadingSpinner from '../../components/common/LoadingSpinner';
 import '../../styles/dashboard-animations.css';
@@ -92,13 +92,19 @@ const AdminDashboard = () => {
     return yesterday.toISOString().split('T')[0];
   });
 
+  // The dashboard bundle already carries the first day and week, so the tab effect
+  // only refetches after a tab or date change
+  const bundleLoaded = useRef(false);
+
   useEffect(() => {
     fetchData();
-    fetchQuickStats();
-    fetchAlerts();
   }, []);
 
   useEffect(() => {
+    if (!bundleLoaded.current) {
+      bundleLoaded.current = true;
+      return;
+    }
     if (activeTab === 'daily') {
       fetchDailyData();
     } else if (activeTab === 'weekly') {
@@ -111,11 +117,7 @@ const AdminDashboard = () => {
   const fetchData = async () => {
     try {
       setLoading(true);
-      await Promise.all([
-        fetchDailyData(),
-        fetchQuickStats(),
-        fetchAlerts()
-      ]);
+      await fetchDashboardBundle();
     } catch (error) {
       console.error('Error fetching data:', error);
       toast.error('Failed to load dashboard data');
@@ -124,9 +126,10 @@ const AdminDashboard = () => {
     }
   };
 
-  const fetchDailyData = async () => {
+  // One request for the day, its week, quick stats and alerts
+  const fetchDashboardBundle = async () => {
     try {
-      const response = await fetch(`http://localhost:5000/api/analytics/daily/${selectedDate}`, {
+      const response = await fetch(`http://localhost:5000/api/analytics/dashboard/bundle?date=${selectedDate}`, {
         headers: {
           'Authorization': `Bearer ${localStorage.getItem('firebaseToken')}`
         }
@@ -134,29 +137,57 @@ const AdminDashboard = () => {
       const data = await response.json();
       
       if (data.status === 'success') {
-        setDailyData(data.data);
-      } else if (data.status === 'no_data') {
-        // Handle no data scenarios
-        setDailyData({
-          type: data.type,
-          message: data.message,
-          overview: data.data?.overview || {
-            totalStudents: 0,
-            participatingStudents: 0,
-            participationRate: 0,
-            overallRating: 0
-          }
-        });
+        applyDailyResponse(data.data.today);
+        if (!data.data.week.error) {
+          setWeeklyData(data.data.week.data);
+        }
+        setQuickStats(data.data.quickStats);
+        setAlerts(data.data.alerts);
       } else {
-        console.error('Error in daily analysis:', data.message);
-        toast.error(data.message || 'Failed to fetch daily data');
+        console.error('Error in dashboard bundle:', data.message);
+        toast.error(data.message || 'Failed to fetch dashboard data');
       }
+    } catch (error) {
+      console.error('Error fetching dashboard bundle:', error);
+      toast.error('Failed to fetch dashboard data');
+    }
+  };
+
+  const fetchDailyData = async () => {
+    try {
+      const response = await fetch(`http://localhost:5000/api/analytics/daily/${selectedDate}`, {
+        headers: {
+          'Authorization': `Bearer ${localStorage.getItem('firebaseToken')}`
+        }
+      });
+      applyDailyResponse(await response.json());
     } catch (error) {
       console.error('Error fetching daily data:', error);
       toast.error('Failed to fetch daily analysis data');
     }
   };
 
+  const applyDailyResponse = (data) => {
+    if (data.status === 'success') {
+      setDailyData(data.data);
+    } else if (data.status === 'no_data') {
+      // Handle no data scenarios
+      setDailyData({
+        type: data.type,
+        message: data.message,
+        overview: data.data?.overview || {
+          totalStudents: 0,
+          participatingStudents: 0,
+          participationRate: 0,
+          overallRating: 0
+        }
+      });
+    } else {
+      console.error('Error in daily analysis:', data.message);
+      toast.error(data.message || 'Failed to fetch daily data');
+    }
+  };
+
   const fetchWeeklyData = async () => {
     try {
       const response = await fetch(`http://localhost:5000/api/analytics/weekly/${selectedDate}`, {
@@ -189,22 +220,6 @@ const AdminDashboard = () => {
     }
   };
 
-  const fetchQuickStats = async () => {
-    try {
-      const response = await fetch('http://localhost:5000/api/analytics/dashboard/quick-stats', {
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('firebaseToken')}`
-        }
-      });
-      const data = await response.json();
-      if (data.status === 'success') {
-        setQuickStats(data.data);
-      }
-    } catch (error) {
-      console.error('Error fetching quick stats:', error);
-    }
-  };
-
   const fetchAlerts = async () => {
     try {
       const response = await fetch('http://localhost:5000/api/analytics/alerts', {